@@ -11,6 +11,8 @@ from django.core.cache import cache
 from journal.models import Journal
 from communication.models import AssistantIA
 from django.db.models import Count
+from mindscribe.openrouter import get_client
+from mindscribe.model_router import RoutingError, get_router
 
 logger = logging.getLogger(__name__)
 
@@ -41,18 +43,18 @@ class OpenRouterService:
         
         models_to_try = [model] if model else [self.default_model] + self.fallback_models
         
-        for current_model in models_to_try:
-            try:
-                logger.info(f"Essai avec le modèle: {current_model}")
-                result = self._call_openrouter_api(prompt, current_model, **kwargs)
-                if result['success']:
-                    logger.info(f"✅ Succès avec {current_model}")
-                    return result
-                else:
-                    logger.warning(f"Échec avec {current_model}, essaye le suivant...")
-            except Exception as e:
-                logger.warning(f"Erreur avec {current_model}: {str(e)}, essaye le suivant...")
-                continue
+        # Le routeur essaie d'abord le modèle le plus rapide en ce moment, lance une requête
+        # "hedgée" sur le suivant s'il tarde, et respecte une deadline totale pour tous les modèles
+        try:
+            result, modele = get_router().call(
+                lambda current_model, timeout: self._call_openrouter_api(prompt, current_model, deadline=timeout, **kwargs),
+                models_to_try,
+                deadline=self.config.get('timeout', 60)
+            )
+            logger.info(f"✅ Succès avec {modele}")
+            return result
+        except RoutingError as e:
+            logger.warning(f"Aucun modèle n'a répondu: {e}")
                 
         logger.error("Tous les modèles ont échoué, utilisation du mode simulation")
         fallback_response = self._generer_reponse_intelligente(prompt)
@@ -65,7 +67,7 @@ class OpenRouterService:
             'date_interaction': fallback_response.get('date_interaction', timezone.now().strftime('%H:%M')),
         }
     
-    def _call_openrouter_api(self, prompt: str, model: str, **kwargs) -> Dict:
+    def _call_openrouter_api(self, prompt: str, model: str, deadline: float = None, **kwargs) -> Dict:
         print("🚀 ========== DÉBUT APPEL OPENROUTER API ==========")
         print(f"📝 PROMPT ENVOYÉ ({len(prompt)} caractères):")
         print(f"\"{prompt}\"")
@@ -73,13 +75,6 @@ class OpenRouterService:
         
         start_time = time.time()
         try:
-            headers = {
-                'Authorization': f'Bearer {self.api_key}',
-                'Content-Type': 'application/json',
-                'HTTP-Referer': getattr(settings, 'SITE_URL', 'https://mindscribe.com'),
-                'X-Title': getattr(settings, 'SITE_NAME', 'MindScribe'),
-            }
-            
             payload = {
                 'model': model,
                 'messages': [{'role': 'user', 'content': prompt}],
@@ -88,16 +83,12 @@ class OpenRouterService:
             }
             
             logger.info(f"Envoi requête à OpenRouter avec modèle: {model}")
-            response = requests.post(
-                f'{self.base_url}/chat/completions',
-                headers=headers,
-                json=payload,
-                timeout=self.config.get('timeout', 60)
+            # Client partagé : connexions persistantes, deadline globale et disjoncteur par modèle
+            data = get_client().chat_completion(
+                payload,
+                deadline=deadline or self.config.get('timeout', 60)
             )
-            
-            logger.info(f"Réponse OpenRouter - Status: {response.status_code}")
-            response.raise_for_status()
-            data = response.json()
+            logger.info(f"Réponse OpenRouter reçue pour {model}")
             
             duree = time.time() - start_time
             
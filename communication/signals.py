@@ -0,0 +1,10 @@
+"""
+Signaux de l'application communication.
+"""
+from mindscribe.response_cache import invalidate_on
+from .models import AssistantIA, RapportPDF, SuggestionConnexion
+
+# Compteurs du tableau de bord communication en cache : invalidés à chaque écriture
+invalidate_on('communication', RapportPDF, 'utilisateur')
+invalidate_on('communication', AssistantIA, 'utilisateur')
+invalidate_on('communication', SuggestionConnexion, 'utilisateur_source')
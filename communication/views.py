@@ -16,6 +16,8 @@ from io import BytesIO
 import logging
 from .models import AssistantIA
 from .services.ai_service import ai_service
+from mindscribe.response_cache import cache_per_user
+from mindscribe.throttling import RateLimited, request_key, throttled_call
 
 from .models import RapportPDF, ModeleRapport, HistoriqueGeneration, AssistantIA, SuggestionConnexion
 from django.db.models import Q
@@ -33,6 +35,7 @@ from django.core import serializers
 class DashboardCommunicationView(LoginRequiredMixin, View):
     """Vue principale du tableau de bord communication"""
     
+    @method_decorator(cache_per_user('communication'))
     def get(self, request):
         context = {
             'active_tab': 'communication',
@@ -396,14 +399,27 @@ class EnvoyerMessageView(LoginRequiredMixin, View):
                 'journal_info': journal_info,
             }
             
-            # Process interaction
-            resultat = ai_service.traiter_interaction(
-                utilisateur=request.user,
-                message=message,
-                journal=journal,
-                session_id=session_id,
-                contexte=contexte
-            )
+            # Process interaction (un double envoi du même message partage le même appel IA)
+            try:
+                resultat = throttled_call(
+                    'assistant',
+                    str(request.user.id),
+                    request_key(message, journal_id, session_id),
+                    lambda: ai_service.traiter_interaction(
+                        utilisateur=request.user,
+                        message=message,
+                        journal=journal,
+                        session_id=session_id,
+                        contexte=contexte
+                    )
+                )
+            except RateLimited as e:
+                response = JsonResponse({
+                    'success': False,
+                    'error': 'Trop de messages envoyés, veuillez patienter quelques secondes.'
+                }, status=429)
+                response['Retry-After'] = e.retry_after_header
+                return response
             
             if resultat.get('success'):
                 response_data = {
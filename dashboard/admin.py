@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Statistique
+from .models import AgregatJournalier, Statistique
 
 @admin.register(Statistique)
 class StatistiqueAdmin(admin.ModelAdmin):
@@ -20,3 +20,11 @@ class StatistiqueAdmin(admin.ModelAdmin):
             'fields': ('analyses_liees',)
         }),
     )
+
+
+@admin.register(AgregatJournalier)
+class AgregatJournalierAdmin(admin.ModelAdmin):
+    list_display = ['utilisateur', 'jour', 'nombre_analyses', 'nombre_entrees', 'date_mise_a_jour']
+    list_filter = ['jour']
+    search_fields = ['utilisateur__username', 'utilisateur__email']
+    readonly_fields = ['id', 'date_mise_a_jour']
@@ -0,0 +1,35 @@
+"""
+Commande reconstruisant les agrégats journaliers du tableau de bord.
+"""
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.services.agregats import recalculer_agregats
+
+
+class Command(BaseCommand):
+    help = 'Reconstruit les agrégats journaliers (AgregatJournalier) à partir des analyses et des entrées de journal'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--utilisateur',
+            action='append',
+            help="Nom d'utilisateur à recalculer (répétable) ; tous les utilisateurs par défaut"
+        )
+        parser.add_argument('--taille-lot', type=int, default=500, help='Lignes par insertion groupée')
+
+    def handle(self, *args, **options):
+        utilisateurs = None
+        if options['utilisateur']:
+            utilisateurs = get_user_model().objects.filter(username__in=options['utilisateur'])
+            inconnus = set(options['utilisateur']) - set(utilisateurs.values_list('username', flat=True))
+            if inconnus:
+                raise CommandError(f"Utilisateurs inconnus : {', '.join(sorted(inconnus))}")
+
+        debut = time.perf_counter()
+        nombre = recalculer_agregats(utilisateurs, taille_lot=options['taille_lot'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{nombre} agrégats journaliers recalculés en {time.perf_counter() - debut:.1f}s"
+        ))
@@ -174,4 +174,79 @@ class BilanMensuel(models.Model):
     class Meta:
         verbose_name = "Bilan Mensuel IA"
         verbose_name_plural = "Bilans Mensuels IA"
-        ordering = ['-date_creation']
\ No newline at end of file
+        ordering = ['-date_creation']
+
+class AgregatJournalier(models.Model):
+    """
+    Agrégats d'un utilisateur pour une journée, tenus à jour à chaque enregistrement ou
+    suppression d'une analyse (JournalAnalysis) ou d'une entrée (Journal).
+
+    Les APIs du tableau de bord lisent ces lignes (une par jour d'activité) au lieu de
+    reparcourir toutes les analyses de l'utilisateur.
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    utilisateur = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='agregats_journaliers',
+        verbose_name="Utilisateur"
+    )
+    jour = models.DateField(verbose_name="Jour")
+
+    # Analyses (module2_analysis.JournalAnalysis)
+    nombre_analyses = models.IntegerField(default=0, verbose_name="Nombre d'analyses")
+    sentiments = models.JSONField(default=dict, blank=True, verbose_name="Nombre d'analyses par sentiment")
+    somme_emotion_score = models.FloatField(default=0.0, verbose_name="Somme des scores d'émotion")
+    mots_cles = models.JSONField(default=dict, blank=True, verbose_name="Occurrences des mots-clés")
+    themes = models.JSONField(default=dict, blank=True, verbose_name="Occurrences des thèmes")
+
+    # Entrées (journal.Journal)
+    nombre_entrees = models.IntegerField(default=0, verbose_name="Nombre d'entrées")
+
+    date_mise_a_jour = models.DateTimeField(auto_now=True, verbose_name="Date de mise à jour")
+
+    def __str__(self):
+        return f"Agrégat {self.utilisateur.username} - {self.jour}"
+
+    @property
+    def emotion_score_moyen(self):
+        return self.somme_emotion_score / self.nombre_analyses if self.nombre_analyses else None
+
+    @property
+    def est_vide(self):
+        return self.nombre_analyses <= 0 and self.nombre_entrees <= 0
+
+    class Meta:
+        verbose_name = "Agrégat journalier"
+        verbose_name_plural = "Agrégats journaliers"
+        ordering = ['jour']
+        unique_together = ('utilisateur', 'jour')
+
+
+class VersionDonnees(models.Model):
+    """
+    Version des données d'un utilisateur pour une portée ('dashboard', 'bilans', ...),
+    incrémentée à chaque écriture qui les concerne. Partagée par tous les processus, elle
+    entre dans la clé des réponses en cache (mindscribe/response_cache.py) ; celle de la
+    portée 'dashboard' sert aussi d'ETag aux réponses du tableau de bord.
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    utilisateur = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='versions_donnees',
+        verbose_name="Utilisateur"
+    )
+    portee = models.CharField(max_length=50, default='dashboard', verbose_name="Portée")
+    version = models.PositiveIntegerField(default=0, verbose_name="Version")
+    date_mise_a_jour = models.DateTimeField(auto_now=True, verbose_name="Date de mise à jour")
+
+    def __str__(self):
+        return f"Version {self.version} ({self.portee}) - {self.utilisateur.username}"
+
+    class Meta:
+        verbose_name = "Version des données"
+        verbose_name_plural = "Versions des données"
+        unique_together = ['utilisateur', 'portee']
@@ -0,0 +1,444 @@
+# dashboard/services/agregats.py
+"""
+Agrégats journaliers par utilisateur (AgregatJournalier), source des APIs du tableau de bord.
+
+Chaque enregistrement ou suppression d'une analyse (JournalAnalysis) ou d'une entrée
+(Journal) recalcule la ligne du jour concerné à partir de ses lignes sources (voir
+dashboard/signals.py et recalculer_jour) : la lecture du tableau de bord coûte alors
+O(jours d'activité) au lieu de O(analyses), une écriture O(analyses du jour).
+
+Les opérations qui n'envoient pas de signaux (QuerySet.update, bulk_create, modifications
+directes en base) ne sont pas suivies : la commande `recalculer_agregats` reconstruit les
+agrégats à partir des analyses et des entrées.
+
+Toute modification des agrégats d'un utilisateur incrémente sa VersionDonnees, d'où est
+tiré l'ETag du tableau de bord : une requête conditionnelle sans changement coûte la
+lecture d'une seule ligne.
+"""
+import logging
+from collections import Counter
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from dashboard.models import AgregatJournalier
+from mindscribe.response_cache import bump_version, get_version
+from .analytique import agregats_journaliers_mongo, base_mongo
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+SENTIMENTS_POSITIFS = ['positif', 'positive', 'happy', 'joyful']
+SENTIMENTS_NEGATIFS = ['negatif', 'negative', 'sad', 'angry']
+
+# Score numérique d'un sentiment, pour le graphique d'évolution d'humeur
+SCORE_SENTIMENT = {
+    'positif': 1, 'positive': 1, 'happy': 1, 'joyful': 1,
+    'neutre': 0, 'neutral': 0, 'mixed': 0,
+    'negatif': -1, 'negative': -1, 'sad': -1, 'angry': -1
+}
+
+# Champs d'une analyse qui entrent dans les agrégats
+CHAMPS_ANALYSE = ('user', 'created_at', 'sentiment', 'emotion_score', 'keywords', 'topics')
+
+# À incrémenter quand le format du tableau de bord change, pour invalider les ETags émis
+FORMAT_TABLEAU_DE_BORD = 1
+
+# Nombre de jours d'écriture affichés par le graphique de fréquence
+JOURS_FREQUENCE = 30
+
+
+def jour_de(date_heure):
+    """
+    Retourne le jour (date locale) d'une date/heure.
+    """
+    if timezone.is_aware(date_heure):
+        return timezone.localdate(date_heure)
+    return date_heure.date()
+
+
+def ton_sentiment(sentiment):
+    """
+    Ramène un sentiment brut à 'positif', 'negatif' ou 'neutre'.
+    """
+    sentiment = (sentiment or '').lower()
+    if sentiment in SENTIMENTS_POSITIFS:
+        return 'positif'
+    if sentiment in SENTIMENTS_NEGATIFS:
+        return 'negatif'
+    return 'neutre'
+
+
+def contribution_analyse(analyse):
+    """
+    Retourne la part d'une analyse dans les agrégats.
+
+    Args:
+        analyse (JournalAnalysis): L'analyse
+
+    Returns:
+        dict: utilisateur_id, jour, sentiment, emotion_score, keywords et topics, ou None
+            si l'analyse n'est rattachée à aucun utilisateur ou à aucune date
+    """
+    if not analyse.user_id or analyse.created_at is None:
+        return None
+    return {
+        'utilisateur_id': analyse.user_id,
+        'jour': jour_de(analyse.created_at),
+        'sentiment': analyse.sentiment or '',
+        'emotion_score': analyse.emotion_score or 0.0,
+        'keywords': [str(mot) for mot in analyse.keywords or []],
+        'topics': [str(theme) for theme in analyse.topics or []],
+    }
+
+
+def _ajuster_compteur(compteur, elements, signe):
+    for element in elements:
+        compte = compteur.get(element, 0) + signe
+        if compte > 0:
+            compteur[element] = compte
+        else:
+            compteur.pop(element, None)
+
+
+def cumuler_analyse(agregat, contribution, signe=1):
+    """
+    Ajoute (signe=1) ou retire (signe=-1) une analyse d'un agrégat, sans l'enregistrer.
+    """
+    agregat.nombre_analyses += signe
+    agregat.somme_emotion_score += signe * contribution['emotion_score']
+    _ajuster_compteur(agregat.sentiments, [contribution['sentiment']], signe)
+    _ajuster_compteur(agregat.mots_cles, contribution['keywords'], signe)
+    _ajuster_compteur(agregat.themes, contribution['topics'], signe)
+    if agregat.nombre_analyses <= 0:
+        # Plus aucune analyse ce jour-là : repart de zéro plutôt que de garder des restes d'arrondi
+        agregat.nombre_analyses = 0
+        agregat.somme_emotion_score = 0.0
+
+
+# Champs d'un agrégat recalculés à partir des lignes sources
+CHAMPS_AGREGAT = ('nombre_analyses', 'sentiments', 'somme_emotion_score', 'mots_cles', 'themes', 'nombre_entrees')
+
+# Recalculs d'un jour tant que des écritures concurrentes le modifient
+ESSAIS_RECALCUL = 3
+
+
+def _bornes_du_jour(jour):
+    debut = datetime.combine(jour, time.min)
+    if settings.USE_TZ:
+        debut = timezone.make_aware(debut)
+    return debut, debut + timedelta(days=1)
+
+
+def _valeurs_du_jour(utilisateur_id, jour):
+    """
+    Calcule l'agrégat d'un jour à partir de ses analyses et de ses entrées.
+
+    Returns:
+        dict: Les champs de CHAMPS_AGREGAT, ou None si le jour est vide
+    """
+    from journal.models import Journal
+    from module2_analysis.models import JournalAnalysis
+
+    debut, fin = _bornes_du_jour(jour)
+    # Ordre chronologique : les compteurs gardent l'ordre d'arrivée des analyses
+    agregat = _calculer_agregats_python(
+        JournalAnalysis.objects.filter(
+            user_id=utilisateur_id, created_at__gte=debut, created_at__lt=fin
+        ).order_by('created_at', 'pk'),
+        Journal.objects.filter(utilisateur_id=utilisateur_id, date_creation__gte=debut, date_creation__lt=fin),
+    ).get((utilisateur_id, jour))
+    if agregat is None or agregat.est_vide:
+        return None
+    return {champ: getattr(agregat, champ) for champ in CHAMPS_AGREGAT}
+
+
+def _enregistrer_jour(utilisateur_id, jour, valeurs, creer):
+    lignes = AgregatJournalier.objects.filter(utilisateur_id=utilisateur_id, jour=jour)
+    if valeurs is None:
+        lignes.delete()
+    elif not lignes.update(**valeurs) and creer:
+        try:
+            with transaction.atomic():
+                AgregatJournalier.objects.create(utilisateur_id=utilisateur_id, jour=jour, **valeurs)
+        except IntegrityError:
+            # Créée entre-temps par une écriture concurrente
+            lignes.update(**valeurs)
+
+
+def recalculer_jour(utilisateur_id, jour, creer=True):
+    """
+    Recalcule l'agrégat d'un jour à partir des lignes sources et l'enregistre.
+
+    Un agrégat n'est jamais modifié par lecture-modification-écriture : deux écritures
+    concurrentes ne peuvent pas perdre une mise à jour (djongo ne verrouille pas les lignes
+    et les compteurs JSON ne se prêtent pas à un $inc). Après l'enregistrement, le jour est
+    relu : si une écriture concurrente l'a changé entre le calcul et l'enregistrement, il
+    est recalculé, si bien que le dernier recalcul enregistré correspond aux sources.
+
+    Args:
+        utilisateur_id (int): L'utilisateur
+        jour (date): Le jour
+        creer (bool): Si l'agrégat peut être créé ; un retrait ne doit pas recréer la
+            ligne d'un utilisateur en cours de suppression
+    """
+    valeurs = _valeurs_du_jour(utilisateur_id, jour)
+    for _ in range(ESSAIS_RECALCUL):
+        _enregistrer_jour(utilisateur_id, jour, valeurs, creer)
+        relues = _valeurs_du_jour(utilisateur_id, jour)
+        if relues == valeurs:
+            break
+        valeurs = relues
+    else:
+        logger.warning(f"Agrégat du {jour} (utilisateur {utilisateur_id}) modifié pendant son recalcul")
+    incrementer_versions([utilisateur_id])
+
+
+def _recalculer_jour_maintenant_et_au_commit(utilisateur_id, jour, creer):
+    recalculer_jour(utilisateur_id, jour, creer)
+    # Dans une transaction, les écritures concurrentes ne sont visibles qu'après le commit
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: recalculer_jour(utilisateur_id, jour, creer=False))
+
+
+def appliquer_analyse(contribution, signe=1):
+    """
+    Met à jour l'agrégat du jour d'une analyse ajoutée ou retirée.
+
+    Args:
+        contribution (dict): La part de l'analyse (contribution_analyse), ou None
+        signe (int): 1 pour un ajout, -1 pour un retrait
+    """
+    if contribution is None:
+        return
+    _recalculer_jour_maintenant_et_au_commit(contribution['utilisateur_id'], contribution['jour'], creer=signe > 0)
+
+
+def appliquer_entree(utilisateur_id, date_creation, signe=1):
+    """
+    Met à jour l'agrégat du jour d'une entrée de journal ajoutée ou retirée.
+    """
+    if not utilisateur_id or date_creation is None:
+        return
+    _recalculer_jour_maintenant_et_au_commit(utilisateur_id, jour_de(date_creation), creer=signe > 0)
+
+
+def incrementer_versions(utilisateur_ids):
+    """
+    Incrémente la version des données des utilisateurs donnés (et invalide leurs réponses en cache).
+    """
+    for utilisateur_id in set(utilisateur_ids):
+        bump_version('dashboard', utilisateur_id)
+
+
+def etag_donnees(utilisateur, version=None):
+    """
+    Retourne l'ETag des données du tableau de bord d'un utilisateur.
+
+    Args:
+        utilisateur (User): L'utilisateur
+        version (str, optional): La version 'dashboard' déjà lue pour la requête, qui entre
+            aussi dans la clé de la réponse en cache ; relue sinon
+    """
+    version = version or get_version('dashboard', utilisateur.pk)
+    return f"{FORMAT_TABLEAU_DE_BORD}-{utilisateur.pk}-{version}"
+
+
+def _calculer_agregats_python(analyses, journaux):
+    """
+    Calcule les agrégats journaliers en parcourant les analyses et les entrées.
+
+    Returns:
+        dict: {(utilisateur_id, jour): AgregatJournalier non enregistré}
+    """
+    agregats = {}
+
+    def agregat_du(utilisateur_id, jour):
+        cle = (utilisateur_id, jour)
+        if cle not in agregats:
+            agregats[cle] = AgregatJournalier(
+                utilisateur_id=utilisateur_id, jour=jour, sentiments={}, mots_cles={}, themes={}
+            )
+        return agregats[cle]
+
+    for analyse in analyses.only(*CHAMPS_ANALYSE).iterator():
+        contribution = contribution_analyse(analyse)
+        if contribution is not None:
+            cumuler_analyse(agregat_du(contribution['utilisateur_id'], contribution['jour']), contribution)
+
+    for utilisateur_id, date_creation in journaux.values_list('utilisateur_id', 'date_creation').iterator():
+        if date_creation is not None:
+            agregat_du(utilisateur_id, jour_de(date_creation)).nombre_entrees += 1
+
+    return agregats
+
+
+def _calculer_agregats_mongo(utilisateurs):
+    """
+    Calcule les agrégats journaliers par pipelines MongoDB, ou retourne None si indisponible.
+    """
+    db = base_mongo()
+    if db is None:
+        return None
+    utilisateur_ids = None if utilisateurs is None else list(utilisateurs.values_list('pk', flat=True))
+    try:
+        valeurs = agregats_journaliers_mongo(db, utilisateur_ids)
+    except Exception as e:
+        logger.warning(f"Échec des pipelines MongoDB, agrégats recalculés en Python: {e}")
+        return None
+    return {
+        (utilisateur_id, jour): AgregatJournalier(utilisateur_id=utilisateur_id, jour=jour, **champs)
+        for (utilisateur_id, jour), champs in valeurs.items()
+    }
+
+
+def recalculer_agregats(utilisateurs=None, taille_lot=500):
+    """
+    Reconstruit les agrégats à partir des analyses et des entrées de journal.
+
+    Sur MongoDB, les comptes sont faits par le serveur (dashboard/services/analytique.py) ;
+    sinon, ou si les pipelines échouent, en parcourant les lignes.
+
+    Args:
+        utilisateurs (QuerySet, optional): Les utilisateurs concernés, tous par défaut
+        taille_lot (int): Nombre de lignes par insertion groupée
+
+    Returns:
+        int: Nombre d'agrégats créés
+    """
+    from journal.models import Journal
+    from module2_analysis.models import JournalAnalysis
+
+    analyses = JournalAnalysis.objects.all()
+    journaux = Journal.objects.all()
+    anciens = AgregatJournalier.objects.all()
+    if utilisateurs is not None:
+        analyses = analyses.filter(user__in=utilisateurs)
+        journaux = journaux.filter(utilisateur__in=utilisateurs)
+        anciens = anciens.filter(utilisateur__in=utilisateurs)
+
+    agregats = _calculer_agregats_mongo(utilisateurs)
+    if agregats is None:
+        agregats = _calculer_agregats_python(analyses, journaux)
+
+    with transaction.atomic():
+        concernes = set(anciens.values_list('utilisateur_id', flat=True))
+        concernes.update(utilisateur_id for utilisateur_id, _ in agregats)
+        anciens.delete()
+        AgregatJournalier.objects.bulk_create(agregats.values(), batch_size=taille_lot)
+        incrementer_versions(concernes)
+
+    logger.info(f"{len(agregats)} agrégats journaliers recalculés")
+    return len(agregats)
+
+
+def agregats_utilisateur(utilisateur):
+    """
+    Retourne les agrégats journaliers d'un utilisateur, du plus ancien au plus récent.
+    """
+    return AgregatJournalier.objects.filter(utilisateur=utilisateur).order_by('jour')
+
+
+def cumuler_compteurs(agregats, champ):
+    """
+    Additionne un compteur (sentiments, mots_cles ou themes) sur plusieurs jours.
+
+    Returns:
+        Counter: Occurrences cumulées
+    """
+    total = Counter()
+    for compteur in agregats.values_list(champ, flat=True):
+        total.update(compteur or {})
+    return total
+
+
+def score_du_jour(agregat):
+    """
+    Retourne le score d'humeur moyen (-1 à 1) des analyses d'un jour.
+    """
+    if not agregat.nombre_analyses:
+        return 0
+    total = sum(SCORE_SENTIMENT.get(sentiment.lower(), 0) * compte for sentiment, compte in agregat.sentiments.items())
+    return round(total / agregat.nombre_analyses, 2)
+
+
+def sentiment_du_jour(agregat):
+    """
+    Retourne le sentiment le plus fréquent des analyses d'un jour.
+    """
+    if not agregat.sentiments:
+        return ''
+    return max(agregat.sentiments, key=agregat.sentiments.get)
+
+
+def humeur_dominante(sentiment_counts):
+    """
+    Retourne le ton ('positif', 'negatif' ou 'neutre') du sentiment le plus fréquent.
+    """
+    if not sentiment_counts:
+        return 'neutre'
+    return ton_sentiment(max(sentiment_counts, key=sentiment_counts.get))
+
+
+def distribution_sentiments(sentiment_counts):
+    """
+    Répartit les analyses entre sentiments positifs, neutres et négatifs.
+    """
+    positif = sum(sentiment_counts.get(sentiment, 0) for sentiment in SENTIMENTS_POSITIFS)
+    negatif = sum(sentiment_counts.get(sentiment, 0) for sentiment in SENTIMENTS_NEGATIFS)
+    return {
+        'positif': positif,
+        'neutre': sum(sentiment_counts.values()) - positif - negatif,
+        'negatif': negatif,
+    }
+
+
+def resume_tableau_de_bord(utilisateur):
+    """
+    Calcule tous les widgets du tableau de bord en un seul parcours des agrégats.
+
+    Returns:
+        dict: Une section par widget, au format de l'API correspondante (sans 'success')
+    """
+    evolution = {'dates': [], 'scores': [], 'sentiments': []}
+    sentiment_counts = Counter()
+    mots_cles = Counter()
+    themes = Counter()
+    frequence = []
+    total_analyses = 0
+
+    for agregat in agregats_utilisateur(utilisateur).iterator():
+        if agregat.nombre_analyses:
+            total_analyses += agregat.nombre_analyses
+            evolution['dates'].append(agregat.jour.strftime('%Y-%m-%d'))
+            evolution['scores'].append(score_du_jour(agregat))
+            evolution['sentiments'].append(sentiment_du_jour(agregat))
+        sentiment_counts.update(agregat.sentiments or {})
+        mots_cles.update(agregat.mots_cles or {})
+        themes.update(agregat.themes or {})
+        if agregat.nombre_entrees:
+            frequence.append((agregat.jour.strftime('%Y-%m-%d'), agregat.nombre_entrees))
+
+    frequence = frequence[-JOURS_FREQUENCE:]
+    themes_comptes = themes.most_common(10)
+    return {
+        'statistiques': {
+            'total_analyses': total_analyses,
+            'humeur_moyenne': humeur_dominante(sentiment_counts),
+            'themes_uniques': len(themes),
+            'mots_cles': len(mots_cles),
+        },
+        'evolution_humeur': evolution,
+        'wordcloud': {'wordcloud': [[mot, count] for mot, count in mots_cles.most_common(50)]},
+        'themes': {
+            'labels': [theme for theme, _ in themes_comptes],
+            'data': [count for _, count in themes_comptes],
+        },
+        'distribution_humeurs': distribution_sentiments(sentiment_counts),
+        'frequence_ecriture': {
+            'dates': [jour for jour, _ in frequence],
+            'counts': [nombre for _, nombre in frequence],
+        },
+    }
@@ -4,6 +4,10 @@ from collections import Counter
 import string
 from datetime import datetime
 
+from .lexique import (
+    DICTIONNAIRE_PSYCHOLOGIQUE, EMOTION, INTENSITE, LEXIQUE, PATTERN, THEME, THEMES_PSYCHOLOGIQUES, Lexique
+)
+
 class AnalyseurRapide:
     def __init__(self):
         try:
@@ -43,94 +47,10 @@ class AnalyseurRapide:
                 'donc', 'or', 'ni', 'car', 'depuis', 'pendant', 'sous', 'sur', 'dans'
             ])
             
-            # Dictionnaire psychologique COMPLET en français
-            self.dictionnaire_psychologique = {
-                'émotions_primaire': {
-                    'joie': {
-                        'mots': ['heureux', 'content', 'joyeux', 'satisfait', 'fier', 'enthousiaste', 'optimiste', 'reconnaissant', 'chanceux', 'épanoui', 'réjoui', 'ravie', 'combler'],
-                        'score': 2.0,
-                        'intensite': 1.5
-                    },
-                    'tristesse': {
-                        'mots': ['triste', 'malheureux', 'déçu', 'désespéré', 'démoralisé', 'accablé', 'mélancolique', 'affligé', 'navré', 'peiné'],
-                        'score': -2.0,
-                        'intensite': 1.8
-                    },
-                    'colère': {
-                        'mots': ['fâché', 'énervé', 'frustré', 'irrité', 'exaspéré', 'furieux', 'outragé', 'rage', 'colère', 'irritation'],
-                        'score': -1.8,
-                        'intensite': 2.0
-                    },
-                    'peur': {
-                        'mots': ['anxieux', 'inquiet', 'craintif', 'paniqué', 'terrifié', 'appréhensif', 'angoissé', 'stressé', 'nerveux'],
-                        'score': -1.5,
-                        'intensite': 1.7
-                    },
-                    'dégout': {
-                        'mots': ['dégoûté', 'répugné', 'écœuré', 'horripilé', 'dégouté', 'repoussé'],
-                        'score': -1.2,
-                        'intensite': 1.3
-                    }
-                },
-                'émotions_secondaire': {
-                    'honte': {
-                        'mots': ['honteux', 'coupable', 'regret', 'remords', 'confus', 'gêné'],
-                        'score': -1.0,
-                        'intensite': 1.2
-                    },
-                    'jalousie': {
-                        'mots': ['jaloux', 'envieux', 'possessif', 'jalousie', 'envie'],
-                        'score': -0.8,
-                        'intensite': 1.1
-                    },
-                    'solitude': {
-                        'mots': ['seul', 'isolé', 'abandonné', 'rejeté', 'solitude', 'isolement'],
-                        'score': -1.5,
-                        'intensite': 1.6
-                    },
-                    'confiance': {
-                        'mots': ['confiant', 'serein', 'apaisé', 'rassuré', 'sécurisé', 'tranquille'],
-                        'score': 1.2,
-                        'intensite': 1.0
-                    }
-                },
-                'intensite_emotionnelle': {
-                    'faible': ['un peu', 'légèrement', 'assez', 'plutôt', 'modérément'],
-                    'moyenne': ['vraiment', 'suffisamment', 'bien', 'fort', 'intense'],
-                    'forte': ['très', 'extrêmement', 'totalement', 'complètement', 'absolument', 'profondément'],
-                    'extreme': ['intensément', 'passionnément', 'désespérément', 'terriblement', 'extrêmement']
-                },
-                'patterns_cognitifs': {
-                    'pensée_tout_rien': ['toujours', 'jamais', 'rien', 'tout', 'personne', 'aucun', 'chaque', 'sans'],
-                    'catastrophisme': ['horrible', 'terrible', 'catastrophe', 'désastre', 'insupportable', 'affreux', 'épouvantable'],
-                    'generalisation': ['encore', 'toujours', 'sans cesse', 'constamment', 'toujours pareil'],
-                    'personalisation': ['ma faute', 'je devrais', 'je dois', 'cest ma faute', 'à cause de moi']
-                }
-            }
-            
-            # Thèmes psychologiques détaillés
-            self.themes_psychologiques = {
-                'relations_interpersonnelles': {
-                    'mots': ['ami', 'amour', 'copain', 'copine', 'relation', 'amitié', 'partenaire', 'meilleur', 'dispute', 'conflit', 'famille', 'parent', 'collègue', 'proche', 'connaissance'],
-                    'sous_themes': ['conflit', 'rupture', 'réconciliation', 'solitude', 'communication', 'amitié', 'famille']
-                },
-                'estime_soi': {
-                    'mots': ['fier', 'honteux', 'confiant', 'doute', 'incapable', 'compétent', 'réussite', 'échec', 'valeur', 'estime', 'confiance'],
-                    'sous_themes': ['confiance en soi', 'doute', 'accomplissement', 'auto-critique', 'valorisation']
-                },
-                'santé_mentale': {
-                    'mots': ['stress', 'anxieux', 'déprimé', 'fatigue', 'énergie', 'sommeil', 'moral', 'équilibre', 'bienêtre', 'détente', 'repos'],
-                    'sous_themes': ['anxiété', 'dépression', 'burnout', 'bien-être', 'relaxation']
-                },
-                'travail_etudes': {
-                    'mots': ['travail', 'bureau', 'projet', 'réunion', 'deadline', 'emploi', 'carrière', 'examen', 'étude', 'profession', 'métier'],
-                    'sous_themes': ['pression', 'accomplissement', 'échec', 'réussite', 'évolution']
-                },
-                'developpement_personnel': {
-                    'mots': ['objectif', 'progrès', 'changement', 'amélioration', 'défi', 'apprentissage', 'croissance', 'évolution', 'transformation'],
-                    'sous_themes': ['croissance', 'transition', 'transformation', 'apprentissage']
-                }
-            }
+            # Lexique psychologique, compilé une fois à l'import (voir lexique.py)
+            self.dictionnaire_psychologique = DICTIONNAIRE_PSYCHOLOGIQUE
+            self.themes_psychologiques = THEMES_PSYCHOLOGIQUES
+            self.lexique = LEXIQUE
             
             print("✅ AnalyseurProfond initialisé avec succès!")
             
@@ -141,6 +61,7 @@ class AnalyseurRapide:
             self.stop_words_fr = self._get_fallback_stopwords()
             self.dictionnaire_psychologique = {}
             self.themes_psychologiques = {}
+            self.lexique = Lexique({}, {})
 
     def _get_fallback_stopwords(self):
         """Stopwords français de base sans NLTK"""
@@ -159,11 +80,14 @@ class AnalyseurRapide:
             return self._resultat_vide()
         
         try:
+            # Une seule recherche du lexique, partagée par les analyses
+            occurrences = self.lexique.rechercher(texte)
+
             # Analyses multiples et détaillées
-            analyse_sentiment = self._analyse_sentiment_profonde(texte)
-            analyse_emotions = self._analyse_emotions_detaillees(texte)
-            analyse_themes = self._analyse_themes_psychologiques(texte)
-            analyse_cognitive = self._analyse_patterns_cognitifs(texte)
+            analyse_sentiment = self._analyse_sentiment_profonde(texte, occurrences)
+            analyse_emotions = self._analyse_emotions_detaillees(texte, occurrences)
+            analyse_themes = self._analyse_themes_psychologiques(texte, occurrences)
+            analyse_cognitive = self._analyse_patterns_cognitifs(texte, occurrences)
             recommandations = self._generer_recommandations_personnalisees(
                 analyse_sentiment, analyse_emotions, analyse_themes, analyse_cognitive
             )
@@ -201,44 +125,48 @@ class AnalyseurRapide:
             print(f"❌ Erreur dans l'analyse: {e}")
             return self._resultat_erreur(str(e))
 
-    def _analyse_sentiment_profonde(self, texte):
+    def _occurrences(self, texte, occurrences):
+        """Occurrences du lexique dans le texte, recherchées si elles ne sont pas fournies"""
+        return self.lexique.rechercher(texte) if occurrences is None else occurrences
+
+    def _mots_par_categorie(self, occurrences, famille):
+        """Mots distincts trouvés par catégorie d'une famille du lexique, dans l'ordre du texte"""
+        categories = {}
+        for occurrence in occurrences:
+            for etiquette in occurrence.etiquettes:
+                if etiquette.famille == famille:
+                    mots = categories.setdefault(etiquette.categorie, [])
+                    if occurrence.mot not in mots:
+                        mots.append(occurrence.mot)
+        return categories
+
+    def _analyse_sentiment_profonde(self, texte, occurrences=None):
         """Analyse de sentiment multidimensionnelle sans NLTK"""
-        texte_lower = texte.lower()
+        occurrences = self._occurrences(texte, occurrences)
         
         # Score basé sur le dictionnaire français
         score_total = 0
         emotions_trouvees = {}
         mots_emotionnels = []
         
-        # Analyser chaque catégorie d'émotions
-        for categorie, emotions in self.dictionnaire_psychologique.items():
-            if 'émotions' in categorie:
-                for emotion_nom, data in emotions.items():
-                    mots_trouves = []
-                    for mot in data['mots']:
-                        if mot in texte_lower:
-                            # Compter les occurrences
-                            count = texte_lower.count(mot)
-                            score_total += data['score'] * count
-                            mots_trouves.extend([mot] * count)
-                            mots_emotionnels.extend([mot] * count)
-                    
-                    if mots_trouves:
-                        emotions_trouvees[emotion_nom] = {
-                            'score': data['score'] * len(mots_trouves),
-                            'mots_trouves': mots_trouves,
-                            'intensite': data['intensite']
-                        }
-        
-        # Analyser l'intensité
+        # Chaque occurrence d'un mot émotionnel compte, chaque mot d'intensité une fois
         intensite_score = 0
-        for niveau, mots in self.dictionnaire_psychologique['intensite_emotionnelle'].items():
-            for mot in mots:
-                if mot in texte_lower:
-                    if niveau == 'faible': intensite_score += 0.5
-                    elif niveau == 'moyenne': intensite_score += 1
-                    elif niveau == 'forte': intensite_score += 1.5
-                    elif niveau == 'extreme': intensite_score += 2
+        mots_intensite = set()
+        for occurrence in occurrences:
+            for etiquette in occurrence.etiquettes:
+                if etiquette.famille == EMOTION:
+                    score_total += etiquette.score
+                    emotion = emotions_trouvees.setdefault(etiquette.categorie, {
+                        'score': 0,
+                        'mots_trouves': [],
+                        'intensite': etiquette.intensite
+                    })
+                    emotion['score'] += etiquette.score
+                    emotion['mots_trouves'].append(occurrence.mot)
+                    mots_emotionnels.append(occurrence.mot)
+                elif etiquette.famille == INTENSITE and (etiquette.categorie, occurrence.mot) not in mots_intensite:
+                    mots_intensite.add((etiquette.categorie, occurrence.mot))
+                    intensite_score += etiquette.score
         
         # Déterminer le ton principal
         if score_total > 3:
@@ -266,7 +194,7 @@ class AnalyseurRapide:
             intensite_globale = 'faible'
         
         # Détection spéciale pour les cas évidents
-        if 'heureux' in texte_lower and 'salut' in texte_lower:
+        if 'heureux' in mots_emotionnels and 'salut' in texte.lower():
             ton_principal = 'positif'
             confiance = 0.9
         
@@ -280,69 +208,65 @@ class AnalyseurRapide:
             'mots_emotionnels': mots_emotionnels
         }
 
-    def _analyse_emotions_detaillees(self, texte):
+    def _analyse_emotions_detaillees(self, texte, occurrences=None):
         """Analyse détaillée des émotions"""
-        texte_lower = texte.lower()
+        occurrences = self._occurrences(texte, occurrences)
         emotions_detaillees = {}
         
-        for categorie, emotions in self.dictionnaire_psychologique.items():
-            if 'émotions' in categorie:
-                for emotion_nom, data in emotions.items():
-                    mots_trouves = [mot for mot in data['mots'] if mot in texte_lower]
-                    if mots_trouves:
-                        presence = len(mots_trouves)
-                        intensite = 'élevée' if presence >= 2 else 'moyenne' if presence >= 1 else 'faible'
-                        
-                        emotions_detaillees[emotion_nom] = {
-                            'presence': presence,
-                            'mots_cles': mots_trouves,
-                            'intensite': intensite,
-                            'score_emotion': data['score']
-                        }
+        scores = {
+            etiquette.categorie: etiquette.score
+            for occurrence in occurrences for etiquette in occurrence.etiquettes if etiquette.famille == EMOTION
+        }
+        for emotion_nom, mots_trouves in self._mots_par_categorie(occurrences, EMOTION).items():
+            presence = len(mots_trouves)
+            intensite = 'élevée' if presence >= 2 else 'moyenne' if presence >= 1 else 'faible'
+            
+            emotions_detaillees[emotion_nom] = {
+                'presence': presence,
+                'mots_cles': mots_trouves,
+                'intensite': intensite,
+                'score_emotion': scores[emotion_nom]
+            }
         
         return emotions_detaillees
 
-    def _analyse_themes_psychologiques(self, texte):
+    def _analyse_themes_psychologiques(self, texte, occurrences=None):
         """Analyse des thèmes psychologiques"""
-        texte_lower = texte.lower()
+        occurrences = self._occurrences(texte, occurrences)
         themes_detectes = {}
         
-        for theme, data in self.themes_psychologiques.items():
-            mots_trouves = [mot for mot in data['mots'] if mot in texte_lower]
-            if mots_trouves:
-                # Identifier les sous-thèmes pertinents
-                sous_themes_pertinents = []
-                for sous_theme in data['sous_themes']:
-                    if any(mot in sous_theme for mot in mots_trouves):
-                        sous_themes_pertinents.append(sous_theme)
-                
-                pertinence = 'élevée' if len(mots_trouves) >= 3 else 'moyenne' if len(mots_trouves) >= 2 else 'faible'
-                
-                themes_detectes[theme] = {
-                    'score': len(mots_trouves),
-                    'mots_cles': mots_trouves,
-                    'sous_themes': sous_themes_pertinents,
-                    'pertinence': pertinence
-                }
+        for theme, mots_trouves in self._mots_par_categorie(occurrences, THEME).items():
+            # Identifier les sous-thèmes pertinents
+            sous_themes_pertinents = []
+            for sous_theme in self.themes_psychologiques[theme]['sous_themes']:
+                if any(mot in sous_theme for mot in mots_trouves):
+                    sous_themes_pertinents.append(sous_theme)
+            
+            pertinence = 'élevée' if len(mots_trouves) >= 3 else 'moyenne' if len(mots_trouves) >= 2 else 'faible'
+            
+            themes_detectes[theme] = {
+                'score': len(mots_trouves),
+                'mots_cles': mots_trouves,
+                'sous_themes': sous_themes_pertinents,
+                'pertinence': pertinence
+            }
         
         return themes_detectes
 
-    def _analyse_patterns_cognitifs(self, texte):
+    def _analyse_patterns_cognitifs(self, texte, occurrences=None):
         """Détection des patterns de pensée"""
-        texte_lower = texte.lower()
+        occurrences = self._occurrences(texte, occurrences)
         patterns_detectes = {}
         
-        for pattern, mots in self.dictionnaire_psychologique['patterns_cognitifs'].items():
-            mots_trouves = [mot for mot in mots if mot in texte_lower]
-            if mots_trouves:
-                occurrences = len(mots_trouves)
-                impact = 'élevé' if occurrences >= 3 else 'modéré' if occurrences >= 2 else 'faible'
-                
-                patterns_detectes[pattern] = {
-                    'occurrences': occurrences,
-                    'exemples': mots_trouves,
-                    'impact': impact
-                }
+        for pattern, mots_trouves in self._mots_par_categorie(occurrences, PATTERN).items():
+            occurrences_pattern = len(mots_trouves)
+            impact = 'élevé' if occurrences_pattern >= 3 else 'modéré' if occurrences_pattern >= 2 else 'faible'
+            
+            patterns_detectes[pattern] = {
+                'occurrences': occurrences_pattern,
+                'exemples': mots_trouves,
+                'impact': impact
+            }
         
         return patterns_detectes
 
@@ -412,15 +336,8 @@ class AnalyseurRapide:
             # Pondérer les mots émotionnels
             mots_ponderes = []
             for mot in mots_filtres:
-                poids = 1
                 # Vérifier si c'est un mot émotionnel
-                for categorie in self.dictionnaire_psychologique.values():
-                    if isinstance(categorie, dict):
-                        for emotion_data in categorie.values():
-                            if isinstance(emotion_data, dict) and 'mots' in emotion_data:
-                                if mot in emotion_data['mots']:
-                                    poids = 3
-                                    break
+                poids = 3 if mot in self.lexique.mots_emotionnels else 1
                 mots_ponderes.extend([mot] * poids)
             
             compteur = Counter(mots_ponderes)
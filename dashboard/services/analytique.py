@@ -0,0 +1,210 @@
+# dashboard/services/analytique.py
+"""
+Statistiques du tableau de bord calculées par MongoDB (pipelines d'agrégation natifs).
+
+En production la base est MongoDB (djongo) : au lieu de rapatrier toutes les analyses
+pour les compter en Python, les calculs lourds sont confiés au serveur ($match sur
+l'utilisateur et la période, $unwind des mots-clés et thèmes, $group, $sortByCount) et
+seuls les comptes reviennent. Sont concernés la reconstruction des agrégats journaliers
+(recalculer_agregats) et les statistiques des bilans mensuels.
+
+Sur une autre base (SQLite en développement et dans les tests), ou si un pipeline échoue,
+les appelants gardent leur calcul Python, qui fait référence.
+
+Les JSONField (keywords, topics, themes_detectes) sont enregistrés par Django sous forme
+de chaîne JSON : les pipelines acceptent les deux formes (tableau ou chaîne, décodée par
+$function, MongoDB 4.4+).
+"""
+import logging
+from datetime import date
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_ANALYTIQUE_CONFIG = {
+    'backend': 'auto',          # 'mongo', 'python' ou 'auto' (mongo si la base est djongo)
+    'alias': 'default',         # Alias de la base Django interrogée
+}
+
+_DECODER_JSON = (
+    "function(valeur) { try { var v = JSON.parse(valeur); return Array.isArray(v) ? v : []; } "
+    "catch (e) { return []; } }"
+)
+
+SCORE_TON = {'positif': 1, 'neutre': 0, 'negatif': -1}
+
+
+def get_analytique_config():
+    """
+    Retourne la configuration analytique fusionnée avec le réglage DASHBOARD_ANALYTIQUE.
+    """
+    config = dict(DEFAULT_ANALYTIQUE_CONFIG)
+    config.update(getattr(settings, 'DASHBOARD_ANALYTIQUE', {}))
+    return config
+
+
+def base_mongo(config=None):
+    """
+    Retourne la base pymongo sous-jacente à djongo, ou None si les pipelines sont indisponibles.
+    """
+    config = config or get_analytique_config()
+    if config['backend'] == 'python':
+        return None
+    connexion = connections[config['alias']]
+    if connexion.settings_dict.get('ENGINE') != 'djongo':
+        if config['backend'] == 'mongo':
+            logger.warning(f"La base '{config['alias']}' n'est pas MongoDB, calcul des statistiques en Python")
+        return None
+    try:
+        connexion.ensure_connection()
+        # djongo expose la base pymongo (pymongo.database.Database) comme connexion
+        return connexion.connection
+    except Exception as e:
+        logger.warning(f"Base MongoDB indisponible pour les statistiques: {e}")
+        return None
+
+
+def _tableau_json(champ):
+    """
+    Expression lisant un JSONField, enregistré en tableau ou en chaîne JSON.
+    """
+    valeur = f'${champ}'
+    return {'$switch': {
+        'branches': [
+            {'case': {'$isArray': valeur}, 'then': valeur},
+            {'case': {'$eq': [{'$type': valeur}, 'string']},
+             'then': {'$function': {'body': _DECODER_JSON, 'args': [valeur], 'lang': 'js'}}},
+        ],
+        'default': [],
+    }}
+
+
+def _jour(champ):
+    return {'$dateToString': {'format': '%Y-%m-%d', 'date': f'${champ}', 'timezone': settings.TIME_ZONE}}
+
+
+def _filtre(champ_utilisateur, champ_date, utilisateur_ids=None, debut=None, fin=None):
+    filtre = {champ_utilisateur: {'$ne': None}, champ_date: {'$ne': None}}
+    if utilisateur_ids is not None:
+        filtre[champ_utilisateur] = {'$in': list(utilisateur_ids)}
+    if debut is not None:
+        filtre[champ_date] = {'$gte': debut, '$lte': fin}
+    return filtre
+
+
+def agregats_journaliers_mongo(db, utilisateur_ids=None):
+    """
+    Calcule les agrégats journaliers par pipelines d'agrégation.
+
+    Args:
+        db (pymongo.database.Database): La base MongoDB
+        utilisateur_ids (iterable, optional): Les utilisateurs concernés, tous par défaut
+
+    Returns:
+        dict: {(utilisateur_id, jour): champs d'AgregatJournalier}
+    """
+    from journal.models import Journal
+    from module2_analysis.models import JournalAnalysis
+
+    analyses = db[JournalAnalysis._meta.db_table]
+    filtre_analyses = {'$match': _filtre('user_id', 'created_at', utilisateur_ids)}
+    agregats = {}
+
+    def agregat_du(cle):
+        cle = (cle['u'], date.fromisoformat(cle['j']))
+        if cle not in agregats:
+            agregats[cle] = {
+                'nombre_analyses': 0, 'sentiments': {}, 'somme_emotion_score': 0.0,
+                'mots_cles': {}, 'themes': {}, 'nombre_entrees': 0,
+            }
+        return agregats[cle]
+
+    # Nombre d'analyses et somme des scores par utilisateur, jour et sentiment
+    for ligne in analyses.aggregate([
+        filtre_analyses,
+        {'$group': {
+            '_id': {'u': '$user_id', 'j': _jour('created_at'), 's': {'$ifNull': ['$sentiment', '']}},
+            'n': {'$sum': 1},
+            'e': {'$sum': {'$ifNull': ['$emotion_score', 0]}},
+        }},
+    ], allowDiskUse=True):
+        agregat = agregat_du(ligne['_id'])
+        agregat['nombre_analyses'] += ligne['n']
+        agregat['somme_emotion_score'] += ligne['e']
+        agregat['sentiments'][ligne['_id']['s']] = ligne['n']
+
+    # Occurrences des mots-clés et des thèmes par utilisateur et jour
+    for champ, cible in (('keywords', 'mots_cles'), ('topics', 'themes')):
+        for ligne in analyses.aggregate([
+            filtre_analyses,
+            {'$project': {'u': '$user_id', 'j': _jour('created_at'), 'e': _tableau_json(champ)}},
+            {'$unwind': '$e'},
+            {'$group': {'_id': {'u': '$u', 'j': '$j', 'e': '$e'}, 'n': {'$sum': 1}}},
+        ], allowDiskUse=True):
+            agregat_du(ligne['_id'])[cible][str(ligne['_id']['e'])] = ligne['n']
+
+    # Entrées de journal par utilisateur et jour
+    for ligne in db[Journal._meta.db_table].aggregate([
+        {'$match': _filtre('utilisateur_id', 'date_creation', utilisateur_ids)},
+        {'$group': {'_id': {'u': '$utilisateur_id', 'j': _jour('date_creation')}, 'n': {'$sum': 1}}},
+    ], allowDiskUse=True):
+        agregat_du(ligne['_id'])['nombre_entrees'] = ligne['n']
+
+    return agregats
+
+
+def statistiques_periode_mongo(db, utilisateur, date_debut, date_fin):
+    """
+    Calcule les statistiques d'un bilan mensuel par pipeline d'agrégation.
+
+    Même résultat que ServiceBilanIA._calculer_statistiques : les analyses (AnalyseIA) des
+    entrées de la période sont jointes par $lookup. À égalité d'occurrences, l'ordre des
+    thèmes dominants peut différer du calcul Python.
+
+    Returns:
+        dict: frequence_ecriture, score_humeur et themes_dominants
+    """
+    from analysis.models import AnalyseIA
+    from journal.models import Journal
+
+    if timezone.is_naive(date_debut):
+        date_debut, date_fin = timezone.make_aware(date_debut), timezone.make_aware(date_fin)
+    journaux = db[Journal._meta.db_table]
+    filtre = _filtre('utilisateur_id', 'date_creation', [utilisateur.pk], date_debut, date_fin)
+
+    # Une entrée a au plus une analyse (OneToOne) : après $unwind, un document par entrée
+    resultat = next(journaux.aggregate([
+        {'$match': filtre},
+        {'$lookup': {'from': AnalyseIA._meta.db_table, 'localField': 'id', 'foreignField': 'journal_id', 'as': 'a'}},
+        {'$unwind': {'path': '$a', 'preserveNullAndEmptyArrays': True}},
+        {'$facet': {
+            'entrees': [{'$count': 'n'}],
+            'humeur': [
+                {'$match': {'a': {'$exists': True}}},
+                {'$group': {'_id': None, 'score': {'$avg': {'$switch': {
+                    'branches': [
+                        {'case': {'$eq': ['$a.ton_general', ton]}, 'then': score}
+                        for ton, score in SCORE_TON.items()
+                    ],
+                    'default': 0,
+                }}}}},
+            ],
+            'themes': [
+                {'$match': {'a': {'$exists': True}}},
+                {'$project': {'t': _tableau_json('a.themes_detectes')}},
+                {'$unwind': '$t'},
+                {'$sortByCount': '$t'},
+                {'$limit': 5},
+            ],
+        }},
+    ], allowDiskUse=True))
+
+    return {
+        'frequence_ecriture': resultat['entrees'][0]['n'] if resultat['entrees'] else 0,
+        'score_humeur': resultat['humeur'][0]['score'] if resultat['humeur'] else 0,
+        'themes_dominants': [ligne['_id'] for ligne in resultat['themes']],
+    }
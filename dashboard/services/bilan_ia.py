@@ -4,9 +4,13 @@ from collections import Counter
 from analysis.models import AnalyseIA
 from journal.models import Journal
 from dashboard.models import BilanMensuel, Statistique  # ← Modifier cette ligne
+from .analytique import base_mongo, statistiques_periode_mongo
 import json
+import logging
 import random
 
+logger = logging.getLogger(__name__)
+
 class ServiceBilanIA:
     """Service pour générer automatiquement les bilans mensuels par IA"""
     
@@ -61,7 +65,7 @@ class ServiceBilanIA:
     
     @staticmethod
     def _calculer_statistiques(utilisateur, mois, annee):
-        """Calcule les statistiques pour la période"""
+        """Calcule les statistiques pour la période (par MongoDB si possible)"""
         
         date_debut = datetime(annee, mois, 1)
         if mois == 12:
@@ -69,6 +73,19 @@ class ServiceBilanIA:
         else:
             date_fin = datetime(annee, mois + 1, 1) - timedelta(days=1)
         
+        db = base_mongo()
+        if db is not None:
+            try:
+                return statistiques_periode_mongo(db, utilisateur, date_debut, date_fin)
+            except Exception as e:
+                logger.warning(f"Échec du pipeline MongoDB, statistiques calculées en Python: {e}")
+        
+        return ServiceBilanIA._calculer_statistiques_python(utilisateur, date_debut, date_fin)
+    
+    @staticmethod
+    def _calculer_statistiques_python(utilisateur, date_debut, date_fin):
+        """Calcule les statistiques de la période en parcourant les analyses"""
+        
         analyses = AnalyseIA.objects.filter(
             journal__utilisateur=utilisateur,
             journal__date_creation__range=[date_debut, date_fin]
@@ -0,0 +1,222 @@
+# dashboard/services/lexique.py
+"""
+Lexique psychologique de l'analyseur rapide, compilé une fois pour toutes.
+
+Tous les mots et expressions du lexique (émotions, intensité, patterns cognitifs, thèmes)
+sont réunis dans une seule expression régulière, construite à l'import en arbre des
+préfixes : à chaque position du texte le moteur ne suit qu'un chemin, et une recherche
+parcourt le texte une fois quelle que soit la taille du lexique.
+
+Les correspondances respectent les limites de mots ('seul' ne correspond plus dans
+'seulement') et l'expression la plus longue l'emporte ('toujours pareil' plutôt que
+'toujours'). Chaque occurrence porte les étiquettes de tout ce qu'elle désigne dans le
+lexique, y compris les mots qu'une expression contient ('toujours pareil' compte aussi
+pour 'toujours').
+"""
+import re
+from collections import namedtuple
+
+# Dictionnaire psychologique COMPLET en français
+DICTIONNAIRE_PSYCHOLOGIQUE = {
+    'émotions_primaire': {
+        'joie': {
+            'mots': ['heureux', 'content', 'joyeux', 'satisfait', 'fier', 'enthousiaste', 'optimiste', 'reconnaissant', 'chanceux', 'épanoui', 'réjoui', 'ravie', 'combler'],
+            'score': 2.0,
+            'intensite': 1.5
+        },
+        'tristesse': {
+            'mots': ['triste', 'malheureux', 'déçu', 'désespéré', 'démoralisé', 'accablé', 'mélancolique', 'affligé', 'navré', 'peiné'],
+            'score': -2.0,
+            'intensite': 1.8
+        },
+        'colère': {
+            'mots': ['fâché', 'énervé', 'frustré', 'irrité', 'exaspéré', 'furieux', 'outragé', 'rage', 'colère', 'irritation'],
+            'score': -1.8,
+            'intensite': 2.0
+        },
+        'peur': {
+            'mots': ['anxieux', 'inquiet', 'craintif', 'paniqué', 'terrifié', 'appréhensif', 'angoissé', 'stressé', 'nerveux'],
+            'score': -1.5,
+            'intensite': 1.7
+        },
+        'dégout': {
+            'mots': ['dégoûté', 'répugné', 'écœuré', 'horripilé', 'dégouté', 'repoussé'],
+            'score': -1.2,
+            'intensite': 1.3
+        }
+    },
+    'émotions_secondaire': {
+        'honte': {
+            'mots': ['honteux', 'coupable', 'regret', 'remords', 'confus', 'gêné'],
+            'score': -1.0,
+            'intensite': 1.2
+        },
+        'jalousie': {
+            'mots': ['jaloux', 'envieux', 'possessif', 'jalousie', 'envie'],
+            'score': -0.8,
+            'intensite': 1.1
+        },
+        'solitude': {
+            'mots': ['seul', 'isolé', 'abandonné', 'rejeté', 'solitude', 'isolement'],
+            'score': -1.5,
+            'intensite': 1.6
+        },
+        'confiance': {
+            'mots': ['confiant', 'serein', 'apaisé', 'rassuré', 'sécurisé', 'tranquille'],
+            'score': 1.2,
+            'intensite': 1.0
+        }
+    },
+    'intensite_emotionnelle': {
+        'faible': ['un peu', 'légèrement', 'assez', 'plutôt', 'modérément'],
+        'moyenne': ['vraiment', 'suffisamment', 'bien', 'fort', 'intense'],
+        'forte': ['très', 'extrêmement', 'totalement', 'complètement', 'absolument', 'profondément'],
+        'extreme': ['intensément', 'passionnément', 'désespérément', 'terriblement', 'extrêmement']
+    },
+    'patterns_cognitifs': {
+        'pensée_tout_rien': ['toujours', 'jamais', 'rien', 'tout', 'personne', 'aucun', 'chaque', 'sans'],
+        'catastrophisme': ['horrible', 'terrible', 'catastrophe', 'désastre', 'insupportable', 'affreux', 'épouvantable'],
+        'generalisation': ['encore', 'toujours', 'sans cesse', 'constamment', 'toujours pareil'],
+        'personalisation': ['ma faute', 'je devrais', 'je dois', 'cest ma faute', 'à cause de moi']
+    }
+}
+
+# Thèmes psychologiques détaillés
+THEMES_PSYCHOLOGIQUES = {
+    'relations_interpersonnelles': {
+        'mots': ['ami', 'amour', 'copain', 'copine', 'relation', 'amitié', 'partenaire', 'meilleur', 'dispute', 'conflit', 'famille', 'parent', 'collègue', 'proche', 'connaissance'],
+        'sous_themes': ['conflit', 'rupture', 'réconciliation', 'solitude', 'communication', 'amitié', 'famille']
+    },
+    'estime_soi': {
+        'mots': ['fier', 'honteux', 'confiant', 'doute', 'incapable', 'compétent', 'réussite', 'échec', 'valeur', 'estime', 'confiance'],
+        'sous_themes': ['confiance en soi', 'doute', 'accomplissement', 'auto-critique', 'valorisation']
+    },
+    'santé_mentale': {
+        'mots': ['stress', 'anxieux', 'déprimé', 'fatigue', 'énergie', 'sommeil', 'moral', 'équilibre', 'bienêtre', 'détente', 'repos'],
+        'sous_themes': ['anxiété', 'dépression', 'burnout', 'bien-être', 'relaxation']
+    },
+    'travail_etudes': {
+        'mots': ['travail', 'bureau', 'projet', 'réunion', 'deadline', 'emploi', 'carrière', 'examen', 'étude', 'profession', 'métier'],
+        'sous_themes': ['pression', 'accomplissement', 'échec', 'réussite', 'évolution']
+    },
+    'developpement_personnel': {
+        'mots': ['objectif', 'progrès', 'changement', 'amélioration', 'défi', 'apprentissage', 'croissance', 'évolution', 'transformation'],
+        'sous_themes': ['croissance', 'transition', 'transformation', 'apprentissage']
+    }
+}
+
+# Poids des mots d'intensité dans le score d'intensité
+POIDS_INTENSITE = {'faible': 0.5, 'moyenne': 1, 'forte': 1.5, 'extreme': 2}
+
+EMOTION = 'emotion'
+INTENSITE = 'intensite'
+PATTERN = 'pattern'
+THEME = 'theme'
+
+# famille : EMOTION, INTENSITE, PATTERN ou THEME ; categorie : l'émotion, le niveau, le pattern ou le thème
+Etiquette = namedtuple('Etiquette', ['famille', 'categorie', 'score', 'intensite'])
+
+# mot : l'entrée du lexique ; debut, fin : sa position dans le texte en minuscules
+Occurrence = namedtuple('Occurrence', ['mot', 'debut', 'fin', 'etiquettes'])
+
+
+def _cle(expression):
+    return ' '.join(expression.lower().split())
+
+
+def _motif_arbre(expressions):
+    """
+    Expression régulière en arbre des préfixes reconnaissant les expressions données.
+
+    Les branches d'un nœud commencent par des caractères différents et les suffixes
+    optionnels sont gloutons : l'expression la plus longue est essayée d'abord.
+    """
+    arbre = {}
+    for expression in expressions:
+        noeud = arbre
+        for caractere in expression:
+            noeud = noeud.setdefault(caractere, {})
+        noeud[''] = {}
+
+    def motif(noeud):
+        fin = '' in noeud
+        branches = [
+            (r'\s+' if caractere == ' ' else re.escape(caractere)) + motif(enfant)
+            for caractere, enfant in sorted(noeud.items()) if caractere
+        ]
+        if not branches:
+            return ''
+        if len(branches) == 1 and not fin:
+            return branches[0]
+        return '(?:' + '|'.join(branches) + ')' + ('?' if fin else '')
+
+    return motif(arbre)
+
+
+class Lexique:
+    """
+    Reconnaissance en une passe des entrées d'un lexique psychologique.
+
+    Args:
+        dictionnaire (dict): Au format de DICTIONNAIRE_PSYCHOLOGIQUE
+        themes (dict): Au format de THEMES_PSYCHOLOGIQUES
+    """
+
+    def __init__(self, dictionnaire, themes):
+        etiquettes = {}
+
+        def ajouter(expression, etiquette):
+            etiquettes.setdefault(_cle(expression), []).append(etiquette)
+
+        for categorie, contenu in dictionnaire.items():
+            if 'émotions' in categorie:
+                for emotion, data in contenu.items():
+                    for mot in data['mots']:
+                        ajouter(mot, Etiquette(EMOTION, emotion, data['score'], data['intensite']))
+        for niveau, mots in dictionnaire.get('intensite_emotionnelle', {}).items():
+            for mot in mots:
+                ajouter(mot, Etiquette(INTENSITE, niveau, POIDS_INTENSITE.get(niveau, 0), None))
+        for pattern, mots in dictionnaire.get('patterns_cognitifs', {}).items():
+            for mot in mots:
+                ajouter(mot, Etiquette(PATTERN, pattern, None, None))
+        for theme, data in themes.items():
+            for mot in data['mots']:
+                ajouter(mot, Etiquette(THEME, theme, None, None))
+
+        self.etiquettes = {expression: tuple(liste) for expression, liste in etiquettes.items()}
+        self.mots_emotionnels = frozenset(
+            expression for expression, liste in self.etiquettes.items()
+            if any(etiquette.famille == EMOTION for etiquette in liste)
+        )
+        self.motif = re.compile(r'(?<!\w)' + _motif_arbre(self.etiquettes) + r'(?!\w)') if self.etiquettes else None
+
+        # Entrées contenues dans une expression plus longue, qui les masque dans le texte
+        self.contenues = {
+            expression: [
+                autre for autre in self.etiquettes
+                if autre != expression and re.search(r'(?<!\w)' + re.escape(autre) + r'(?!\w)', expression)
+            ]
+            for expression in self.etiquettes if ' ' in expression
+        }
+
+    def rechercher(self, texte):
+        """
+        Retourne les occurrences des entrées du lexique dans le texte, dans l'ordre du texte.
+
+        Returns:
+            list: Occurrence(mot, debut, fin, etiquettes) ; une entrée contenue dans une
+            expression trouvée a sa propre occurrence, à la même position
+        """
+        if not texte or self.motif is None:
+            return []
+        occurrences = []
+        for correspondance in self.motif.finditer(texte.lower()):
+            mot = _cle(correspondance.group())
+            debut, fin = correspondance.span()
+            occurrences.append(Occurrence(mot, debut, fin, self.etiquettes[mot]))
+            for contenu in self.contenues.get(mot, ()):
+                occurrences.append(Occurrence(contenu, debut, fin, self.etiquettes[contenu]))
+        return occurrences
+
+
+LEXIQUE = Lexique(DICTIONNAIRE_PSYCHOLOGIQUE, THEMES_PSYCHOLOGIQUES)
@@ -0,0 +1,84 @@
+"""
+Signaux tenant à jour les agrégats journaliers du tableau de bord.
+"""
+import logging
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from journal.models import Journal
+from mindscribe.response_cache import invalidate_on
+from module2_analysis.models import JournalAnalysis
+from .models import BilanMensuel, Statistique
+from .services.agregats import (
+    CHAMPS_ANALYSE, appliquer_analyse, appliquer_entree, contribution_analyse
+)
+
+logger = logging.getLogger(__name__)
+
+# Pages des bilans mensuels en cache ; les données du tableau de bord ('dashboard') sont
+# invalidées par les agrégats eux-mêmes, une fois à jour (services/agregats.py)
+invalidate_on('bilans', Statistique, 'utilisateur')
+invalidate_on('bilans', BilanMensuel, 'utilisateur')
+
+
+@receiver(pre_save, sender=JournalAnalysis)
+def memoriser_ancienne_analyse(sender, instance, update_fields=None, **kwargs):
+    """Mémorise la part de l'analyse déjà comptée, à retirer après l'enregistrement."""
+    instance._contribution_agregat = None
+    if instance._state.adding:
+        return
+    if update_fields is not None and not set(update_fields) & set(CHAMPS_ANALYSE):
+        return
+    try:
+        ancienne = JournalAnalysis.objects.filter(pk=instance.pk).only(*CHAMPS_ANALYSE).first()
+        if ancienne is not None:
+            instance._contribution_agregat = contribution_analyse(ancienne)
+    except Exception as e:
+        logger.error(f"Erreur lors de la lecture de l'ancienne analyse {instance.pk}: {e}", exc_info=True)
+
+
+@receiver(post_save, sender=JournalAnalysis)
+def mettre_a_jour_agregat_analyse(sender, instance, created, update_fields=None, **kwargs):
+    """Remplace l'ancienne part de l'analyse par la nouvelle dans les agrégats."""
+    ancienne = instance.__dict__.pop('_contribution_agregat', None)
+    if not created and ancienne is None:
+        # Champs agrégés non modifiés, ou analyse absente des agrégats (recalculer_agregats la reprendra)
+        return
+    try:
+        nouvelle = contribution_analyse(instance)
+        if ancienne == nouvelle:
+            return
+        if ancienne is not None and nouvelle is not None and ancienne['jour'] == nouvelle['jour']:
+            # Même jour : un seul recalcul
+            ancienne = None
+        appliquer_analyse(ancienne, -1)
+        appliquer_analyse(nouvelle, 1)
+    except Exception as e:
+        logger.error(f"Erreur lors de la mise à jour des agrégats (analyse {instance.pk}): {e}", exc_info=True)
+
+
+@receiver(post_delete, sender=JournalAnalysis)
+def retirer_analyse_des_agregats(sender, instance, **kwargs):
+    try:
+        appliquer_analyse(contribution_analyse(instance), -1)
+    except Exception as e:
+        logger.error(f"Erreur lors de la mise à jour des agrégats (analyse {instance.pk}): {e}", exc_info=True)
+
+
+@receiver(post_save, sender=Journal)
+def ajouter_entree_aux_agregats(sender, instance, created, **kwargs):
+    if not created:
+        return
+    try:
+        appliquer_entree(instance.utilisateur_id, instance.date_creation, 1)
+    except Exception as e:
+        logger.error(f"Erreur lors de la mise à jour des agrégats (entrée {instance.pk}): {e}", exc_info=True)
+
+
+@receiver(post_delete, sender=Journal)
+def retirer_entree_des_agregats(sender, instance, **kwargs):
+    try:
+        appliquer_entree(instance.utilisateur_id, instance.date_creation, -1)
+    except Exception as e:
+        logger.error(f"Erreur lors de la mise à jour des agrégats (entrée {instance.pk}): {e}", exc_info=True)
@@ -1,3 +1,434 @@
+import io
+import json
+import os
+import unittest
+import uuid
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from analysis.models import AnalyseIA
+from journal.models import Journal
+from mindscribe.response_cache import get_response_cache, get_version, response_cache_stats
+from recommendations.models import Objectif
+from module2_analysis.models import JournalAnalysis
+from .models import AgregatJournalier, VersionDonnees
+from .services import analytique
+from .services.agregats import _calculer_agregats_python, etag_donnees, incrementer_versions, recalculer_agregats
+from .services.analyse_ia import AnalyseurRapide
+from .services.bilan_ia import ServiceBilanIA
+from .services.lexique import LEXIQUE, PATTERN
+
+try:
+    import pymongo
+except ImportError:
+    pymongo = None
+
+MONGODB_TEST_URI = os.environ.get('MONGODB_TEST_URI', '')
+
+User = get_user_model()
+
+
+class AgregatJournalierTestCase(TestCase):
+    """
+    Test case for the incrementally maintained daily aggregates.
+    """
+
+    def setUp(self):
+        get_response_cache().clear()
+        self.user = User.objects.create_user(username='agregats', password='testpassword')
+        self.client.force_login(self.user)
+
+    def _analyse(self, sentiment, keywords, topics, emotion_score=0.5, jours=0):
+        analyse = JournalAnalysis.objects.create(
+            user=self.user, text='x', sentiment=sentiment, emotion_score=emotion_score,
+            keywords=keywords, topics=topics
+        )
+        if jours:
+            analyse.created_at = timezone.now() - timedelta(days=jours)
+            analyse.save()
+        return analyse
+
+    def _etat(self):
+        return [
+            (a.jour, a.nombre_analyses, a.nombre_entrees, a.sentiments, round(a.somme_emotion_score, 6), a.mots_cles, a.themes)
+            for a in AgregatJournalier.objects.filter(utilisateur=self.user).order_by('jour')
+        ]
+
+    def test_save_update_and_delete_adjust_the_day(self):
+        premiere = self._analyse('positif', ['travail', 'sport'], ['carrière'], emotion_score=0.8)
+        self._analyse('negatif', ['travail'], ['stress'], emotion_score=0.2)
+
+        agregat = AgregatJournalier.objects.get(utilisateur=self.user)
+        self.assertEqual(agregat.nombre_analyses, 2)
+        self.assertEqual(agregat.sentiments, {'positif': 1, 'negatif': 1})
+        self.assertEqual(agregat.mots_cles, {'travail': 2, 'sport': 1})
+        self.assertAlmostEqual(agregat.emotion_score_moyen, 0.5)
+
+        # An enrichment replaces the previous results of the analysis
+        premiere.sentiment = 'negatif'
+        premiere.keywords = ['famille']
+        premiere.save()
+        agregat.refresh_from_db()
+        self.assertEqual(agregat.nombre_analyses, 2)
+        self.assertEqual(agregat.sentiments, {'negatif': 2})
+        self.assertEqual(agregat.mots_cles, {'travail': 1, 'famille': 1})
+
+        # Saving unrelated fields leaves the aggregate untouched
+        premiere.summary = 'résumé'
+        premiere.save(update_fields=['summary'])
+        agregat.refresh_from_db()
+        self.assertEqual(agregat.nombre_analyses, 2)
+
+        JournalAnalysis.objects.filter(user=self.user).delete()
+        self.assertFalse(AgregatJournalier.objects.filter(utilisateur=self.user).exists())
+
+    def test_moving_an_analysis_to_another_day(self):
+        self._analyse('positif', ['a'], [], jours=3)
+        jours = list(AgregatJournalier.objects.filter(utilisateur=self.user).values_list('jour', flat=True))
+        self.assertEqual(jours, [timezone.localdate() - timedelta(days=3)])
+
+    def test_journal_entries_are_counted(self):
+        entree = Journal.objects.create(utilisateur=self.user, contenu_texte='bonjour')
+        Journal.objects.create(utilisateur=self.user, contenu_texte='encore')
+        self.assertEqual(AgregatJournalier.objects.get(utilisateur=self.user).nombre_entrees, 2)
+        entree.delete()
+        self.assertEqual(AgregatJournalier.objects.get(utilisateur=self.user).nombre_entrees, 1)
+
+    def test_concurrent_write_during_update_is_not_lost(self):
+        from .services import agregats
+
+        enregistrer = agregats._enregistrer_jour
+        ecritures = []
+
+        def enregistrer_puis_ecrire(*args, **kwargs):
+            enregistrer(*args, **kwargs)
+            if not ecritures:
+                # Another worker writes between this computation and its save (no signal here)
+                ecritures.append(JournalAnalysis.objects.bulk_create([
+                    JournalAnalysis(user=self.user, text='y', sentiment='negatif', keywords=['sommeil'], topics=[])
+                ]))
+
+        with patch.object(agregats, '_enregistrer_jour', side_effect=enregistrer_puis_ecrire):
+            self._analyse('positif', ['travail'], [])
+
+        agregat = AgregatJournalier.objects.get(utilisateur=self.user)
+        self.assertEqual(agregat.nombre_analyses, 2)
+        self.assertEqual(agregat.sentiments, {'positif': 1, 'negatif': 1})
+        self.assertEqual(agregat.mots_cles, {'travail': 1, 'sommeil': 1})
+
+    def test_backfill_matches_incremental_updates(self):
+        self._analyse('positif', ['travail', 'sport'], ['carrière'], emotion_score=0.9)
+        self._analyse('sad', ['travail'], ['stress', 'sommeil'], emotion_score=0.1, jours=2)
+        self._analyse('neutral', [], [], jours=2)
+        Journal.objects.create(utilisateur=self.user, contenu_texte='bonjour')
+        attendu = self._etat()
+
+        AgregatJournalier.objects.all().delete()
+        self.assertEqual(recalculer_agregats(), 2)
+        self.assertEqual(self._etat(), attendu)
+
+        AgregatJournalier.objects.all().delete()
+        call_command('recalculer_agregats', '--utilisateur', 'agregats', stdout=io.StringIO())
+        self.assertEqual(self._etat(), attendu)
+
+    def test_endpoints_read_the_aggregates(self):
+        self._analyse('positif', ['travail', 'sport'], ['carrière'])
+        self._analyse('positive', ['travail'], ['carrière', 'santé'], jours=1)
+        self._analyse('sad', ['fatigue'], ['santé'], jours=1)
+        Journal.objects.create(utilisateur=self.user, contenu_texte='bonjour')
+
+        data = self.client.get(reverse('dashboard:api_statistiques')).json()
+        self.assertEqual(data['total_analyses'], 3)
+        self.assertEqual(data['humeur_moyenne'], 'positif')
+        self.assertEqual(data['themes_uniques'], 2)
+        self.assertEqual(data['mots_cles'], 3)
+
+        data = self.client.get(reverse('dashboard:api_distribution_humeurs')).json()
+        self.assertEqual((data['positif'], data['neutre'], data['negatif']), (2, 0, 1))
+
+        data = self.client.get(reverse('dashboard:api_wordcloud')).json()
+        self.assertEqual(data['wordcloud'][0], ['travail', 2])
+
+        data = self.client.get(reverse('dashboard:api_evolution_humeur')).json()
+        self.assertEqual(data['scores'], [0.0, 1.0])
+        self.assertEqual(len(data['dates']), 2)
+
+        data = self.client.get(reverse('dashboard:api_frequence_ecriture')).json()
+        self.assertEqual(data['dates'], [timezone.localdate().strftime('%Y-%m-%d')])
+        self.assertEqual(data['counts'], [1])
+
+
+class BundleTableauDeBordTestCase(TestCase):
+    """
+    Test case for the single dashboard bundle endpoint and its ETag.
+    """
+
+    def setUp(self):
+        get_response_cache().clear()
+        self.user = User.objects.create_user(username='bundle', password='testpassword')
+        self.client.force_login(self.user)
+        JournalAnalysis.objects.create(user=self.user, text='x', sentiment='positif', keywords=['travail'], topics=['carrière'])
+        Journal.objects.create(utilisateur=self.user, contenu_texte='bonjour')
+
+    def test_bundle_matches_the_widget_endpoints(self):
+        bundle = self.client.get(reverse('dashboard:api_bundle')).json()
+        for section, url in [
+            ('statistiques', 'dashboard:api_statistiques'),
+            ('evolution_humeur', 'dashboard:api_evolution_humeur'),
+            ('wordcloud', 'dashboard:api_wordcloud'),
+            ('themes', 'dashboard:api_themes'),
+            ('chronologie', 'dashboard:api_chronologie'),
+            ('distribution_humeurs', 'dashboard:api_distribution_humeurs'),
+            ('frequence_ecriture', 'dashboard:api_frequence_ecriture'),
+            ('score_emotionnel', 'dashboard:api_score_emotionnel'),
+        ]:
+            self.assertEqual(bundle[section], self.client.get(reverse(url)).json(), section)
+
+    def test_conditional_get_until_the_next_write(self):
+        response = self.client.get(reverse('dashboard:api_bundle'))
+        etag = response['ETag']
+        self.assertIn('no-cache', response['Cache-Control'])
+
+        response = self.client.get(reverse('dashboard:api_bundle'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        JournalAnalysis.objects.create(user=self.user, text='y', sentiment='negatif')
+        response = self.client.get(reverse('dashboard:api_bundle'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['statistiques']['total_analyses'], 2)
+
+    def test_etag_and_cached_body_share_one_version_read(self):
+        self.client.get(reverse('dashboard:api_bundle'))
+        incrementer_versions([self.user.pk])
+        # A write between two reads could pair an old cached body with a new ETag: one read only
+        with patch('mindscribe.response_cache.get_version', wraps=get_version) as lecture:
+            response = self.client.get(reverse('dashboard:api_bundle'))
+        self.assertEqual(lecture.call_count, 1)
+        self.assertEqual(response['ETag'], f'"{etag_donnees(self.user)}"')
+
+    def test_other_users_do_not_change_the_etag(self):
+        etag = self.client.get(reverse('dashboard:api_bundle'))['ETag']
+        autre = User.objects.create_user(username='autre', email='autre@example.com', password='testpassword')
+        JournalAnalysis.objects.create(user=autre, text='z', sentiment='positif')
+        response = self.client.get(reverse('dashboard:api_bundle'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+
+class AnalytiqueTestCase(TestCase):
+    """
+    Test case for the choice of the statistics backend and its Python fallback.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='analytique', password='testpassword')
+        JournalAnalysis.objects.create(user=self.user, text='x', sentiment='positif', keywords=['travail'])
+
+    def test_python_backend_outside_mongodb(self):
+        self.assertIsNone(analytique.base_mongo({'backend': 'auto', 'alias': 'default'}))
+        self.assertIsNone(analytique.base_mongo({'backend': 'mongo', 'alias': 'default'}))
+        self.assertIsNone(analytique.base_mongo({'backend': 'python', 'alias': 'default'}))
+
+    def test_failed_pipeline_falls_back_to_python(self):
+        with patch('dashboard.services.agregats.base_mongo', return_value=object()), \
+                patch('dashboard.services.agregats.agregats_journaliers_mongo', side_effect=RuntimeError('pipeline')):
+            self.assertEqual(recalculer_agregats(), 1)
+        self.assertEqual(AgregatJournalier.objects.get(utilisateur=self.user).mots_cles, {'travail': 1})
+
+    def test_bilan_statistics_fall_back_to_python(self):
+        journal = Journal.objects.create(utilisateur=self.user, contenu_texte='bonjour')
+        AnalyseIA.objects.create(journal=journal, ton_general='positif', themes_detectes=['travail'])
+        maintenant = timezone.localtime()
+        with patch('dashboard.services.bilan_ia.base_mongo', return_value=object()), \
+                patch('dashboard.services.bilan_ia.statistiques_periode_mongo', side_effect=RuntimeError('pipeline')):
+            statistiques = ServiceBilanIA._calculer_statistiques(self.user, maintenant.month, maintenant.year)
+        self.assertEqual(statistiques['themes_dominants'], ['travail'])
+
+
+@unittest.skipUnless(pymongo and MONGODB_TEST_URI, "MONGODB_TEST_URI (and pymongo) required for the pipeline parity tests")
+class AnalytiqueMongoParityTestCase(TestCase):
+    """
+    Parity of the MongoDB pipelines with the Python calculations.
+
+    The rows are created through the ORM, then copied into a scratch MongoDB database the
+    way djongo stores them (JSON fields as JSON strings, or as arrays for older documents).
+    """
+
+    def setUp(self):
+        self.client_mongo = pymongo.MongoClient(MONGODB_TEST_URI)
+        self.db = self.client_mongo[f"mindscribe_parite_{uuid.uuid4().hex[:8]}"]
+        self.user = User.objects.create_user(username='parite', password='testpassword')
+        self.autre = User.objects.create_user(username='autre', email='autre@example.com', password='testpassword')
+
+        debut_mois = timezone.localtime().replace(day=2, hour=12)
+        donnees = [
+            (self.user, 'positif', 0.9, ['travail', 'sport', 'travail'], ['carrière'], 0),
+            (self.user, 'negatif', 0.2, ['fatigue'], ['santé', 'carrière'], 0),
+            (self.user, 'neutral', 0.5, [], [], 1),
+            (self.user, '', 0.4, ['sport'], ['loisirs'], 40),
+            (self.autre, 'positive', 0.7, ['famille'], ['famille'], 0),
+        ]
+        for index, (user, sentiment, score, keywords, topics, jours) in enumerate(donnees):
+            date = debut_mois - timedelta(days=jours)
+            analyse = JournalAnalysis.objects.create(
+                user=user, text='x', sentiment=sentiment, emotion_score=score, keywords=keywords, topics=topics
+            )
+            JournalAnalysis.objects.filter(pk=analyse.pk).update(created_at=date)
+            journal = Journal.objects.create(utilisateur=user, contenu_texte='x')
+            Journal.objects.filter(pk=journal.pk).update(date_creation=date)
+            AnalyseIA.objects.create(
+                journal=journal, ton_general=['positif', 'negatif', 'neutre'][index % 3], themes_detectes=topics
+            )
+            encoder = json.dumps if index % 2 == 0 else list
+            self.db[JournalAnalysis._meta.db_table].insert_one({
+                'id': analyse.id.hex, 'user_id': user.pk, 'created_at': date, 'sentiment': sentiment,
+                'emotion_score': score, 'keywords': encoder(keywords), 'topics': encoder(topics),
+            })
+            self.db[Journal._meta.db_table].insert_one({'id': journal.id.hex, 'utilisateur_id': user.pk, 'date_creation': date})
+            self.db[AnalyseIA._meta.db_table].insert_one({
+                'journal_id': journal.id.hex, 'ton_general': ['positif', 'negatif', 'neutre'][index % 3],
+                'themes_detectes': encoder(topics),
+            })
+
+    def tearDown(self):
+        self.client_mongo.drop_database(self.db.name)
+        self.client_mongo.close()
+
+    def test_daily_aggregates_parity(self):
+        attendu = {
+            cle: {
+                'nombre_analyses': agregat.nombre_analyses, 'sentiments': agregat.sentiments,
+                'somme_emotion_score': round(agregat.somme_emotion_score, 6), 'mots_cles': agregat.mots_cles,
+                'themes': agregat.themes, 'nombre_entrees': agregat.nombre_entrees,
+            }
+            for cle, agregat in _calculer_agregats_python(JournalAnalysis.objects.all(), Journal.objects.all()).items()
+        }
+        obtenu = analytique.agregats_journaliers_mongo(self.db)
+        for valeurs in obtenu.values():
+            valeurs['somme_emotion_score'] = round(valeurs['somme_emotion_score'], 6)
+        self.assertEqual(obtenu, attendu)
+
+        seul = analytique.agregats_journaliers_mongo(self.db, [self.autre.pk])
+        self.assertEqual(set(seul), {cle for cle in attendu if cle[0] == self.autre.pk})
+
+    def test_monthly_statistics_parity(self):
+        maintenant = timezone.localtime()
+        date_debut = datetime(maintenant.year, maintenant.month, 1)
+        date_fin = date_debut + timedelta(days=27)
+        attendu = ServiceBilanIA._calculer_statistiques_python(self.user, date_debut, date_fin)
+        obtenu = analytique.statistiques_periode_mongo(self.db, self.user, date_debut, date_fin)
+        self.assertEqual(obtenu['frequence_ecriture'], attendu['frequence_ecriture'])
+        self.assertAlmostEqual(obtenu['score_humeur'], attendu['score_humeur'])
+        self.assertEqual(sorted(obtenu['themes_dominants']), sorted(attendu['themes_dominants']))
+
+
+class ResponseCacheTestCase(TestCase):
+    """
+    Test case for the versioned per-user response cache.
+    """
+
+    def setUp(self):
+        get_response_cache().clear()
+        self.user = User.objects.create_user(username='cache', password='testpassword')
+        self.client.force_login(self.user)
+        JournalAnalysis.objects.create(user=self.user, text='x', sentiment='positif', keywords=['travail'])
+
+    def _stats(self, view):
+        return response_cache_stats().get(f"dashboard.views.{view}", {'hits': 0, 'misses': 0})
+
+    def test_hit_until_the_next_write(self):
+        avant = self._stats('donnees_statistiques')
+        premiere = self.client.get(reverse('dashboard:api_statistiques')).json()
+        seconde = self.client.get(reverse('dashboard:api_statistiques')).json()
+        self.assertEqual(premiere, seconde)
+        apres = self._stats('donnees_statistiques')
+        self.assertEqual((apres['hits'] - avant['hits'], apres['misses'] - avant['misses']), (1, 1))
+        self.assertIn('hit_ratio', apres)
+
+        JournalAnalysis.objects.create(user=self.user, text='y', sentiment='negatif')
+        self.assertEqual(self.client.get(reverse('dashboard:api_statistiques')).json()['total_analyses'], 2)
+
+    def test_writes_in_another_process_invalidate(self):
+        url = reverse('dashboard:api_statistiques')
+        self.client.get(url)
+        self.client.get(url)
+        avant = self._stats('donnees_statistiques')
+
+        # Another worker, with its own response cache, handles the write
+        with patch('mindscribe.response_cache.get_response_cache', return_value=LocMemCache('autre-worker', {})):
+            JournalAnalysis.objects.create(user=self.user, text='y', sentiment='negatif')
+
+        self.assertEqual(self.client.get(url).json()['total_analyses'], 2)
+        self.assertEqual(self._stats('donnees_statistiques')['hits'], avant['hits'])
+
+    def test_deleting_a_user_does_not_recreate_versions(self):
+        self.client.get(reverse('dashboard:api_statistiques'))
+        Journal.objects.create(utilisateur=self.user, contenu_texte='bonjour')
+        self.user.delete()
+        self.assertFalse(VersionDonnees.objects.exists())
+        self.assertFalse(AgregatJournalier.objects.exists())
+
+    def test_responses_are_per_user(self):
+        self.client.get(reverse('dashboard:api_wordcloud'))
+        autre = User.objects.create_user(username='autre', email='autre@example.com', password='testpassword')
+        JournalAnalysis.objects.create(user=autre, text='z', sentiment='positif', keywords=['famille'])
+        self.client.force_login(autre)
+        self.assertEqual(self.client.get(reverse('dashboard:api_wordcloud')).json()['wordcloud'], [['famille', 1]])
+
+    def test_model_writes_invalidate_other_scopes(self):
+        url = reverse('recommendations:dashboard')
+        # The first page sets the CSRF cookie and is not stored; the next ones are
+        for _ in range(3):
+            self.client.get(url)
+        avant = response_cache_stats()['recommendations.views.dashboard']
+        self.assertGreaterEqual(avant['hits'], 1)
+        Objectif.objects.create(
+            utilisateur=self.user, nom='Courir', date_debut=timezone.localdate(),
+            date_fin=timezone.localdate() + timedelta(days=2)
+        )
+        response = self.client.get(url)
+        self.assertContains(response, 'Courir')
+        self.assertEqual(response_cache_stats()['recommendations.views.dashboard']['hits'], avant['hits'])
+
+
+class LexiqueTestCase(TestCase):
+    """Tests de la reconnaissance compilée du lexique de l'analyseur rapide"""
+
+    def test_word_boundaries(self):
+        mots = [occurrence.mot for occurrence in LEXIQUE.rechercher("Seulement déçue, mais seul et Triste.")]
+        self.assertEqual(mots, ['seul', 'triste'])
+
+    def test_longest_expression_also_tags_contained_words(self):
+        occurrences = LEXIQUE.rechercher("C'est toujours   pareil")
+        self.assertEqual([occurrence.mot for occurrence in occurrences], ['toujours pareil', 'toujours'])
+        patterns = {
+            etiquette.categorie for occurrence in occurrences
+            for etiquette in occurrence.etiquettes if etiquette.famille == PATTERN
+        }
+        self.assertEqual(patterns, {'generalisation', 'pensée_tout_rien'})
+
+    def test_analyses_share_one_scan(self):
+        analyseur = AnalyseurRapide()
+        texte = "Je suis heureux, très heureux et fier de mon travail. Mon ami est seul, toujours."
+        with patch.object(analyseur.lexique, 'rechercher', wraps=analyseur.lexique.rechercher) as rechercher:
+            analyse = analyseur.analyser_texte(texte)['analyse_complete']
+        self.assertEqual(rechercher.call_count, 1)
 
-# Create your tests here.
+        self.assertEqual(analyse['sentiment_principal']['ton'], 'positif')
+        self.assertEqual(analyse['emotions_detectees']['joie']['mots_cles'], ['heureux', 'fier'])
+        sentiment = analyseur._analyse_sentiment_profonde(texte)
+        self.assertEqual(sentiment['emotions_trouvees']['joie']['mots_trouves'], ['heureux', 'heureux', 'fier'])
+        self.assertEqual(sentiment['score_global'], 2.0 * 3 - 1.5)
+        self.assertEqual(
+            set(analyse['themes_psychologiques']),
+            {'estime_soi', 'travail_etudes', 'relations_interpersonnelles'}
+        )
+        self.assertEqual(analyse['patterns_cognitifs']['pensée_tout_rien']['exemples'], ['toujours'])
+        self.assertEqual(analyse['mots_cles_significatifs'][0], {'mot': 'heureux', 'frequence': 6})
@@ -16,6 +16,7 @@ urlpatterns = [
     path('api/distribution-humeurs/', views.donnees_distribution_humeurs, name='api_distribution_humeurs'),
     path('api/frequence-ecriture/', views.donnees_frequence_ecriture, name='api_frequence_ecriture'),
     path('api/score-emotionnel/', views.donnees_score_emotionnel, name='api_score_emotionnel'),
+    path('api/bundle/', views.donnees_bundle, name='api_bundle'),
 
 # URLs pour les bilans mensuels
 path('bilan-mensuel/', views.bilan_mensuel, name='bilan_mensuel'),
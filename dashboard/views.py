@@ -2,18 +2,26 @@
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
+from mindscribe.response_cache import cache_per_user, get_request_version
 from module2_analysis.models import JournalAnalysis
 from journal.models import Journal
-from datetime import datetime, timedelta
-from collections import Counter
+from datetime import datetime
 import json
 
-from django.views.decorators.http import require_http_methods
+from django.utils.cache import add_never_cache_headers, patch_cache_control
+from django.views.decorators.http import condition, require_http_methods
 from .models import BilanMensuel, Statistique
 from .services import ServiceBilanIA
 from .services.analyse_ia import AnalyseurRapide
+from .services.agregats import (
+    JOURS_FREQUENCE, agregats_utilisateur, cumuler_compteurs, distribution_sentiments, etag_donnees,
+    humeur_dominante, resume_tableau_de_bord, score_du_jour, sentiment_du_jour, ton_sentiment
+)
 from .models import BilanMensuel, Statistique, AnalyseRapide
 
+# Positivité, Stabilité, Intensité, Diversité, Croissance (données simulées pour la démo)
+SCORES_EMOTIONNELS_DEMO = [75, 60, 80, 55, 70]
+
 @login_required
 def tableau_bord(request):
     """Vue principale du tableau de bord"""
@@ -22,29 +30,20 @@ def tableau_bord(request):
 # ==================== APIs pour les données ====================
 
 @login_required
+@cache_per_user('dashboard')
 def donnees_evolution_humeur(request):
-    """API pour les données du graphique d'évolution d'humeur"""
+    """API pour les données du graphique d'évolution d'humeur (un point par jour)"""
     try:
-        analyses = JournalAnalysis.objects.filter(
-            user=request.user
-        ).order_by('created_at')
+        agregats = agregats_utilisateur(request.user).filter(nombre_analyses__gt=0)
         
         dates = []
         scores = []
         sentiments = []
         
-        for analyse in analyses:
-            # Convertir le sentiment en score numérique
-            sentiment_map = {
-                'positif': 1, 'positive': 1, 'happy': 1, 'joyful': 1,
-                'neutre': 0, 'neutral': 0, 'mixed': 0,
-                'negatif': -1, 'negative': -1, 'sad': -1, 'angry': -1
-            }
-            score = sentiment_map.get(analyse.sentiment.lower(), 0)
-            
-            dates.append(analyse.created_at.strftime('%Y-%m-%d'))
-            scores.append(score)
-            sentiments.append(analyse.sentiment)
+        for agregat in agregats:
+            dates.append(agregat.jour.strftime('%Y-%m-%d'))
+            scores.append(score_du_jour(agregat))
+            sentiments.append(sentiment_du_jour(agregat))
         
         return JsonResponse({
             'success': True,
@@ -59,19 +58,12 @@ def donnees_evolution_humeur(request):
         }, status=500)
 
 @login_required
+@cache_per_user('dashboard')
 def donnees_wordcloud(request):
     """API pour les données du word cloud"""
     try:
-        analyses = JournalAnalysis.objects.filter(user=request.user)
-        
-        # Agrège tous les mots-clés
-        tous_mots_cles = []
-        for analyse in analyses:
-            if analyse.keywords:
-                tous_mots_cles.extend(analyse.keywords)
-        
-        # Calcule les fréquences
-        frequences = Counter(tous_mots_cles)
+        # Fréquences des mots-clés, cumulées jour par jour
+        frequences = cumuler_compteurs(agregats_utilisateur(request.user), 'mots_cles')
         
         # Formate pour le word cloud
         wordcloud_data = [[mot, count] for mot, count in frequences.most_common(50)]
@@ -87,19 +79,12 @@ def donnees_wordcloud(request):
         }, status=500)
 
 @login_required
+@cache_per_user('dashboard')
 def donnees_themes(request):
     """API pour les données des thèmes dominants"""
     try:
-        analyses = JournalAnalysis.objects.filter(user=request.user)
-        
-        # Agrège tous les thèmes
-        tous_themes = []
-        for analyse in analyses:
-            if analyse.topics:
-                tous_themes.extend(analyse.topics)
-        
-        # Compte les occurrences
-        themes_comptes = Counter(tous_themes).most_common(10)
+        # Occurrences des thèmes, cumulées jour par jour
+        themes_comptes = cumuler_compteurs(agregats_utilisateur(request.user), 'themes').most_common(10)
         
         # Prépare les données pour le graphique
         labels = [theme for theme, count in themes_comptes]
@@ -116,7 +101,35 @@ def donnees_themes(request):
             'error': str(e)
         }, status=500)
 
+def _evenement_chronologie(analyse):
+    """Construit l'événement de la chronologie d'une analyse"""
+    # Détermine la couleur selon le sentiment
+    couleur_map = {
+        'positif': '#10b981', 'positive': '#10b981', 'happy': '#10b981', 'joyful': '#10b981',
+        'neutre': '#f59e0b', 'neutral': '#f59e0b', 'mixed': '#f59e0b',
+        'negatif': '#ef4444', 'negative': '#ef4444', 'sad': '#ef4444', 'angry': '#ef4444'
+    }
+    
+    icone_map = {
+        'positif': '😊', 'positive': '😊', 'happy': '😊', 'joyful': '😊',
+        'neutre': '😐', 'neutral': '😐', 'mixed': '😐',
+        'negatif': '😞', 'negative': '😞', 'sad': '😞', 'angry': '😠'
+    }
+    
+    sentiment = analyse.sentiment.lower()
+    ton = ton_sentiment(sentiment)
+    
+    return {
+        'date': analyse.created_at.strftime('%d %b %Y'),
+        'titre': f"{icone_map.get(sentiment, '😐')} Humeur {ton}",
+        'description': f"Thèmes: {', '.join(analyse.topics[:2]) if analyse.topics else 'Aucun'}",
+        'couleur': couleur_map.get(sentiment, '#f59e0b'),
+        'ton': ton,
+        'mots_cles': analyse.keywords[:3] if analyse.keywords else []
+    }
+
 @login_required
+@cache_per_user('dashboard')
 def donnees_chronologie(request):
     """API pour les données de la chronologie"""
     try:
@@ -124,32 +137,7 @@ def donnees_chronologie(request):
             user=request.user
         ).order_by('-created_at')[:10]
         
-        events = []
-        for analyse in analyses:
-            # Détermine la couleur selon le sentiment
-            couleur_map = {
-                'positif': '#10b981', 'positive': '#10b981', 'happy': '#10b981', 'joyful': '#10b981',
-                'neutre': '#f59e0b', 'neutral': '#f59e0b', 'mixed': '#f59e0b',
-                'negatif': '#ef4444', 'negative': '#ef4444', 'sad': '#ef4444', 'angry': '#ef4444'
-            }
-            
-            icone_map = {
-                'positif': '😊', 'positive': '😊', 'happy': '😊', 'joyful': '😊',
-                'neutre': '😐', 'neutral': '😐', 'mixed': '😐',
-                'negatif': '😞', 'negative': '😞', 'sad': '😞', 'angry': '😠'
-            }
-            
-            sentiment = analyse.sentiment.lower()
-            ton = 'positif' if sentiment in ['positif', 'positive', 'happy', 'joyful'] else 'negatif' if sentiment in ['negatif', 'negative', 'sad', 'angry'] else 'neutre'
-            
-            events.append({
-                'date': analyse.created_at.strftime('%d %b %Y'),
-                'titre': f"{icone_map.get(sentiment, '😐')} Humeur {ton}",
-                'description': f"Thèmes: {', '.join(analyse.topics[:2]) if analyse.topics else 'Aucun'}",
-                'couleur': couleur_map.get(sentiment, '#f59e0b'),
-                'ton': ton,
-                'mots_cles': analyse.keywords[:3] if analyse.keywords else []
-            })
+        events = [_evenement_chronologie(analyse) for analyse in analyses]
         
         return JsonResponse({
             'success': True,
@@ -162,42 +150,19 @@ def donnees_chronologie(request):
         }, status=500)
 
 @login_required
+@cache_per_user('dashboard')
 def donnees_statistiques(request):
     """API pour les statistiques globales"""
     try:
-        analyses = JournalAnalysis.objects.filter(user=request.user)
-        total_analyses = analyses.count()
-        
-        # Calcul du sentiment dominant
-        sentiments = list(analyses.values_list('sentiment', flat=True))
-        sentiment_counts = Counter(sentiments)
-        
-        if sentiments:
-            # Trouver le sentiment le plus fréquent
-            sentiment_dominant = max(sentiment_counts, key=sentiment_counts.get)
-            # Normaliser pour l'affichage
-            if sentiment_dominant.lower() in ['positif', 'positive', 'happy', 'joyful']:
-                humeur_moyenne = 'positif'
-            elif sentiment_dominant.lower() in ['negatif', 'negative', 'sad', 'angry']:
-                humeur_moyenne = 'negatif'
-            else:
-                humeur_moyenne = 'neutre'
-        else:
-            humeur_moyenne = 'neutre'
-        
-        # Thèmes uniques
-        tous_themes = []
-        for analyse in analyses:
-            if analyse.topics:
-                tous_themes.extend(analyse.topics)
-        themes_uniques = len(set(tous_themes))
-        
-        # Mots-clés uniques
-        tous_mots_cles = []
-        for analyse in analyses:
-            if analyse.keywords:
-                tous_mots_cles.extend(analyse.keywords)
-        mots_cles_uniques = len(set(tous_mots_cles))
+        agregats = agregats_utilisateur(request.user)
+        total_analyses = sum(agregats.values_list('nombre_analyses', flat=True))
+        
+        # Calcul du sentiment dominant, normalisé pour l'affichage
+        humeur_moyenne = humeur_dominante(cumuler_compteurs(agregats, 'sentiments'))
+        
+        # Thèmes et mots-clés uniques
+        themes_uniques = len(cumuler_compteurs(agregats, 'themes'))
+        mots_cles_uniques = len(cumuler_compteurs(agregats, 'mots_cles'))
         
         return JsonResponse({
             'success': True,
@@ -213,27 +178,16 @@ def donnees_statistiques(request):
         }, status=500)
 
 @login_required
+@cache_per_user('dashboard')
 def donnees_distribution_humeurs(request):
     """API pour la distribution des humeurs"""
     try:
-        analyses = JournalAnalysis.objects.filter(user=request.user)
-        
         # Compter les sentiments par catégorie
-        positif_count = analyses.filter(
-            sentiment__in=['positif', 'positive', 'happy', 'joyful']
-        ).count()
-        
-        negatif_count = analyses.filter(
-            sentiment__in=['negatif', 'negative', 'sad', 'angry']
-        ).count()
-        
-        neutre_count = analyses.count() - positif_count - negatif_count
+        distribution = distribution_sentiments(cumuler_compteurs(agregats_utilisateur(request.user), 'sentiments'))
         
         return JsonResponse({
             'success': True,
-            'positif': positif_count,
-            'neutre': neutre_count,
-            'negatif': negatif_count
+            **distribution
         })
     except Exception as e:
         return JsonResponse({
@@ -242,24 +196,23 @@ def donnees_distribution_humeurs(request):
         }, status=500)
 
 @login_required
+@cache_per_user('dashboard')
 def donnees_frequence_ecriture(request):
     """API pour la fréquence d'écriture"""
     try:
-        journaux = Journal.objects.filter(utilisateur=request.user).order_by('date_creation')
-        
-        # Group par date (simplifié)
-        dates_count = {}
-        for journal in journaux:
-            date_str = journal.date_creation.strftime('%Y-%m-%d')
-            dates_count[date_str] = dates_count.get(date_str, 0) + 1
-        
-        # Limiter aux 30 derniers jours pour la démo
-        sorted_dates = sorted(dates_count.keys())[-30:]
+        # Limiter aux 30 derniers jours d'écriture
+        agregats = list(
+            agregats_utilisateur(request.user)
+            .filter(nombre_entrees__gt=0)
+            .order_by('-jour')
+            .values_list('jour', 'nombre_entrees')[:JOURS_FREQUENCE]
+        )
+        agregats.reverse()
         
         return JsonResponse({
             'success': True,
-            'dates': sorted_dates,
-            'counts': [dates_count[date] for date in sorted_dates]
+            'dates': [jour.strftime('%Y-%m-%d') for jour, _ in agregats],
+            'counts': [nombre for _, nombre in agregats]
         })
     except Exception as e:
         return JsonResponse({
@@ -274,15 +227,58 @@ def donnees_score_emotionnel(request):
         # Données simulées pour la démo - pourrait être calculé à partir des analyses réelles
         return JsonResponse({
             'success': True,
-            'scores': [75, 60, 80, 55, 70]  # Positivité, Stabilité, Intensité, Diversité, Croissance
+            'scores': SCORES_EMOTIONNELS_DEMO
+        })
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=500)
+
+def _etag_tableau_de_bord(request, *args, **kwargs):
+    # Même lecture de la version que la clé du corps en cache (cache_per_user)
+    if not request.user.is_authenticated:
+        return None
+    return etag_donnees(request.user, get_request_version(request, 'dashboard'))
+
+@login_required
+@condition(etag_func=_etag_tableau_de_bord)
+@cache_per_user('dashboard')
+def donnees_bundle(request):
+    """
+    API regroupant tous les widgets du tableau de bord en une seule réponse.
+
+    Les widgets sont calculés en un seul parcours des agrégats journaliers. L'ETag suit la
+    version des données de l'utilisateur : tant qu'il n'a rien écrit, le navigateur reçoit
+    un 304 sans que rien ne soit recalculé.
+    """
+    try:
+        sections = resume_tableau_de_bord(request.user)
+        analyses = JournalAnalysis.objects.filter(
+            user=request.user
+        ).only('created_at', 'sentiment', 'topics', 'keywords').order_by('-created_at')[:10]
+        sections['chronologie'] = {'events': [_evenement_chronologie(analyse) for analyse in analyses]}
+        sections['score_emotionnel'] = {'scores': SCORES_EMOTIONNELS_DEMO}
+        
+        response = JsonResponse({
+            'success': True,
+            **{nom: {'success': True, **section} for nom, section in sections.items()}
         })
+        # Le navigateur garde la réponse mais la revalide (If-None-Match) à chaque chargement
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
     except Exception as e:
         return JsonResponse({
             'success': False,
             'error': str(e)
         }, status=500)
 
+def _mois_courant(request, *args, **kwargs):
+    # Sans période dans l'URL, le bilan affiché est celui du mois courant
+    return datetime.now().strftime('%Y-%m')
+
 @login_required
+@cache_per_user('bilans', key_func=_mois_courant)
 def bilan_mensuel(request, annee=None, mois=None):
     """Vue pour afficher les bilans mensuels"""
     try:
@@ -327,7 +323,10 @@ def bilan_mensuel(request, annee=None, mois=None):
         context = {
             'error': f"Erreur lors du chargement du bilan: {str(e)}"
         }
-        return render(request, 'dashboard/bilan_mensuel.html', context)
+        response = render(request, 'dashboard/bilan_mensuel.html', context)
+        # Ne pas garder l'erreur en cache
+        add_never_cache_headers(response)
+        return response
 
 @login_required
 @require_http_methods(["POST"])
@@ -5,14 +5,21 @@ set -e
 : "${PORT:=8000}"
 : "${WORKERS:=3}"
 : "${TIMEOUT:=120}"
+: "${GUNICORN_WORKER_CLASS:=sync}"
 
 echo "Applying database migrations (if any)..."
 python manage.py migrate --noinput || true
 
+if [ -n "${ANALYSIS_INFERENCE_SOCKET}" ]; then
+    echo "Starting local inference server on ${ANALYSIS_INFERENCE_SOCKET}..."
+    python manage.py run_inference_server --socket "${ANALYSIS_INFERENCE_SOCKET}" &
+fi
+
 echo "Starting Gunicorn on port ${PORT}..."
 exec gunicorn mindscribe.wsgi:application \
     --bind 0.0.0.0:"${PORT}" \
     --workers "${WORKERS}" \
+    --worker-class "${GUNICORN_WORKER_CLASS}" \
     --timeout "${TIMEOUT}"
 
 
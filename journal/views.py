@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
@@ -17,7 +18,9 @@ def create_journal_entry(request):
     """
     View for creating a new journal entry with multimodal content
     """
-    return render(request, 'journal/create_entry.html')
+    return render(request, 'journal/create_entry.html', {
+        'analysis_streaming': getattr(settings, 'ANALYSIS_STREAMING', False),
+    })
 
 @login_required
 def journal_list(request):
@@ -137,7 +140,8 @@ def edit_journal(request, journal_id):
             analysis_results = analyze_multimodal_content(
                 text=text if text else None,
                 audio_path=audio_path,
-                image_path=image_path
+                image_path=image_path,
+                known_transcription=entry.audio_transcription or None
             )
             
             # Update all analysis fields
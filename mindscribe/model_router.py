@@ -0,0 +1,289 @@
+"""
+Latency-aware routing of LLM calls across interchangeable models.
+
+The router keeps, per model, an exponentially weighted moving average (EWMA) of the
+latency and of the error rate of recent calls, and tries the fastest healthy model
+first. When the first model is much slower than usual (`hedge_factor` times its latency
+EWMA, and at least `hedge_delay` seconds), a hedged call is sent to the next best model
+and the first answer wins; when a call fails, the next model is tried at once. Calls
+within a model's normal latency are therefore never paid twice. Everything happens within one total deadline, instead of one
+full timeout per model tried in sequence.
+
+A synchronous HTTP call cannot be interrupted from another thread: the losing call is
+abandoned (its answer is dropped) and stops by itself at the deadline it was given,
+which never exceeds what is left of the total deadline. Its outcome still feeds the
+model's statistics.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+from django.conf import settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROUTER_CONFIG = {
+    'ewma_alpha': 0.3,          # Weight of the latest observation in the moving averages
+    'initial_latency': 5.0,     # Seconds assumed for a model never called yet
+    'error_penalty': 4.0,       # Score = latency * (1 + error_penalty * error_rate)
+    'max_error_rate': 0.5,      # Above this, a model is only tried after the healthy ones
+    'recovery_time': 60,        # Seconds after its last failure before an unhealthy model is healthy again
+    'hedge_factor': 3.0,        # Hedge once the first model takes this multiple of its latency EWMA
+    'hedge_delay': 4.0,         # Minimum seconds before a hedged call to the next model; 0 disables hedging
+    'deadline': 45,             # Total seconds of a routed call, all models included
+    'max_workers': 16,          # Threads running calls (shared by all routed calls of the process)
+}
+
+
+class RoutingError(requests.exceptions.RequestException):
+    """
+    Raised when no model answered successfully within the deadline.
+
+    `errors` holds the exception of every failed call, in order.
+    """
+
+    def __init__(self, message, errors=None):
+        super().__init__(message)
+        self.errors = errors or []
+
+
+class ModelStats:
+    """
+    Moving averages and counters of one model.
+    """
+
+    def __init__(self, initial_latency):
+        self.latency = initial_latency
+        self.error_rate = 0.0
+        self.observed = False
+        self.calls = 0
+        self.successes = 0
+        self.failures = 0
+        self.in_flight = 0
+        self.wins = 0
+        self.hedges = 0
+        self.abandoned = 0
+        self.last_failure_at = None
+        self.last_error = ''
+
+    def record(self, latency, success, alpha, error=None):
+        if success:
+            # The first observation replaces the initial guess
+            self.latency = latency if not self.observed else alpha * latency + (1 - alpha) * self.latency
+            self.observed = True
+            self.successes += 1
+        else:
+            self.failures += 1
+            self.last_failure_at = time.monotonic()
+            self.last_error = str(error)[:200]
+        self.error_rate = alpha * (0.0 if success else 1.0) + (1 - alpha) * self.error_rate
+
+    def snapshot(self):
+        return {
+            'ewma_latency': round(self.latency, 3),
+            'ewma_error_rate': round(self.error_rate, 3),
+            'calls': self.calls,
+            'successes': self.successes,
+            'failures': self.failures,
+            'in_flight': self.in_flight,
+            'wins': self.wins,
+            'hedges': self.hedges,
+            'abandoned': self.abandoned,
+            'last_error': self.last_error,
+        }
+
+
+def get_router_config():
+    """
+    Return the router configuration merged with the MODEL_ROUTER setting.
+    """
+    config = dict(DEFAULT_ROUTER_CONFIG)
+    config.update(getattr(settings, 'MODEL_ROUTER', {}))
+    return config
+
+
+class ModelRouter:
+    """
+    Picks the fastest healthy model for each call, with hedging and failover.
+    """
+
+    def __init__(self, config=None):
+        self.config = dict(DEFAULT_ROUTER_CONFIG)
+        self.config.update(config or {})
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=self.config['max_workers'], thread_name_prefix='model-router')
+
+    def _stats_for(self, model):
+        stats = self._stats.get(model)
+        if stats is None:
+            stats = self._stats[model] = ModelStats(self.config['initial_latency'])
+        return stats
+
+    def _is_healthy(self, stats):
+        if stats.error_rate < self.config['max_error_rate']:
+            return True
+        return time.monotonic() - stats.last_failure_at >= self.config['recovery_time']
+
+    def rank(self, models):
+        """
+        Order models by expected latency, healthy ones first.
+
+        Args:
+            models (list): The candidate models, in order of preference
+
+        Returns:
+            list: The models, best first (ties keep the given order)
+        """
+        with self._lock:
+            scored = []
+            for index, model in enumerate(dict.fromkeys(models)):
+                stats = self._stats_for(model)
+                score = stats.latency * (1 + self.config['error_penalty'] * stats.error_rate)
+                scored.append((not self._is_healthy(stats), score, index, model))
+        return [model for _, _, _, model in sorted(scored)]
+
+    def _run(self, model, func, timeout):
+        started = time.monotonic()
+        try:
+            result = func(model, timeout)
+        except Exception as e:
+            with self._lock:
+                stats = self._stats_for(model)
+                stats.in_flight -= 1
+                stats.record(time.monotonic() - started, False, self.config['ewma_alpha'], e)
+            raise
+        with self._lock:
+            stats = self._stats_for(model)
+            stats.in_flight -= 1
+            stats.record(time.monotonic() - started, True, self.config['ewma_alpha'])
+        return result
+
+    def hedge_delay_for(self, model):
+        """
+        Return the seconds after which a call to model is slow enough to be hedged, or None.
+        """
+        if not self.config['hedge_delay']:
+            return None
+        with self._lock:
+            latency = self._stats_for(model).latency
+        return max(self.config['hedge_delay'], self.config['hedge_factor'] * latency)
+
+    def _launch(self, model, func, expires_at, pending, hedge=False):
+        with self._lock:
+            stats = self._stats_for(model)
+            stats.calls += 1
+            stats.in_flight += 1
+            if hedge:
+                stats.hedges += 1
+        future = self._executor.submit(self._run, model, func, max(0.1, expires_at - time.monotonic()))
+        pending[future] = model
+
+    def _abandon(self, pending):
+        with self._lock:
+            for model in pending.values():
+                self._stats_for(model).abandoned += 1
+
+    def call(self, func, models, deadline=None, hedge_delay=None):
+        """
+        Run func on the best model, hedging on and failing over to the next ones.
+
+        Args:
+            func (callable): func(model, timeout) -> result; raises on failure and should
+                not run longer than timeout seconds
+            models (list): The candidate models, in order of preference
+            deadline (float, optional): Total seconds allowed, defaults to the config
+            hedge_delay (float, optional): Seconds before the hedged call (0 disables hedging),
+                defaults to a multiple of the latency of the model called first
+
+        Returns:
+            tuple: (the result, the model that produced it)
+
+        Raises:
+            RoutingError: If every model failed or the deadline expired
+        """
+        deadline = deadline or self.config['deadline']
+        expires_at = time.monotonic() + deadline
+        candidates = self.rank(models)
+        if not candidates:
+            raise RoutingError("No model to route the call to")
+
+        def hedge_time(model):
+            delay = self.hedge_delay_for(model) if hedge_delay is None else hedge_delay
+            return time.monotonic() + delay if delay else None
+
+        pending = {}
+        errors = []
+        messages = []
+        model = candidates.pop(0)
+        self._launch(model, func, expires_at, pending)
+        hedge_at = hedge_time(model)
+
+        while pending:
+            now = time.monotonic()
+            if now >= expires_at:
+                break
+            timeout = expires_at - now
+            if hedge_at is not None and candidates:
+                timeout = max(0, min(timeout, hedge_at - now))
+            done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                model = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    errors.append(e)
+                    messages.append(f"{model}: {e}")
+                    logger.warning(f"Routed call to {model} failed: {e}")
+                    continue
+                self._abandon(pending)
+                with self._lock:
+                    self._stats_for(model).wins += 1
+                return result, model
+
+            if not pending and candidates:
+                # Every call in flight failed: fail over to the next model at once
+                model = candidates.pop(0)
+                self._launch(model, func, expires_at, pending)
+                hedge_at = hedge_time(model)
+            elif hedge_at is not None and candidates and time.monotonic() >= hedge_at:
+                # The current call is slow: hedge once on the next best model
+                model = candidates.pop(0)
+                logger.info(f"Hedging slow call on {model}")
+                self._launch(model, func, expires_at, pending, hedge=True)
+                hedge_at = None
+
+        self._abandon(pending)
+        if pending:
+            raise RoutingError(f"No model answered within {deadline}s ({'; '.join(messages) or 'all calls still running'})", errors)
+        raise RoutingError(f"All models failed: {'; '.join(messages)}", errors)
+
+    def stats(self):
+        """
+        Return the moving averages and counters of every model, best first.
+        """
+        with self._lock:
+            models = list(self._stats)
+        ranked = self.rank(models)
+        with self._lock:
+            return {model: dict(self._stats[model].snapshot(), healthy=self._is_healthy(self._stats[model])) for model in ranked}
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_router():
+    """
+    Return the process-wide model router, creating it on first use.
+    """
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = ModelRouter(get_router_config())
+    return _router
@@ -0,0 +1,342 @@
+"""
+Shared OpenRouter HTTP client.
+
+Every OpenRouter caller (journal analysis, recommendations, assistant IA) goes through one
+process-wide client so that TLS connections are pooled and kept alive, every call has a
+deadline, transient failures are retried with jitter and a failing model is short-circuited.
+"""
+import json
+import logging
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_CLIENT_CONFIG = {
+    'pool_connections': 4,          # Number of host pools kept by the session
+    'pool_maxsize': 10,             # Keep-alive connections per host
+    'connect_timeout': 5,           # Seconds to establish a connection
+    'read_timeout': 30,             # Seconds to wait for a response on one attempt
+    'deadline': 45,                 # Total seconds for a call, retries included
+    'max_retries': 2,               # Retries after the first attempt
+    'backoff_base': 0.5,            # Seconds, doubled on every retry
+    'backoff_max': 4,               # Upper bound of a single backoff
+    'breaker_failure_threshold': 5, # Consecutive failures before a model's circuit opens
+    'breaker_reset_timeout': 30,    # Seconds before an open circuit lets a trial call through
+}
+
+# Status codes worth retrying: rate limiting and upstream/gateway errors
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """
+    Raised when a model's circuit breaker is open and the call is not attempted.
+    """
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    closed -> open after `failure_threshold` failures in a row,
+    open -> half_open after `reset_timeout` seconds (a single trial call is let through),
+    half_open -> closed on success, back to open on failure.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow_request(self):
+        with self._lock:
+            if self.state == 'open':
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = 'half_open'
+                self._trial_in_flight = False
+            if self.state == 'half_open':
+                if self._trial_in_flight:
+                    return False
+                self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def release_trial(self):
+        """
+        Free the half-open trial slot of a call whose outcome says nothing about the model.
+        """
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+    def snapshot(self):
+        with self._lock:
+            return {'state': self.state, 'failures': self.failures}
+
+
+def _parse_retry_after(response):
+    """
+    Return the Retry-After delay of a response in seconds, if it is given as a number.
+    """
+    value = response.headers.get('Retry-After')
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+class OpenRouterClient:
+    """
+    Pooled, deadline-aware client for the OpenRouter chat completions API.
+    """
+
+    def __init__(self, api_key=None, base_url=None, config=None):
+        self.api_key = api_key if api_key is not None else getattr(settings, 'OPENROUTER_API_KEY', '')
+        self.base_url = base_url or getattr(settings, 'OPENROUTER_BASE_URL', 'https://openrouter.ai/api/v1')
+        self.config = dict(DEFAULT_CLIENT_CONFIG)
+        self.config.update(getattr(settings, 'OPENROUTER_CLIENT', {}))
+        self.config.update(config or {})
+
+        # Retries are handled here (with deadlines and jitter), not by urllib3
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.config['pool_connections'],
+            pool_maxsize=self.config['pool_maxsize'],
+            max_retries=0,
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self._breakers = {}
+        self._lock = threading.Lock()
+        self._stats = {'requests': 0, 'successes': 0, 'failures': 0, 'retries': 0, 'short_circuited': 0}
+
+    def _breaker_for(self, model):
+        with self._lock:
+            breaker = self._breakers.get(model)
+            if breaker is None:
+                breaker = CircuitBreaker(
+                    failure_threshold=self.config['breaker_failure_threshold'],
+                    reset_timeout=self.config['breaker_reset_timeout'],
+                )
+                self._breakers[model] = breaker
+            return breaker
+
+    def _count(self, counter):
+        with self._lock:
+            self._stats[counter] += 1
+
+    def _headers(self, title=None, referer=None):
+        return {
+            'Authorization': f'Bearer {self.api_key}',
+            'Content-Type': 'application/json',
+            'HTTP-Referer': referer or getattr(settings, 'SITE_URL', 'https://mindscribe.com'),
+            'X-Title': title or getattr(settings, 'SITE_NAME', 'MindScribe'),
+        }
+
+    def _start_call(self, model):
+        breaker = self._breaker_for(model)
+        if not breaker.allow_request():
+            self._count('short_circuited')
+            raise CircuitOpenError(f"Circuit open for model {model}, skipping call")
+        self._count('requests')
+        return breaker
+
+    def _send(self, payload, breaker, deadline, timeout, headers, stream=False):
+        """
+        POST the payload, retrying transient failures until a response below 400 or the deadline.
+
+        Returns:
+            tuple: (the successful response, the monotonic time the deadline expires at)
+        """
+        model = payload.get('model', '')
+        deadline = deadline or self.config['deadline']
+        expires_at = time.monotonic() + deadline
+        url = f'{self.base_url}/chat/completions'
+        attempt = 0
+
+        while True:
+            remaining = expires_at - time.monotonic()
+            if remaining <= 0:
+                breaker.record_failure()
+                self._count('failures')
+                raise requests.exceptions.Timeout(f"OpenRouter call to {model} exceeded its {deadline}s deadline")
+
+            retry_after = None
+            try:
+                response = self.session.post(
+                    url,
+                    headers=headers,
+                    json=payload,
+                    timeout=(min(self.config['connect_timeout'], remaining), min(timeout or self.config['read_timeout'], remaining)),
+                    stream=stream,
+                )
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error = e
+            else:
+                if response.status_code < 400:
+                    return response, expires_at
+                try:
+                    response.raise_for_status()
+                except requests.exceptions.HTTPError as e:
+                    error = e
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    # Client errors (bad key, bad payload) say nothing about the model's health
+                    self._count('failures')
+                    breaker.release_trial()
+                    raise error
+                retry_after = _parse_retry_after(response)
+
+            attempt += 1
+            delay = retry_after if retry_after is not None else random.uniform(
+                0, min(self.config['backoff_max'], self.config['backoff_base'] * 2 ** (attempt - 1))
+            )
+            if attempt > self.config['max_retries'] or time.monotonic() + delay >= expires_at:
+                breaker.record_failure()
+                self._count('failures')
+                raise error
+
+            logger.warning(f"OpenRouter call to {model} failed ({error}), retry {attempt} in {delay:.2f}s")
+            self._count('retries')
+            time.sleep(delay)
+
+    def chat_completion(self, payload, deadline=None, timeout=None, title=None, referer=None):
+        """
+        Call the chat completions endpoint.
+
+        Args:
+            payload (dict): The request body (must contain 'model')
+            deadline (float, optional): Total seconds allowed for the call, retries included
+            timeout (float, optional): Read timeout of a single attempt
+            title (str, optional): X-Title header identifying the caller
+            referer (str, optional): HTTP-Referer header
+
+        Returns:
+            dict: The decoded JSON response
+
+        Raises:
+            CircuitOpenError: If the model's circuit is open
+            requests.exceptions.RequestException: If the call failed or the deadline expired
+        """
+        breaker = self._start_call(payload.get('model', ''))
+        response, _ = self._send(payload, breaker, deadline, timeout, self._headers(title=title, referer=referer))
+        breaker.record_success()
+        self._count('successes')
+        return response.json()
+
+    def stream_chat_completion(self, payload, deadline=None, timeout=None, title=None, referer=None):
+        """
+        Call the chat completions endpoint in streaming mode (server-sent events).
+
+        Connection failures and retryable statuses are retried until the first byte;
+        once content has started flowing, a failure is raised to the caller. `timeout`
+        bounds the wait for each chunk and `deadline` the whole stream.
+
+        Args:
+            payload (dict): The request body (must contain 'model'); 'stream' is forced on
+            deadline (float, optional): Total seconds allowed for the call, retries included
+            timeout (float, optional): Read timeout between two chunks
+            title (str, optional): X-Title header identifying the caller
+            referer (str, optional): HTTP-Referer header
+
+        Yields:
+            str: The content deltas of the completion, in order
+
+        Raises:
+            CircuitOpenError: If the model's circuit is open
+            requests.exceptions.RequestException: If the call failed or the deadline expired
+        """
+        model = payload.get('model', '')
+        breaker = self._start_call(model)
+        response, expires_at = self._send(
+            dict(payload, stream=True), breaker, deadline, timeout,
+            self._headers(title=title, referer=referer), stream=True
+        )
+        # SSE responses carry no charset, requests would otherwise assume ISO-8859-1
+        response.encoding = 'utf-8'
+        recorded = False
+        try:
+            for line in response.iter_lines(decode_unicode=True):
+                if time.monotonic() > expires_at:
+                    raise requests.exceptions.Timeout(f"OpenRouter stream from {model} exceeded its deadline")
+                # Blank lines separate events, lines starting with ':' are keep-alive comments
+                if not line or not line.startswith('data:'):
+                    continue
+                data = line[5:].strip()
+                if data == '[DONE]':
+                    break
+                try:
+                    chunk = json.loads(data)
+                except ValueError:
+                    raise requests.exceptions.RequestException(f"Invalid event in OpenRouter stream: {data[:100]}")
+                if 'error' in chunk:
+                    raise requests.exceptions.RequestException(f"OpenRouter stream error: {chunk['error'].get('message', chunk['error'])}")
+                choices = chunk.get('choices') or [{}]
+                delta = (choices[0].get('delta') or {}).get('content')
+                if delta:
+                    yield delta
+        except requests.exceptions.RequestException:
+            recorded = True
+            breaker.record_failure()
+            self._count('failures')
+            raise
+        else:
+            recorded = True
+            breaker.record_success()
+            self._count('successes')
+        finally:
+            if not recorded:
+                # Closed by the consumer (client disconnect) or interrupted by an error
+                # unrelated to the model: the call says nothing about it
+                breaker.release_trial()
+            response.close()
+
+    def stats(self):
+        """
+        Return call counters and the circuit breaker state of every model.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            breakers = dict(self._breakers)
+        stats['circuits'] = {model: breaker.snapshot() for model, breaker in breakers.items()}
+        return stats
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Return the process-wide OpenRouter client, creating it on first use.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = OpenRouterClient()
+    return _client
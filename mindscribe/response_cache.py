@@ -0,0 +1,220 @@
+"""
+Per-user cache of the read-heavy views (dashboard data, monthly reports, recommendation
+and communication dashboards).
+
+A cached response is keyed by the view, the user, the request and the current *data
+version* of the scope the view depends on. A version is a counter per scope and user,
+incremented whenever a relevant model is written (post_save/post_delete receivers
+registered with invalidate_on, or an explicit bump_version). Invalidation is therefore one
+row update, and a response computed before a write can never be served after it: its
+key contains a version that no longer exists. The old entries simply expire.
+
+The versions are rows of the database (dashboard.models.VersionDonnees), so a write
+handled by any process (another gunicorn worker, a job worker, a management command)
+invalidates the responses cached by all of them. The version is read before the view
+runs and incremented after the data is written: a response is never cached under a
+version newer than its data.
+
+Responses are stored in the Django cache alias of the RESPONSE_CACHE setting: local
+memory (per process) or files (shared by the workers of a host) out of the box.
+"""
+import hashlib
+import logging
+import threading
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_RESPONSE_CACHE_CONFIG = {
+    'enabled': True,
+    'alias': 'responses',       # Django cache alias (CACHES); 'default' if it does not exist
+    'timeout': 3600,            # Seconds a response is kept
+}
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def get_response_cache_config():
+    """
+    Return the response cache configuration merged with the RESPONSE_CACHE setting.
+    """
+    config = dict(DEFAULT_RESPONSE_CACHE_CONFIG)
+    config.update(getattr(settings, 'RESPONSE_CACHE', {}))
+    return config
+
+
+def get_response_cache(config=None):
+    """
+    Return the Django cache holding the responses and the data versions.
+    """
+    config = config or get_response_cache_config()
+    alias = config['alias'] if config['alias'] in getattr(settings, 'CACHES', {}) else 'default'
+    return caches[alias]
+
+
+def _versions(scope, user_id):
+    from dashboard.models import VersionDonnees
+    return VersionDonnees.objects.filter(utilisateur_id=user_id, portee=scope)
+
+
+def get_version(scope, user_id):
+    """
+    Return the current data version of a scope for a user, creating it if needed.
+
+    The version includes the date of its last change, so a row deleted and created again
+    (counter back to 0) does not reuse the versions of the old one.
+    """
+    from dashboard.models import VersionDonnees
+
+    row = _versions(scope, user_id).values_list('version', 'date_mise_a_jour').first()
+    if row is None:
+        # Created on read: a later write always finds a row to increment
+        try:
+            with transaction.atomic():
+                VersionDonnees.objects.create(utilisateur_id=user_id, portee=scope)
+        except IntegrityError:
+            pass
+        row = _versions(scope, user_id).values_list('version', 'date_mise_a_jour').first()
+    return f"{row[0]}-{int(row[1].timestamp() * 1000)}"
+
+
+def get_request_version(request, scope):
+    """
+    Return the data version of a scope for the user of a request, read once per request.
+
+    A view deriving its ETag from the version and the key of its cached body then use the
+    same read: the body served is never older than its ETag.
+    """
+    versions = request.__dict__.setdefault('_response_cache_versions', {})
+    if scope not in versions:
+        versions[scope] = get_version(scope, request.user.pk)
+    return versions[scope]
+
+
+def bump_version(scope, user_id):
+    """
+    Increment the data version of a scope for a user, invalidating their cached responses.
+
+    Without a version row nothing was cached for the scope (reads create it), so nothing is
+    created here: a user being deleted does not get a new row.
+    """
+    try:
+        _versions(scope, user_id).update(version=F('version') + 1, date_mise_a_jour=timezone.now())
+    except Exception as e:
+        logger.error(f"Could not bump the {scope} data version of user {user_id}: {e}")
+
+
+def invalidate_on(scope, model, user_field):
+    """
+    Bump the data version of scope for the user of every saved or deleted instance of model.
+
+    Args:
+        scope (str): The scope whose cached responses depend on model
+        model (Model): The model class
+        user_field (str): The name of the foreign key to the user on model
+    """
+    attname = model._meta.get_field(user_field).attname
+
+    def receiver(sender, instance, **kwargs):
+        user_id = getattr(instance, attname, None)
+        if user_id is not None:
+            bump_version(scope, user_id)
+
+    uid = f"response-cache:{scope}:{model._meta.label}"
+    post_save.connect(receiver, sender=model, weak=False, dispatch_uid=uid)
+    post_delete.connect(receiver, sender=model, weak=False, dispatch_uid=uid)
+
+
+def _record(view_name, hit):
+    with _stats_lock:
+        stats = _stats.setdefault(view_name, {'hits': 0, 'misses': 0})
+        stats['hits' if hit else 'misses'] += 1
+
+
+def response_cache_stats():
+    """
+    Return the hits, misses and hit ratio of every cached view (in this process).
+    """
+    with _stats_lock:
+        return {
+            view_name: dict(stats, hit_ratio=round(stats['hits'] / (stats['hits'] + stats['misses']), 3))
+            for view_name, stats in sorted(_stats.items())
+        }
+
+
+def _has_pending_messages(request):
+    # Rendering a page consumes the flash messages: such a page is neither served from nor stored in the cache
+    storage = getattr(request, '_messages', None)
+    return storage is not None and len(storage) > 0
+
+
+def _is_cacheable(response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and 'no-store' not in response.get('Cache-Control', '')
+    )
+
+
+def cache_per_user(scope, key_func=None, timeout=None):
+    """
+    Cache the GET responses of a view per user and data version.
+
+    Args:
+        scope (str): The scope whose version the responses depend on
+        key_func (callable, optional): key_func(request, *args, **kwargs) -> str, for views
+            that also depend on something else (e.g. the current date)
+        timeout (int, optional): Seconds a response is kept, defaults to the config
+
+    Pages are keyed by the CSRF cookie too, so the token they embed stays valid for the
+    browser they are served to. Responses that set cookies or are not 200 are not stored.
+    """
+    def decorator(view):
+        view_name = f"{view.__module__}.{view.__qualname__}"
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            config = get_response_cache_config()
+            user = getattr(request, 'user', None)
+            if (
+                not config['enabled'] or request.method not in ('GET', 'HEAD')
+                or user is None or not user.is_authenticated or _has_pending_messages(request)
+            ):
+                return view(request, *args, **kwargs)
+
+            cache = get_response_cache(config)
+            hasher = hashlib.sha256()
+            for part in (
+                request.get_full_path(),
+                request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+                key_func(request, *args, **kwargs) if key_func else '',
+            ):
+                hasher.update(f"{part}\0".encode('utf-8'))
+            key = f"response-cache:{view_name}:{user.pk}:{get_request_version(request, scope)}:{hasher.hexdigest()}"
+
+            response = cache.get(key)
+            if response is not None:
+                _record(view_name, True)
+                return response
+
+            _record(view_name, False)
+            response = view(request, *args, **kwargs)
+            # A page embedding a CSRF token of a cookie the browser does not have yet is not reusable
+            new_csrf_cookie = request.META.get('CSRF_COOKIE_USED') and not request.COOKIES.get(settings.CSRF_COOKIE_NAME)
+            if _is_cacheable(response) and not new_csrf_cookie:
+                cache.set(key, response, timeout=timeout or config['timeout'])
+            return response
+
+        return wrapper
+
+    return decorator
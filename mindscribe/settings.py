@@ -213,4 +213,177 @@ AI_CONFIG = {
     'timeout': 60,          # Augmenté pour les modèles lents
 }
 
+# Client HTTP OpenRouter partagé (pool de connexions, deadlines, retries, disjoncteur)
+OPENROUTER_CLIENT = {
+    'pool_maxsize': config('OPENROUTER_POOL_MAXSIZE', default=10, cast=int),
+    'connect_timeout': 5,
+    'read_timeout': 30,
+    'deadline': config('OPENROUTER_DEADLINE', default=45, cast=int),  # < timeout gunicorn (120s)
+    'max_retries': 2,
+    'breaker_failure_threshold': 5,
+    'breaker_reset_timeout': 30,
+}
+
+# Anti double-clic et limitation de débit des endpoints coûteux (analyse, assistant IA) :
+# fichier SQLite partagé par les workers gunicorn de la machine
+THROTTLING = {
+    'enabled': config('THROTTLING_ENABLED', default=True, cast=bool),
+    'db_path': config('THROTTLING_DB_PATH', default=''),   # '' = <tmp>/mindscribe-throttle.sqlite3
+    'user_rate': 0.2,           # Jetons/seconde par utilisateur (12 appels/minute)
+    'user_burst': 5,
+    'provider_rate': config('THROTTLING_PROVIDER_RATE', default=2.0, cast=float),  # Global, par fournisseur
+    'provider_burst': 20,
+}
+
+# Routage des appels LLM selon la latence (EWMA) et le taux d'erreur de chaque modèle,
+# avec requête "hedgée" sur le 2e meilleur modèle et deadline totale
+MODEL_ROUTER = {
+    'hedge_factor': 3.0,          # Hedging quand le 1er modèle dépasse 3x sa latence moyenne (EWMA)...
+    'hedge_delay': config('MODEL_ROUTER_HEDGE_DELAY', default=4.0, cast=float),  # ... et au moins ce délai ; 0 = pas de hedging
+    'deadline': config('MODEL_ROUTER_DEADLINE', default=45, cast=int),
+    'max_error_rate': 0.5,
+    'recovery_time': 60,
+}
+
+# Modèles de repli de l'analyse de journal (le routeur choisit le plus rapide en bonne santé)
+ANALYSIS_FALLBACK_MODELS = {
+    'text': ["meta-llama/llama-3.1-8b-instruct"],
+    'vision': [],
+}
+
+# Cache des résultats d'analyse (clé = hash du contenu + modèle + version du prompt)
+ANALYSIS_RESULT_CACHE = {
+    'enabled': config('ANALYSIS_CACHE_ENABLED', default=True, cast=bool),
+    'ttl': config('ANALYSIS_CACHE_TTL', default=7 * 24 * 3600, cast=int),  # 7 jours
+    'max_entries': config('ANALYSIS_CACHE_MAX_ENTRIES', default=5000, cast=int),
+    # Transcriptions audio (clé = SHA-256 de l'audio + config STT), réutilisées à chaque édition
+    'max_transcripts': config('ANALYSIS_CACHE_MAX_TRANSCRIPTS', default=20000, cast=int),
+}
+
+# Pipeline d'analyse multimodale : transcription, encodage image et pré-analyse du texte
+# s'exécutent en parallèle ; la pré-analyse texte sert de repli si l'appel multimodal échoue.
+# Désactivée par défaut : c'est un 2e appel LLM complet (payant) pour chaque entrée avec média
+ANALYSIS_PIPELINE = {
+    'text_pre_analysis': config('ANALYSIS_TEXT_PRE_ANALYSIS', default=False, cast=bool),
+}
+
+# Optimisation des images avant envoi au modèle de vision (rotation EXIF, redimensionnement,
+# ré-encodage sous un budget d'octets) ; la copie optimisée est gardée à côté de l'original
+ANALYSIS_IMAGE_OPTIMIZER = {
+    'enabled': config('ANALYSIS_IMAGE_OPTIMIZER_ENABLED', default=True, cast=bool),
+    'max_dimension': config('ANALYSIS_IMAGE_MAX_DIMENSION', default=1280, cast=int),
+    'max_bytes': config('ANALYSIS_IMAGE_MAX_BYTES', default=300 * 1024, cast=int),
+    'format': config('ANALYSIS_IMAGE_FORMAT', default='JPEG'),  # JPEG ou WEBP
+}
+
+# Classe des workers gunicorn (entrypoint.sh). Un worker "sync" reste bloqué pendant toute
+# une analyse en streaming : la page du journal passe alors par la file d'attente des
+# analyses, et ne lit le flux SSE qu'avec des workers gthread/gevent
+GUNICORN_WORKER_CLASS = config('GUNICORN_WORKER_CLASS', default='sync')
+ANALYSIS_STREAMING = config('ANALYSIS_STREAMING', default=GUNICORN_WORKER_CLASS != 'sync', cast=bool)
+
+# File d'attente des analyses (202 + suivi du statut). Avec 'embedded', chaque worker
+# gunicorn fait tourner ses propres threads ; sinon lancer `manage.py run_analysis_worker`
+ANALYSIS_JOBS = {
+    'embedded': config('ANALYSIS_JOBS_EMBEDDED', default=True, cast=bool),
+    'workers': config('ANALYSIS_JOBS_WORKERS', default=2, cast=int),
+    'per_user_limit': 1,          # Analyses simultanées par utilisateur
+    'max_queued_per_user': 10,    # Au-delà, la requête est refusée (429)
+    'max_attempts': 3,
+    'retry_delay': 10,            # Secondes, doublées à chaque nouvel essai
+    'stale_after': 300,           # Job "running" sans heartbeat depuis 5 min -> remis en file
+}
+
+# Analyse en deux temps : niveau "fast" local enregistré tout de suite, niveau "full" (LLM) en tâche de fond
+ANALYSIS_TIERS = {
+    'fast_backend': config('ANALYSIS_FAST_BACKEND', default='auto'),  # local, lexicon ou auto
+    'keywords': 5,
+    'topics': 3,
+}
+
+# Analyse par lots (réponse NDJSON, une ligne par entrée dès qu'elle est terminée)
+ANALYSIS_BATCH = {
+    'max_items': config('ANALYSIS_BATCH_MAX_ITEMS', default=50, cast=int),
+    'concurrency': config('ANALYSIS_BATCH_CONCURRENCY', default=4, cast=int),  # Entrées analysées en parallèle
+    'rate_limit': config('ANALYSIS_BATCH_RATE_LIMIT', default=100, cast=int),  # Entrées par utilisateur et par fenêtre
+    'rate_window': 3600,          # Secondes
+    'deadline': 60,               # Entrées non commencées après 60 s abandonnées (timeout gunicorn : 120 s)
+}
+
+# Modèles locaux (module2_analysis/nlp) : chargés à la première utilisation, les moins
+# récemment utilisés sont déchargés au-delà du budget mémoire (par processus)
+ANALYSIS_LOCAL_MODELS = {
+    'memory_budget_mb': config('ANALYSIS_LOCAL_MODELS_BUDGET_MB', default=4096, cast=int),
+}
+
+# Démon d'inférence local (`manage.py run_inference_server`) partagé par tous les workers
+# gunicorn via un socket Unix ; vide = les modèles tournent dans chaque worker
+ANALYSIS_INFERENCE = {
+    'socket': config('ANALYSIS_INFERENCE_SOCKET', default=''),
+    'max_batch': config('ANALYSIS_INFERENCE_MAX_BATCH', default=16, cast=int),
+    'max_wait_ms': config('ANALYSIS_INFERENCE_MAX_WAIT_MS', default=5, cast=int),
+    'timeout': 30,
+}
+
+# Micro-batching des appels concurrents au pipeline texte local (sentiment, mots-clés, thèmes)
+ANALYSIS_TEXT_BATCHING = {
+    'enabled': config('ANALYSIS_TEXT_BATCHING_ENABLED', default=True, cast=bool),
+    'max_batch': 16,              # Textes par passe du modèle
+    'max_wait_ms': 5,             # Attente maximale pour compléter un lot
+}
+
+# Mode "CPU rapide" : quantification int8 dynamique des modèles sentiment et embeddings,
+# poids quantifiés mis en cache dans BASE_DIR/.cache (jamais sous MEDIA_ROOT) ; threads PyTorch = cœurs / workers si 'threads' vaut 0
+ANALYSIS_FAST_CPU = {
+    'enabled': config('ANALYSIS_FAST_CPU', default=False, cast=bool),
+    'threads': config('ANALYSIS_TORCH_THREADS', default=0, cast=int),
+}
+
+# Extraction des thèmes (spaCy nlp.pipe) ; plusieurs processus pour les gros lots (backfills)
+ANALYSIS_TOPICS = {
+    'n_process': config('ANALYSIS_TOPICS_PROCESSES', default=1, cast=int),
+    'batch_size': 64,
+}
+
+# Résumé map-reduce des longs textes et transcriptions (découpage par phrases, résumés de passages en cache)
+ANALYSIS_SUMMARIZATION = {
+    'chunk_tokens': 700,
+    'max_prompt_tokens': config('ANALYSIS_MAX_PROMPT_TOKENS', default=6000, cast=int),
+    'concurrency': config('ANALYSIS_SUMMARY_CONCURRENCY', default=4, cast=int),
+    'local_batch_size': config('ANALYSIS_SUMMARY_LOCAL_BATCH_SIZE', default=8, cast=int),  # Morceaux par passe de mbart (mémoire)
+}
+
+# Statistiques du tableau de bord (recalcul des agrégats, bilans mensuels) : pipelines
+# d'agrégation MongoDB si la base est djongo, sinon calcul Python
+DASHBOARD_ANALYTIQUE = {
+    'backend': config('DASHBOARD_ANALYTIQUE_BACKEND', default='auto'),  # mongo, python ou auto
+}
+
+# Cache des réponses des vues en lecture (données du tableau de bord, bilans, recommandations,
+# communication) : clé par utilisateur et version de ses données, incrémentée à chaque écriture.
+# Les versions sont en base (VersionDonnees), communes à tous les processus ; les réponses sont
+# en 'locmem' (mémoire de chaque processus) ou 'file' (fichiers partagés par les workers de la machine)
+RESPONSE_CACHE_BACKEND = config('RESPONSE_CACHE_BACKEND', default='locmem')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        'BACKEND': (
+            'django.core.cache.backends.filebased.FileBasedCache' if RESPONSE_CACHE_BACKEND == 'file'
+            else 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': (
+            config('RESPONSE_CACHE_DIR', default=os.path.join(BASE_DIR, '.cache', 'responses'))
+            if RESPONSE_CACHE_BACKEND == 'file' else 'mindscribe-responses'
+        ),
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+RESPONSE_CACHE = {
+    'enabled': config('RESPONSE_CACHE_ENABLED', default=True, cast=bool),
+    'alias': 'responses',
+    'timeout': 3600,
+}
+
 DEBUG = True
\ No newline at end of file
@@ -0,0 +1,408 @@
+"""
+Request coalescing and rate limiting of the expensive (LLM) endpoints.
+
+They are shared by the gunicorn workers of a host through a small SQLite file (the main
+database is MongoDB, through djongo, which offers no atomic conditional update):
+
+- single flight: identical requests of the same user (same content hash) in flight at
+  the same time share one upstream call. The first request leads and runs the call; the
+  others wait for its result. A finished result is still served for `result_ttl`
+  seconds, which absorbs double-clicks and client retries. A leader that died is
+  replaced once its lease expires.
+- counters: fixed-window quotas, such as the entries of batch analyses per user.
+- token buckets: one per user and scope, and one per upstream provider for everybody.
+  A call needs a token from both; when either is empty, RateLimited carries the number
+  of seconds until a token is available (the Retry-After of the 429 response).
+  Requests served by coalescing do not consume tokens.
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+
+from django.conf import settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_THROTTLE_CONFIG = {
+    'enabled': True,
+    'db_path': '',              # SQLite file shared by the workers; '' = <tmp>/mindscribe-throttle.sqlite3
+    'user_rate': 0.2,           # Tokens per second per user and scope (12 calls/minute)
+    'user_burst': 5,            # Bucket size per user and scope
+    'provider_rate': 2.0,       # Tokens per second per upstream provider, all users included
+    'provider_burst': 20,       # Bucket size per provider
+    'lease': 120,               # Seconds before the call of a silent leader is taken over
+    'result_ttl': 10,           # Seconds a finished result is served to identical requests
+    'poll_interval': 0.1,       # Seconds between two checks of a waiting request
+}
+
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class RateLimited(Exception):
+    """
+    Raised when a user or an upstream provider has no token left.
+    """
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self):
+        return str(max(1, int(self.retry_after + 0.999)))
+
+
+class CoalescedCallFailed(Exception):
+    """
+    Raised to the requests that waited for a leader whose call failed.
+    """
+
+
+def get_throttle_config():
+    """
+    Return the throttling configuration merged with the THROTTLING setting.
+    """
+    config = dict(DEFAULT_THROTTLE_CONFIG)
+    config.update(getattr(settings, 'THROTTLING', {}))
+    if not config['db_path']:
+        config['db_path'] = os.path.join(tempfile.gettempdir(), 'mindscribe-throttle.sqlite3')
+    return config
+
+
+def request_key(scope, user_key, *parts):
+    """
+    Return the key identifying identical requests of a user.
+    """
+    hasher = hashlib.sha256()
+    for part in (scope, user_key) + parts:
+        encoded = str(part if part is not None else '').encode('utf-8')
+        hasher.update(f"{len(encoded)}:".encode('utf-8'))
+        hasher.update(encoded)
+    return hasher.hexdigest()
+
+
+class ThrottleStore:
+    """
+    Token buckets, quota counters and single-flight entries in a SQLite file shared by the processes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Autocommit mode: transactions are opened explicitly with BEGIN IMMEDIATE
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS flights (key TEXT PRIMARY KEY, owner TEXT NOT NULL, status TEXT NOT NULL, "
+                "result TEXT, expires_at REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS counters (key TEXT PRIMARY KEY, used INTEGER NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._local.connection = connection
+        return connection
+
+    def _transaction(self, work):
+        """
+        Run work(connection) in a write transaction, serialized across processes.
+        """
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            result = work(connection)
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+        return result
+
+    def take(self, buckets, cost=1.0):
+        """
+        Take cost tokens from every bucket, or from none of them.
+
+        Args:
+            buckets (list): (key, rate per second, capacity) tuples
+            cost (float): Tokens taken from each bucket
+
+        Returns:
+            float: 0 if the tokens were taken, else the seconds until they are available
+        """
+        def work(connection):
+            now = time.time()
+            levels = []
+            wait = 0.0
+            for key, rate, capacity in buckets:
+                row = connection.execute("SELECT tokens, updated_at FROM buckets WHERE key = ?", (key,)).fetchone()
+                tokens = capacity if row is None else min(capacity, row[0] + (now - row[1]) * rate)
+                if tokens < cost:
+                    wait = max(wait, (cost - tokens) / rate if rate > 0 else 60.0)
+                levels.append((key, tokens))
+            if wait:
+                return wait
+            for key, tokens in levels:
+                connection.execute(
+                    "INSERT OR REPLACE INTO buckets (key, tokens, updated_at) VALUES (?, ?, ?)",
+                    (key, tokens - cost, now)
+                )
+            return 0.0
+
+        return self._transaction(work)
+
+    def reserve(self, key, requested, limit, expires_at):
+        """
+        Add up to `requested` units to a counter without going over limit.
+
+        A negative `requested` gives units back. The counter starts again from zero once
+        expires_at has passed (fixed windows).
+
+        Returns:
+            int: The number of units added (or given back)
+        """
+        def work(connection):
+            now = time.time()
+            row = connection.execute("SELECT used, expires_at FROM counters WHERE key = ?", (key,)).fetchone()
+            used = row[0] if row is not None and row[1] > now else 0
+            granted = max(-used, min(requested, limit - used))
+            connection.execute("DELETE FROM counters WHERE expires_at <= ?", (now,))
+            connection.execute(
+                "INSERT OR REPLACE INTO counters (key, used, expires_at) VALUES (?, ?, ?)",
+                (key, used + granted, expires_at)
+            )
+            return granted
+
+        return self._transaction(work)
+
+    def claim(self, key, owner, lease):
+        """
+        Become the leader of a call, or return the entry of the current one.
+
+        Returns:
+            tuple: (status, result) of the live entry, or None if owner is now the leader
+        """
+        def work(connection):
+            now = time.time()
+            row = connection.execute("SELECT status, result, expires_at FROM flights WHERE key = ?", (key,)).fetchone()
+            if row is not None and row[2] > now and row[0] != FAILED:
+                return row[0], row[1]
+            connection.execute("DELETE FROM flights WHERE expires_at <= ?", (now,))
+            connection.execute(
+                "INSERT OR REPLACE INTO flights (key, owner, status, result, expires_at) VALUES (?, ?, ?, NULL, ?)",
+                (key, owner, RUNNING, now + lease)
+            )
+            return None
+
+        return self._transaction(work)
+
+    def get(self, key):
+        row = self._connection().execute(
+            "SELECT owner, status, result, expires_at FROM flights WHERE key = ?", (key,)
+        ).fetchone()
+        return row
+
+    def finish(self, key, owner, status, result, ttl):
+        """
+        Publish the outcome of a call led by owner.
+        """
+        self._transaction(lambda connection: connection.execute(
+            "UPDATE flights SET status = ?, result = ?, expires_at = ? WHERE key = ? AND owner = ?",
+            (status, result, time.time() + ttl, key, owner)
+        ))
+
+    def release(self, key, owner):
+        self._transaction(lambda connection: connection.execute(
+            "DELETE FROM flights WHERE key = ? AND owner = ?", (key, owner)
+        ))
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(config=None):
+    """
+    Return the throttle store of the configured SQLite file.
+    """
+    config = config or get_throttle_config()
+    with _stores_lock:
+        store = _stores.get(config['db_path'])
+        if store is None:
+            store = _stores[config['db_path']] = ThrottleStore(config['db_path'])
+    return store
+
+
+def _take_tokens(store, scope, user_key, provider, config):
+    buckets = [(f"user:{scope}:{user_key}", config['user_rate'], config['user_burst'])]
+    if provider:
+        buckets.append((f"provider:{provider}", config['provider_rate'], config['provider_burst']))
+    wait = store.take(buckets)
+    if wait:
+        raise RateLimited(f"Too many requests, retry in {wait:.1f}s", wait)
+
+
+def _wait_for_leader(store, key, config):
+    """
+    Wait for the leader of key; return its result, or None if the leader disappeared.
+    """
+    while True:
+        row = store.get(key)
+        if row is None:
+            return None
+        owner, status, result, expires_at = row
+        if status == DONE:
+            return json.loads(result)
+        if status == FAILED:
+            raise CoalescedCallFailed(json.loads(result))
+        if expires_at <= time.time():
+            logger.warning(f"Leader {owner} of a coalesced call stopped responding, taking over")
+            return None
+        time.sleep(config['poll_interval'])
+
+
+def throttled_call(scope, user_key, content_key, func, provider='openrouter', rate_scope=None):
+    """
+    Run an expensive call once per identical request and within the rate limits.
+
+    Args:
+        scope (str): The endpoint, e.g. 'analyse' or 'assistant'
+        user_key (str): The user ID (or client IP for anonymous requests)
+        content_key (str): A hash of the request content
+        func (callable): The call; its result must be JSON serializable (default=str)
+        provider (str, optional): The upstream provider whose global bucket is used
+        rate_scope (str, optional): The user bucket, shared by the endpoints calling the
+            same upstream work; defaults to scope
+
+    Returns:
+        The result of func, or of the identical request that ran it
+
+    Raises:
+        RateLimited: If the user or the provider has no token left
+        CoalescedCallFailed: If the identical request this one waited for failed
+    """
+    config = get_throttle_config()
+    if not config['enabled']:
+        return func()
+
+    store = get_store(config)
+    key = request_key(scope, user_key, content_key)
+    owner = uuid.uuid4().hex
+    while True:
+        entry = store.claim(key, owner, config['lease'])
+        if entry is None:
+            break
+        status, result = entry
+        if status == DONE:
+            logger.info(f"Serving a recent identical {scope} request from its result")
+            return json.loads(result)
+        result = _wait_for_leader(store, key, config)
+        if result is not None:
+            logger.info(f"Coalesced an identical in-flight {scope} request")
+            return result
+
+    try:
+        _take_tokens(store, rate_scope or scope, user_key, provider, config)
+    except RateLimited:
+        store.release(key, owner)
+        raise
+
+    try:
+        result = func()
+    except Exception as e:
+        store.finish(key, owner, FAILED, json.dumps(str(e)), config['poll_interval'] * 10)
+        raise
+    store.finish(key, owner, DONE, json.dumps(result, ensure_ascii=False, default=str), config['result_ttl'])
+    return result
+
+
+def _lead_stream(store, key, owner, func, config):
+    """
+    Stream the items of func() and publish its return value to identical requests.
+    """
+    try:
+        result = yield from func()
+    except GeneratorExit:
+        # The client went away: an identical request takes the call over
+        store.release(key, owner)
+        raise
+    except Exception as e:
+        store.finish(key, owner, FAILED, json.dumps(str(e)), config['poll_interval'] * 10)
+        raise
+    store.finish(key, owner, DONE, json.dumps(result, ensure_ascii=False, default=str), config['result_ttl'])
+    return result
+
+
+def _follow_stream(scope, user_key, content_key, func, provider, rate_scope, store, key, entry, config):
+    """
+    Wait for the leader of an identical request and return its result, streaming nothing.
+    """
+    status, result = entry
+    if status == DONE:
+        logger.info(f"Serving a recent identical {scope} request from its result")
+        return json.loads(result)
+    result = _wait_for_leader(store, key, config)
+    if result is not None:
+        logger.info(f"Coalesced an identical in-flight {scope} request")
+        return result
+    # The leader disappeared: run the call as a new request
+    return (yield from throttled_stream(scope, user_key, content_key, func, provider, rate_scope))
+
+
+def throttled_stream(scope, user_key, content_key, func, provider='openrouter', rate_scope=None):
+    """
+    Streamed version of throttled_call.
+
+    The rate limits are checked at once, so RateLimited is raised before anything is
+    streamed. func() is a generator: its items are streamed to the request running the
+    call and its return value is the result. Identical requests in flight wait for that
+    result instead, and stream nothing.
+
+    Args:
+        scope (str): The endpoint, e.g. 'analyse-stream'
+        user_key (str): The user ID (or client IP for anonymous requests)
+        content_key (str): A hash of the request content
+        func (callable): Returns the generator; its return value must be JSON serializable
+        provider (str, optional): The upstream provider whose global bucket is used
+        rate_scope (str, optional): The user bucket, defaults to scope
+
+    Returns:
+        generator: Use `result = yield from throttled_stream(...)`
+
+    Raises:
+        RateLimited: If the user or the provider has no token left
+    """
+    config = get_throttle_config()
+    if not config['enabled']:
+        return func()
+
+    store = get_store(config)
+    key = request_key(scope, user_key, content_key)
+    owner = uuid.uuid4().hex
+    entry = store.claim(key, owner, config['lease'])
+    if entry is not None:
+        return _follow_stream(scope, user_key, content_key, func, provider, rate_scope, store, key, entry, config)
+
+    try:
+        _take_tokens(store, rate_scope or scope, user_key, provider, config)
+    except RateLimited:
+        store.release(key, owner)
+        raise
+    return _lead_stream(store, key, owner, func, config)
+
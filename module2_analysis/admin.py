@@ -2,7 +2,7 @@
 Admin configuration for the module2_analysis app.
 """
 from django.contrib import admin
-from .models import JournalAnalysis
+from .models import JournalAnalysis, AnalysisCacheEntry, AnalysisJob, TranscriptCacheEntry
 
 
 @admin.register(JournalAnalysis)
@@ -30,3 +30,35 @@ class JournalAnalysisAdmin(admin.ModelAdmin):
         }),
     )
 
+
+
+@admin.register(AnalysisCacheEntry)
+class AnalysisCacheEntryAdmin(admin.ModelAdmin):
+    """
+    Admin configuration for the AnalysisCacheEntry model.
+    """
+    list_display = ('key', 'model_name', 'prompt_version', 'hits', 'created_at', 'last_accessed_at')
+    list_filter = ('model_name', 'prompt_version')
+    search_fields = ('key',)
+    readonly_fields = ('created_at', 'last_accessed_at', 'hits')
+
+
+@admin.register(TranscriptCacheEntry)
+class TranscriptCacheEntryAdmin(admin.ModelAdmin):
+    """
+    Admin configuration for the TranscriptCacheEntry model.
+    """
+    list_display = ('audio_sha256', 'hits', 'created_at', 'last_accessed_at')
+    search_fields = ('audio_sha256', 'transcript')
+    readonly_fields = ('created_at', 'last_accessed_at', 'hits')
+
+
+@admin.register(AnalysisJob)
+class AnalysisJobAdmin(admin.ModelAdmin):
+    """
+    Admin configuration for the AnalysisJob model.
+    """
+    list_display = ('id', 'user', 'status', 'attempts', 'created_at', 'finished_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('id', 'user__username', 'error')
+    readonly_fields = ('created_at', 'updated_at', 'started_at', 'finished_at', 'heartbeat_at')
@@ -1,8 +1,27 @@
 """
 App configuration for the module2_analysis app.
 """
+import os
+import sys
+
 from django.apps import AppConfig
 
+# Programs serving HTTP requests, whose processes run the embedded analysis workers
+SERVER_PROGRAMS = ('gunicorn', 'uwsgi', 'uvicorn', 'daphne')
+
+
+def serves_requests(argv=None, environ=None):
+    """
+    Whether the current process is a web server process rather than a management command.
+    """
+    argv = sys.argv if argv is None else argv
+    environ = os.environ if environ is None else environ
+    program = os.path.basename(argv[0]) if argv else ''
+    if any(program.startswith(server) for server in SERVER_PROGRAMS):
+        return True
+    # runserver: only the child process started by the autoreloader serves requests
+    return argv[1:2] == ['runserver'] and (environ.get('RUN_MAIN') == 'true' or '--noreload' in argv)
+
 
 class Module2AnalysisConfig(AppConfig):
     """
@@ -21,3 +40,7 @@ class Module2AnalysisConfig(AppConfig):
         # Note: This is commented out to avoid loading models during testing
         # from . import services
 
+        # Pick up the queued and stale analysis jobs right after a deploy or restart
+        if serves_requests():
+            from .jobs import start_embedded_workers
+            start_embedded_workers()
@@ -0,0 +1,271 @@
+"""
+Batch analysis of many journal entries in one request.
+
+Entries are validated one by one, their media written to a batch directory, then analyzed
+by a bounded thread pool; each outcome is handed back as soon as it finishes, so the view
+can stream it as one NDJSON line. An invalid or failing entry is reported in its own line
+without failing the rest of the batch.
+
+The request holds a (sync) gunicorn worker, so entries not started before `deadline` are
+reported as `timeout` instead of being analyzed: with the model router deadline, the last
+entries still finish before gunicorn's timeout kills the worker.
+
+A per-user quota (entries per time window, counted in the throttle store shared by the
+workers) keeps a single user from monopolizing the OpenRouter budget: entries beyond the
+quota are reported as `rate_limited` with the delay after which they can be resubmitted.
+"""
+import base64
+import logging
+import os
+import shutil
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout, as_completed
+
+from django.conf import settings
+from django.core.files import File
+from django.db import connection
+
+from mindscribe.throttling import get_store
+
+from .serializers import AnalysisRequestSerializer
+from .services import analyze_multimodal_content, save_journal_analysis
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_CONFIG = {
+    'max_items': 50,        # Entries accepted in one request
+    'concurrency': 4,       # Entries analyzed at once for a batch
+    'rate_limit': 100,      # Entries a user may submit per window
+    'rate_window': 3600,    # Seconds
+    'deadline': 60,         # Seconds after which entries not yet started are given up
+}
+
+BATCH_DIRECTORY = 'analysis_batches'
+
+STATUS_OK = 'ok'
+STATUS_ERROR = 'error'
+STATUS_INVALID = 'invalid'
+STATUS_RATE_LIMITED = 'rate_limited'
+STATUS_TIMEOUT = 'timeout'
+
+
+def get_batch_config():
+    """
+    Return the batch analysis configuration merged with the ANALYSIS_BATCH setting.
+    """
+    config = dict(DEFAULT_BATCH_CONFIG)
+    config.update(getattr(settings, 'ANALYSIS_BATCH', {}))
+    return config
+
+
+def reserve_quota(user_key, requested, config=None):
+    """
+    Reserve up to `requested` entries of a user's quota for the current window.
+
+    Args:
+        user_key (str): The user ID, or the client address for anonymous requests
+        requested (int): The number of entries to analyze
+        config (dict, optional): Batch settings, defaults to get_batch_config()
+
+    Returns:
+        tuple: (number of entries granted, seconds until the window resets)
+    """
+    config = config or get_batch_config()
+    window = config['rate_window']
+    now = time.time()
+    window_start = int(now // window) * window
+    retry_after = max(1, int(window_start + window - now))
+    key = f"analysis-batch-quota:{user_key}:{window_start}"
+
+    granted = get_store().reserve(key, requested, config['rate_limit'], window_start + window)
+    return granted, retry_after
+
+
+def release_quota(user_key, count, config=None):
+    """
+    Give back quota reserved for entries that were not analyzed.
+    """
+    config = config or get_batch_config()
+    window = config['rate_window']
+    window_start = int(time.time() // window) * window
+    key = f"analysis-batch-quota:{user_key}:{window_start}"
+    get_store().reserve(key, -count, config['rate_limit'], window_start + window)
+
+
+def _write_media(directory, data, filename):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, os.path.basename(filename))
+    with open(path, 'wb') as f:
+        f.write(base64.b64decode(data))
+    return path
+
+
+def prepare_entries(raw_entries, directory):
+    """
+    Validate batch entries and write their base64 media to disk.
+
+    Each entry accepts the JSON fields of the single analysis endpoint (text, audio_data,
+    audio_filename, image_data, image_filename) and an optional client `id` echoed back.
+
+    Returns:
+        tuple: (list of runnable entry dicts, list of invalid item reports)
+    """
+    entries = []
+    invalid = []
+    for index, raw in enumerate(raw_entries):
+        item_id = raw.get('id') if isinstance(raw, dict) else None
+        serializer = AnalysisRequestSerializer(data=raw if isinstance(raw, dict) else {})
+        if not serializer.is_valid():
+            invalid.append({'index': index, 'id': item_id, 'status': STATUS_INVALID, 'error': serializer.errors})
+            continue
+
+        data = serializer.validated_data
+        entry_directory = os.path.join(directory, str(index))
+        entry = {'index': index, 'id': item_id, 'text': data.get('text') or '', 'audio_path': None, 'image_path': None}
+        try:
+            if data.get('audio_data'):
+                entry['audio_path'] = _write_media(entry_directory, data['audio_data'], data.get('audio_filename') or 'audio.wav')
+            if data.get('image_data'):
+                entry['image_path'] = _write_media(entry_directory, data['image_data'], data.get('image_filename') or 'image.jpg')
+        except (ValueError, TypeError) as e:
+            invalid.append({'index': index, 'id': item_id, 'status': STATUS_INVALID, 'error': f"Invalid media data: {e}"})
+            continue
+        entries.append(entry)
+    return entries, invalid
+
+
+def _analyze_entry(entry):
+    try:
+        return analyze_multimodal_content(
+            text=entry['text'] or None,
+            audio_path=entry['audio_path'],
+            image_path=entry['image_path']
+        )
+    finally:
+        # Worker threads open their own database connection (result cache)
+        connection.close()
+
+
+def _save(user, entry, results):
+    audio_file = open(entry['audio_path'], 'rb') if entry['audio_path'] else None
+    image_file = open(entry['image_path'], 'rb') if entry['image_path'] else None
+    try:
+        journal_analysis = save_journal_analysis(
+            user,
+            entry['text'],
+            results,
+            audio_file=File(audio_file, name=os.path.basename(entry['audio_path'])) if audio_file else None,
+            image_file=File(image_file, name=os.path.basename(entry['image_path'])) if image_file else None
+        )
+    finally:
+        for f in (audio_file, image_file):
+            if f:
+                f.close()
+    return str(journal_analysis.id)
+
+
+def _report(future, entry, user, save):
+    report = {'index': entry['index'], 'id': entry['id']}
+    try:
+        results = future.result()
+        if save and user is not None:
+            results['analysis_id'] = _save(user, entry, results)
+        report.update(status=STATUS_OK, result=results)
+    except Exception as e:
+        logger.error(f"Batch entry {entry['index']} failed: {e}")
+        report.update(status=STATUS_ERROR, error=str(e))
+    return report
+
+
+def analyze_batch(raw_entries, user=None, user_key=None, save=True, config=None):
+    """
+    Analyze a list of entries with bounded concurrency, yielding each outcome as it finishes.
+
+    Args:
+        raw_entries (list): The entry dicts of the request
+        user (User, optional): The user the analyses are saved for
+        user_key (str, optional): The rate limit key, defaults to the user ID
+        save (bool): Whether to save a JournalAnalysis for each successful entry
+        config (dict, optional): Batch settings, defaults to get_batch_config()
+
+    Yields:
+        dict: One report per entry ({'index', 'id', 'status', 'result' or 'error'}),
+              entries given up at the deadline having the `timeout` status,
+              then a final {'summary': {...}} with the counts per status
+    """
+    config = config or get_batch_config()
+    started = time.perf_counter()
+    counts = {STATUS_OK: 0, STATUS_ERROR: 0, STATUS_INVALID: 0, STATUS_RATE_LIMITED: 0, STATUS_TIMEOUT: 0}
+    directory = os.path.join(settings.MEDIA_ROOT, BATCH_DIRECTORY, uuid.uuid4().hex)
+
+    try:
+        entries, invalid = prepare_entries(raw_entries, directory)
+        for report in invalid:
+            counts[STATUS_INVALID] += 1
+            yield report
+
+        key = user_key or (str(user.id) if user is not None else 'anonymous')
+        granted, retry_after = reserve_quota(key, len(entries), config)
+        for entry in entries[granted:]:
+            counts[STATUS_RATE_LIMITED] += 1
+            yield {
+                'index': entry['index'],
+                'id': entry['id'],
+                'status': STATUS_RATE_LIMITED,
+                'error': "Batch analysis quota exceeded",
+                'retry_after': retry_after,
+            }
+        entries = entries[:granted]
+
+        if entries:
+            workers = max(1, min(config['concurrency'], len(entries)))
+            executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='analysis-batch')
+            futures = {executor.submit(_analyze_entry, entry): entry for entry in entries}
+            remaining = set(futures)
+            try:
+                try:
+                    for future in as_completed(futures, timeout=max(0, started + config['deadline'] - time.perf_counter())):
+                        remaining.discard(future)
+                        report = _report(future, futures[future], user, save)
+                        counts[report['status']] += 1
+                        yield report
+                except FuturesTimeout:
+                    given_up = [future for future in remaining if future.cancel()]
+                    remaining.difference_update(given_up)
+                    logger.warning(f"Batch deadline reached, giving up {len(given_up)} entries not yet started")
+                    release_quota(key, len(given_up), config)
+                    for future in given_up:
+                        entry = futures[future]
+                        counts[STATUS_TIMEOUT] += 1
+                        yield {
+                            'index': entry['index'],
+                            'id': entry['id'],
+                            'status': STATUS_TIMEOUT,
+                            'error': "Batch deadline reached before this entry was analyzed, resubmit it",
+                        }
+                    # Entries already running are short (model router deadline): wait for them
+                    for future in as_completed(set(remaining)):
+                        remaining.discard(future)
+                        report = _report(future, futures[future], user, save)
+                        counts[report['status']] += 1
+                        yield report
+            finally:
+                # The client went away (GeneratorExit) or the batch failed: do not keep the
+                # worker until the entries nobody will read are analyzed
+                abandoned = [future for future in remaining if future.cancel()]
+                if abandoned:
+                    logger.warning(f"Batch interrupted, cancelling {len(abandoned)} entries not yet started")
+                    release_quota(key, len(abandoned), config)
+                executor.shutdown(wait=False)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    yield {
+        'summary': dict(
+            counts,
+            total=len(raw_entries),
+            elapsed=round(time.perf_counter() - started, 3),
+        )
+    }
@@ -0,0 +1,328 @@
+"""
+Content-addressed cache for multimodal analysis results.
+
+Results are keyed on a SHA-256 of the normalized text, the raw audio and image bytes,
+the model name and the prompt version, so re-analyzing identical content (e.g. saving
+an edited entry without changes) is served from the database instead of OpenRouter.
+
+Audio transcripts are cached separately, keyed on the audio's SHA-256 and the
+transcription config, so an unchanged recording is never sent to the STT service twice
+even when the accompanying text changed.
+"""
+import hashlib
+import json
+import logging
+import threading
+import unicodedata
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import AnalysisCacheEntry, TranscriptCacheEntry
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_CONFIG = {
+    'enabled': True,
+    'ttl': 7 * 24 * 3600,     # Seconds before an entry is considered stale
+    'max_entries': 5000,      # Least recently used entries are evicted past this size
+    'max_transcripts': 20000, # Same for transcripts (they never expire)
+}
+
+# Size of the chunks used when hashing media files
+HASH_CHUNK_SIZE = 64 * 1024
+
+# Per-process counters (the persistent per-entry hit count lives in the database)
+_stats_lock = threading.Lock()
+_stats = {
+    'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0,
+    'transcript_hits': 0, 'transcript_misses': 0, 'transcript_stores': 0,
+}
+
+
+def get_cache_config():
+    """
+    Return the cache configuration merged with the ANALYSIS_RESULT_CACHE setting.
+    """
+    config = dict(DEFAULT_CACHE_CONFIG)
+    config.update(getattr(settings, 'ANALYSIS_RESULT_CACHE', {}))
+    return config
+
+
+def _increment(counter, amount=1):
+    with _stats_lock:
+        _stats[counter] += amount
+
+
+def normalize_text(text):
+    """
+    Normalize text so that cosmetic differences (unicode form, whitespace) hash identically.
+
+    Args:
+        text (str): The text to normalize
+
+    Returns:
+        str: The normalized text
+    """
+    if not text:
+        return ''
+    text = unicodedata.normalize('NFC', text)
+    return ' '.join(text.split())
+
+
+def update_hash_with_file(hasher, path):
+    """
+    Feed a file into a hashlib object in fixed-size chunks.
+    """
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            hasher.update(chunk)
+
+
+def hash_file(path):
+    """
+    Return the hex SHA-256 of a file, read in fixed-size chunks.
+    """
+    hasher = hashlib.sha256()
+    update_hash_with_file(hasher, path)
+    return hasher.hexdigest()
+
+
+def compute_cache_key(text=None, audio_path=None, image_path=None, model_name='', prompt_version=''):
+    """
+    Compute the content hash identifying an analysis request.
+
+    Args:
+        text (str, optional): The text to analyze
+        audio_path (str, optional): The path to the audio file
+        image_path (str, optional): The path to the image file
+        model_name (str): The model that will produce the analysis
+        prompt_version (str): The version of the analysis prompt
+
+    Returns:
+        str: A hex SHA-256 digest
+    """
+    hasher = hashlib.sha256()
+    for label, value in (('model', model_name), ('prompt', prompt_version), ('text', normalize_text(text))):
+        encoded = (value or '').encode('utf-8')
+        hasher.update(f"{label}:{len(encoded)}:".encode('utf-8'))
+        hasher.update(encoded)
+
+    # Media files are hashed separately and labelled, so the same bytes
+    # submitted as audio or as an image produce different keys
+    for label, path in (('audio', audio_path), ('image', image_path)):
+        if path:
+            hasher.update(f"{label}:{hash_file(path)}".encode('utf-8'))
+        else:
+            hasher.update(f"{label}:-".encode('utf-8'))
+
+    return hasher.hexdigest()
+
+
+def get_cached_result(key):
+    """
+    Look up a cached analysis result.
+
+    Args:
+        key (str): The content hash returned by compute_cache_key()
+
+    Returns:
+        dict: The cached result, or None on a miss
+    """
+    config = get_cache_config()
+    if not config['enabled']:
+        return None
+
+    try:
+        entry = AnalysisCacheEntry.objects.filter(key=key).first()
+    except Exception as e:
+        logger.error(f"Error reading analysis cache: {e}")
+        return None
+
+    if entry is None:
+        _increment('misses')
+        return None
+
+    now = timezone.now()
+    if entry.created_at < now - timedelta(seconds=config['ttl']):
+        logger.info(f"Analysis cache entry {key[:12]} expired")
+        entry.delete()
+        _increment('misses')
+        return None
+
+    entry.hits += 1
+    entry.last_accessed_at = now
+    entry.save(update_fields=['hits', 'last_accessed_at'])
+    _increment('hits')
+    logger.info(f"Analysis cache hit for {key[:12]}")
+    return entry.result
+
+
+def store_result(key, result, model_name='', prompt_version=''):
+    """
+    Store an analysis result and evict stale or least recently used entries.
+
+    Args:
+        key (str): The content hash returned by compute_cache_key()
+        result (dict): The analysis result to cache
+        model_name (str): The model that produced the result
+        prompt_version (str): The version of the analysis prompt
+    """
+    config = get_cache_config()
+    if not config['enabled']:
+        return
+
+    now = timezone.now()
+    try:
+        AnalysisCacheEntry.objects.update_or_create(
+            key=key,
+            defaults={
+                'result': result,
+                'model_name': model_name,
+                'prompt_version': prompt_version,
+                'created_at': now,
+                'last_accessed_at': now,
+            }
+        )
+        _increment('stores')
+        evict(config)
+    except Exception as e:
+        logger.error(f"Error writing analysis cache: {e}")
+
+
+def evict(config=None):
+    """
+    Remove expired entries, then the least recently used ones beyond max_entries.
+
+    Returns:
+        int: The number of evicted entries
+    """
+    config = config or get_cache_config()
+    cutoff = timezone.now() - timedelta(seconds=config['ttl'])
+    evicted, _ = AnalysisCacheEntry.objects.filter(created_at__lt=cutoff).delete()
+
+    overflow = AnalysisCacheEntry.objects.count() - config['max_entries']
+    if overflow > 0:
+        stale_ids = list(
+            AnalysisCacheEntry.objects.order_by('last_accessed_at').values_list('id', flat=True)[:overflow]
+        )
+        deleted, _ = AnalysisCacheEntry.objects.filter(id__in=stale_ids).delete()
+        evicted += deleted
+
+    if evicted:
+        _increment('evictions', evicted)
+        logger.info(f"Evicted {evicted} analysis cache entries")
+    return evicted
+
+
+def compute_transcript_key(audio_sha256, transcription_config):
+    """
+    Compute the key identifying a transcript: the audio hash plus the transcription config.
+    """
+    config_json = json.dumps(transcription_config, sort_keys=True)
+    return hashlib.sha256(f"{audio_sha256}:{config_json}".encode('utf-8')).hexdigest()
+
+
+def get_cached_transcript(audio_sha256, transcription_config):
+    """
+    Look up the transcript of an audio file.
+
+    Args:
+        audio_sha256 (str): The SHA-256 of the audio file, see hash_file()
+        transcription_config (dict): The provider and options used to transcribe
+
+    Returns:
+        str: The cached transcript, or None on a miss
+    """
+    if not get_cache_config()['enabled']:
+        return None
+
+    try:
+        entry = TranscriptCacheEntry.objects.filter(
+            key=compute_transcript_key(audio_sha256, transcription_config)
+        ).first()
+        if entry is None:
+            _increment('transcript_misses')
+            return None
+        entry.hits += 1
+        entry.last_accessed_at = timezone.now()
+        entry.save(update_fields=['hits', 'last_accessed_at'])
+    except Exception as e:
+        logger.error(f"Error reading transcript cache: {e}")
+        return None
+
+    _increment('transcript_hits')
+    logger.info(f"Transcript cache hit for audio {audio_sha256[:12]}")
+    return entry.transcript
+
+
+def store_transcript(audio_sha256, transcription_config, transcript):
+    """
+    Store the transcript of an audio file and evict the least recently used transcripts.
+
+    Args:
+        audio_sha256 (str): The SHA-256 of the audio file, see hash_file()
+        transcription_config (dict): The provider and options used to transcribe
+        transcript (str): The transcript
+    """
+    config = get_cache_config()
+    if not config['enabled'] or not transcript:
+        return
+
+    now = timezone.now()
+    try:
+        TranscriptCacheEntry.objects.update_or_create(
+            key=compute_transcript_key(audio_sha256, transcription_config),
+            defaults={
+                'audio_sha256': audio_sha256,
+                'transcription_config': transcription_config,
+                'transcript': transcript,
+                'created_at': now,
+                'last_accessed_at': now,
+            }
+        )
+        _increment('transcript_stores')
+
+        overflow = TranscriptCacheEntry.objects.count() - config['max_transcripts']
+        if overflow > 0:
+            stale_ids = list(
+                TranscriptCacheEntry.objects.order_by('last_accessed_at').values_list('id', flat=True)[:overflow]
+            )
+            deleted, _ = TranscriptCacheEntry.objects.filter(id__in=stale_ids).delete()
+            _increment('evictions', deleted)
+    except Exception as e:
+        logger.error(f"Error writing transcript cache: {e}")
+
+
+def clear_cache():
+    """
+    Delete every cached analysis result and transcript.
+    """
+    AnalysisCacheEntry.objects.all().delete()
+    TranscriptCacheEntry.objects.all().delete()
+
+
+def cache_stats():
+    """
+    Return hit/miss counters for this process along with persistent cache totals.
+
+    Returns:
+        dict: Cache statistics
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+    transcript_lookups = stats['transcript_hits'] + stats['transcript_misses']
+    stats['transcript_hit_ratio'] = round(stats['transcript_hits'] / transcript_lookups, 3) if transcript_lookups else 0.0
+    try:
+        stats['entries'] = AnalysisCacheEntry.objects.count()
+        stats['transcripts'] = TranscriptCacheEntry.objects.count()
+        stats['total_hits'] = AnalysisCacheEntry.objects.aggregate(total=Sum('hits'))['total'] or 0
+    except Exception as e:
+        logger.error(f"Error reading analysis cache stats: {e}")
+    stats['config'] = get_cache_config()
+    return stats
@@ -0,0 +1,439 @@
+"""
+Database-backed job queue for multimodal analysis.
+
+Analysis requests are stored as AnalysisJob rows and processed by a small pool of worker
+threads running inside each web process (or by the `run_analysis_worker` management
+command), so no broker is required. Jobs are claimed with a conditional update, retried
+with exponential backoff, capped per user, and recovered from a stale heartbeat when the
+process running them died.
+"""
+import logging
+import os
+import shutil
+import socket
+import threading
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import close_old_connections, connection
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import AnalysisJob
+from .services import analyze_multimodal_content, enrich_journal_analysis, save_journal_analysis
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOB_CONFIG = {
+    'embedded': True,           # Run a worker pool inside each web process
+    'workers': 2,               # Worker threads per process
+    'per_user_limit': 1,        # Jobs of the same user running at once
+    'max_queued_per_user': 10,  # Pending jobs a user may have before being refused
+    'max_attempts': 3,          # Attempts before a job is marked as failed
+    'retry_delay': 10,          # Seconds before the first retry, doubled afterwards
+    'heartbeat_interval': 15,   # Seconds between heartbeats of a running job
+    'stale_after': 300,         # Seconds without heartbeat before a running job is recovered
+    'poll_interval': 2,         # Seconds an idle worker waits before looking for work
+}
+
+JOBS_DIRECTORY = 'analysis_jobs'
+
+
+class JobQueueFull(Exception):
+    """
+    Raised when a user already has too many pending analysis jobs.
+    """
+
+
+def get_job_config():
+    """
+    Return the job queue configuration merged with the ANALYSIS_JOBS setting.
+    """
+    config = dict(DEFAULT_JOB_CONFIG)
+    config.update(getattr(settings, 'ANALYSIS_JOBS', {}))
+    return config
+
+
+def _job_directory(job_id):
+    return os.path.join(settings.MEDIA_ROOT, JOBS_DIRECTORY, str(job_id))
+
+
+def _store_upload(directory, uploaded_file):
+    """
+    Copy an uploaded file into the job directory and return its path.
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, os.path.basename(uploaded_file.name))
+    with open(path, 'wb') as f:
+        for chunk in uploaded_file.chunks():
+            f.write(chunk)
+    return path
+
+
+def check_job_quota(user, config=None):
+    """
+    Refuse a new job when the user already has too many pending ones.
+
+    Raises:
+        JobQueueFull: If the user already has too many pending jobs
+    """
+    config = config or get_job_config()
+    if user is None:
+        return
+    pending = AnalysisJob.objects.filter(
+        user=user,
+        status__in=[AnalysisJob.STATUS_QUEUED, AnalysisJob.STATUS_RUNNING]
+    ).count()
+    if pending >= config['max_queued_per_user']:
+        raise JobQueueFull(f"Too many pending analyses ({pending}), please wait for them to finish")
+
+
+def enqueue_analysis(text=None, audio_file=None, image_file=None, user=None, analysis_id=None):
+    """
+    Queue a multimodal analysis.
+
+    Args:
+        text (str, optional): The text to analyze
+        audio_file (File, optional): The uploaded audio file
+        image_file (File, optional): The uploaded image file
+        user (User, optional): The user the resulting analysis is saved for
+        analysis_id (str, optional): An analysis already saved by the fast tier, which the
+            job enriches instead of creating a new one
+
+    Returns:
+        AnalysisJob: The queued job
+
+    Raises:
+        JobQueueFull: If the user already has too many pending jobs
+    """
+    config = get_job_config()
+    check_job_quota(user, config)
+
+    job_id = uuid.uuid4()
+    directory = _job_directory(job_id)
+    job = AnalysisJob(
+        id=job_id,
+        user=user,
+        text=text or '',
+        analysis_id=str(analysis_id or ''),
+        max_attempts=config['max_attempts'],
+    )
+    if audio_file:
+        job.audio_path = _store_upload(directory, audio_file)
+        job.audio_name = os.path.basename(audio_file.name)
+    if image_file:
+        job.image_path = _store_upload(directory, image_file)
+        job.image_name = os.path.basename(image_file.name)
+    job.save()
+
+    logger.info(f"Queued analysis job {job.id} for user {user.id if user else 'anonymous'}")
+    if config['embedded']:
+        get_worker_pool().wake()
+    return job
+
+
+def recover_stale_jobs(config=None):
+    """
+    Requeue running jobs whose worker stopped sending heartbeats (e.g. a killed process).
+
+    Returns:
+        int: The number of recovered jobs
+    """
+    config = config or get_job_config()
+    cutoff = timezone.now() - timedelta(seconds=config['stale_after'])
+    recovered = 0
+    for job in AnalysisJob.objects.filter(status=AnalysisJob.STATUS_RUNNING, heartbeat_at__lt=cutoff):
+        logger.warning(f"Recovering stale analysis job {job.id} from worker {job.worker_id}")
+        _record_failure(job, "Worker stopped responding", config)
+        recovered += 1
+    return recovered
+
+
+def _running_count(user_id):
+    return AnalysisJob.objects.filter(user_id=user_id, status=AnalysisJob.STATUS_RUNNING).count()
+
+
+def claim_next_job(worker_id, config=None):
+    """
+    Claim the oldest runnable job, respecting the per-user concurrency limit.
+
+    The database offers no update conditional on other rows, so the limit is checked
+    again once the job is claimed: a worker that finds the user over the limit (another
+    worker claimed a job of the same user meanwhile) gives its job back. Of two racing
+    workers, the later count sees both claims, so the limit is never exceeded (at worst
+    both give back and retry at the next poll).
+
+    Returns:
+        AnalysisJob: The claimed job, or None if there is nothing to run
+    """
+    config = config or get_job_config()
+    now = timezone.now()
+    candidates = AnalysisJob.objects.filter(
+        status=AnalysisJob.STATUS_QUEUED,
+        available_at__lte=now
+    ).order_by('created_at')[:20]
+
+    busy_users = {}
+    for job in candidates:
+        if job.user_id is not None:
+            if job.user_id not in busy_users:
+                busy_users[job.user_id] = _running_count(job.user_id)
+            if busy_users[job.user_id] >= config['per_user_limit']:
+                continue
+
+        # Only one worker can win the queued -> running transition
+        claimed = AnalysisJob.objects.filter(id=job.id, status=AnalysisJob.STATUS_QUEUED).update(
+            status=AnalysisJob.STATUS_RUNNING,
+            worker_id=worker_id,
+            attempts=job.attempts + 1,
+            started_at=now,
+            heartbeat_at=now,
+        )
+        if not claimed:
+            continue
+        if job.user_id is not None and _running_count(job.user_id) > config['per_user_limit']:
+            AnalysisJob.objects.filter(id=job.id, status=AnalysisJob.STATUS_RUNNING, worker_id=worker_id).update(
+                status=AnalysisJob.STATUS_QUEUED,
+                worker_id='',
+                attempts=job.attempts,
+                started_at=job.started_at,
+                heartbeat_at=job.heartbeat_at,
+            )
+            logger.info(f"User {job.user_id} reached its running job limit meanwhile, giving back job {job.id}")
+            busy_users[job.user_id] = config['per_user_limit']
+            continue
+        return AnalysisJob.objects.get(id=job.id)
+    return None
+
+
+def _cleanup_files(job):
+    shutil.rmtree(_job_directory(job.id), ignore_errors=True)
+
+
+def _record_failure(job, error_message, config):
+    """
+    Schedule a retry with exponential backoff, or mark the job as failed.
+    """
+    if job.attempts < job.max_attempts:
+        delay = config['retry_delay'] * 2 ** max(job.attempts - 1, 0)
+        AnalysisJob.objects.filter(id=job.id).update(
+            status=AnalysisJob.STATUS_QUEUED,
+            error=error_message,
+            available_at=timezone.now() + timedelta(seconds=delay),
+            worker_id='',
+        )
+        logger.warning(f"Analysis job {job.id} failed (attempt {job.attempts}), retrying in {delay}s: {error_message}")
+    else:
+        AnalysisJob.objects.filter(id=job.id).update(
+            status=AnalysisJob.STATUS_FAILED,
+            error=error_message,
+            finished_at=timezone.now(),
+        )
+        _cleanup_files(job)
+        logger.error(f"Analysis job {job.id} failed after {job.attempts} attempts: {error_message}")
+
+
+def _heartbeat(job_id, stop_event, interval):
+    try:
+        while not stop_event.wait(interval):
+            AnalysisJob.objects.filter(id=job_id, status=AnalysisJob.STATUS_RUNNING).update(heartbeat_at=timezone.now())
+    finally:
+        connection.close()
+
+
+def run_job(job, config=None):
+    """
+    Run a claimed job and record its outcome.
+    """
+    config = config or get_job_config()
+    stop_event = threading.Event()
+    heartbeat = threading.Thread(
+        target=_heartbeat,
+        args=(job.id, stop_event, config['heartbeat_interval']),
+        daemon=True
+    )
+    heartbeat.start()
+    try:
+        results = analyze_multimodal_content(
+            text=job.text or None,
+            audio_path=job.audio_path or None,
+            image_path=job.image_path or None
+        )
+
+        analysis_id = job.analysis_id
+        if analysis_id:
+            # The fast tier already saved the entry: the full analysis enriches it
+            enrich_journal_analysis(analysis_id, results)
+            results['analysis_id'] = analysis_id
+        elif job.user_id:
+            audio_file = open(job.audio_path, 'rb') if job.audio_path else None
+            image_file = open(job.image_path, 'rb') if job.image_path else None
+            try:
+                journal_analysis = save_journal_analysis(
+                    job.user,
+                    job.text,
+                    results,
+                    audio_file=File(audio_file, name=job.audio_name) if audio_file else None,
+                    image_file=File(image_file, name=job.image_name) if image_file else None
+                )
+            finally:
+                for f in (audio_file, image_file):
+                    if f:
+                        f.close()
+            analysis_id = str(journal_analysis.id)
+            results['analysis_id'] = analysis_id
+
+        AnalysisJob.objects.filter(id=job.id).update(
+            status=AnalysisJob.STATUS_SUCCEEDED,
+            result=results,
+            analysis_id=analysis_id,
+            error='',
+            finished_at=timezone.now(),
+        )
+        _cleanup_files(job)
+        logger.info(f"Analysis job {job.id} succeeded")
+    except Exception as e:
+        _record_failure(job, str(e), config)
+    finally:
+        stop_event.set()
+
+
+def run_next_job(worker_id=None, config=None):
+    """
+    Recover stale jobs, then claim and run the next runnable job.
+
+    Returns:
+        bool: True if a job was run
+    """
+    config = config or get_job_config()
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    recover_stale_jobs(config)
+    job = claim_next_job(worker_id, config)
+    if job is None:
+        return False
+    run_job(job, config)
+    return True
+
+
+class JobWorkerPool:
+    """
+    Pool of daemon threads processing analysis jobs in the current process.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.worker_prefix = f"{socket.gethostname()}:{os.getpid()}"
+        self._wake_event = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for index in range(self.size):
+                thread = threading.Thread(
+                    target=self._run,
+                    args=(f"{self.worker_prefix}:{index}",),
+                    name=f"analysis-worker-{index}",
+                    daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+            logger.info(f"Started {self.size} analysis worker threads")
+
+    def wake(self):
+        self.start()
+        self._wake_event.set()
+
+    def _run(self, worker_id):
+        config = get_job_config()
+        while True:
+            try:
+                config = get_job_config()
+                ran_job = run_next_job(worker_id, config)
+            except Exception as e:
+                logger.error(f"Analysis worker {worker_id} error: {e}")
+                ran_job = False
+            finally:
+                close_old_connections()
+
+            if not ran_job:
+                self._wake_event.wait(config['poll_interval'])
+                self._wake_event.clear()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_worker_pool():
+    """
+    Return the worker pool of this process, creating it on first use.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = JobWorkerPool(get_job_config()['workers'])
+    return _pool
+
+
+def start_embedded_workers(config=None):
+    """
+    Start the worker pool of this process when the queue runs embedded.
+
+    Called when a web process starts, so that jobs queued before a restart and jobs left
+    running by a dead process (recovered by the workers) do not wait for a new enqueue.
+
+    Returns:
+        JobWorkerPool: The started pool, or None if the queue is not embedded
+    """
+    config = config or get_job_config()
+    if not config['embedded']:
+        return None
+    pool = get_worker_pool()
+    pool.wake()
+    return pool
+
+
+def job_to_dict(job):
+    """
+    Serialize a job for the status endpoint.
+    """
+    data = {
+        'job_id': str(job.id),
+        'status': job.status,
+        'attempts': job.attempts,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
+    if job.status == AnalysisJob.STATUS_SUCCEEDED:
+        data['result'] = job.result
+        data['analysis_id'] = job.analysis_id or None
+    if job.error:
+        data['error'] = job.error
+    return data
+
+
+def job_queue_stats():
+    """
+    Return the number of jobs per status and the age of the oldest runnable job.
+    """
+    stats = {s: 0 for s, _ in AnalysisJob.STATUS_CHOICES}
+    try:
+        for row in AnalysisJob.objects.values('status').annotate(count=Count('id')):
+            stats[row['status']] = row['count']
+        oldest = AnalysisJob.objects.filter(
+            status=AnalysisJob.STATUS_QUEUED,
+            available_at__lte=timezone.now()
+        ).order_by('created_at').first()
+        stats['oldest_queued_seconds'] = round((timezone.now() - oldest.created_at).total_seconds(), 1) if oldest else 0
+    except Exception as e:
+        logger.error(f"Error reading analysis job stats: {e}")
+    stats['config'] = get_job_config()
+    return stats
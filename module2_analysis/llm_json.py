@@ -0,0 +1,403 @@
+"""
+Extraction, repair and validation of the JSON objects returned by language models.
+
+Models asked for "only JSON" still wrap it in ```json fences, add a sentence before or
+after it, leave trailing commas, use single quotes or Python literals, echo the `//`
+comments of the prompt template, or get cut off by max_tokens. Instead of retrying the
+whole completion, the answer is rewritten into strict JSON in a single left-to-right pass:
+the first object is located, copied up to its balanced closing brace, and repaired on the
+way. Strings are copied with precompiled regular expressions, so long answers cost one
+scan at C speed instead of several per-character Python loops.
+
+The parsed object is then checked against a small schema (see ANALYSIS_SCHEMA), which
+coerces the common near-misses (numbers sent as strings, a lone string instead of a list)
+and cleans every string of non-printable characters while it walks the result.
+"""
+import functools
+import json
+import logging
+import re
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# A double-quoted JSON string without raw control characters
+_STRING_RE = re.compile(r'"(?:[^"\\\x00-\x1f]|\\.)*"', re.S)
+# A run of characters outside strings that is not JSON punctuation (numbers, literals)
+_BARE_RE = re.compile(r'[^\s,:{}\[\]"\'/`]+')
+_WHITESPACE_RE = re.compile(r'\s+')
+# Where the next character after a closing quote must be for the quote to end the string
+_AFTER_STRING_RE = re.compile(r'\s*(?:[,:}\]]|$|//)')
+
+_BARE_LITERALS = {
+    'True': 'true',
+    'False': 'false',
+    'None': 'null',
+    'NaN': 'null',
+    'undefined': 'null',
+}
+
+_CONTROL_ESCAPES = {
+    '\n': '\\n',
+    '\r': '\\r',
+    '\t': '\\t',
+    '\b': '\\b',
+    '\f': '\\f',
+}
+
+_VALID_ESCAPES = '"\\/bfnrtu'
+
+
+class LLMJSONError(ValueError):
+    """
+    Raised when a model answer does not contain a usable JSON object.
+    """
+
+
+# Fields of the multimodal analysis; the required ones must be present and valid
+ANALYSIS_SCHEMA = {
+    'sentiment': {'type': 'string', 'required': True},
+    'emotion_score': {'type': 'number', 'required': True, 'min': 0.0, 'max': 1.0},
+    'emotions_detected': {'type': 'list'},
+    'keywords': {'type': 'list', 'required': True},
+    'summary': {'type': 'string', 'required': True},
+    'detailed_summary': {'type': 'string'},
+    'topics': {'type': 'list', 'required': True},
+    'positive_aspects': {'type': 'list'},
+    'negative_aspects': {'type': 'list'},
+    'action_items': {'type': 'list'},
+    'mood_analysis': {'type': 'string'},
+    'audio_transcription': {'type': 'string'},
+    'image_caption': {'type': 'string'},
+    'image_scene': {'type': 'string'},
+    'image_analysis': {'type': 'string'},
+}
+
+
+def _read_string(text, start, quote, out):
+    """
+    Copy the string opening at text[start] to out as a valid double-quoted JSON string.
+
+    Returns:
+        int: The index just after the string (len(text) when the answer was truncated)
+    """
+    if quote == '"':
+        match = _STRING_RE.match(text, start)
+        if match and _AFTER_STRING_RE.match(text, match.end()):
+            out.append(match.group())
+            return match.end()
+
+    # Slow path: single quotes, raw control characters, bad escapes, unescaped inner quotes
+    buf = ['"']
+    n = len(text)
+    i = start + 1
+    while i < n:
+        c = text[i]
+        if c == '\\':
+            if i + 1 >= n:
+                break
+            escaped = text[i + 1]
+            if escaped == "'":
+                buf.append("'")
+            elif escaped in _VALID_ESCAPES:
+                buf.append('\\' + escaped)
+            else:
+                buf.append('\\\\' + escaped)
+            i += 2
+            continue
+        if c == quote and _AFTER_STRING_RE.match(text, i + 1):
+            buf.append('"')
+            out.append(''.join(buf))
+            return i + 1
+        if c == '"':
+            buf.append('\\"')
+        elif c < ' ':
+            buf.append(_CONTROL_ESCAPES.get(c) or '\\u%04x' % ord(c))
+        else:
+            buf.append(c)
+        i += 1
+
+    # Truncated answer: close the string where the text stops
+    buf.append('"')
+    out.append(''.join(buf))
+    return n
+
+
+def _skip_comment(text, i):
+    if text.startswith('//', i):
+        end = text.find('\n', i)
+        return len(text) if end == -1 else end + 1
+    end = text.find('*/', i + 2)
+    return len(text) if end == -1 else end + 2
+
+
+def _close_truncated(out, stack):
+    """
+    Drop the dangling tail of a truncated answer and close the open containers.
+    """
+    while out and out[-1] == ',':
+        out.pop()
+    if out and out[-1] == ':':
+        out.append('null')
+    elif stack and stack[-1] == '}' and len(out) >= 2 and out[-1].startswith('"') and out[-2] in ('{', ','):
+        # A key without its value
+        out.pop()
+        if out[-1] == ',':
+            out.pop()
+    out.extend(reversed(stack))
+
+
+def repair_json(text):
+    """
+    Extract the first JSON object of a model answer and rewrite it as strict JSON.
+
+    Leading prose and code fences are skipped, and copying stops at the balanced closing
+    brace. On the way, trailing commas, comments, single-quoted strings, Python literals,
+    raw control characters and unescaped inner quotes are fixed, and an answer cut off
+    mid-way is closed.
+
+    Args:
+        text (str): The raw model answer
+
+    Returns:
+        str: The repaired JSON text
+
+    Raises:
+        LLMJSONError: If the answer contains no object
+    """
+    start = text.find('{')
+    if start == -1:
+        raise LLMJSONError("No JSON object found in the model answer")
+
+    out = []
+    stack = []
+    n = len(text)
+    i = start
+    while i < n:
+        c = text[i]
+        if c == '"' or c == "'":
+            i = _read_string(text, i, c, out)
+            continue
+        if c == '{' or c == '[':
+            stack.append('}' if c == '{' else ']')
+            out.append(c)
+        elif c == '}' or c == ']':
+            while out and out[-1] == ',':
+                out.pop()
+            if stack:
+                # The expected closer also repairs a mismatched bracket
+                out.append(stack.pop())
+            if not stack:
+                return ''.join(out)
+        elif c == ',' or c == ':':
+            if c == ',' and out and out[-1] in (',', '{', '['):
+                pass  # empty element
+            else:
+                out.append(c)
+        elif c == '/' and text.startswith(('//', '/*'), i):
+            i = _skip_comment(text, i)
+            continue
+        elif c.isspace():
+            i = _WHITESPACE_RE.match(text, i).end()
+            continue
+        else:
+            match = _BARE_RE.match(text, i)
+            if match is None:
+                # Stray punctuation such as a closing fence inside a truncated answer
+                i += 1
+                continue
+            token = match.group()
+            out.append(_BARE_LITERALS.get(token, token))
+            i = match.end()
+            continue
+        i += 1
+
+    _close_truncated(out, stack)
+    return ''.join(out)
+
+
+@functools.lru_cache(maxsize=1)
+def _unprintable_re():
+    """
+    Build the pattern of the characters removed from model strings.
+
+    Same rule as the former per-character filter: anything non-printable or outside the
+    Basic Multilingual Plane (emoji, rare scripts) goes.
+    """
+    ranges = []
+    range_start = None
+    for code in range(0x10000):
+        printable = chr(code).isprintable()
+        if not printable and range_start is None:
+            range_start = code
+        elif printable and range_start is not None:
+            ranges.append((range_start, code - 1))
+            range_start = None
+    if range_start is not None:
+        ranges.append((range_start, 0xFFFF))
+    ranges.append((0x10000, 0x10FFFF))
+    char_class = ''.join(
+        '\\U%08x' % low if low == high else '\\U%08x-\\U%08x' % (low, high)
+        for low, high in ranges
+    )
+    return re.compile(f'[{char_class}]+')
+
+
+def clean_text(value):
+    """
+    Remove non-printable characters and characters outside the BMP from a string.
+    """
+    if value.isascii() and value.isprintable():
+        return value
+    return _unprintable_re().sub('', value)
+
+
+def sanitize(value):
+    """
+    Recursively clean all strings of a parsed value.
+    """
+    if isinstance(value, str):
+        return clean_text(value)
+    if isinstance(value, list):
+        return [sanitize(item) for item in value]
+    if isinstance(value, dict):
+        return {k: sanitize(v) for k, v in value.items()}
+    return value
+
+
+def _coerce(value, spec):
+    """
+    Coerce a field value to its schema type.
+
+    Returns:
+        The coerced (and cleaned) value
+
+    Raises:
+        ValueError: If the value cannot be used
+    """
+    kind = spec.get('type')
+    if kind == 'string':
+        if isinstance(value, str):
+            return clean_text(value)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return str(value)
+        raise ValueError(f"expected a string, got {type(value).__name__}")
+
+    if kind == 'number':
+        if isinstance(value, bool):
+            raise ValueError("expected a number, got a boolean")
+        number = float(value.strip().rstrip('%')) if isinstance(value, str) else float(value)
+        if 'min' in spec:
+            number = max(spec['min'], number)
+        if 'max' in spec:
+            number = min(spec['max'], number)
+        return number
+
+    if kind == 'list':
+        if isinstance(value, str):
+            value = [value]
+        if not isinstance(value, list):
+            raise ValueError(f"expected a list, got {type(value).__name__}")
+        if spec.get('items') == 'object':
+            return [sanitize(item) for item in value if isinstance(item, dict)]
+        return [
+            clean_text(item) if isinstance(item, str) else str(item)
+            for item in value
+            if item is not None and not isinstance(item, (dict, list))
+        ]
+
+    if kind == 'object':
+        if not isinstance(value, dict):
+            raise ValueError(f"expected an object, got {type(value).__name__}")
+        return sanitize(value)
+
+    return sanitize(value)
+
+
+def validate(data, schema):
+    """
+    Check a parsed object against a schema and return its cleaned fields.
+
+    A schema maps each field to a spec: `type` ('string', 'number', 'list' or 'object'),
+    `required`, `min`/`max` for numbers and `items` ('string' or 'object') for lists.
+    Fields missing from the answer are None in the result; fields the schema does not
+    know are dropped. An optional field that cannot be coerced is set to None.
+
+    Args:
+        data (dict): The parsed model answer
+        schema (dict): The field specs
+
+    Returns:
+        dict: The validated fields, strings cleaned
+
+    Raises:
+        LLMJSONError: If a required field is missing or invalid
+    """
+    results = {}
+    missing = []
+    invalid = []
+    for field, spec in schema.items():
+        value = data.get(field)
+        if value is not None:
+            try:
+                value = _coerce(value, spec)
+            except (TypeError, ValueError) as e:
+                logger.warning(f"Invalid field {field} in model answer: {e}")
+                value = None
+                if spec.get('required'):
+                    invalid.append(field)
+        elif spec.get('required'):
+            missing.append(field)
+        results[field] = value
+
+    if missing:
+        raise LLMJSONError(f"Missing required fields in AI response: {', '.join(missing)}")
+    if invalid:
+        raise LLMJSONError(f"Invalid required fields in AI response: {', '.join(invalid)}")
+    return results
+
+
+def parse_llm_json(text, schema=None):
+    """
+    Parse the JSON object of a model answer, repairing it if needed.
+
+    Answers whose outermost braces enclose valid JSON (possibly fenced or surrounded by
+    prose) are handed to json.loads directly; anything else goes through repair_json once.
+
+    Args:
+        text (str): The raw model answer
+        schema (dict, optional): Fields to validate, see validate()
+
+    Returns:
+        dict: The parsed object, or its validated fields when a schema is given
+
+    Raises:
+        LLMJSONError: If no valid object can be recovered
+    """
+    if not text or not text.strip():
+        raise LLMJSONError("Empty model answer")
+
+    stripped = text.strip()
+    data = None
+    start = stripped.find('{')
+    end = stripped.rfind('}')
+    if start != -1 and end > start:
+        # Fenced or surrounded by prose but otherwise valid: one json.loads on the slice
+        try:
+            data = json.loads(stripped[start:end + 1])
+        except ValueError:
+            data = None
+
+    if data is None:
+        repaired = repair_json(stripped)
+        try:
+            data = json.loads(repaired)
+        except ValueError as e:
+            raise LLMJSONError(f"Unable to parse the model answer as JSON: {e}") from e
+        logger.info("Parsed model answer after JSON repair")
+
+    if not isinstance(data, dict):
+        raise LLMJSONError(f"Expected a JSON object, got {type(data).__name__}")
+    if schema is not None:
+        return validate(data, schema)
+    return data
@@ -0,0 +1,53 @@
+"""
+Management command captioning and classifying the journal images in batches.
+"""
+import json
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from module2_analysis.nlp.image_pipeline import DEFAULT_BATCH_SIZE, analyze_images
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp')
+
+
+class Command(BaseCommand):
+    help = 'Caption and classify the scene of every image under journal_images/ (one JSON line per image)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dir',
+            help='Image directory (defaults to MEDIA_ROOT/journal_images)'
+        )
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Images per forward pass')
+        parser.add_argument('--output', help='Write the JSON lines to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        directory = options['dir'] or os.path.join(settings.MEDIA_ROOT, 'journal_images')
+        paths = sorted(
+            os.path.join(root, name)
+            for root, _, names in os.walk(directory)
+            for name in names
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        self.stdout.write(f"{len(paths)} images in {directory}")
+
+        output = open(options['output'], 'w', encoding='utf-8') if options['output'] else self.stdout
+        started = time.perf_counter()
+        try:
+            # Chunks of a few batches keep memory bounded and show progress
+            step = options['batch_size'] * 4
+            for start in range(0, len(paths), step):
+                chunk = paths[start:start + step]
+                for path, result in zip(chunk, analyze_images(chunk, batch_size=options['batch_size'])):
+                    output.write(json.dumps({'path': os.path.relpath(path, directory), **result}, ensure_ascii=False) + '\n')
+        finally:
+            if options['output']:
+                output.close()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Analyzed {len(paths)} images in {elapsed:.1f}s ({len(paths) / elapsed if elapsed else 0:.1f} images/s)"
+        ))
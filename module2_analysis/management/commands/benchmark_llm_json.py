@@ -0,0 +1,103 @@
+"""
+Management command comparing the LLM-JSON parser with the former cleanup code.
+"""
+import json
+import re
+import timeit
+
+from django.core.management.base import BaseCommand
+
+from module2_analysis.llm_json import ANALYSIS_SCHEMA, LLMJSONError, parse_llm_json
+
+
+def _legacy_sanitize(value):
+    if isinstance(value, str):
+        value = value.encode('utf-8', errors='ignore').decode('utf-8')
+        return ''.join(c for c in value if ord(c) < 65536 and c.isprintable())
+    if isinstance(value, list):
+        return [_legacy_sanitize(item) for item in value]
+    if isinstance(value, dict):
+        return {k: _legacy_sanitize(v) for k, v in value.items()}
+    return value
+
+
+def _legacy_parse(ai_response):
+    """
+    The cleanup previously done in _parse_analysis_response, kept as the baseline.
+    """
+    if ai_response.startswith("```") and "```" in ai_response[3:]:
+        ai_response = ai_response.split("```", 2)[1]
+        if ai_response.startswith("json"):
+            ai_response = ai_response[4:]
+        ai_response = ai_response.strip()
+    try:
+        data = json.loads(ai_response)
+    except json.JSONDecodeError:
+        cleaned = ai_response.encode('utf-8', errors='ignore').decode('utf-8')
+        try:
+            data = json.loads(cleaned)
+        except json.JSONDecodeError:
+            cleaned = ''.join(c for c in cleaned if ord(c) < 65536 and c.isprintable())
+            try:
+                data = json.loads(cleaned)
+            except json.JSONDecodeError:
+                cleaned = cleaned.replace("'", '"')
+                cleaned = re.sub(r',\s*}', '}', cleaned)
+                cleaned = re.sub(r',\s*]', ']', cleaned)
+                data = json.loads(cleaned)
+    return _legacy_sanitize({field: data.get(field) for field in ANALYSIS_SCHEMA})
+
+
+def _sample_answers(paragraphs):
+    text = "Tu as passé une journée chargée mais tu as su garder l'équilibre. 🙂 " * paragraphs
+    answer = {
+        'sentiment': 'positif',
+        'emotion_score': 0.72,
+        'emotions_detected': ['joie', 'fatigue'],
+        'keywords': ['travail', 'équipe', 'sport', 'repos', 'famille'],
+        'summary': text[:200],
+        'detailed_summary': text,
+        'topics': ['travail', 'bien-être'],
+        'positive_aspects': ['réunion productive'],
+        'negative_aspects': ['manque de sommeil'],
+        'action_items': ['te coucher plus tôt'],
+        'mood_analysis': text,
+    }
+    clean = json.dumps(answer, ensure_ascii=False)
+    fenced = f"```json\n{json.dumps(answer, ensure_ascii=False, indent=2)}\n```"
+    broken = "Voici l'analyse demandée :\n```json\n" + json.dumps(answer, ensure_ascii=False, indent=2)[:-2] + ",\n}\n```"
+    return {'clean': clean, 'fenced': fenced, 'trailing comma + prose': broken}
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the LLM-JSON extraction/repair module against the former cleanup code'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--number', type=int, default=200, help='Parses per measurement')
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[1, 20, 200],
+            help='Paragraph counts of the generated answers'
+        )
+
+    def handle(self, *args, **options):
+        number = options['number']
+        for paragraphs in options['sizes']:
+            for name, answer in _sample_answers(paragraphs).items():
+                try:
+                    _legacy_parse(answer)
+                    legacy = timeit.timeit(lambda: _legacy_parse(answer), number=number) / number * 1000
+                    legacy_label = f"{legacy:.3f} ms"
+                except (ValueError, AttributeError):
+                    legacy_label = "fails"
+                try:
+                    parse_llm_json(answer, ANALYSIS_SCHEMA)
+                    current = timeit.timeit(lambda: parse_llm_json(answer, ANALYSIS_SCHEMA), number=number) / number * 1000
+                    current_label = f"{current:.3f} ms"
+                except LLMJSONError:
+                    current_label = "fails"
+                self.stdout.write(
+                    f"{len(answer):>8} chars  {name:<24} legacy: {legacy_label:>10}  llm_json: {current_label:>10}"
+                )
@@ -0,0 +1,92 @@
+"""
+Management command comparing the fp32 and quantized (fast CPU) text models.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+SAMPLE_TEXTS = [
+    "Aujourd'hui, j'ai eu une réunion très productive avec mon équipe.",
+    "Je me sens épuisé, la semaine a été vraiment difficile.",
+    "Balade au parc avec ma sœur, il faisait beau et on a beaucoup ri.",
+    "Je n'arrive pas à dormir, je pense sans arrêt à l'examen de demain.",
+    "Rien de spécial aujourd'hui, j'ai travaillé puis regardé un film.",
+    "Mon chef m'a félicité pour le projet, je suis fier de moi.",
+    "Dispute avec mon colocataire à propos du ménage, ça m'a énervé.",
+    "J'ai commencé la méditation ce matin, dix minutes, c'était apaisant.",
+]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark latency, throughput and agreement of the quantized text models against fp32'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', help='Text file with one sample per line (defaults to built-in samples)')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per measurement')
+        parser.add_argument('--batch-size', type=int, default=16, help='Batch size of the throughput runs')
+
+    def handle(self, *args, **options):
+        try:
+            import torch
+            from transformers import pipeline, AutoTokenizer, AutoModelForSequenceClassification
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise CommandError(f"The local models are not installed: {e}")
+
+        from module2_analysis.nlp.quantization import configure_threads, quantize
+        from module2_analysis.nlp.text_pipeline import EMBEDDING_MODEL_NAME, SENTIMENT_MODEL_NAME
+
+        texts = SAMPLE_TEXTS
+        if options['file']:
+            with open(options['file'], encoding='utf-8') as f:
+                texts = [line.strip() for line in f if line.strip()]
+        configure_threads()
+        self.stdout.write(f"{len(texts)} texts, {torch.get_num_threads()} threads")
+
+        # Sentiment
+        tokenizer = AutoTokenizer.from_pretrained(SENTIMENT_MODEL_NAME)
+        fp32_model = AutoModelForSequenceClassification.from_pretrained(SENTIMENT_MODEL_NAME).eval()
+        int8_model = quantize(AutoModelForSequenceClassification.from_pretrained(SENTIMENT_MODEL_NAME).eval())
+        variants = {
+            'fp32': pipeline("sentiment-analysis", model=fp32_model, tokenizer=tokenizer),
+            'int8': pipeline("sentiment-analysis", model=int8_model, tokenizer=tokenizer),
+        }
+        labels = {}
+        for name, classifier in variants.items():
+            labels[name] = [r['label'] for r in self._run(classifier, texts, options['batch_size'])]
+            self._report(f"sentiment {name}", lambda: self._run(classifier, texts, 1), lambda: self._run(classifier, texts, options['batch_size']), len(texts), options['repeat'])
+        agreement = sum(a == b for a, b in zip(labels['fp32'], labels['int8'])) / len(texts)
+        self.stdout.write(f"sentiment label agreement int8 vs fp32: {agreement:.1%}")
+
+        # Embeddings
+        fp32_encoder = SentenceTransformer(EMBEDDING_MODEL_NAME, device='cpu').eval()
+        int8_encoder = quantize(SentenceTransformer(EMBEDDING_MODEL_NAME, device='cpu').eval())
+        embeddings = {}
+        for name, encoder in (('fp32', fp32_encoder), ('int8', int8_encoder)):
+            embeddings[name] = self._encode(encoder, texts, options['batch_size'])
+            self._report(f"embedding {name}", lambda: self._encode(encoder, texts, 1), lambda: self._encode(encoder, texts, options['batch_size']), len(texts), options['repeat'])
+        similarity = torch.nn.functional.cosine_similarity(embeddings['fp32'], embeddings['int8']).mean().item()
+        self.stdout.write(f"embedding mean cosine similarity int8 vs fp32: {similarity:.4f}")
+
+    def _run(self, classifier, texts, batch_size):
+        import torch
+        with torch.inference_mode():
+            return classifier(texts, batch_size=batch_size, truncation=True)
+
+    def _encode(self, encoder, texts, batch_size):
+        import torch
+        with torch.inference_mode():
+            return encoder.encode(texts, batch_size=batch_size, convert_to_tensor=True)
+
+    def _report(self, label, single, batched, count, repeat):
+        single()  # Warm-up
+        started = time.perf_counter()
+        for _ in range(repeat):
+            single()
+        latency = (time.perf_counter() - started) / (repeat * count) * 1000
+
+        started = time.perf_counter()
+        for _ in range(repeat):
+            batched()
+        throughput = repeat * count / (time.perf_counter() - started)
+        self.stdout.write(f"{label:<16} latency {latency:8.1f} ms/text   throughput {throughput:8.1f} texts/s")
@@ -0,0 +1,43 @@
+"""
+Management command processing queued analysis jobs in a dedicated process.
+"""
+import os
+import socket
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from module2_analysis.jobs import get_job_config, run_next_job
+
+
+class Command(BaseCommand):
+    help = 'Process queued multimodal analysis jobs (use with ANALYSIS_JOBS_EMBEDDED=False)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Process the runnable jobs then exit instead of polling forever'
+        )
+
+    def handle(self, *args, **options):
+        config = get_job_config()
+        worker_id = f"{socket.gethostname()}:{os.getpid()}:cli"
+        self.stdout.write(f"Analysis worker {worker_id} started")
+
+        processed = 0
+        try:
+            while True:
+                ran_job = run_next_job(worker_id, config)
+                close_old_connections()
+                if ran_job:
+                    processed += 1
+                    continue
+                if options['once']:
+                    break
+                time.sleep(config['poll_interval'])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} analysis jobs"))
@@ -0,0 +1,53 @@
+"""
+Management command running the local inference daemon on a Unix socket.
+"""
+import signal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from module2_analysis.nlp.server import (
+    InferenceServer, InferenceService, default_operations, get_inference_config
+)
+
+
+class Command(BaseCommand):
+    help = 'Serve the local NLP/vision models to all web workers over a Unix socket'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--socket', help='Socket path (defaults to ANALYSIS_INFERENCE_SOCKET)')
+        parser.add_argument(
+            '--no-warmup',
+            action='store_true',
+            help='Load models on first request instead of at startup'
+        )
+
+    def handle(self, *args, **options):
+        config = get_inference_config()
+        socket_path = options['socket'] or config['socket']
+        if not socket_path:
+            raise CommandError("No socket path: pass --socket or set ANALYSIS_INFERENCE_SOCKET")
+
+        if not options['no_warmup']:
+            from module2_analysis.nlp import text_pipeline, image_pipeline
+            text_pipeline.load_models()
+            image_pipeline.load_models()
+
+        service = InferenceService(
+            default_operations(),
+            max_batch=config['max_batch'],
+            max_wait_ms=config['max_wait_ms']
+        )
+        server = InferenceServer(socket_path, service)
+
+        def stop(signum, frame):
+            raise KeyboardInterrupt
+
+        signal.signal(signal.SIGTERM, stop)
+        self.stdout.write(f"Inference server listening on {socket_path}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+        self.stdout.write(self.style.SUCCESS("Inference server stopped"))
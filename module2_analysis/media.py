@@ -0,0 +1,198 @@
+"""
+Media preprocessing for the analysis pipeline.
+
+Audio files are only ever read from disk in fixed-size chunks (hashing, upload to the
+transcription service), never loaded whole into memory.
+
+Uploaded photos are usually several megabytes; the vision model only needs enough detail
+to read the scene and facial expressions. Images are therefore rotated according to their
+EXIF orientation, downscaled and re-encoded under a byte budget before being sent, and the
+optimized file is cached next to the upload so that re-analyses reuse it.
+"""
+import hashlib
+import io
+import json
+import logging
+import os
+import sys
+
+from django.conf import settings
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_IMAGE_CONFIG = {
+    'enabled': True,
+    'max_dimension': 1280,      # Longest side in pixels after downscaling
+    'max_bytes': 300 * 1024,    # Target size of the encoded image
+    'format': 'JPEG',           # JPEG or WEBP
+    'quality': 85,              # First quality tried
+    'min_quality': 45,          # Below this, the image is downscaled further instead
+}
+
+# Size of the chunks streamed to the transcription service
+AUDIO_UPLOAD_CHUNK_SIZE = 256 * 1024
+
+FORMAT_MIME_TYPES = {
+    'JPEG': 'image/jpeg',
+    'WEBP': 'image/webp',
+}
+
+FORMAT_EXTENSIONS = {
+    'JPEG': '.jpg',
+    'WEBP': '.webp',
+}
+
+
+def get_image_config():
+    """
+    Return the image optimizer configuration merged with the ANALYSIS_IMAGE_OPTIMIZER setting.
+    """
+    config = dict(DEFAULT_IMAGE_CONFIG)
+    config.update(getattr(settings, 'ANALYSIS_IMAGE_OPTIMIZER', {}))
+    config['format'] = config['format'].upper()
+    return config
+
+
+def optimized_image_path(image_path, config=None):
+    """
+    Return the path of the optimized copy cached next to an image.
+
+    The name includes a digest of the optimizer settings, so changing them
+    produces a new copy instead of serving a stale one.
+    """
+    config = config or get_image_config()
+    settings_digest = hashlib.sha1(json.dumps(config, sort_keys=True).encode('utf-8')).hexdigest()[:8]
+    root, _ = os.path.splitext(image_path)
+    return f"{root}.opt-{settings_digest}{FORMAT_EXTENSIONS[config['format']]}"
+
+
+def _flatten(image):
+    """
+    Convert an image to RGB, compositing any transparency onto white.
+    """
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.split()[-1])
+        return background
+    if image.mode != 'RGB':
+        return image.convert('RGB')
+    return image
+
+
+def _encode(image, config):
+    """
+    Encode an image under the byte budget, lowering quality then dimensions as needed.
+    """
+    while True:
+        quality = config['quality']
+        while True:
+            buffer = io.BytesIO()
+            image.save(buffer, format=config['format'], quality=quality, optimize=True)
+            data = buffer.getvalue()
+            if len(data) <= config['max_bytes'] or quality <= config['min_quality']:
+                break
+            quality = max(config['min_quality'], quality - 10)
+
+        if len(data) <= config['max_bytes'] or max(image.size) <= 256:
+            return data
+        width, height = image.size
+        image = image.resize((int(width * 0.75), int(height * 0.75)), Image.LANCZOS)
+
+
+def optimize_image(image_path, config=None):
+    """
+    Produce a downscaled, size-bounded copy of an image for the vision model.
+
+    Args:
+        image_path (str): The path to the uploaded image
+        config (dict, optional): Optimizer settings, defaults to get_image_config()
+
+    Returns:
+        tuple: (image bytes, MIME type), or None if the file is not a readable image
+    """
+    config = config or get_image_config()
+    if not config['enabled']:
+        return None
+
+    cached_path = optimized_image_path(image_path, config)
+    mime_type = FORMAT_MIME_TYPES[config['format']]
+    try:
+        if os.path.exists(cached_path) and os.path.getmtime(cached_path) >= os.path.getmtime(image_path):
+            with open(cached_path, 'rb') as f:
+                return f.read(), mime_type
+    except OSError:
+        pass
+
+    try:
+        with Image.open(image_path) as source:
+            image = ImageOps.exif_transpose(source)
+            image = _flatten(image)
+            image.thumbnail((config['max_dimension'], config['max_dimension']), Image.LANCZOS)
+            data = _encode(image, config)
+    except (UnidentifiedImageError, OSError, ValueError) as e:
+        logger.warning(f"Could not optimize image {os.path.basename(image_path)}: {e}")
+        return None
+
+    original_size = os.path.getsize(image_path)
+    logger.info(f"Optimized image {os.path.basename(image_path)}: {original_size} -> {len(data)} bytes")
+    try:
+        with open(cached_path, 'wb') as f:
+            f.write(data)
+    except OSError as e:
+        logger.warning(f"Could not cache optimized image: {e}")
+    return data, mime_type
+
+
+def remove_optimized_image(image_path, config=None):
+    """
+    Delete the optimized copy cached next to an image, if any.
+    """
+    cached_path = optimized_image_path(image_path, config)
+    if os.path.exists(cached_path):
+        os.remove(cached_path)
+
+
+def iter_file_chunks(path, chunk_size=AUDIO_UPLOAD_CHUNK_SIZE):
+    """
+    Yield a file's content in fixed-size chunks, for streaming request bodies.
+    """
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            yield chunk
+
+
+def peak_rss_kb():
+    """
+    Return the process memory high-water mark (peak resident set size) in kilobytes.
+
+    Returns:
+        int: The peak RSS, or None where the platform does not report it
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux kilobytes
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def current_rss_kb():
+    """
+    Return the current resident set size of the process in kilobytes.
+
+    Returns:
+        int: The RSS, or None where /proc is not available
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return resident_pages * os.sysconf('SC_PAGE_SIZE') // 1024
@@ -3,12 +3,20 @@ Models for the module2_analysis app.
 """
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 import uuid
 
 class JournalAnalysis(models.Model):
     """
     Model for storing multimodal journal analysis results.
     """
+    TIER_FAST = 'fast'
+    TIER_FULL = 'full'
+    TIER_CHOICES = [
+        (TIER_FAST, 'Fast (local models, LLM enrichment pending)'),
+        (TIER_FULL, 'Full (LLM)'),
+    ]
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -44,6 +52,7 @@ class JournalAnalysis(models.Model):
     image_analysis = models.TextField(blank=True, verbose_name="Image analysis")
     
     # Metadata
+    analysis_tier = models.CharField(max_length=10, choices=TIER_CHOICES, default=TIER_FULL, verbose_name="Analysis tier")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Created at")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Updated at")
     
@@ -55,3 +64,113 @@ class JournalAnalysis(models.Model):
         verbose_name_plural = "Journal Analyses"
         ordering = ['-created_at']
 
+
+
+class AnalysisCacheEntry(models.Model):
+    """
+    Model for storing cached analysis results, keyed on a hash of the analyzed content.
+    """
+    key = models.CharField(max_length=64, unique=True, verbose_name="Content hash")
+    model_name = models.CharField(max_length=100, blank=True, verbose_name="Model name")
+    prompt_version = models.CharField(max_length=20, blank=True, verbose_name="Prompt version")
+    result = models.JSONField(default=dict, verbose_name="Analysis result")
+    hits = models.PositiveIntegerField(default=0, verbose_name="Hits")
+
+    # Metadata
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="Created at")
+    last_accessed_at = models.DateTimeField(default=timezone.now, verbose_name="Last accessed at")
+
+    def __str__(self):
+        return f"Cached analysis {self.key[:12]} ({self.model_name})"
+
+    class Meta:
+        verbose_name = "Analysis Cache Entry"
+        verbose_name_plural = "Analysis Cache Entries"
+        ordering = ['-last_accessed_at']
+
+
+class TranscriptCacheEntry(models.Model):
+    """
+    Model for storing audio transcripts, keyed on the audio's SHA-256 and the transcription config.
+    """
+    key = models.CharField(max_length=64, unique=True, verbose_name="Audio and config hash")
+    audio_sha256 = models.CharField(max_length=64, db_index=True, verbose_name="Audio SHA-256")
+    transcription_config = models.JSONField(default=dict, verbose_name="Transcription config")
+    transcript = models.TextField(verbose_name="Transcript")
+    hits = models.PositiveIntegerField(default=0, verbose_name="Hits")
+
+    # Metadata
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="Created at")
+    last_accessed_at = models.DateTimeField(default=timezone.now, verbose_name="Last accessed at")
+
+    def __str__(self):
+        return f"Cached transcript {self.audio_sha256[:12]}"
+
+    class Meta:
+        verbose_name = "Transcript Cache Entry"
+        verbose_name_plural = "Transcript Cache Entries"
+        ordering = ['-last_accessed_at']
+
+
+class AnalysisJob(models.Model):
+    """
+    Model for queued analysis jobs processed outside the request/response cycle.
+    """
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_SUCCEEDED, 'Succeeded'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='analysis_jobs',
+        blank=True,
+        null=True,
+        verbose_name="User"
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED, verbose_name="Status")
+
+    # Input content (media files are stored under MEDIA_ROOT/analysis_jobs/<id>/)
+    text = models.TextField(blank=True, verbose_name="Text content")
+    audio_path = models.CharField(max_length=500, blank=True, verbose_name="Audio path")
+    audio_name = models.CharField(max_length=255, blank=True, verbose_name="Audio file name")
+    image_path = models.CharField(max_length=500, blank=True, verbose_name="Image path")
+    image_name = models.CharField(max_length=255, blank=True, verbose_name="Image file name")
+
+    # Outcome
+    result = models.JSONField(default=dict, blank=True, verbose_name="Result")
+    error = models.TextField(blank=True, verbose_name="Error")
+    analysis_id = models.CharField(max_length=36, blank=True, verbose_name="Saved analysis ID")
+
+    # Scheduling
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Attempts")
+    max_attempts = models.PositiveIntegerField(default=3, verbose_name="Max attempts")
+    available_at = models.DateTimeField(default=timezone.now, verbose_name="Available at")
+    worker_id = models.CharField(max_length=100, blank=True, verbose_name="Worker ID")
+    heartbeat_at = models.DateTimeField(blank=True, null=True, verbose_name="Heartbeat at")
+    started_at = models.DateTimeField(blank=True, null=True, verbose_name="Started at")
+    finished_at = models.DateTimeField(blank=True, null=True, verbose_name="Finished at")
+
+    # Metadata
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Created at")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Updated at")
+
+    def __str__(self):
+        return f"Analysis job {self.id} ({self.status})"
+
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_SUCCEEDED, self.STATUS_FAILED)
+
+    class Meta:
+        verbose_name = "Analysis Job"
+        verbose_name_plural = "Analysis Jobs"
+        ordering = ['created_at']
@@ -3,29 +3,36 @@ Audio analysis pipeline using Hugging Face models.
 """
 import os
 import logging
-from transformers import pipeline, AutoProcessor, WhisperForConditionalGeneration
+
+from .registry import get_registry, ModelUnavailable
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-# Global variables to store loaded models
-transcription_pipeline = None
+# The model is loaded by the shared registry on first use (see registry.py)
+TRANSCRIPTION_MODEL = 'transcription'
+
+
+def _load_transcription():
+    from transformers import pipeline
+    # Audio transcription model
+    return pipeline("automatic-speech-recognition", model="openai/whisper-small")
+
+
+registry = get_registry()
+registry.register(TRANSCRIPTION_MODEL, _load_transcription, estimated_mb=1000)
+
 
 def load_models():
     """
-    Load all audio analysis models.
-    This function should be called once during application startup.
+    Load all audio analysis models up front (warm-up).
+    Optional: the model is otherwise loaded by the registry on first use.
     """
-    global transcription_pipeline
-    
     logger.info("Loading audio analysis models...")
-    
     try:
-        # Audio transcription model
-        transcription_pipeline = pipeline("automatic-speech-recognition", model="openai/whisper-small")
-        logger.info("Audio transcription model loaded successfully")
-    except Exception as e:
-        logger.error(f"Failed to load audio transcription model: {e}")
+        registry.get(TRANSCRIPTION_MODEL)
+    except ModelUnavailable:
+        pass
 
 
 def transcribe_audio(audio_file_path):
@@ -38,7 +45,12 @@ def transcribe_audio(audio_file_path):
     Returns:
         str: The transcription
     """
-    if not audio_file_path or not transcription_pipeline:
+    if not audio_file_path:
+        return ""
+    
+    try:
+        transcription_pipeline = registry.get(TRANSCRIPTION_MODEL)
+    except ModelUnavailable:
         return ""
     
     try:
@@ -0,0 +1,126 @@
+"""
+Coalescing of concurrent single-item calls into batched calls.
+
+Transformer models cost nearly the same for a batch of 8 short texts as for one on CPU,
+but requests arrive one text at a time. A MicroBatcher queues the items submitted by
+concurrent threads, waits a few milliseconds for more to arrive (up to a maximum batch
+size), runs the batch function once and hands each caller its own output.
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Runs `batch_func(items) -> outputs` on batches gathered from concurrent submit() calls.
+    """
+
+    def __init__(self, batch_func, max_batch=16, max_wait_ms=5, name='batcher'):
+        self.batch_func = batch_func
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000
+        self.name = name
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._largest_batch = 0
+        self._busy_seconds = 0.0
+        self._errors = 0
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name=f"microbatch-{self.name}", daemon=True)
+                    self._thread.start()
+
+    def submit(self, item):
+        """
+        Queue an item and return a Future resolving to its output.
+        """
+        future = Future()
+        self._ensure_started()
+        self._queue.put((item, future))
+        return future
+
+    def submit_many(self, items):
+        """
+        Queue several items and return their Futures, in order.
+        """
+        futures = []
+        self._ensure_started()
+        for item in items:
+            future = Future()
+            self._queue.put((item, future))
+            futures.append(future)
+        return futures
+
+    def __call__(self, item, timeout=None):
+        return self.submit(item).result(timeout)
+
+    def map(self, items, timeout=None):
+        """
+        Run items through the batcher and return their outputs, in order.
+        """
+        return [future.result(timeout) for future in self.submit_many(items)]
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            items = [item for item, _ in batch]
+            started = time.perf_counter()
+            try:
+                outputs = self.batch_func(items)
+                if len(outputs) != len(items):
+                    raise ValueError(f"{self.name}: {len(outputs)} outputs for {len(items)} items")
+            except Exception as e:
+                logger.error(f"Batch of {len(items)} failed in {self.name}: {e}")
+                with self._stats_lock:
+                    self._errors += 1
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            finally:
+                with self._stats_lock:
+                    self._batches += 1
+                    self._items += len(items)
+                    self._largest_batch = max(self._largest_batch, len(items))
+                    self._busy_seconds += time.perf_counter() - started
+
+            for (_, future), output in zip(batch, outputs):
+                future.set_result(output)
+
+    def stats(self):
+        """
+        Return batch counters and the throughput while busy.
+        """
+        with self._stats_lock:
+            return {
+                'batches': self._batches,
+                'items': self._items,
+                'errors': self._errors,
+                'average_batch': round(self._items / self._batches, 2) if self._batches else 0,
+                'largest_batch': self._largest_batch,
+                'items_per_second': round(self._items / self._busy_seconds, 1) if self._busy_seconds else 0,
+                'queued': self._queue.qsize(),
+            }
@@ -0,0 +1,196 @@
+"""
+Client of the local inference daemon (server.py).
+
+Each web worker keeps one InferenceClient. Single-item calls made concurrently by the
+worker's threads are coalesced by a MicroBatcher per (operation, parameters) and sent to
+the daemon as one request, so the socket round-trip and the forward pass are shared.
+
+infer() is the entry point for the rest of the code: it uses the daemon when
+ANALYSIS_INFERENCE['socket'] is set and the in-process pipelines otherwise.
+"""
+import itertools
+import json
+import logging
+import socket
+import threading
+
+from .batching import MicroBatcher
+from .server import get_inference_config
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class InferenceUnavailable(Exception):
+    """
+    Raised when the inference daemon cannot be reached or rejects a request.
+    """
+
+
+class _Connection:
+    """
+    A persistent connection to the daemon, used by a single dispatcher thread.
+    """
+
+    def __init__(self, socket_path, timeout):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._sock = None
+        self._file = None
+        self._ids = itertools.count(1)
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self._sock = sock
+        self._file = sock.makefile('rb')
+
+    def close(self):
+        if self._sock is not None:
+            try:
+                self._file.close()
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = None
+        self._file = None
+
+    def request(self, op, inputs, params):
+        payload = {'id': next(self._ids), 'op': op, 'inputs': inputs, 'params': params}
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8') + b'\n'
+        # A connection closed by a daemon restart is only noticed on use: retry once
+        for attempt in range(2):
+            try:
+                if self._sock is None:
+                    self._connect()
+                self._sock.sendall(data)
+                line = self._file.readline()
+                if not line:
+                    raise ConnectionError("Connection closed by the inference server")
+                break
+            except OSError as e:
+                self.close()
+                if attempt:
+                    raise InferenceUnavailable(f"Inference server unreachable at {self.socket_path}: {e}") from e
+
+        response = json.loads(line)
+        if 'error' in response:
+            raise InferenceUnavailable(f"Inference server error for {op}: {response['error']}")
+        return response['outputs']
+
+
+class InferenceClient:
+    """
+    Sends micro-batched requests to the inference daemon over its Unix socket.
+    """
+
+    def __init__(self, socket_path, max_batch=16, max_wait_ms=5, timeout=30):
+        self.socket_path = socket_path
+        self.max_batch = max_batch
+        self.max_wait_ms = max_wait_ms
+        self.timeout = timeout
+        self._batchers = {}
+        self._lock = threading.Lock()
+
+    def _batcher(self, op, params):
+        key = (op, tuple(sorted(params.items())))
+        batcher = self._batchers.get(key)
+        if batcher is None:
+            with self._lock:
+                batcher = self._batchers.get(key)
+                if batcher is None:
+                    connection = _Connection(self.socket_path, self.timeout)
+                    batcher = MicroBatcher(
+                        lambda items: connection.request(op, items, params),
+                        max_batch=self.max_batch,
+                        max_wait_ms=self.max_wait_ms,
+                        name=f"client-{op}"
+                    )
+                    self._batchers[key] = batcher
+        return batcher
+
+    def call(self, op, item, **params):
+        """
+        Run one input through an operation of the daemon.
+
+        Raises:
+            InferenceUnavailable: If the daemon cannot be reached or fails
+        """
+        return self._batcher(op, params)(item, timeout=self.timeout)
+
+    def map(self, op, items, **params):
+        """
+        Run several inputs through an operation of the daemon, in order.
+        """
+        return self._batcher(op, params).map(items, timeout=self.timeout)
+
+    def server_stats(self):
+        """
+        Return the daemon's batching and model statistics.
+        """
+        return _Connection(self.socket_path, self.timeout).request('stats', [], {})[0]
+
+    def stats(self):
+        return {f"{op}{dict(params) or ''}": b.stats() for (op, params), b in self._batchers.items()}
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_inference_client():
+    """
+    Return the inference client of this process, or None when no daemon is configured.
+    """
+    global _client
+    config = get_inference_config()
+    if not config['socket']:
+        return None
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = InferenceClient(
+                    config['socket'],
+                    max_batch=config['max_batch'],
+                    max_wait_ms=config['max_wait_ms'],
+                    timeout=config['timeout']
+                )
+    return _client
+
+
+def infer(op, item, **params):
+    """
+    Run a local model operation, through the daemon if one is configured.
+
+    Args:
+        op (str): sentiment, keywords, topics, summary, image, caption or scene
+        item: The text (or image path) to process
+        **params: Operation parameters (top_n, max_length)
+
+    Returns:
+        The operation output for this item
+
+    Raises:
+        InferenceUnavailable: If the configured daemon cannot be reached
+    """
+    client = get_inference_client()
+    if client is not None:
+        return client.call(op, item, **params)
+    return _local_operation(op)(item, **params)
+
+
+def _local_operation(op):
+    """
+    Return the in-process single-item function of an operation (text calls are micro-batched).
+    """
+    from . import image_pipeline, text_pipeline
+    return {
+        'sentiment': text_pipeline.analyze_sentiment,
+        'keywords': text_pipeline.extract_keywords,
+        'topics': text_pipeline.extract_topics,
+        'summary': text_pipeline.generate_summary,
+        'image': lambda path: image_pipeline.analyze_images([path])[0],
+        'caption': image_pipeline.caption_image,
+        'scene': image_pipeline.classify_image_scene,
+    }[op]
@@ -3,70 +3,193 @@ Image analysis pipeline using Hugging Face models.
 """
 import os
 import logging
-import torch
 from PIL import Image
-from transformers import (
-    pipeline,
-    ViTFeatureExtractor,
-    ViTForImageClassification,
-    VisionEncoderDecoderModel,
-    AutoTokenizer,
-    AutoProcessor
-)
+
+from .quantization import inference_mode
+from .registry import get_registry, ModelUnavailable
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-# Global variables to store loaded models
-image_captioning_model = None
-image_captioning_feature_extractor = None
-image_captioning_tokenizer = None
-scene_processor = None
-scene_model = None
+# Models are loaded by the shared registry on first use (see registry.py)
+CAPTIONING_MODEL = 'image_captioning'
+SCENE_MODEL = 'image_scene'
+
+# Both ViT models take 224x224 images
+IMAGE_SIZE = 224
+DEFAULT_BATCH_SIZE = 8
+
+
+def _device():
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def _load_captioning():
+    from transformers import ViTFeatureExtractor, VisionEncoderDecoderModel, AutoTokenizer
+    
+    # Image captioning model
+    image_captioning_model = VisionEncoderDecoderModel.from_pretrained("nlpconnect/vit-gpt2-image-captioning")
+    image_captioning_feature_extractor = ViTFeatureExtractor.from_pretrained("nlpconnect/vit-gpt2-image-captioning")
+    image_captioning_tokenizer = AutoTokenizer.from_pretrained("nlpconnect/vit-gpt2-image-captioning")
+    
+    # Set special tokens
+    image_captioning_tokenizer.pad_token = image_captioning_tokenizer.eos_token
+    
+    # Set generation parameters
+    image_captioning_model.config.decoder_start_token_id = image_captioning_tokenizer.bos_token_id
+    image_captioning_model.config.eos_token_id = image_captioning_tokenizer.eos_token_id
+    image_captioning_model.config.pad_token_id = image_captioning_tokenizer.pad_token_id
+    image_captioning_model.config.max_length = 40
+    
+    # Move model to appropriate device
+    image_captioning_model = image_captioning_model.to(_device())
+    return image_captioning_model, image_captioning_feature_extractor, image_captioning_tokenizer
+
+
+def _load_scene():
+    from transformers import ViTForImageClassification, AutoProcessor
+    
+    # Image scene classification model
+    scene_processor = AutoProcessor.from_pretrained("google/vit-base-patch16-224")
+    scene_model = ViTForImageClassification.from_pretrained("google/vit-base-patch16-224")
+    return scene_processor, scene_model.to(_device())
+
+
+registry = get_registry()
+registry.register(CAPTIONING_MODEL, _load_captioning, estimated_mb=1000)
+registry.register(SCENE_MODEL, _load_scene, estimated_mb=350)
+
+
+def _get_model(name):
+    """
+    Return a model from the registry, or None if it cannot be loaded.
+    """
+    try:
+        return registry.get(name)
+    except ModelUnavailable:
+        return None
+
 
 def load_models():
     """
-    Load all image analysis models.
-    This function should be called once during application startup.
+    Load all image analysis models up front (warm-up).
+    Optional: every model is otherwise loaded by the registry on first use.
     """
-    global image_captioning_model, image_captioning_feature_extractor, image_captioning_tokenizer
-    global scene_processor, scene_model
-    
     logger.info("Loading image analysis models...")
+    for name in (CAPTIONING_MODEL, SCENE_MODEL):
+        _get_model(name)
+
+
+def load_image(image_path, size=IMAGE_SIZE):
+    """
+    Decode an image once, downscaled to the model input size.
     
-    # Determine device
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    logger.info(f"Using device: {device}")
-    
-    try:
-        # Image captioning model
-        image_captioning_model = VisionEncoderDecoderModel.from_pretrained("nlpconnect/vit-gpt2-image-captioning")
-        image_captioning_feature_extractor = ViTFeatureExtractor.from_pretrained("nlpconnect/vit-gpt2-image-captioning")
-        image_captioning_tokenizer = AutoTokenizer.from_pretrained("nlpconnect/vit-gpt2-image-captioning")
-        
-        # Set special tokens
-        image_captioning_tokenizer.pad_token = image_captioning_tokenizer.eos_token
+    Args:
+        image_path (str): The path to the image
+        size (int): The side of the square model input
         
-        # Set generation parameters
-        image_captioning_model.config.decoder_start_token_id = image_captioning_tokenizer.bos_token_id
-        image_captioning_model.config.eos_token_id = image_captioning_tokenizer.eos_token_id
-        image_captioning_model.config.pad_token_id = image_captioning_tokenizer.pad_token_id
-        image_captioning_model.config.max_length = 40
+    Returns:
+        PIL.Image.Image: The RGB image, resized to size x size
+    """
+    with Image.open(image_path) as image:
+        # JPEG photos are decoded directly at a reduced scale, much faster than full size
+        image.draft("RGB", (size, size))
+        return image.convert("RGB").resize((size, size), Image.BILINEAR)
+
+
+def _preprocessing(processor):
+    """
+    Return what determines the pixel values produced by an image processor.
+    """
+    return (
+        repr(getattr(processor, 'size', None)),
+        list(getattr(processor, 'image_mean', None) or []),
+        list(getattr(processor, 'image_std', None) or []),
+    )
+
+
+def _model_device(model):
+    return next(model.parameters()).device
+
+
+def _analyze_batch(images, captioning, scene_models):
+    """
+    Caption and classify decoded images, sharing their pixel values between the models.
+    """
+    captions = [""] * len(images)
+    scenes = [""] * len(images)
+    pixel_values = None
+    pixel_preprocessing = None
+    
+    with inference_mode():
+        if captioning:
+            image_captioning_model, image_captioning_feature_extractor, image_captioning_tokenizer = captioning
+            try:
+                pixel_values = image_captioning_feature_extractor(images=images, return_tensors="pt").pixel_values
+                pixel_preprocessing = _preprocessing(image_captioning_feature_extractor)
+                output_ids = image_captioning_model.generate(pixel_values.to(_model_device(image_captioning_model)), max_length=40)
+                captions = image_captioning_tokenizer.batch_decode(output_ids, skip_special_tokens=True)
+            except Exception as e:
+                logger.error(f"Error captioning images: {e}")
+        
+        if scene_models:
+            scene_processor, scene_model = scene_models
+            try:
+                # Both checkpoints normalize the same way: reuse the captioning tensor
+                if pixel_values is None or pixel_preprocessing != _preprocessing(scene_processor):
+                    pixel_values = scene_processor(images=images, return_tensors="pt").pixel_values
+                logits = scene_model(pixel_values=pixel_values.to(_model_device(scene_model))).logits
+                scenes = [scene_model.config.id2label[index] for index in logits.argmax(-1).tolist()]
+            except Exception as e:
+                logger.error(f"Error classifying image scenes: {e}")
+    
+    return [{"caption": c, "scene": s} for c, s in zip(captions, scenes)]
+
+
+def analyze_images(image_paths, caption=True, scene=True, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Caption and classify the scene of several images.
+    
+    Each image is decoded and resized once, and its pixel values feed both models;
+    images go through the models batch_size at a time.
+    
+    Args:
+        image_paths (list): The paths to the images
+        caption (bool): Whether to generate captions
+        scene (bool): Whether to classify scenes
+        batch_size (int): Images per forward pass
         
-        # Move model to appropriate device
-        image_captioning_model = image_captioning_model.to(device)
-        logger.info("Image captioning model loaded successfully")
-    except Exception as e:
-        logger.error(f"Failed to load image captioning model: {e}")
+    Returns:
+        list: One {"caption", "scene"} dict per image, in order (empty strings on failure)
+    """
+    results = [{"caption": "", "scene": ""} for _ in image_paths]
+    captioning = _get_model(CAPTIONING_MODEL) if caption and any(image_paths) else None
+    scene_models = _get_model(SCENE_MODEL) if scene and any(image_paths) else None
+    if not captioning and not scene_models:
+        return results
     
-    try:
-        # Image scene classification model
-        scene_processor = AutoProcessor.from_pretrained("google/vit-base-patch16-224")
-        scene_model = ViTForImageClassification.from_pretrained("google/vit-base-patch16-224")
-        scene_model = scene_model.to(device)
-        logger.info("Image scene classification model loaded successfully")
-    except Exception as e:
-        logger.error(f"Failed to load image scene classification model: {e}")
+    for start in range(0, len(image_paths), batch_size):
+        indexes = []
+        images = []
+        for index in range(start, min(start + batch_size, len(image_paths))):
+            image_path = image_paths[index]
+            if not image_path:
+                continue
+            if not os.path.exists(image_path):
+                logger.error(f"Image file not found: {image_path}")
+                continue
+            try:
+                images.append(load_image(image_path))
+                indexes.append(index)
+            except Exception as e:
+                logger.error(f"Error opening image {image_path}: {e}")
+        
+        if images:
+            for index, result in zip(indexes, _analyze_batch(images, captioning, scene_models)):
+                results[index] = result
+    
+    return results
 
 
 def caption_image(image_path):
@@ -79,34 +202,7 @@ def caption_image(image_path):
     Returns:
         str: The caption
     """
-    if not image_path or not image_captioning_model:
-        return ""
-    
-    try:
-        # Check if file exists
-        if not os.path.exists(image_path):
-            logger.error(f"Image file not found: {image_path}")
-            return ""
-        
-        # Open image
-        image = Image.open(image_path).convert("RGB")
-        
-        # Determine device
-        device = next(image_captioning_model.parameters()).device
-        
-        # Process image
-        pixel_values = image_captioning_feature_extractor(image, return_tensors="pt").pixel_values.to(device)
-        
-        # Generate caption
-        output_ids = image_captioning_model.generate(pixel_values, max_length=40)
-        
-        # Decode caption
-        caption = image_captioning_tokenizer.decode(output_ids[0], skip_special_tokens=True)
-        
-        return caption
-    except Exception as e:
-        logger.error(f"Error captioning image: {e}")
-        return ""
+    return analyze_images([image_path], scene=False)[0]["caption"]
 
 
 def classify_image_scene(image_path):
@@ -119,37 +215,4 @@ def classify_image_scene(image_path):
     Returns:
         str: The scene classification
     """
-    if not image_path or not scene_model:
-        return ""
-    
-    try:
-        # Check if file exists
-        if not os.path.exists(image_path):
-            logger.error(f"Image file not found: {image_path}")
-            return ""
-        
-        # Open image
-        image = Image.open(image_path).convert("RGB")
-        
-        # Determine device
-        device = next(scene_model.parameters()).device
-        
-        # Process image
-        inputs = scene_processor(images=image, return_tensors="pt").to(device)
-        
-        # Generate prediction
-        with torch.no_grad():
-            outputs = scene_model(**inputs)
-        
-        # Get predicted class
-        logits = outputs.logits
-        predicted_class_idx = logits.argmax(-1).item()
-        
-        # Get class label
-        label = scene_model.config.id2label[predicted_class_idx]
-        
-        return label
-    except Exception as e:
-        logger.error(f"Error classifying image scene: {e}")
-        return ""
-
+    return analyze_images([image_path], caption=False)[0]["scene"]
@@ -0,0 +1,142 @@
+"""
+Opt-in "fast CPU" mode for the local transformer models.
+
+Our hosts are CPU-only. With ANALYSIS_FAST_CPU['enabled'], the sentiment model
+(XLM-RoBERTa) and the keyword embedding model (MiniLM) are converted with PyTorch dynamic
+int8 quantization of their Linear layers, which roughly halves latency and memory on x86
+at a small cost in accuracy (see `manage.py benchmark_text_models`). The quantized weights
+are cached as a state dict in a private directory (never under MEDIA_ROOT, which is
+served and receives uploads) and loaded with `weights_only=True` into a freshly quantized
+module on the next start, so a cache file can never run code when it is read.
+
+Each process also caps the PyTorch thread pools: by default the CPU cores are shared
+between the gunicorn workers instead of every worker spawning one thread per core.
+"""
+import contextlib
+import hashlib
+import logging
+import os
+
+from django.conf import settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_FAST_CPU_CONFIG = {
+    'enabled': False,
+    'threads': 0,           # PyTorch intra-op threads per process; 0 = cores / web workers
+    'cache_dir': '',        # Where quantized weights are cached; '' = BASE_DIR/.cache/model_cache
+}
+
+_threads_configured = False
+
+
+def get_fast_cpu_config():
+    """
+    Return the fast CPU configuration merged with the ANALYSIS_FAST_CPU setting.
+    """
+    config = dict(DEFAULT_FAST_CPU_CONFIG)
+    config.update(getattr(settings, 'ANALYSIS_FAST_CPU', {}))
+    if not config['cache_dir']:
+        config['cache_dir'] = os.path.join(settings.BASE_DIR, '.cache', 'model_cache')
+    return config
+
+
+def default_thread_count(cpu_count=None, workers=None):
+    """
+    Return the threads each process should use so that web workers share the cores.
+    """
+    cpu_count = cpu_count or os.cpu_count() or 1
+    workers = workers or int(os.environ.get('WORKERS', 3))
+    return max(1, cpu_count // max(1, workers))
+
+
+def configure_threads(config=None):
+    """
+    Cap the PyTorch thread pools of this process (once).
+    """
+    global _threads_configured
+    if _threads_configured:
+        return
+    import torch
+
+    config = config or get_fast_cpu_config()
+    threads = config['threads'] or default_thread_count()
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Only allowed before the first parallel work has started
+        pass
+    _threads_configured = True
+    logger.info(f"PyTorch limited to {threads} threads per process")
+
+
+def inference_mode():
+    """
+    Return torch.inference_mode() when torch is installed, else a no-op context.
+    """
+    try:
+        import torch
+    except ImportError:
+        return contextlib.nullcontext()
+    return torch.inference_mode()
+
+
+def quantize(model):
+    """
+    Apply dynamic int8 quantization to the Linear layers of a module.
+    """
+    import torch
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def quantized_cache_path(name, config=None):
+    """
+    Return the cache file of the weights of a quantized model.
+
+    The PyTorch version is part of the name: packed quantized weights are not portable
+    across versions.
+    """
+    import torch
+    config = config or get_fast_cpu_config()
+    version = hashlib.sha1(torch.__version__.encode('utf-8')).hexdigest()[:8]
+    return os.path.join(config['cache_dir'], f"{name.replace('/', '__')}.int8-{version}.pt")
+
+
+def load_quantized(name, build, config=None):
+    """
+    Return the quantized version of a module, with its weights from the disk cache when possible.
+
+    Args:
+        name (str): The model name, used for the cache file
+        build (callable): Returns the fp32 module to quantize (and to load cached weights into)
+        config (dict, optional): Fast CPU settings, defaults to get_fast_cpu_config()
+
+    Returns:
+        torch.nn.Module: The quantized module, in eval mode
+    """
+    import torch
+
+    config = config or get_fast_cpu_config()
+    configure_threads(config)
+    path = quantized_cache_path(name, config)
+    model = quantize(build().eval())
+    if os.path.exists(path):
+        try:
+            model.load_state_dict(torch.load(path, map_location='cpu', weights_only=True))
+            logger.info(f"Loaded quantized {name} weights from {path}")
+            return model.eval()
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable quantized model cache {path}: {e}")
+            model = quantize(build().eval())
+
+    try:
+        os.makedirs(config['cache_dir'], mode=0o700, exist_ok=True)
+        temp_path = f"{path}.tmp-{os.getpid()}"
+        torch.save(model.state_dict(), temp_path)
+        os.replace(temp_path, path)
+        logger.info(f"Cached quantized {name} at {path}")
+    except OSError as e:
+        logger.warning(f"Could not cache quantized {name}: {e}")
+    return model.eval()
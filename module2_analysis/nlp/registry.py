@@ -0,0 +1,241 @@
+"""
+Lazy, shared registry of the local Hugging Face / spaCy models.
+
+The pipelines used to load every model into module globals at startup, so each gunicorn
+worker paid for all of them (mbart-large-50 alone is several GB) even though most
+requests need one at most. Pipelines now register a loader per model; the registry
+loads a model on its first use, measures how much resident memory the load added, and
+evicts the least recently used models once the configured budget is exceeded.
+
+This module does not import torch or transformers itself, so it can be imported (and
+its statistics read) on hosts without the local models installed.
+"""
+import gc
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from ..media import current_rss_kb
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_REGISTRY_CONFIG = {
+    'memory_budget_mb': 4096,       # Resident memory the loaded models may use together
+    'retry_failed_after': 300,      # Seconds before a model that failed to load is tried again
+}
+
+
+def get_registry_config():
+    """
+    Return the model registry configuration merged with the ANALYSIS_LOCAL_MODELS setting.
+    """
+    config = dict(DEFAULT_REGISTRY_CONFIG)
+    config.update(getattr(settings, 'ANALYSIS_LOCAL_MODELS', {}))
+    return config
+
+
+class ModelUnavailable(Exception):
+    """
+    Raised when a model failed to load (missing dependency, download error...).
+    """
+
+
+class _Entry:
+    def __init__(self, loader, estimated_mb):
+        self.loader = loader
+        self.estimated_mb = estimated_mb
+        self.model = None
+        self.memory_mb = 0.0
+        self.loads = 0
+        self.hits = 0
+        self.evictions = 0
+        self.load_seconds = 0.0
+        self.last_used = None
+        self.failed_at = None
+        self.error = None
+        self.lock = threading.Lock()
+
+
+class ModelRegistry:
+    """
+    Loads registered models on first use and keeps them within a memory budget (LRU).
+    """
+
+    def __init__(self, memory_budget_mb=None, retry_failed_after=None, measure_rss=True):
+        config = get_registry_config()
+        self.measure_rss = measure_rss
+        self.memory_budget_mb = memory_budget_mb if memory_budget_mb is not None else config['memory_budget_mb']
+        self.retry_failed_after = retry_failed_after if retry_failed_after is not None else config['retry_failed_after']
+        self._entries = {}
+        self._resident = OrderedDict()  # name -> entry, least recently used first
+        self._lock = threading.Lock()
+        # Loads are serialized so that the RSS difference is attributable to one model
+        self._load_lock = threading.Lock()
+
+    def register(self, name, loader, estimated_mb=None):
+        """
+        Register a model loader.
+
+        Args:
+            name (str): The model name used with get()
+            loader (callable): Returns the loaded model (any object)
+            estimated_mb (float, optional): Size used when the RSS is not measured
+        """
+        with self._lock:
+            if name not in self._entries:
+                self._entries[name] = _Entry(loader, estimated_mb)
+
+    def is_registered(self, name):
+        return name in self._entries
+
+    def get(self, name):
+        """
+        Return a model, loading it (and evicting others) if needed.
+
+        Raises:
+            KeyError: If no loader is registered under this name
+            ModelUnavailable: If the model failed to load
+        """
+        entry = self._entries[name]
+        model = self._touch(name, entry)
+        if model is not None:
+            return model
+
+        with entry.lock:
+            # Another thread may have loaded it while we waited
+            model = self._touch(name, entry)
+            if model is not None:
+                return model
+            if entry.failed_at is not None and time.time() - entry.failed_at < self.retry_failed_after:
+                raise ModelUnavailable(f"Model {name} is unavailable: {entry.error}")
+            model = self._load(name, entry)
+
+        self._enforce_budget(keep=name)
+        return model
+
+    def _touch(self, name, entry):
+        with self._lock:
+            if entry.model is None:
+                return None
+            entry.hits += 1
+            entry.last_used = time.time()
+            self._resident.move_to_end(name)
+            return entry.model
+
+    def _load(self, name, entry):
+        with self._load_lock:
+            logger.info(f"Loading local model {name}...")
+            rss_before = current_rss_kb() if self.measure_rss else None
+            started = time.perf_counter()
+            try:
+                model = entry.loader()
+            except Exception as e:
+                entry.failed_at = time.time()
+                entry.error = str(e)
+                logger.error(f"Failed to load local model {name}: {e}")
+                raise ModelUnavailable(f"Model {name} is unavailable: {e}") from e
+            elapsed = time.perf_counter() - started
+            rss_after = current_rss_kb() if self.measure_rss else None
+
+        if rss_before is not None and rss_after is not None and rss_after > rss_before:
+            memory_mb = (rss_after - rss_before) / 1024
+        else:
+            memory_mb = entry.estimated_mb or 0.0
+
+        with self._lock:
+            entry.model = model
+            entry.memory_mb = round(memory_mb, 1)
+            entry.loads += 1
+            entry.load_seconds = round(elapsed, 3)
+            entry.last_used = time.time()
+            entry.failed_at = None
+            entry.error = None
+            self._resident[name] = entry
+            self._resident.move_to_end(name)
+        logger.info(f"Loaded local model {name} in {elapsed:.1f}s (~{entry.memory_mb} MB)")
+        return model
+
+    def _enforce_budget(self, keep=None):
+        """
+        Evict least recently used models until the resident total fits the budget.
+        """
+        evicted = []
+        with self._lock:
+            while self.resident_mb() > self.memory_budget_mb:
+                name = next((n for n in self._resident if n != keep), None)
+                if name is None:
+                    break
+                entry = self._resident.pop(name)
+                entry.model = None
+                entry.evictions += 1
+                evicted.append(name)
+        if evicted:
+            self._release_memory()
+            logger.info(f"Evicted local models {', '.join(evicted)} to stay under {self.memory_budget_mb} MB")
+        return evicted
+
+    def evict(self, name):
+        """
+        Unload a model; it is loaded again on its next use.
+        """
+        with self._lock:
+            entry = self._resident.pop(name, None)
+            if entry is None:
+                return False
+            entry.model = None
+            entry.evictions += 1
+        self._release_memory()
+        return True
+
+    def _release_memory(self):
+        gc.collect()
+        torch = sys.modules.get('torch')
+        if torch is not None and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def resident_mb(self):
+        return sum(entry.memory_mb for entry in self._resident.values())
+
+    def stats(self):
+        """
+        Return load, hit and eviction counters per model and the resident total.
+        """
+        with self._lock:
+            models = {
+                name: {
+                    'loaded': entry.model is not None,
+                    'memory_mb': entry.memory_mb if entry.model is not None else 0.0,
+                    'loads': entry.loads,
+                    'hits': entry.hits,
+                    'evictions': entry.evictions,
+                    'load_seconds': entry.load_seconds,
+                    'error': entry.error,
+                }
+                for name, entry in self._entries.items()
+            }
+            return {
+                'memory_budget_mb': self.memory_budget_mb,
+                'resident_mb': round(self.resident_mb(), 1),
+                'models': models,
+            }
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """
+    Return the model registry of this process, creating it on first use.
+    """
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ModelRegistry()
+    return _registry
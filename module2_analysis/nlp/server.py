@@ -0,0 +1,165 @@
+"""
+Local inference daemon shared by all web workers.
+
+Gunicorn runs several workers (3 by default, see entrypoint.sh) and each of them would
+otherwise load its own copy of the local models. The daemon, started with
+`manage.py run_inference_server`, owns the sentiment, keyword, topic, summarization,
+caption and scene models and serves them over a Unix socket; workers talk to it through
+InferenceClient (client.py). Memory stays constant as workers are added and models are
+warmed up once per deployment instead of once per worker restart.
+
+Protocol: one JSON object per line in each direction.
+    request:  {"id": 1, "op": "sentiment", "inputs": ["...", "..."], "params": {}}
+    response: {"id": 1, "outputs": [...]}  or  {"id": 1, "error": "..."}
+
+Requests for the same operation and parameters coming from different connections are
+coalesced by a MicroBatcher, so concurrent workers share forward passes.
+"""
+import json
+import logging
+import os
+import socketserver
+import threading
+
+from django.conf import settings
+
+from .batching import MicroBatcher
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_INFERENCE_CONFIG = {
+    'socket': '',           # Unix socket path; empty means models run in the web process
+    'max_batch': 16,        # Items per forward pass
+    'max_wait_ms': 5,       # Time a batch waits for more items
+    'timeout': 30,          # Seconds a client waits for an answer
+}
+
+
+def get_inference_config():
+    """
+    Return the inference server configuration merged with the ANALYSIS_INFERENCE setting.
+    """
+    config = dict(DEFAULT_INFERENCE_CONFIG)
+    config.update(getattr(settings, 'ANALYSIS_INFERENCE', {}))
+    return config
+
+
+def _text_ops():
+    from . import text_pipeline
+    return {
+        'sentiment': text_pipeline.analyze_sentiment_batch,
+        'keywords': text_pipeline.extract_keywords_batch,
+        'topics': text_pipeline.extract_topics_batch,
+        'summary': lambda texts, max_length=150: [text_pipeline.generate_summary(t, max_length=max_length) for t in texts],
+    }
+
+
+def _image_ops():
+    from . import image_pipeline
+    return {
+        'image': image_pipeline.analyze_images,
+        'caption': lambda paths: [r['caption'] for r in image_pipeline.analyze_images(paths, scene=False)],
+        'scene': lambda paths: [r['scene'] for r in image_pipeline.analyze_images(paths, caption=False)],
+    }
+
+
+def default_operations():
+    """
+    Return the operations served by the daemon: name -> function(list of inputs, **params).
+    """
+    operations = {}
+    operations.update(_text_ops())
+    operations.update(_image_ops())
+    return operations
+
+
+class InferenceService:
+    """
+    Dispatches requests to one MicroBatcher per (operation, parameters).
+    """
+
+    def __init__(self, operations, max_batch=16, max_wait_ms=5):
+        self.operations = operations
+        self.max_batch = max_batch
+        self.max_wait_ms = max_wait_ms
+        self._batchers = {}
+        self._lock = threading.Lock()
+
+    def _batcher(self, op, params):
+        key = (op, tuple(sorted(params.items())))
+        batcher = self._batchers.get(key)
+        if batcher is None:
+            with self._lock:
+                batcher = self._batchers.get(key)
+                if batcher is None:
+                    func = self.operations[op]
+                    batcher = MicroBatcher(
+                        lambda items: func(items, **params),
+                        max_batch=self.max_batch,
+                        max_wait_ms=self.max_wait_ms,
+                        name=op
+                    )
+                    self._batchers[key] = batcher
+        return batcher
+
+    def handle(self, request):
+        """
+        Run one decoded request and return the response dict.
+        """
+        request_id = request.get('id')
+        op = request.get('op')
+        if op == 'stats':
+            return {'id': request_id, 'outputs': [self.stats()]}
+        if op not in self.operations:
+            return {'id': request_id, 'error': f"Unknown operation: {op}"}
+        inputs = request.get('inputs')
+        if not isinstance(inputs, list):
+            return {'id': request_id, 'error': "inputs must be a list"}
+        try:
+            outputs = self._batcher(op, request.get('params') or {}).map(inputs)
+        except Exception as e:
+            return {'id': request_id, 'error': str(e)}
+        return {'id': request_id, 'outputs': outputs}
+
+    def stats(self):
+        from .registry import get_registry
+        return {
+            'operations': {f"{op}{dict(params) or ''}": b.stats() for (op, params), b in self._batchers.items()},
+            'models': get_registry().stats(),
+        }
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        service = self.server.service
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                response = service.handle(request)
+            except ValueError as e:
+                response = {'id': None, 'error': f"Invalid request: {e}"}
+            self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b'\n')
+            self.wfile.flush()
+
+
+class InferenceServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Threaded Unix socket server, one thread per client connection.
+    """
+    daemon_threads = True
+
+    def __init__(self, socket_path, service):
+        self.service = service
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        super().__init__(socket_path, _RequestHandler)
+        # Web workers may run as another user of the same group
+        os.chmod(socket_path, 0o660)
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
@@ -1,62 +1,298 @@
 """
 Text analysis pipeline using Hugging Face models.
 """
+import copy
 import logging
-from transformers import pipeline, AutoTokenizer, AutoModelForSequenceClassification, AutoModelForSeq2SeqLM
-from keybert import KeyBERT
-from sentence_transformers import SentenceTransformer
-import spacy
+import threading
+from collections import Counter
+
+from django.conf import settings
+
+from .batching import MicroBatcher
+from .quantization import get_fast_cpu_config, inference_mode, load_quantized
+from .registry import get_registry, ModelUnavailable
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-# Global variables to store loaded models
-nlp_fr = None
-sentiment_pipeline = None
-summarization_pipeline = None
-keyword_model = None
+# Models are loaded by the shared registry on first use (see registry.py); the heavy
+# libraries are only imported by the loaders.
+SPACY_MODEL = 'spacy_fr'
+SENTIMENT_MODEL = 'sentiment'
+SUMMARIZATION_MODEL = 'summarization'
+KEYWORD_MODEL = 'keywords'
+
+SPACY_EXCLUDED_COMPONENTS = ["ner", "lemmatizer"]
+SENTIMENT_MODEL_NAME = "cardiffnlp/twitter-xlm-roberta-base-sentiment"
+EMBEDDING_MODEL_NAME = 'paraphrase-multilingual-MiniLM-L12-v2'
+SUMMARIZATION_MODEL_NAME = "facebook/mbart-large-50-many-to-many-mmt"
+
+
+def _load_spacy():
+    import spacy
+    # French NLP model for topic extraction: noun_chunks only need the POS tags and the
+    # dependency parse, so the entity recognizer and the lemmatizer are not loaded
+    return spacy.load("fr_core_news_md", exclude=SPACY_EXCLUDED_COMPONENTS)
+
+
+def _load_sentiment():
+    from transformers import pipeline, AutoTokenizer, AutoModelForSequenceClassification
+    sentiment_tokenizer = AutoTokenizer.from_pretrained(SENTIMENT_MODEL_NAME)
+    if get_fast_cpu_config()['enabled']:
+        sentiment_model = load_quantized(
+            SENTIMENT_MODEL_NAME,
+            lambda: AutoModelForSequenceClassification.from_pretrained(SENTIMENT_MODEL_NAME)
+        )
+    else:
+        sentiment_model = AutoModelForSequenceClassification.from_pretrained(SENTIMENT_MODEL_NAME)
+    return pipeline("sentiment-analysis", model=sentiment_model, tokenizer=sentiment_tokenizer)
+
+
+def _load_summarization():
+    from transformers import pipeline, AutoTokenizer, AutoModelForSeq2SeqLM
+    summarization_tokenizer = AutoTokenizer.from_pretrained(SUMMARIZATION_MODEL_NAME)
+    summarization_model = AutoModelForSeq2SeqLM.from_pretrained(SUMMARIZATION_MODEL_NAME)
+    return pipeline("summarization", model=summarization_model, tokenizer=summarization_tokenizer)
+
+
+def _load_keywords():
+    from keybert import KeyBERT
+    from sentence_transformers import SentenceTransformer
+    if get_fast_cpu_config()['enabled']:
+        sentence_model = load_quantized(EMBEDDING_MODEL_NAME, lambda: SentenceTransformer(EMBEDDING_MODEL_NAME, device='cpu'))
+    else:
+        sentence_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+    return KeyBERT(model=sentence_model)
+
+
+registry = get_registry()
+registry.register(SPACY_MODEL, _load_spacy, estimated_mb=120)
+registry.register(SENTIMENT_MODEL, _load_sentiment, estimated_mb=1100)
+registry.register(SUMMARIZATION_MODEL, _load_summarization, estimated_mb=2400)
+registry.register(KEYWORD_MODEL, _load_keywords, estimated_mb=480)
+
+
+def _get_model(name):
+    """
+    Return a model from the registry, or None if it cannot be loaded.
+    """
+    try:
+        return registry.get(name)
+    except ModelUnavailable:
+        return None
+
 
 def load_models():
     """
-    Load all text analysis models.
-    This function should be called once during application startup.
+    Load all text analysis models up front (warm-up).
+    Optional: every model is otherwise loaded by the registry on first use.
     """
-    global nlp_fr, sentiment_pipeline, summarization_pipeline, keyword_model
-    
     logger.info("Loading text analysis models...")
+    for name in (SPACY_MODEL, SENTIMENT_MODEL, SUMMARIZATION_MODEL, KEYWORD_MODEL):
+        _get_model(name)
+
+
+# Map the model's output to our expected format
+SENTIMENT_LABELS = {
+    "LABEL_0": "negatif",
+    "LABEL_1": "neutre",
+    "LABEL_2": "positif",
+    "negative": "negatif",
+    "neutral": "neutre",
+    "positive": "positif",
+}
+
+NEUTRAL_SENTIMENT = {"sentiment": "neutre", "emotion_score": 0.5}
+
+DEFAULT_BATCHING_CONFIG = {
+    'enabled': True,        # Coalesce concurrent single-text calls into batches
+    'max_batch': 16,        # Texts per forward pass
+    'max_wait_ms': 5,       # Time the first text of a batch waits for others
+}
+
+_batchers = {}
+_batchers_lock = threading.Lock()
+
+
+def get_batching_config():
+    """
+    Return the micro-batching configuration merged with the ANALYSIS_TEXT_BATCHING setting.
+    """
+    config = dict(DEFAULT_BATCHING_CONFIG)
+    config.update(getattr(settings, 'ANALYSIS_TEXT_BATCHING', {}))
+    return config
+
+
+def _non_empty(texts, default, run):
+    """
+    Run `run` on the non-empty texts only and put `default` copies in the other slots.
+    """
+    indexes = [i for i, text in enumerate(texts) if text]
+    results = [copy.deepcopy(default) for _ in texts]
+    if indexes:
+        for i, result in zip(indexes, run([texts[i] for i in indexes])):
+            results[i] = result
+    return results
+
+
+def analyze_sentiment_batch(texts):
+    """
+    Analyze the sentiment of several texts in one forward pass.
     
-    try:
-        # French NLP model for topic extraction
-        nlp_fr = spacy.load("fr_core_news_md")
-        logger.info("French NLP model loaded successfully")
-    except Exception as e:
-        logger.error(f"Failed to load French NLP model: {e}")
+    Args:
+        texts (list): The texts to analyze
+        
+    Returns:
+        list: One {"sentiment", "emotion_score"} dict per text, in order
+    """
+    sentiment_pipeline = _get_model(SENTIMENT_MODEL) if any(texts) else None
+    if not sentiment_pipeline:
+        return [dict(NEUTRAL_SENTIMENT) for _ in texts]
+    
+    def run(batch):
+        with inference_mode():
+            results = sentiment_pipeline(batch, batch_size=len(batch), truncation=True)
+        return [
+            {
+                "sentiment": SENTIMENT_LABELS.get(result["label"], "neutre"),
+                "emotion_score": result["score"]
+            }
+            for result in results
+        ]
     
     try:
-        # Sentiment analysis model
-        sentiment_tokenizer = AutoTokenizer.from_pretrained("cardiffnlp/twitter-xlm-roberta-base-sentiment")
-        sentiment_model = AutoModelForSequenceClassification.from_pretrained("cardiffnlp/twitter-xlm-roberta-base-sentiment")
-        sentiment_pipeline = pipeline("sentiment-analysis", model=sentiment_model, tokenizer=sentiment_tokenizer)
-        logger.info("Sentiment analysis model loaded successfully")
+        return _non_empty(texts, NEUTRAL_SENTIMENT, run)
     except Exception as e:
-        logger.error(f"Failed to load sentiment analysis model: {e}")
+        logger.error(f"Error analyzing sentiment: {e}")
+        return [dict(NEUTRAL_SENTIMENT) for _ in texts]
+
+
+def extract_keywords_batch(texts, top_n=5):
+    """
+    Extract keywords from several texts, embedding them together.
+    
+    Args:
+        texts (list): The texts to analyze
+        top_n (int): The number of keywords to extract per text
+        
+    Returns:
+        list: One list of keywords per text, in order
+    """
+    keyword_model = _get_model(KEYWORD_MODEL) if any(texts) else None
+    if not keyword_model:
+        return [[] for _ in texts]
+    
+    def run(batch):
+        with inference_mode():
+            keywords = keyword_model.extract_keywords(
+                batch,
+                keyphrase_ngram_range=(1, 2),
+                stop_words='french',
+                top_n=top_n
+            )
+        # KeyBERT returns a flat list for a single document
+        if len(batch) == 1:
+            keywords = [keywords]
+        # Return only the keywords, not the scores
+        return [[keyword for keyword, _ in doc_keywords] for doc_keywords in keywords]
     
     try:
-        # Summarization model
-        summarization_tokenizer = AutoTokenizer.from_pretrained("facebook/mbart-large-50-many-to-many-mmt")
-        summarization_model = AutoModelForSeq2SeqLM.from_pretrained("facebook/mbart-large-50-many-to-many-mmt")
-        summarization_pipeline = pipeline("summarization", model=summarization_model, tokenizer=summarization_tokenizer)
-        logger.info("Summarization model loaded successfully")
+        return _non_empty(texts, [], run)
     except Exception as e:
-        logger.error(f"Failed to load summarization model: {e}")
+        logger.error(f"Error extracting keywords: {e}")
+        return [[] for _ in texts]
+
+
+DEFAULT_TOPICS_CONFIG = {
+    'n_process': 1,         # spaCy worker processes for large batches (backfills)
+    'batch_size': 64,       # Texts per spaCy batch
+}
+
+
+def get_topics_config():
+    """
+    Return the topic extraction configuration merged with the ANALYSIS_TOPICS setting.
+    """
+    config = dict(DEFAULT_TOPICS_CONFIG)
+    config.update(getattr(settings, 'ANALYSIS_TOPICS', {}))
+    return config
+
+
+def rank_noun_chunks(doc, top_n=3):
+    """
+    Return the most frequent 1-2 word noun chunks of a parsed text.
+    
+    Ties keep the order of first appearance, so the result is deterministic.
+    """
+    counts = Counter(
+        chunk.text.lower()
+        for chunk in doc.noun_chunks
+        if len(chunk.text.split()) <= 2  # Limit to 1-2 word phrases
+    )
+    return [topic for topic, _ in counts.most_common(top_n)]
+
+
+def extract_topics_batch(texts, top_n=3, n_process=None):
+    """
+    Extract topics from several texts with one spaCy pass.
+    
+    Args:
+        texts (list): The texts to analyze
+        top_n (int): The number of topics to extract per text
+        n_process (int, optional): spaCy worker processes, defaults to ANALYSIS_TOPICS
+        
+    Returns:
+        list: One list of topics per text, in order, most frequent first
+    """
+    nlp_fr = _get_model(SPACY_MODEL) if any(texts) else None
+    if not nlp_fr:
+        return [[] for _ in texts]
+    
+    config = get_topics_config()
+    n_process = n_process or config['n_process']
+    
+    def run(batch):
+        # Extra processes only pay off on large batches
+        processes = n_process if len(batch) >= 2 * config['batch_size'] else 1
+        docs = nlp_fr.pipe(batch, batch_size=config['batch_size'], n_process=processes)
+        return [rank_noun_chunks(doc, top_n) for doc in docs]
     
     try:
-        # Keyword extraction model
-        sentence_model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
-        keyword_model = KeyBERT(model=sentence_model)
-        logger.info("Keyword extraction model loaded successfully")
+        return _non_empty(texts, [], run)
     except Exception as e:
-        logger.error(f"Failed to load keyword extraction model: {e}")
+        logger.error(f"Error extracting topics: {e}")
+        return [[] for _ in texts]
+
+
+def _dispatch(name, batch_func, text, **params):
+    """
+    Run one text through batch_func, coalesced with concurrent calls when batching is enabled.
+    """
+    config = get_batching_config()
+    if not config['enabled']:
+        return batch_func([text], **params)[0]
+    
+    key = (name, tuple(sorted(params.items())))
+    batcher = _batchers.get(key)
+    if batcher is None:
+        with _batchers_lock:
+            batcher = _batchers.get(key)
+            if batcher is None:
+                batcher = MicroBatcher(
+                    lambda texts: batch_func(texts, **params),
+                    max_batch=config['max_batch'],
+                    max_wait_ms=config['max_wait_ms'],
+                    name=name
+                )
+                _batchers[key] = batcher
+    return batcher(text)
+
+
+def batching_stats():
+    """
+    Return the throughput counters of the micro-batching dispatchers.
+    """
+    return {f"{name}{dict(params) or ''}": b.stats() for (name, params), b in _batchers.items()}
 
 
 def analyze_sentiment(text):
@@ -69,29 +305,9 @@ def analyze_sentiment(text):
     Returns:
         dict: A dictionary containing the sentiment label and score
     """
-    if not text or not sentiment_pipeline:
-        return {"sentiment": "neutre", "emotion_score": 0.5}
-    
-    try:
-        result = sentiment_pipeline(text)[0]
-        
-        # Map the model's output to our expected format
-        label_mapping = {
-            "LABEL_0": "negatif",
-            "LABEL_1": "neutre",
-            "LABEL_2": "positif"
-        }
-        
-        sentiment = label_mapping.get(result["label"], "neutre")
-        score = result["score"]
-        
-        return {
-            "sentiment": sentiment,
-            "emotion_score": score
-        }
-    except Exception as e:
-        logger.error(f"Error analyzing sentiment: {e}")
-        return {"sentiment": "neutre", "emotion_score": 0.5}
+    if not text:
+        return dict(NEUTRAL_SENTIMENT)
+    return _dispatch('sentiment', analyze_sentiment_batch, text)
 
 
 def extract_keywords(text, top_n=5):
@@ -105,23 +321,9 @@ def extract_keywords(text, top_n=5):
     Returns:
         list: A list of keywords
     """
-    if not text or not keyword_model:
-        return []
-    
-    try:
-        # Extract keywords
-        keywords = keyword_model.extract_keywords(
-            text, 
-            keyphrase_ngram_range=(1, 2), 
-            stop_words='french', 
-            top_n=top_n
-        )
-        
-        # Return only the keywords, not the scores
-        return [keyword for keyword, _ in keywords]
-    except Exception as e:
-        logger.error(f"Error extracting keywords: {e}")
+    if not text:
         return []
+    return _dispatch('keywords', extract_keywords_batch, text, top_n=top_n)
 
 
 def extract_topics(text, top_n=3):
@@ -135,33 +337,49 @@ def extract_topics(text, top_n=3):
     Returns:
         list: A list of topics
     """
-    if not text or not nlp_fr:
+    if not text:
         return []
+    return _dispatch('topics', extract_topics_batch, text, top_n=top_n)
+
+
+def summarize_batch(texts, max_length=150):
+    """
+    Summarize several texts, each within the model input, in batched generations.
     
-    try:
-        # Process the text with spaCy
-        doc = nlp_fr(text)
-        
-        # Extract noun phrases as potential topics
-        noun_phrases = []
-        for chunk in doc.noun_chunks:
-            if len(chunk.text.split()) <= 2:  # Limit to 1-2 word phrases
-                noun_phrases.append(chunk.text.lower())
-        
-        # Get unique topics
-        topics = list(set(noun_phrases))
+    At most ANALYSIS_SUMMARIZATION['local_batch_size'] texts go through the model at once,
+    so a long transcript does not blow through the memory budget of the model registry.
+    
+    Args:
+        texts (list): The texts to summarize
+        max_length (int): The maximum length of each summary
         
-        # Limit to top_n topics
-        return topics[:top_n]
-    except Exception as e:
-        logger.error(f"Error extracting topics: {e}")
-        return []
+    Returns:
+        list: The summaries, in order
+    """
+    from ..summarization import get_summarization_config
+
+    summarization_pipeline = _get_model(SUMMARIZATION_MODEL)
+    # Set language for mbart model
+    summarization_pipeline.tokenizer.src_lang = "fr_XX"
+    with inference_mode():
+        results = summarization_pipeline(
+            texts,
+            batch_size=max(1, min(len(texts), get_summarization_config()['local_batch_size'])),
+            max_length=max_length,
+            min_length=min(30, max_length),
+            do_sample=False,
+            truncation=True
+        )
+    return [result["summary_text"] for result in results]
 
 
 def generate_summary(text, max_length=150):
     """
     Generate a summary of a text.
     
+    Texts longer than the model input are summarized by chunks (see summarization.py)
+    instead of being truncated.
+    
     Args:
         text (str): The text to summarize
         max_length (int): The maximum length of the summary
@@ -169,23 +387,23 @@ def generate_summary(text, max_length=150):
     Returns:
         str: The summary
     """
-    if not text or not summarization_pipeline or len(text.split()) < 30:
+    from ..summarization import map_reduce_summarize
+
+    if not text or len(text.split()) < 30:
         return text[:max_length] if text else ""
     
+    summarization_pipeline = _get_model(SUMMARIZATION_MODEL)
+    if not summarization_pipeline:
+        return text[:max_length]
+    
     try:
-        # Set language for mbart model
-        summarization_pipeline.tokenizer.src_lang = "fr_XX"
-        
-        # Generate summary
-        summary = summarization_pipeline(
+        tokenizer = summarization_pipeline.tokenizer
+        return map_reduce_summarize(
             text,
-            max_length=max_length,
-            min_length=30,
-            do_sample=False
-        )[0]["summary_text"]
-        
-        return summary
+            lambda texts: summarize_batch(texts, max_length=max_length),
+            f"local:{SUMMARIZATION_MODEL_NAME}:{max_length}",
+            count_tokens=lambda t: len(tokenizer.encode(t, add_special_tokens=False))
+        )
     except Exception as e:
         logger.error(f"Error generating summary: {e}")
         return text[:max_length] if text else ""
-
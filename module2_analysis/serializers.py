@@ -44,6 +44,17 @@ class AnalysisRequestSerializer(serializers.Serializer):
         return data
 
 
+class BatchAnalysisRequestSerializer(serializers.Serializer):
+    """
+    Serializer for batch analysis requests (JSON only, media as base64).
+    Each entry is validated separately so that one bad entry does not reject the batch.
+    """
+    entries = serializers.ListField(child=serializers.JSONField(), allow_empty=False)
+    user_id = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    save = serializers.BooleanField(required=False, default=True)
+
+
+
 class AnalysisResponseSerializer(serializers.Serializer):
     """
     Serializer for multimodal analysis responses with enhanced fields.
@@ -77,7 +88,7 @@ class JournalAnalysisSerializer(serializers.ModelSerializer):
             'summary', 'detailed_summary', 'positive_aspects', 'negative_aspects', 
             'action_items', 'mood_analysis', 'audio_transcription', 
             'image_caption', 'image_scene', 'image_analysis',
-            'created_at', 'updated_at'
+            'analysis_tier', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'analysis_tier', 'created_at', 'updated_at']
 
@@ -7,8 +7,21 @@ import logging
 import json
 import requests
 import base64
-import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 from django.conf import settings
+from django.db import connection
+
+from mindscribe.openrouter import get_client
+from mindscribe.model_router import RoutingError, get_router
+from .cache import (
+    compute_cache_key, get_cached_result, store_result,
+    hash_file, get_cached_transcript, store_transcript
+)
+from .llm_json import ANALYSIS_SCHEMA, LLMJSONError, clean_text, parse_llm_json, sanitize
+from .media import optimize_image, iter_file_chunks, peak_rss_kb
+from .streaming import IncrementalJSONParser
+from .summarization import condense_for_prompt
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -16,10 +29,67 @@ logger = logging.getLogger(__name__)
 # API keys from settings
 OPENROUTER_API_KEY = getattr(settings, 'OPENROUTER_API_KEY', '')
 ASSEMBLYAI_API_KEY = getattr(settings, 'ASSEMBLYAI_API_KEY', '')
+ASSEMBLYAI_UPLOAD_URL = "https://api.assemblyai.com/v2/upload"
+
+# Part of the transcript store key: change it and audio is transcribed again
+TRANSCRIPTION_CONFIG = {'provider': 'assemblyai', 'language_code': 'fr'}
+
+# Models used for analysis (vision-capable model for images)
+TEXT_MODEL = "mistralai/mistral-nemo:free"
+VISION_MODEL = "google/gemini-2.0-flash-exp:free"
+
+# Bump whenever the analysis prompt changes so cached results are not reused
+PROMPT_VERSION = "1"
+
+DEFAULT_PIPELINE_CONFIG = {
+    # Analyze the text alone while media stages run, used if the multimodal call fails.
+    # Off by default: it is a second full LLM call for every entry with media
+    'text_pre_analysis': False,
+}
+
+IMAGE_MIME_TYPES = {
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.gif': 'image/gif',
+    '.webp': 'image/webp'
+}
 
 # No need for load_all_models function since we're using OpenRouter API
 
 
+def get_pipeline_config():
+    """
+    Return the analysis pipeline configuration merged with the ANALYSIS_PIPELINE setting.
+    """
+    config = dict(DEFAULT_PIPELINE_CONFIG)
+    config.update(getattr(settings, 'ANALYSIS_PIPELINE', {}))
+    return config
+
+
+def upload_audio_for_transcription(audio_path):
+    """
+    Stream an audio file to AssemblyAI's upload endpoint in fixed-size chunks.
+    
+    The request body is a generator, so it is sent with chunked transfer encoding
+    and the file is never held in memory as a whole.
+    
+    Args:
+        audio_path (str): Path to the audio file
+        
+    Returns:
+        str: The upload URL to pass to the transcriber
+    """
+    response = requests.post(
+        ASSEMBLYAI_UPLOAD_URL,
+        headers={'authorization': ASSEMBLYAI_API_KEY},
+        data=iter_file_chunks(audio_path),
+        timeout=(5, 300)
+    )
+    response.raise_for_status()
+    return response.json()['upload_url']
+
+
 def transcribe_audio_with_whisper(audio_path):
     """
     Transcribe audio using AssemblyAI's official Python SDK (FREE $50 credits!).
@@ -61,14 +131,15 @@ def transcribe_audio_with_whisper(audio_path):
         logger.info("Using AssemblyAI SDK to transcribe audio")
         
         # Create transcriber and transcribe the audio file
-        # The SDK handles upload and polling automatically!
+        # The file is streamed to AssemblyAI first, the SDK handles polling
         transcriber = aai.Transcriber()
         
         # Configure for French language
-        config = aai.TranscriptionConfig(language_code="fr")
+        config = aai.TranscriptionConfig(language_code=TRANSCRIPTION_CONFIG['language_code'])
         
         logger.info("Uploading and processing...")
-        transcript = transcriber.transcribe(audio_path, config=config)
+        upload_url = upload_audio_for_transcription(audio_path)
+        transcript = transcriber.transcribe(upload_url, config=config)
         
         # Check if transcription was successful
         if transcript.status == aai.TranscriptStatus.error:
@@ -94,96 +165,155 @@ def transcribe_audio_with_whisper(audio_path):
         return None
 
 
-def analyze_multimodal_content(text=None, audio_path=None, image_path=None):
+def _prepare_text(text):
     """
-    Analyze multimodal content (text, audio, image) using appropriate AI models via OpenRouter.
-    - Text analysis: mistralai/mistral-nemo:free
-    - Image analysis: google/gemini-2.0-flash-exp:free (supports vision)
-    - Audio: Transcribed first using OpenAI Whisper API, then analyzed
+    Normalize the text encoding to handle special characters.
+    """
+    try:
+        return text.encode('utf-8', errors='ignore').decode('utf-8')
+    except Exception as e:
+        logger.warning(f"Error normalizing text: {e}")
+        # Fall back to the original text
+        return text
+
+
+def _prepare_audio(audio_path, known_transcription=None, use_cache=True):
+    """
+    Transcribe an audio file and build the prompt parts describing it.
+    
+    The transcript store is consulted before any Speech-to-Text call, so an
+    unchanged recording is only transcribed once. Only Speech-to-Text output is
+    stored: a transcript saved on the entry is used when Speech-to-Text fails,
+    never written to the store.
     
     Args:
-        text (str, optional): The text to analyze
-        audio_path (str, optional): The path to the audio file
-        image_path (str, optional): The path to the image file
+        audio_path (str): The path to the audio file
+        known_transcription (str, optional): A transcript already saved for this file
+        use_cache (bool): Whether to read and write the transcript store
         
     Returns:
-        dict: A dictionary containing the analysis results
+        tuple: (the transcription or None, list of prompt parts)
     """
-    logger.info(f"Analyzing content: text={bool(text)}, audio={bool(audio_path)}, image={bool(image_path)}")
-    
-    # Prepare the content for analysis
     content_parts = []
-    audio_base64 = None
-    image_base64 = None
     audio_transcription = None
-    
-    # Add text content if provided with proper encoding handling
-    if text:
-        # Ensure text is properly encoded to handle special characters
-        try:
-            # Try to normalize the text encoding
-            normalized_text = text.encode('utf-8', errors='ignore').decode('utf-8')
-            content_parts.append(f"TEXT CONTENT: {normalized_text}")
-        except Exception as e:
-            logger.warning(f"Error normalizing text: {e}")
-            # Fall back to the original text
-            content_parts.append(f"TEXT CONTENT: {text}")
-    
-    # Process audio file if provided - transcribe it first using Speech-to-Text
-    if audio_path:
-        try:
+    try:
+        logger.info(f"Processing audio file: {os.path.basename(audio_path)}")
+        audio_sha256 = hash_file(audio_path) if use_cache else None
+        if use_cache:
+            audio_transcription = get_cached_transcript(audio_sha256, TRANSCRIPTION_CONFIG)
+        
+        if audio_transcription:
+            logger.info("Reusing stored transcription, skipping Speech-to-Text")
+        else:
             # First, transcribe the audio using Speech-to-Text (AssemblyAI)
-            logger.info(f"Processing audio file: {os.path.basename(audio_path)}")
             print("\n" + "="*80)
             print("SPEECH-TO-TEXT (AssemblyAI): Starting transcription...")
             print("="*80)
             audio_transcription = transcribe_audio_with_whisper(audio_path)
-            
-            if audio_transcription:
-                print("\n" + "="*80)
-                print("TRANSCRIPTION RESULT:")
-                print(f'"{audio_transcription}"')
-                print("="*80 + "\n")
-                logger.info("Speech-to-Text completed successfully!")
-                logger.info(f"Transcribed text: {audio_transcription[:100]}{'...' if len(audio_transcription) > 100 else ''}")
+            if audio_transcription and use_cache:
+                store_transcript(audio_sha256, TRANSCRIPTION_CONFIG, audio_transcription)
+            elif not audio_transcription and known_transcription:
+                logger.warning("Speech-to-Text failed, using the transcription saved on the entry")
+                audio_transcription = known_transcription
+        
+        if audio_transcription:
+            print("\n" + "="*80)
+            print("TRANSCRIPTION RESULT:")
+            print(f'"{audio_transcription}"')
+            print("="*80 + "\n")
+            logger.info("Speech-to-Text completed successfully!")
+            logger.info(f"Transcribed text: {audio_transcription[:100]}{'...' if len(audio_transcription) > 100 else ''}")
+            # Long recordings are condensed passage by passage; the result keeps the full transcript
+            prompt_transcription, condensed = condense_for_prompt(audio_transcription)
+            if condensed:
+                content_parts.append(f"AUDIO SPEECH-TO-TEXT TRANSCRIPTION (résumée passage par passage, dans l'ordre): {prompt_transcription}")
+                content_parts.append("IMPORTANT: Ce texte résume fidèlement, dans l'ordre, une longue transcription Speech-to-Text professionnelle de l'audio. Base ton analyse émotionnelle sur ce CONTENU RÉEL, pas sur des hypothèses.")
+            else:
                 content_parts.append(f"AUDIO SPEECH-TO-TEXT TRANSCRIPTION (mot pour mot): {audio_transcription}")
                 content_parts.append("IMPORTANT: Cette transcription provient d'un système Speech-to-Text professionnel et représente EXACTEMENT ce qui a été dit dans l'audio. Base ton analyse émotionnelle sur le CONTENU RÉEL de cette transcription, pas sur des hypothèses.")
-            else:
-                logger.warning("Audio transcription failed, skipping audio analysis")
-                logger.warning("Speech-to-Text transcription failed - audio analysis will be skipped")
-                content_parts.append("AUDIO FILE: Transcription non disponible")
-                
-            # Also encode audio for potential future use
-            with open(audio_path, 'rb') as audio_file:
-                audio_bytes = audio_file.read()
-                audio_base64 = base64.b64encode(audio_bytes).decode('utf-8')
-                logger.info(f"Encoded audio file to base64: {len(audio_base64)} characters")
-        except Exception as e:
-            logger.error(f"Error processing audio file: {e}")
-            logger.error(f"Error processing audio: {e}")
-            content_parts.append("AUDIO FILE: Erreur lors du traitement")
+        else:
+            logger.warning("Audio transcription failed, skipping audio analysis")
+            logger.warning("Speech-to-Text transcription failed - audio analysis will be skipped")
+            content_parts.append("AUDIO FILE: Transcription non disponible")
+    except Exception as e:
+        logger.error(f"Error processing audio file: {e}")
+        logger.error(f"Error processing audio: {e}")
+        content_parts.append("AUDIO FILE: Erreur lors du traitement")
     
-    # Process image file if provided
-    if image_path:
+    return audio_transcription, content_parts
+
+
+def _prepare_image(image_path):
+    """
+    Encode an image as a data URL for the vision model.
+    
+    The optimized (rotated, downscaled, size-bounded) copy is sent when the file
+    can be decoded; otherwise the raw file is sent as before.
+    
+    Args:
+        image_path (str): The path to the image file
+        
+    Returns:
+        str: The data URL, or None if the file could not be read
+    """
+    optimized = optimize_image(image_path)
+    if optimized is not None:
+        image_bytes, mime_type = optimized
+    else:
         try:
-            # Read and encode image file to base64
             with open(image_path, 'rb') as image_file:
                 image_bytes = image_file.read()
-                image_base64 = base64.b64encode(image_bytes).decode('utf-8')
-                logger.info(f"Encoded image file to base64: {len(image_base64)} characters")
         except Exception as e:
             logger.error(f"Error encoding image file: {e}")
-        
-        content_parts.append(f"IMAGE FILE: {os.path.basename(image_path)}")
-        content_parts.append("IMPORTANT POUR L'ANALYSE D'IMAGE: Examine attentivement les expressions faciales, la posture corporelle et l'ambiance générale. Sois particulièrement vigilant pour détecter les signes de tristesse, d'anxiété, de stress ou d'autres émotions négatives. Ne présume pas que les gens sourient ou sont heureux par défaut.")
-    
-    # Combine all content
-    combined_content = "\n\n".join(content_parts)
-    
-    # If no content provided, return an error
-    if not combined_content:
-        raise Exception("Aucun contenu à analyser. Veuillez fournir du texte, un fichier audio ou une image.")
+            return None
+        # Determine image type from file extension
+        mime_type = IMAGE_MIME_TYPES.get(os.path.splitext(image_path)[1].lower(), 'image/jpeg')
     
+    image_base64 = base64.b64encode(image_bytes).decode('utf-8')
+    logger.info(f"Encoded image file to base64: {len(image_base64)} characters")
+    return f"data:{mime_type};base64,{image_base64}"
+
+
+def _run_stage(name, timings, memory, func, *args, **kwargs):
+    """
+    Run a pipeline stage in a worker thread and record its duration in milliseconds
+    and how much it raised the process memory high-water mark, in kilobytes.
+    """
+    started = time.perf_counter()
+    peak_before = peak_rss_kb()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        timings[name] = round((time.perf_counter() - started) * 1000, 1)
+        if peak_before is not None:
+            memory[name] = peak_rss_kb() - peak_before
+        # Stages touching the result cache open a connection bound to this worker thread
+        connection.close()
+
+
+def _text_only_fallback(pre_analysis_future, audio_transcription):
+    """
+    Return the text-only pre-analysis when the multimodal call failed, or None.
+    """
+    if pre_analysis_future is None:
+        return None
+    try:
+        results = dict(pre_analysis_future.result())
+    except Exception as e:
+        logger.error(f"Text-only pre-analysis failed too: {e}")
+        return None
+    results.pop('timings', None)
+    results.pop('memory', None)
+    if audio_transcription:
+        results['audio_transcription'] = audio_transcription
+    results['analysis_scope'] = 'text'
+    return results
+
+
+def _build_analysis_prompt(combined_content):
+    """
+    Build the analysis prompt around the combined text, transcription and image notes.
+    """
     # Create an enhanced prompt with more detailed analysis requirements
     prompt = f"""Analyze the following content and provide a VERY detailed structured analysis in French:
 
@@ -222,201 +352,476 @@ INSTRUCTIONS CRITIQUES:
 12. Assure-toi que la réponse JSON est valide et ne contient pas de caractères qui pourraient causer des problèmes d'encodage.
 13. Si une transcription audio est fournie dans le contenu, base ton analyse sur le CONTENU EXACT de la transcription, pas sur des hypothèses.
 """
+    return prompt
+
+
+def _lookup_cached_result(text, audio_path, image_path, model_name, use_cache):
+    """
+    Look up the result cache for this content.
     
+    Returns:
+        tuple: (the cache key or None, the cached result or None)
+    """
+    if not use_cache or not (text or audio_path or image_path):
+        return None, None
     try:
-        # Call OpenRouter API to analyze content
-        logger.info("Sending request to OpenRouter AI...")
-        
-        # Prepare the request payload with a more detailed system prompt
-        # Build the user message content
-        user_message_content = []
-        
-        # Add text prompt
-        user_message_content.append({
-            "type": "text",
-            "text": prompt
-        })
-        
-        # Add image if provided (using data URL format)
-        if image_base64:
-            # Determine image type from file extension
-            image_ext = os.path.splitext(image_path)[1].lower()
-            mime_types = {
-                '.jpg': 'image/jpeg',
-                '.jpeg': 'image/jpeg',
-                '.png': 'image/png',
-                '.gif': 'image/gif',
-                '.webp': 'image/webp'
-            }
-            mime_type = mime_types.get(image_ext, 'image/jpeg')
-            
-            user_message_content.append({
-                "type": "image_url",
-                "image_url": {
-                    "url": f"data:{mime_type};base64,{image_base64}"
-                }
-            })
-            logger.info(f"Added image to request with MIME type: {mime_type}")
-        
-        # Note: Audio is transcribed separately using Whisper, so we don't send audio_url anymore
-        
-        # Choose the right model based on content type
-        # Use Google Gemini Flash (free) for images as it supports vision
-        # Use Mistral Nemo (free) for text-only analysis
-        if image_base64:
-            model_name = "google/gemini-2.0-flash-exp:free"
-            logger.info("Using Google Gemini Flash for image analysis")
+        cache_key = compute_cache_key(
+            text=text,
+            audio_path=audio_path,
+            image_path=image_path,
+            model_name=model_name,
+            prompt_version=PROMPT_VERSION
+        )
+    except OSError as e:
+        logger.warning(f"Could not hash content for the result cache: {e}")
+        return None, None
+    return cache_key, get_cached_result(cache_key)
+
+
+def _prepare_content(executor, timings, memory, text, audio_path, image_path, use_cache, known_transcription):
+    """
+    Run the audio and image stages on the executor and build the analysis prompt.
+    
+    Returns:
+        tuple: (the prompt, the image data URL or None, the audio transcription or None)
+    """
+    audio_future = None
+    image_future = None
+    if audio_path:
+        audio_future = executor.submit(
+            _run_stage, 'transcription', timings, memory,
+            _prepare_audio, audio_path, known_transcription=known_transcription, use_cache=use_cache
+        )
+    if image_path:
+        image_future = executor.submit(_run_stage, 'image_encoding', timings, memory, _prepare_image, image_path)
+    
+    # Prepare the content for analysis
+    content_parts = []
+    audio_transcription = None
+    image_data_url = None
+    
+    # Add text content if provided with proper encoding handling
+    if text:
+        prompt_text, condensed = condense_for_prompt(_prepare_text(text))
+        if condensed:
+            content_parts.append(f"TEXT CONTENT (long texte résumé passage par passage, dans l'ordre): {prompt_text}")
         else:
-            model_name = "mistralai/mistral-nemo:free"
-            logger.info("Using Mistral Nemo for text analysis")
-        
-        payload = {
-            "model": model_name,
-            "messages": [
-                {"role": "system", "content": "Tu es un assistant d'analyse avancé spécialisé dans l'analyse de journaux personnels. Tu excelles dans l'analyse de texte, audio et images pour en extraire des insights profonds. Tu es PARTICULIÈREMENT doué pour détecter avec précision les émotions réelles dans les expressions faciales, le langage corporel et le ton vocal, qu'elles soient positives (joie, enthousiasme, sérénité) ou négatives (tristesse, anxiété, colère). Pour l'audio, tu commences TOUJOURS par transcrire EXACTEMENT ce qui est dit, mot pour mot, avant de faire ton analyse. NE FABRIQUE JAMAIS une transcription - si tu ne peux pas comprendre l'audio clairement, indique simplement 'Transcription non claire' au lieu d'inventer du contenu. Tu fournis toujours des analyses détaillées, empathiques et pertinentes en français. Tu réponds UNIQUEMENT avec du JSON valide, sans texte supplémentaire. Tes résumés sont toujours personnalisés, utilisant la forme 'tu', et offrent des perspectives significatives. IMPORTANT: N'utilise PAS de caractères spéciaux ou Unicode rares dans tes réponses - utilise uniquement des caractères ASCII standard et des caractères français courants pour éviter les problèmes d'encodage."},
-                {"role": "user", "content": user_message_content if len(user_message_content) > 1 else prompt}
-            ]
-        }
+            content_parts.append(f"TEXT CONTENT: {prompt_text}")
+    
+    # Audio is transcribed first using Speech-to-Text
+    if audio_future:
+        audio_transcription, audio_parts = audio_future.result()
+        content_parts.extend(audio_parts)
+    
+    if image_future:
+        image_data_url = image_future.result()
+        content_parts.append(f"IMAGE FILE: {os.path.basename(image_path)}")
+        content_parts.append("IMPORTANT POUR L'ANALYSE D'IMAGE: Examine attentivement les expressions faciales, la posture corporelle et l'ambiance générale. Sois particulièrement vigilant pour détecter les signes de tristesse, d'anxiété, de stress ou d'autres émotions négatives. Ne présume pas que les gens sourient ou sont heureux par défaut.")
+    
+    # Combine all content
+    combined_content = "\n\n".join(content_parts)
+    
+    # If no content provided, return an error
+    if not combined_content:
+        raise Exception("Aucun contenu à analyser. Veuillez fournir du texte, un fichier audio ou une image.")
+    
+    return _build_analysis_prompt(combined_content), image_data_url, audio_transcription
+
+
+def analyze_multimodal_content(text=None, audio_path=None, image_path=None, use_cache=True, known_transcription=None):
+    """
+    Analyze multimodal content (text, audio, image) using appropriate AI models via OpenRouter.
+    - Text analysis: mistralai/mistral-nemo:free
+    - Image analysis: google/gemini-2.0-flash-exp:free (supports vision)
+    - Audio: Transcribed first using AssemblyAI, then analyzed
+    
+    Audio transcription, image encoding and (for text plus media, when
+    ANALYSIS_PIPELINE['text_pre_analysis'] is on) a text-only pre-analysis run
+    concurrently; the duration of each stage is reported in
+    the 'timings' entry of the result, in milliseconds. The 'memory' entry holds
+    the process peak RSS and how much each stage raised it, in kilobytes.
+    
+    Results are cached on a hash of the content, model and prompt version, so
+    analyzing the same content twice only calls OpenRouter once.
+    
+    Args:
+        text (str, optional): The text to analyze
+        audio_path (str, optional): The path to the audio file
+        image_path (str, optional): The path to the image file
+        use_cache (bool): Whether to read and write the result and transcript caches
+        known_transcription (str, optional): A transcript saved for the audio file (e.g. when
+            re-analyzing an edited entry), used if Speech-to-Text fails
         
-        # Make the API request using the exact format provided with proper encoding
-        # Ajout des paramètres requis par OpenRouter
-        if "max_tokens" not in payload:
-            payload["max_tokens"] = 1000
-        if "temperature" not in payload:
-            payload["temperature"] = 0.7
-            
-        # Log the payload for debugging
-        logger.info(f"Sending payload to OpenRouter: {json.dumps(payload, ensure_ascii=False)}")
-            
-        response = requests.post(
-            url="https://openrouter.ai/api/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-                "Content-Type": "application/json",
-                "HTTP-Referer": "http://localhost:8000",
-                "X-Title": "MindScribe Journal"
-            },
-            json=payload  # Using json parameter instead of data for proper JSON handling
+    Returns:
+        dict: A dictionary containing the analysis results
+    """
+    logger.info(f"Analyzing content: text={bool(text)}, audio={bool(audio_path)}, image={bool(image_path)}")
+    started = time.perf_counter()
+    timings = {}
+    memory = {}
+    config = get_pipeline_config()
+    
+    # Use Google Gemini Flash (free) for images as it supports vision
+    # Use Mistral Nemo (free) for text-only analysis
+    model_name = VISION_MODEL if image_path else TEXT_MODEL
+    
+    # Serve repeated analyses of identical content from the cache
+    cache_key, cached_result = _lookup_cached_result(text, audio_path, image_path, model_name, use_cache)
+    if cached_result is not None:
+        cached_result['timings'] = {'total': round((time.perf_counter() - started) * 1000, 1)}
+        cached_result['memory'] = {'peak_rss_kb': peak_rss_kb(), 'stages': {}}
+        return cached_result
+    
+    # Independent stages overlap, so time to result is the slowest stage rather than their sum
+    executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix='analysis-stage')
+    try:
+        pre_analysis_future = None
+        if text and (audio_path or image_path) and config['text_pre_analysis']:
+            pre_analysis_future = executor.submit(
+                _run_stage, 'text_pre_analysis', timings, memory,
+                analyze_multimodal_content, text=text, use_cache=use_cache
+            )
+        
+        prompt, image_data_url, audio_transcription = _prepare_content(
+            executor, timings, memory, text, audio_path, image_path, use_cache, known_transcription
         )
         
-        # Check if the request was successful
-        response.raise_for_status()
-        
-        # Parse the response
-        response_data = response.json()
-        ai_response = response_data["choices"][0]["message"]["content"]
-        logger.info(f"Received response from OpenRouter AI")
-        print(f"Raw response from OpenRouter AI: {ai_response}")
-        
-        # Clean up the response - remove markdown code blocks if present
-        if ai_response.startswith("```") and "```" in ai_response[3:]:
-            # Extract the JSON content from markdown code blocks
-            ai_response = ai_response.split("```", 2)[1]
-            if ai_response.startswith("json"):
-                ai_response = ai_response[4:]
-            ai_response = ai_response.strip()
-            
-        # Parse JSON response with thorough encoding handling
+        llm_started = time.perf_counter()
         try:
-            # First attempt to parse the JSON as is
-            ai_results = json.loads(ai_response)
-            logger.info(f"Successfully parsed JSON from OpenRouter AI")
-        except json.JSONDecodeError as e:
-            logger.error(f"JSON parsing error: {e}")
-            try:
-                # First level of cleaning - handle basic encoding issues
-                cleaned_response = ai_response.encode('utf-8', errors='ignore').decode('utf-8')
-                ai_results = json.loads(cleaned_response)
-                logger.info("Successfully parsed JSON after basic cleaning from OpenRouter AI")
-            except json.JSONDecodeError:
-                try:
-                    # Second level of cleaning - remove problematic characters
-                    cleaned_response = ''.join(c for c in cleaned_response if ord(c) < 65536 and c.isprintable())
-                    ai_results = json.loads(cleaned_response)
-                    logger.info("Successfully parsed JSON after removing problematic characters")
-                except json.JSONDecodeError:
-                    try:
-                        # Third level of cleaning - try to fix common JSON syntax errors
-                        cleaned_response = cleaned_response.replace("'", '"')  # Replace single quotes with double quotes
-                        cleaned_response = re.sub(r',\s*}', '}', cleaned_response)  # Remove trailing commas
-                        cleaned_response = re.sub(r',\s*]', ']', cleaned_response)  # Remove trailing commas in arrays
-                        ai_results = json.loads(cleaned_response)
-                        logger.info("Successfully parsed JSON after fixing syntax errors")
-                    except Exception as parse_error:
-                        logger.error(f"Failed to parse JSON after multiple cleaning attempts: {parse_error}")
-                        # If all parsing attempts fail, raise a clear error
-                        raise Exception(f"Error in AI analysis: Unable to parse AI response as JSON after multiple attempts")
-        
-        # Use the AI results directly without any fallback values
-        results = {
-            "sentiment": ai_results.get("sentiment"),
-            "emotion_score": ai_results.get("emotion_score"),
-            "emotions_detected": ai_results.get("emotions_detected"),
-            "keywords": ai_results.get("keywords"),
-            "summary": ai_results.get("summary"),
-            "detailed_summary": ai_results.get("detailed_summary"),
-            "topics": ai_results.get("topics"),
-            "positive_aspects": ai_results.get("positive_aspects"),
-            "negative_aspects": ai_results.get("negative_aspects"),
-            "action_items": ai_results.get("action_items"),
-            "mood_analysis": ai_results.get("mood_analysis"),
-            # Use the REAL transcription from Whisper, not the AI's fabricated one
-            "audio_transcription": audio_transcription if audio_transcription else ai_results.get("audio_transcription"),
-            "image_caption": ai_results.get("image_caption"),
-            "image_scene": ai_results.get("image_scene"),
-            "image_analysis": ai_results.get("image_analysis")
-        }
-        
-        # If any required fields are missing, raise an error
-        required_fields = ["sentiment", "emotion_score", "keywords", "summary", "topics"]
-        missing_fields = [field for field in required_fields if results.get(field) is None]
-        if missing_fields:
-            raise Exception(f"Error in AI analysis: Missing required fields in AI response: {', '.join(missing_fields)}")
-            
-        logger.info("Successfully analyzed content using OpenRouter AI")
-        
-        # Define a recursive function to sanitize all strings in the results
-        def sanitize_value(value):
-            if isinstance(value, str):
-                # First, normalize the string to remove problematic characters
-                sanitized = value.encode('utf-8', errors='ignore').decode('utf-8')
-                # Then, remove any characters that can't be encoded in charmap
-                sanitized = ''.join(c for c in sanitized if ord(c) < 65536 and c.isprintable())
-                return sanitized
-            elif isinstance(value, list):
-                return [sanitize_value(item) for item in value]
-            elif isinstance(value, dict):
-                return {k: sanitize_value(v) for k, v in value.items()}
-            else:
-                return value
+            results = _request_analysis(prompt, model_name, image_data_url, audio_transcription)
+        except Exception as e:
+            results = _text_only_fallback(pre_analysis_future, audio_transcription)
+            if results is None:
+                raise
+            logger.warning(f"Multimodal analysis failed ({e}), using the text-only pre-analysis")
+        else:
+            if cache_key:
+                store_result(cache_key, results, model_name=model_name, prompt_version=PROMPT_VERSION)
+        finally:
+            timings['llm'] = round((time.perf_counter() - llm_started) * 1000, 1)
+    finally:
+        # A pre-analysis still in flight finishes in the background and lands in the result cache
+        executor.shutdown(wait=False)
+    
+    timings['total'] = round((time.perf_counter() - started) * 1000, 1)
+    results['timings'] = dict(timings)
+    results['memory'] = {'peak_rss_kb': peak_rss_kb(), 'stages': dict(memory)}
+    return results
+
+
+def stream_multimodal_analysis(text=None, audio_path=None, image_path=None, use_cache=True, known_transcription=None):
+    """
+    Analyze multimodal content with a streamed completion, yielding fields as they complete.
+    
+    Same pipeline as analyze_multimodal_content() (cache, concurrent audio and image
+    stages, same prompt), but the OpenRouter call uses SSE streaming and the answer is
+    parsed incrementally, so the first fields are available long before the whole
+    completion. The 'first_field' timing measures that delay.
+    
+    Args:
+        text (str, optional): The text to analyze
+        audio_path (str, optional): The path to the audio file
+        image_path (str, optional): The path to the image file
+        use_cache (bool): Whether to read and write the result and transcript caches
+        known_transcription (str, optional): A transcript saved for the audio file, used if Speech-to-Text fails
         
-        # Apply the sanitization function to all values in the results
-        results = sanitize_value(results)
+    Yields:
+        tuple: ('field', name, value) for each top-level field of the analysis, then
+               ('result', results) with the complete, validated results
+    """
+    logger.info(f"Streaming analysis: text={bool(text)}, audio={bool(audio_path)}, image={bool(image_path)}")
+    started = time.perf_counter()
+    timings = {}
+    memory = {}
+    model_name = VISION_MODEL if image_path else TEXT_MODEL
+    
+    cache_key, cached_result = _lookup_cached_result(text, audio_path, image_path, model_name, use_cache)
+    if cached_result is not None:
+        for name, value in cached_result.items():
+            yield ('field', name, value)
+        cached_result['timings'] = {'total': round((time.perf_counter() - started) * 1000, 1)}
+        cached_result['memory'] = {'peak_rss_kb': peak_rss_kb(), 'stages': {}}
+        yield ('result', cached_result)
+        return
+    
+    executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='analysis-stage')
+    try:
+        prompt, image_data_url, audio_transcription = _prepare_content(
+            executor, timings, memory, text, audio_path, image_path, use_cache, known_transcription
+        )
+    finally:
+        executor.shutdown(wait=False)
+    
+    # The real transcription is known before the model starts answering
+    if audio_transcription:
+        yield ('field', 'audio_transcription', audio_transcription)
+    
+    llm_started = time.perf_counter()
+    parser = IncrementalJSONParser()
+    try:
+        payload = _build_payload(prompt, model_name, image_data_url)
+        for delta in get_client().stream_chat_completion(
+            payload,
+            title="MindScribe Journal",
+            referer="http://localhost:8000"
+        ):
+            for name, value in parser.feed(delta):
+                if 'first_field' not in timings:
+                    timings['first_field'] = round((time.perf_counter() - started) * 1000, 1)
+                # Never surface a transcription made up by the model
+                if name == 'audio_transcription':
+                    continue
+                yield ('field', name, sanitize(value))
+        results = _parse_analysis_response(parser.text, audio_transcription)
+    except Exception as e:
+        raise _analysis_error(e)
+    finally:
+        timings['llm'] = round((time.perf_counter() - llm_started) * 1000, 1)
+    
+    if cache_key:
+        store_result(cache_key, results, model_name=model_name, prompt_version=PROMPT_VERSION)
+    
+    timings['total'] = round((time.perf_counter() - started) * 1000, 1)
+    results['timings'] = dict(timings)
+    results['memory'] = {'peak_rss_kb': peak_rss_kb(), 'stages': dict(memory)}
+    yield ('result', results)
+
+
+def _build_payload(prompt, model_name, image_data_url=None):
+    """
+    Build the OpenRouter chat completion payload for the analysis prompt.
+    
+    Args:
+        prompt (str): The analysis prompt
+        model_name (str): The model to use
+        image_data_url (str, optional): The image as a data URL
         
-        print(f"Final results: {results}")
-        return results
+    Returns:
+        dict: The request payload
+    """
+    # Prepare the request payload with a more detailed system prompt
+    # Build the user message content
+    user_message_content = []
+    
+    # Add text prompt
+    user_message_content.append({
+        "type": "text",
+        "text": prompt
+    })
+    
+    # Add image if provided (using data URL format)
+    if image_data_url:
+        user_message_content.append({
+            "type": "image_url",
+            "image_url": {
+                "url": image_data_url
+            }
+        })
+        logger.info(f"Added image to request with MIME type: {image_data_url[5:image_data_url.index(';')]}")
+    
+    # Note: Audio is transcribed separately using Whisper, so we don't send audio_url anymore
+    
+    logger.info(f"Using {model_name} for analysis")
+    
+    payload = {
+        "model": model_name,
+        "messages": [
+            {"role": "system", "content": "Tu es un assistant d'analyse avancé spécialisé dans l'analyse de journaux personnels. Tu excelles dans l'analyse de texte, audio et images pour en extraire des insights profonds. Tu es PARTICULIÈREMENT doué pour détecter avec précision les émotions réelles dans les expressions faciales, le langage corporel et le ton vocal, qu'elles soient positives (joie, enthousiasme, sérénité) ou négatives (tristesse, anxiété, colère). Pour l'audio, tu commences TOUJOURS par transcrire EXACTEMENT ce qui est dit, mot pour mot, avant de faire ton analyse. NE FABRIQUE JAMAIS une transcription - si tu ne peux pas comprendre l'audio clairement, indique simplement 'Transcription non claire' au lieu d'inventer du contenu. Tu fournis toujours des analyses détaillées, empathiques et pertinentes en français. Tu réponds UNIQUEMENT avec du JSON valide, sans texte supplémentaire. Tes résumés sont toujours personnalisés, utilisant la forme 'tu', et offrent des perspectives significatives. IMPORTANT: N'utilise PAS de caractères spéciaux ou Unicode rares dans tes réponses - utilise uniquement des caractères ASCII standard et des caractères français courants pour éviter les problèmes d'encodage."},
+            {"role": "user", "content": user_message_content if len(user_message_content) > 1 else prompt}
+        ]
+    }
+    
+    # Make the API request using the exact format provided with proper encoding
+    # Ajout des paramètres requis par OpenRouter
+    if "max_tokens" not in payload:
+        payload["max_tokens"] = 1000
+    if "temperature" not in payload:
+        payload["temperature"] = 0.7
+        
+    # Log the payload for debugging
+    logger.info(f"Sending payload to OpenRouter: {json.dumps(payload, ensure_ascii=False)}")
+    
+    return payload
+
+
+def _parse_analysis_response(ai_response, audio_transcription=None):
+    """
+    Parse the model's JSON answer into sanitized analysis results.
+    
+    Args:
+        ai_response (str): The raw completion text
+        audio_transcription (str, optional): The real transcription, preferred over the model's
         
-    except requests.exceptions.HTTPError as e:
-        logger.error(f"HTTP error using OpenRouter AI: {e}")
+    Returns:
+        dict: The sanitized analysis results
+    """
+    # Single pass: locate the object, repair it if needed, validate and clean the fields
+    try:
+        results = parse_llm_json(ai_response, ANALYSIS_SCHEMA)
+    except LLMJSONError as e:
+        logger.error(f"Failed to parse JSON from OpenRouter AI: {e}")
+        raise Exception(f"Error in AI analysis: {e}")
+
+    # Use the REAL transcription from Whisper, never the AI's fabricated one
+    results.pop("audio_transcription", None)
+    if audio_transcription:
+        results["audio_transcription"] = clean_text(audio_transcription)
+
+    logger.info("Successfully analyzed content using OpenRouter AI")
+
+    print(f"Final results: {results}")
+    return results
+
+
+def _analysis_error(error):
+    """
+    Convert an OpenRouter failure into the error raised to callers of the analysis.
+    """
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        logger.error(f"HTTP error using OpenRouter AI: {error}")
         
         # Log specific error details based on status code
-        if e.response.status_code == 401:
+        if error.response.status_code == 401:
             error_message = "Error in AI analysis: API key is invalid or expired. Please check your OpenRouter API key."
-        elif e.response.status_code == 403:
+        elif error.response.status_code == 403:
             error_message = "Error in AI analysis: API access forbidden. Please check your permissions."
-        elif e.response.status_code == 429:
+        elif error.response.status_code == 429:
             error_message = "Error in AI analysis: Rate limit exceeded. Please try again later."
         else:
-            error_message = f"Error in AI analysis: HTTP error {e.response.status_code} - {str(e)}"
+            error_message = f"Error in AI analysis: HTTP error {error.response.status_code} - {str(error)}"
+    else:
+        logger.error(f"Error using OpenRouter AI: {error}")
+        error_message = f"Error in AI analysis: {str(error)}"
+    
+    logger.error(error_message)
+    return Exception(error_message)
+
+
+def _request_analysis(prompt, model_name, image_data_url=None, audio_transcription=None):
+    """
+    Send the analysis prompt (and image) to OpenRouter and parse the JSON answer.
+    
+    Args:
+        prompt (str): The analysis prompt
+        model_name (str): The model to use
+        image_data_url (str, optional): The image as a data URL
+        audio_transcription (str, optional): The transcription of the audio
+        
+    Returns:
+        dict: The sanitized analysis results
+    """
+    def call_model(model, timeout):
+        payload = _build_payload(prompt, model, image_data_url)
+        
+        # The shared client pools connections, retries transient errors and enforces a deadline
+        response_data = get_client().chat_completion(
+            payload,
+            deadline=timeout,
+            title="MindScribe Journal",
+            referer="http://localhost:8000"
+        )
         
-        logger.error(error_message)
-        raise Exception(error_message)
+        # Parse the response (an unusable answer counts as a failure of that model)
+        ai_response = response_data["choices"][0]["message"]["content"]
+        logger.info(f"Received response from OpenRouter AI ({model})")
+        print(f"Raw response from OpenRouter AI: {ai_response}")
+        return _parse_analysis_response(ai_response, audio_transcription)
     
+    try:
+        # Call OpenRouter API to analyze content, on the fastest healthy model of the tier
+        logger.info("Sending request to OpenRouter AI...")
+        fallbacks = getattr(settings, 'ANALYSIS_FALLBACK_MODELS', {}).get('vision' if image_data_url else 'text', [])
+        results, _ = get_router().call(call_model, [model_name] + list(fallbacks))
+        return results
+    
+    except RoutingError as e:
+        # Report the underlying error of the preferred model (e.g. an invalid API key)
+        raise _analysis_error(e.errors[0] if e.errors else e)
     except Exception as e:
-        logger.error(f"Error using OpenRouter AI: {e}")
-        error_message = f"Error in AI analysis: {str(e)}"
-        logger.error(error_message)
-        raise Exception(error_message)
+        raise _analysis_error(e)
+
+
+def _analysis_fields(analysis_results):
+    """
+    Map analysis results to JournalAnalysis fields, replacing None by empty values.
+    """
+    return {
+        'sentiment': analysis_results.get('sentiment', 'neutre'),
+        'emotion_score': analysis_results.get('emotion_score', 0.5),
+        'emotions_detected': analysis_results.get('emotions_detected') or [],
+        'keywords': analysis_results.get('keywords') or [],
+        'topics': analysis_results.get('topics') or [],
+        'summary': analysis_results.get('summary') or '',
+        'detailed_summary': analysis_results.get('detailed_summary') or '',
+        'positive_aspects': analysis_results.get('positive_aspects') or [],
+        'negative_aspects': analysis_results.get('negative_aspects') or [],
+        'action_items': analysis_results.get('action_items') or [],
+        'mood_analysis': analysis_results.get('mood_analysis') or '',
+        'audio_transcription': analysis_results.get('audio_transcription') or '',
+        'image_caption': analysis_results.get('image_caption') or '',
+        'image_scene': analysis_results.get('image_scene') or '',
+        'image_analysis': analysis_results.get('image_analysis') or '',
+    }
+
+
+def save_journal_analysis(user, text, analysis_results, audio_file=None, image_file=None):
+    """
+    Save analysis results as a JournalAnalysis entry for a user.
+    
+    Args:
+        user: User object
+        text (str): The analyzed text
+        analysis_results (dict): The results returned by analyze_multimodal_content()
+            or by the fast tier (tiers.analyze_fast)
+        audio_file (File, optional): The analyzed audio file
+        image_file (File, optional): The analyzed image file
+        
+    Returns:
+        JournalAnalysis: The created entry
+    """
+    from .models import JournalAnalysis
+    
+    journal_analysis = JournalAnalysis.objects.create(
+        user=user,
+        text=text if text else '',
+        analysis_tier=analysis_results.get('analysis_tier') or JournalAnalysis.TIER_FULL,
+        **_analysis_fields(analysis_results)
+    )
+    
+    # Save audio and image if provided
+    if audio_file or image_file:
+        if audio_file:
+            journal_analysis.audio_file = audio_file
+        if image_file:
+            journal_analysis.image_file = image_file
+        journal_analysis.save()
+    
+    return journal_analysis
+
+
+def enrich_journal_analysis(analysis_id, analysis_results):
+    """
+    Replace the results of a saved (fast tier) analysis by the full analysis.
+    
+    Args:
+        analysis_id (str): The JournalAnalysis ID
+        analysis_results (dict): The results returned by analyze_multimodal_content()
+        
+    Returns:
+        JournalAnalysis: The updated entry, or None if it was deleted in the meantime
+    """
+    from .models import JournalAnalysis
+    
+    journal_analysis = JournalAnalysis.objects.filter(id=analysis_id).first()
+    if journal_analysis is None:
+        logger.warning(f"Analysis {analysis_id} no longer exists, dropping its full analysis")
+        return None
+    
+    for field, value in _analysis_fields(analysis_results).items():
+        setattr(journal_analysis, field, value)
+    journal_analysis.analysis_tier = JournalAnalysis.TIER_FULL
+    journal_analysis.save()
+    return journal_analysis
 
 
 # Fonction de fallback supprimée pour utiliser uniquement l'API OpenRouter
@@ -0,0 +1,127 @@
+"""
+Incremental extraction of JSON fields from a streamed LLM completion.
+
+The analysis prompt asks the model for a single JSON object. While the completion is
+streamed, IncrementalJSONParser follows the object character by character and hands back
+each top-level field (`sentiment`, `summary`, `keywords`...) as soon as its value is
+closed, so the page can render it without waiting for the rest of the answer.
+"""
+import json
+import logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class IncrementalJSONParser:
+    """
+    Streaming parser emitting the top-level fields of a JSON object as they complete.
+
+    Text before the opening brace (e.g. a ```json fence) is ignored. Values that do not
+    parse are skipped; the complete answer is still parsed (and repaired) at the end.
+    """
+
+    def __init__(self):
+        self.text = ''
+        self.fields = {}
+        self.done = False
+        self._pos = 0
+        self._started = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._state = 'key'
+        self._key = None
+        self._key_start = None
+        self._value_start = None
+        self._value_kind = None
+
+    def feed(self, chunk):
+        """
+        Consume a chunk of the completion.
+
+        Args:
+            chunk (str): The next piece of the streamed text
+
+        Returns:
+            list: (name, value) tuples of the fields completed by this chunk
+        """
+        self.text += chunk
+        completed = []
+        text = self.text
+        i = self._pos
+
+        while i < len(text) and not self.done:
+            c = text[i]
+
+            if not self._started:
+                if c == '{':
+                    self._started = True
+                    self._depth = 1
+            elif self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == '\\':
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._state == 'in_key':
+                        self._key = self._decode(text[self._key_start:i + 1])
+                        self._state = 'colon'
+                    elif self._depth == 1 and self._state == 'in_value':
+                        self._emit(text[self._value_start:i + 1], completed)
+            elif c == '"':
+                self._in_string = True
+                if self._depth == 1 and self._state == 'key':
+                    self._key_start = i
+                    self._state = 'in_key'
+                elif self._depth == 1 and self._state == 'value':
+                    self._start_value(i, 'string')
+            elif c in '{[':
+                if self._depth == 1 and self._state == 'value':
+                    self._start_value(i, 'container')
+                self._depth += 1
+            elif c in '}]':
+                self._depth -= 1
+                if self._depth == 1 and self._state == 'in_value' and self._value_kind == 'container':
+                    self._emit(text[self._value_start:i + 1], completed)
+                elif self._depth == 0:
+                    if self._state == 'in_value' and self._value_kind == 'primitive':
+                        self._emit(text[self._value_start:i], completed)
+                    self.done = True
+            elif self._depth == 1:
+                if c == ',':
+                    if self._state == 'in_value' and self._value_kind == 'primitive':
+                        self._emit(text[self._value_start:i], completed)
+                    self._state = 'key'
+                elif c == ':' and self._state == 'colon':
+                    self._state = 'value'
+                elif not c.isspace() and self._state == 'value':
+                    self._start_value(i, 'primitive')
+            i += 1
+
+        self._pos = i
+        return completed
+
+    def _start_value(self, index, kind):
+        self._value_start = index
+        self._value_kind = kind
+        self._state = 'in_value'
+
+    def _decode(self, raw):
+        try:
+            return json.loads(raw)
+        except ValueError:
+            return None
+
+    def _emit(self, raw, completed):
+        self._state = 'comma'
+        if self._key is None:
+            return
+        try:
+            value = json.loads(raw.strip())
+        except ValueError:
+            logger.debug(f"Skipping unparsable streamed field {self._key}")
+            return
+        self.fields[self._key] = value
+        completed.append((self._key, value))
@@ -0,0 +1,240 @@
+"""
+Length-aware map-reduce summarization of long entries and transcripts.
+
+Summarization models have a bounded input (mbart-large-50 stops at 1024 tokens and
+silently truncates the rest), and sending an hour-long transcript to the LLM in one
+prompt is slow, expensive and may exceed the context. Long texts are therefore split on
+sentence boundaries into token-bounded chunks; the chunks are summarized in parallel
+(one batched forward pass locally, concurrent OpenRouter calls otherwise) and the joined
+chunk summaries are reduced again until they fit.
+
+Chunk summaries are stored in the analysis result cache, keyed on the chunk text and
+the summarizer, and chunks are packed greedily from the start of the text: appending to
+an entry leaves the earlier chunks unchanged, so only the new ones are summarized.
+"""
+import logging
+import math
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from mindscribe.openrouter import get_client
+from .cache import compute_cache_key, get_cached_result, store_result
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_SUMMARIZATION_CONFIG = {
+    'chunk_tokens': 700,            # Token budget of one chunk (below mbart's 1024)
+    'max_prompt_tokens': 6000,      # Longer texts are condensed before the analysis prompt
+    'concurrency': 4,               # Concurrent LLM calls when summarizing chunks
+    'local_batch_size': 8,          # Chunks per generation of the local model (bounds peak memory)
+    'chunk_summary_words': 120,     # Target length of an LLM chunk summary
+    'llm_model': None,              # Defaults to the analysis text model
+}
+
+# Bump whenever the chunk summary prompt changes so cached summaries are not reused
+SUMMARY_PROMPT_VERSION = "chunk-1"
+
+# Maximum reduce rounds, as a guard against summarizers that do not shorten their input
+MAX_REDUCE_ROUNDS = 4
+
+_SENTENCE_END_RE = re.compile(r'(?<=[.!?…])\s+|\n+')
+
+
+def get_summarization_config():
+    """
+    Return the summarization configuration merged with the ANALYSIS_SUMMARIZATION setting.
+    """
+    config = dict(DEFAULT_SUMMARIZATION_CONFIG)
+    config.update(getattr(settings, 'ANALYSIS_SUMMARIZATION', {}))
+    return config
+
+
+def estimate_tokens(text):
+    """
+    Estimate the number of tokens of a French text (about 4 characters per token).
+    """
+    return math.ceil(len(text) / 4)
+
+
+def split_sentences(text):
+    """
+    Split a text into sentences on terminal punctuation and line breaks.
+    """
+    return [sentence.strip() for sentence in _SENTENCE_END_RE.split(text) if sentence.strip()]
+
+
+def _split_long_sentence(sentence, max_tokens, count_tokens):
+    pieces = []
+    words = []
+    for word in sentence.split():
+        if words and count_tokens(' '.join(words + [word])) > max_tokens:
+            pieces.append(' '.join(words))
+            words = []
+        words.append(word)
+    if words:
+        pieces.append(' '.join(words))
+    return pieces
+
+
+def chunk_text(text, max_tokens, count_tokens=estimate_tokens):
+    """
+    Pack consecutive sentences into chunks of at most max_tokens.
+
+    A sentence longer than the budget on its own is split on word boundaries.
+
+    Args:
+        text (str): The text to split
+        max_tokens (int): The token budget of a chunk
+        count_tokens (callable, optional): Token counter, defaults to estimate_tokens
+
+    Returns:
+        list: The chunks, in order
+    """
+    chunks = []
+    current = []
+    current_tokens = 0
+    for sentence in split_sentences(text):
+        sentence_tokens = count_tokens(sentence)
+        if sentence_tokens > max_tokens:
+            pieces = _split_long_sentence(sentence, max_tokens, count_tokens)
+        else:
+            pieces = [sentence]
+        for piece in pieces:
+            piece_tokens = sentence_tokens if len(pieces) == 1 else count_tokens(piece)
+            if current and current_tokens + piece_tokens > max_tokens:
+                chunks.append(' '.join(current))
+                current = []
+                current_tokens = 0
+            current.append(piece)
+            current_tokens += piece_tokens + 1
+    if current:
+        chunks.append(' '.join(current))
+    return chunks
+
+
+def summarize_chunks(chunks, summarize_batch, namespace):
+    """
+    Summarize chunks, reusing cached summaries and computing the missing ones in one batch.
+
+    Args:
+        chunks (list): The chunk texts
+        summarize_batch (callable): Takes a list of texts, returns their summaries
+        namespace (str): Identifies the summarizer in the cache key (model, length...)
+
+    Returns:
+        list: The chunk summaries, in order
+    """
+    keys = [
+        compute_cache_key(text=chunk, model_name=namespace, prompt_version=SUMMARY_PROMPT_VERSION)
+        for chunk in chunks
+    ]
+    summaries = []
+    missing = []
+    for index, key in enumerate(keys):
+        cached = get_cached_result(key)
+        summaries.append(cached.get('summary') if cached else None)
+        if summaries[-1] is None:
+            missing.append(index)
+
+    if missing:
+        logger.info(f"Summarizing {len(missing)} of {len(chunks)} chunks ({namespace})")
+        for index, summary in zip(missing, summarize_batch([chunks[i] for i in missing])):
+            summaries[index] = summary
+            store_result(keys[index], {'summary': summary}, model_name=namespace, prompt_version=SUMMARY_PROMPT_VERSION)
+    return summaries
+
+
+def condense(text, summarize_batch, namespace, max_tokens, chunk_tokens=None, count_tokens=estimate_tokens):
+    """
+    Replace a text by its joined chunk summaries until it fits in max_tokens.
+
+    Returns:
+        str: The text itself when it already fits, else the condensed text
+    """
+    chunk_tokens = chunk_tokens or get_summarization_config()['chunk_tokens']
+    for _ in range(MAX_REDUCE_ROUNDS):
+        if count_tokens(text) <= max_tokens:
+            break
+        chunks = chunk_text(text, chunk_tokens, count_tokens)
+        text = '\n'.join(summarize_chunks(chunks, summarize_batch, namespace))
+    return text
+
+
+def map_reduce_summarize(text, summarize_batch, namespace, chunk_tokens=None, count_tokens=estimate_tokens):
+    """
+    Summarize a text of any length.
+
+    Texts within one chunk are summarized directly; longer ones are condensed chunk by
+    chunk until the joined summaries fit in one chunk, which is then summarized.
+
+    Returns:
+        str: The summary
+    """
+    chunk_tokens = chunk_tokens or get_summarization_config()['chunk_tokens']
+    if count_tokens(text) > chunk_tokens:
+        text = condense(text, summarize_batch, namespace, chunk_tokens, chunk_tokens, count_tokens)
+    return summarize_chunks([text], summarize_batch, namespace)[0]
+
+
+def _llm_summarize(text, model_name, words):
+    prompt = (
+        f"Résume fidèlement en français, en {words} mots maximum, ce passage d'un journal personnel "
+        "ou de sa transcription audio. Garde les faits, les personnes, les émotions exprimées et "
+        "les préoccupations, sans interprétation ni conseil. Réponds uniquement avec le résumé.\n\n"
+        f"PASSAGE:\n{text}"
+    )
+    payload = {
+        "model": model_name,
+        "messages": [{"role": "user", "content": prompt}],
+        "temperature": 0.2,
+        "max_tokens": words * 3,
+    }
+    response_data = get_client().chat_completion(
+        payload,
+        title="MindScribe Summaries",
+        referer="http://localhost:8000"
+    )
+    return response_data["choices"][0]["message"]["content"].strip()
+
+
+def llm_summarize_batch(texts, config=None):
+    """
+    Summarize texts with concurrent OpenRouter calls.
+    """
+    config = config or get_summarization_config()
+    if config['llm_model']:
+        model_name = config['llm_model']
+    else:
+        from .services import TEXT_MODEL
+        model_name = TEXT_MODEL
+    words = config['chunk_summary_words']
+    with ThreadPoolExecutor(max_workers=max(1, min(config['concurrency'], len(texts)))) as executor:
+        return list(executor.map(lambda text: _llm_summarize(text, model_name, words), texts))
+
+
+def condense_for_prompt(text, config=None):
+    """
+    Condense a text that would not fit in the analysis prompt, through the LLM.
+
+    Returns:
+        tuple: (the text to put in the prompt, True if it was condensed)
+    """
+    config = config or get_summarization_config()
+    if not text or estimate_tokens(text) <= config['max_prompt_tokens']:
+        return text, False
+    try:
+        condensed = condense(
+            text,
+            lambda texts: llm_summarize_batch(texts, config),
+            f"llm:{config['llm_model'] or 'default'}:{config['chunk_summary_words']}",
+            config['max_prompt_tokens'],
+            config['chunk_tokens']
+        )
+    except Exception as e:
+        logger.warning(f"Could not condense long content, sending it whole: {e}")
+        return text, False
+    logger.info(f"Condensed {estimate_tokens(text)} tokens to {estimate_tokens(condensed)} for the analysis prompt")
+    return condensed, True
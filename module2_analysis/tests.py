@@ -1,17 +1,49 @@
 """
 Tests for the module2_analysis app.
 """
+import base64
+import io
 import os
+import json
 import tempfile
-from django.test import TestCase, Client
+import threading
+import time
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest.mock import patch
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, Client, override_settings
+from django.utils import timezone
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 from rest_framework import status
 from rest_framework.test import APIClient
+from PIL import Image
 
-from .models import JournalAnalysis
-from .services import analyze_multimodal_content
+from .models import JournalAnalysis, AnalysisCacheEntry, AnalysisJob
+from .services import analyze_multimodal_content, upload_audio_for_transcription, _parse_analysis_response, _prepare_audio, TEXT_MODEL, TRANSCRIPTION_CONFIG
+from .cache import compute_cache_key, get_cached_result, store_result, hash_file, get_cached_transcript
+from .media import optimize_image, optimized_image_path
+from .streaming import IncrementalJSONParser
+from .batch import analyze_batch, reserve_quota
+from .llm_json import ANALYSIS_SCHEMA, LLMJSONError, clean_text, parse_llm_json, repair_json
+from .nlp.registry import ModelRegistry, ModelUnavailable
+from .nlp.server import InferenceServer, InferenceService
+from .nlp.client import InferenceClient, InferenceUnavailable
+from .nlp import image_pipeline, text_pipeline
+from . import jobs
+from .nlp.quantization import default_thread_count, get_fast_cpu_config
+from .summarization import chunk_text, condense_for_prompt, map_reduce_summarize
+from .apps import serves_requests
+from .jobs import enqueue_analysis, claim_next_job, run_next_job, recover_stale_jobs, start_embedded_workers
+from .tiers import analyze_fast
+from mindscribe.openrouter import OpenRouterClient, CircuitOpenError
+from mindscribe.model_router import ModelRouter, RoutingError
+from mindscribe.throttling import ThrottleStore, throttled_call, throttled_stream
 
 User = get_user_model()
 
@@ -140,3 +172,1634 @@ class AnalysisServiceTestCase(TestCase):
         self.assertEqual(result['keywords'], [])
         self.assertEqual(result['summary'], '')
 
+
+class AnalysisResultCacheTestCase(TestCase):
+    """
+    Test case for the content-addressed analysis result cache.
+    """
+    def test_key_ignores_cosmetic_whitespace(self):
+        """
+        Test that texts differing only by whitespace share a cache key.
+        """
+        key_a = compute_cache_key(text="Une  belle journée\n", model_name='m', prompt_version='1')
+        key_b = compute_cache_key(text="Une belle journée", model_name='m', prompt_version='1')
+        key_c = compute_cache_key(text="Une belle journée", model_name='m', prompt_version='2')
+        
+        self.assertEqual(key_a, key_b)
+        self.assertNotEqual(key_a, key_c)
+    
+    def test_key_depends_on_media_bytes(self):
+        """
+        Test that the cache key changes with the content of the image file.
+        """
+        with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as temp_file:
+            temp_file.write(b'first image')
+        try:
+            key_before = compute_cache_key(image_path=temp_file.name, model_name='m')
+            with open(temp_file.name, 'wb') as f:
+                f.write(b'second image')
+            key_after = compute_cache_key(image_path=temp_file.name, model_name='m')
+        finally:
+            os.remove(temp_file.name)
+        
+        self.assertNotEqual(key_before, key_after)
+    
+    def test_store_and_hit(self):
+        """
+        Test that a stored result is returned and its hit counter incremented.
+        """
+        store_result('a' * 64, {'sentiment': 'positif'}, model_name='m', prompt_version='1')
+        
+        self.assertEqual(get_cached_result('a' * 64), {'sentiment': 'positif'})
+        self.assertIsNone(get_cached_result('b' * 64))
+        self.assertEqual(AnalysisCacheEntry.objects.get(key='a' * 64).hits, 1)
+    
+    @override_settings(ANALYSIS_RESULT_CACHE={'ttl': 60})
+    def test_expired_entry_is_a_miss(self):
+        """
+        Test that entries older than the TTL are not served.
+        """
+        store_result('c' * 64, {'sentiment': 'neutre'})
+        AnalysisCacheEntry.objects.filter(key='c' * 64).update(
+            created_at=timezone.now() - timedelta(seconds=120)
+        )
+        
+        self.assertIsNone(get_cached_result('c' * 64))
+        self.assertFalse(AnalysisCacheEntry.objects.filter(key='c' * 64).exists())
+    
+    @override_settings(ANALYSIS_RESULT_CACHE={'max_entries': 2})
+    def test_least_recently_used_entries_are_evicted(self):
+        """
+        Test that the cache never grows past max_entries.
+        """
+        for index in range(3):
+            store_result(str(index) * 64, {'index': index})
+            AnalysisCacheEntry.objects.filter(key=str(index) * 64).update(
+                last_accessed_at=timezone.now() - timedelta(seconds=10 - index)
+            )
+        
+        self.assertEqual(AnalysisCacheEntry.objects.count(), 2)
+        self.assertFalse(AnalysisCacheEntry.objects.filter(key='0' * 64).exists())
+    
+    @patch('mindscribe.openrouter.OpenRouterClient.chat_completion')
+    def test_repeat_analysis_is_served_from_cache(self, mock_completion):
+        """
+        Test that analyzing the same text twice only calls OpenRouter once.
+        """
+        mock_completion.return_value = {
+            'choices': [{'message': {'content': json.dumps({
+                'sentiment': 'positif',
+                'emotion_score': 0.8,
+                'keywords': ['réunion'],
+                'summary': 'Tu as eu une bonne réunion.',
+                'topics': ['travail'],
+            })}}]
+        }
+        text = "Aujourd'hui, j'ai eu une réunion très productive avec mon équipe."
+        
+        first = analyze_multimodal_content(text=text)
+        second = analyze_multimodal_content(text=text)
+        
+        self.assertEqual(mock_completion.call_count, 1)
+        for result in (first, second):
+            result.pop('timings')
+            result.pop('memory')
+        self.assertEqual(first, second)
+
+
+class OpenRouterClientTestCase(TestCase):
+    """
+    Test case for the shared OpenRouter client.
+    """
+    def _response(self, status_code, body=None):
+        response = requests.Response()
+        response.status_code = status_code
+        response._content = json.dumps(body or {}).encode('utf-8')
+        return response
+    
+    def test_retries_transient_errors(self):
+        """
+        Test that a 503 is retried and the following success returned.
+        """
+        client = OpenRouterClient(api_key='key', config={'backoff_base': 0, 'backoff_max': 0})
+        with patch.object(client.session, 'post', side_effect=[
+            self._response(503),
+            self._response(200, {'choices': []}),
+        ]) as mock_post:
+            result = client.chat_completion({'model': 'm'})
+        
+        self.assertEqual(result, {'choices': []})
+        self.assertEqual(mock_post.call_count, 2)
+        self.assertEqual(client.stats()['retries'], 1)
+    
+    def test_client_errors_are_not_retried(self):
+        """
+        Test that a 401 fails immediately without opening the circuit.
+        """
+        client = OpenRouterClient(api_key='key', config={'breaker_failure_threshold': 1})
+        with patch.object(client.session, 'post', return_value=self._response(401)) as mock_post:
+            with self.assertRaises(requests.exceptions.HTTPError):
+                client.chat_completion({'model': 'm'})
+        
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertEqual(client.stats()['circuits']['m']['state'], 'closed')
+    
+    def test_client_errors_do_not_reset_the_circuit(self):
+        """
+        Test that a 400 neither clears the failure count nor closes a half-open circuit.
+        """
+        client = OpenRouterClient(api_key='key', config={
+            'max_retries': 0,
+            'breaker_failure_threshold': 2,
+            'breaker_reset_timeout': 0,
+        })
+        with patch.object(client.session, 'post', side_effect=[
+            requests.exceptions.ConnectionError('down'),
+            self._response(400),
+            requests.exceptions.ConnectionError('down'),
+        ]):
+            with self.assertRaises(requests.exceptions.ConnectionError):
+                client.chat_completion({'model': 'm'})
+            with self.assertRaises(requests.exceptions.HTTPError):
+                client.chat_completion({'model': 'm'})
+            with self.assertRaises(requests.exceptions.ConnectionError):
+                client.chat_completion({'model': 'm'})
+        self.assertEqual(client.stats()['circuits']['m'], {'state': 'open', 'failures': 2})
+        
+        # Half-open: the trial slot is freed, the circuit stays half-open
+        with patch.object(client.session, 'post', return_value=self._response(401)):
+            with self.assertRaises(requests.exceptions.HTTPError):
+                client.chat_completion({'model': 'm'})
+        self.assertEqual(client.stats()['circuits']['m'], {'state': 'half_open', 'failures': 2})
+        with patch.object(client.session, 'post', return_value=self._response(200, {'ok': True})):
+            self.assertEqual(client.chat_completion({'model': 'm'}), {'ok': True})
+        self.assertEqual(client.stats()['circuits']['m']['state'], 'closed')
+    
+    def test_circuit_opens_after_repeated_failures(self):
+        """
+        Test that a model is short-circuited once its failure threshold is reached.
+        """
+        client = OpenRouterClient(api_key='key', config={
+            'max_retries': 0,
+            'breaker_failure_threshold': 2,
+            'breaker_reset_timeout': 60,
+        })
+        with patch.object(client.session, 'post', side_effect=requests.exceptions.ConnectionError('down')) as mock_post:
+            for _ in range(2):
+                with self.assertRaises(requests.exceptions.ConnectionError):
+                    client.chat_completion({'model': 'm'})
+            with self.assertRaises(CircuitOpenError):
+                client.chat_completion({'model': 'm'})
+        
+        self.assertEqual(mock_post.call_count, 2)
+        self.assertEqual(client.stats()['short_circuited'], 1)
+        
+        # Other models are unaffected
+        with patch.object(client.session, 'post', return_value=self._response(200, {'ok': True})):
+            self.assertEqual(client.chat_completion({'model': 'other'}), {'ok': True})
+    
+    def test_stream_yields_content_deltas(self):
+        """
+        Test that server-sent events are decoded into content deltas.
+        """
+        events = [
+            ': OPENROUTER PROCESSING',
+            'data: ' + json.dumps({'choices': [{'delta': {'content': '{"sentiment": '}}]}),
+            'data: ' + json.dumps({'choices': [{'delta': {'content': '"négatif"}'}}]}),
+            'data: [DONE]',
+        ]
+        response = requests.Response()
+        response.status_code = 200
+        response.raw = io.BytesIO('\n\n'.join(events).encode('utf-8'))
+        client = OpenRouterClient(api_key='key')
+        
+        with patch.object(client.session, 'post', return_value=response) as mock_post:
+            deltas = list(client.stream_chat_completion({'model': 'm'}))
+        
+        self.assertEqual(deltas, ['{"sentiment": ', '"négatif"}'])
+        self.assertTrue(mock_post.call_args.kwargs['json']['stream'])
+        self.assertEqual(client.stats()['successes'], 1)
+    
+    def test_closed_stream_frees_the_trial_slot(self):
+        """
+        Test that a half-open trial stream closed by its consumer does not block the model.
+        """
+        event = 'data: ' + json.dumps({'choices': [{'delta': {'content': '{"sentiment": '}}]})
+        response = requests.Response()
+        response.status_code = 200
+        response.raw = io.BytesIO(f"{event}\n\n{event}\n\n".encode('utf-8'))
+        client = OpenRouterClient(api_key='key', config={'breaker_reset_timeout': 0})
+        breaker = client._breaker_for('m')
+        breaker.state, breaker.opened_at = 'open', 0
+        
+        with patch.object(client.session, 'post', return_value=response):
+            stream = client.stream_chat_completion({'model': 'm'})
+            next(stream)
+            stream.close()
+        
+        self.assertEqual(client.stats()['circuits']['m']['state'], 'half_open')
+        with patch.object(client.session, 'post', return_value=self._response(200, {'ok': True})):
+            self.assertEqual(client.chat_completion({'model': 'm'}), {'ok': True})
+
+
+class ImageOptimizerTestCase(TestCase):
+    """
+    Test case for the image payload optimizer.
+    """
+    def setUp(self):
+        """
+        Create a large photo tagged with a 90° EXIF rotation.
+        """
+        self.directory = tempfile.mkdtemp()
+        self.image_path = os.path.join(self.directory, 'photo.jpg')
+        image = Image.effect_noise((3000, 2000), 64).convert('RGB')
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Orientation: rotate 90° clockwise
+        image.save(self.image_path, format='JPEG', quality=95, exif=exif)
+    
+    def tearDown(self):
+        for name in os.listdir(self.directory):
+            os.remove(os.path.join(self.directory, name))
+        os.rmdir(self.directory)
+    
+    @override_settings(ANALYSIS_IMAGE_OPTIMIZER={'max_dimension': 1000, 'max_bytes': 150 * 1024})
+    def test_image_is_rotated_downscaled_and_bounded(self):
+        """
+        Test that the optimized image respects EXIF orientation and the size limits.
+        """
+        data, mime_type = optimize_image(self.image_path)
+        
+        with Image.open(io.BytesIO(data)) as optimized:
+            self.assertEqual(optimized.size, (667, 1000))
+        self.assertLessEqual(len(data), 150 * 1024)
+        self.assertLess(len(data), os.path.getsize(self.image_path))
+        self.assertEqual(mime_type, 'image/jpeg')
+    
+    def test_optimized_copy_is_cached_next_to_upload(self):
+        """
+        Test that a second optimization reads the cached copy instead of decoding again.
+        """
+        first, _ = optimize_image(self.image_path)
+        self.assertTrue(os.path.exists(optimized_image_path(self.image_path)))
+        
+        with patch('module2_analysis.media.Image.open') as mock_open:
+            second, _ = optimize_image(self.image_path)
+        
+        mock_open.assert_not_called()
+        self.assertEqual(first, second)
+    
+    def test_unreadable_image_is_skipped(self):
+        """
+        Test that a file Pillow cannot decode is left to the raw fallback.
+        """
+        path = os.path.join(self.directory, 'broken.jpg')
+        with open(path, 'wb') as f:
+            f.write(b'dummy image content')
+        
+        self.assertIsNone(optimize_image(path))
+
+
+class AnalysisFanOutTestCase(TestCase):
+    """
+    Test case for the concurrent preparation stages of the multimodal analysis.
+    """
+    def setUp(self):
+        """
+        Set up test data.
+        """
+        self.ai_response = {
+            'choices': [{'message': {'content': json.dumps({
+                'sentiment': 'neutre',
+                'emotion_score': 0.5,
+                'keywords': ['photo'],
+                'summary': 'Tu as partagé une photo.',
+                'topics': ['loisirs'],
+            })}}]
+        }
+        self.audio_file = tempfile.NamedTemporaryFile(suffix='.wav', delete=False)
+        self.audio_file.write(b'dummy audio content')
+        self.audio_file.close()
+        self.image_file = tempfile.NamedTemporaryFile(suffix='.jpg', delete=False)
+        self.image_file.write(b'dummy image content')
+        self.image_file.close()
+    
+    def tearDown(self):
+        os.remove(self.audio_file.name)
+        os.remove(self.image_file.name)
+    
+    @override_settings(ANALYSIS_PIPELINE={'text_pre_analysis': False})
+    @patch('mindscribe.openrouter.OpenRouterClient.chat_completion')
+    @patch('module2_analysis.services._prepare_image')
+    @patch('module2_analysis.services.transcribe_audio_with_whisper')
+    def test_audio_and_image_stages_overlap(self, mock_transcribe, mock_prepare_image, mock_completion):
+        """
+        Test that transcription and image encoding run concurrently and are timed.
+        """
+        def slow_transcription(path):
+            time.sleep(0.3)
+            return "Je me sens bien."
+        
+        def slow_image(path):
+            time.sleep(0.3)
+            return 'data:image/jpeg;base64,ZHVtbXk='
+        
+        mock_transcribe.side_effect = slow_transcription
+        mock_prepare_image.side_effect = slow_image
+        mock_completion.return_value = self.ai_response
+        
+        started = time.perf_counter()
+        result = analyze_multimodal_content(
+            audio_path=self.audio_file.name,
+            image_path=self.image_file.name,
+            use_cache=False
+        )
+        elapsed = time.perf_counter() - started
+        
+        self.assertLess(elapsed, 0.55)
+        self.assertEqual(result['audio_transcription'], "Je me sens bien.")
+        self.assertGreaterEqual(result['timings']['transcription'], 300)
+        self.assertGreaterEqual(result['timings']['image_encoding'], 300)
+        self.assertIn('llm', result['timings'])
+        self.assertIn('total', result['timings'])
+        self.assertIn('transcription', result['memory']['stages'])
+        self.assertIsNotNone(result['memory']['peak_rss_kb'])
+    
+    @patch('mindscribe.openrouter.OpenRouterClient.chat_completion')
+    def test_media_entry_makes_one_llm_call_by_default(self, mock_completion):
+        """
+        Test that no text-only pre-analysis is paid for unless it is enabled.
+        """
+        mock_completion.return_value = self.ai_response
+        
+        analyze_multimodal_content(
+            text="Une belle journée au parc.",
+            image_path=self.image_file.name,
+            use_cache=False
+        )
+        
+        self.assertEqual(mock_completion.call_count, 1)
+    
+    @override_settings(ANALYSIS_PIPELINE={'text_pre_analysis': True})
+    @patch('mindscribe.openrouter.OpenRouterClient.chat_completion')
+    def test_text_pre_analysis_is_used_when_multimodal_call_fails(self, mock_completion):
+        """
+        Test that the text-only pre-analysis answers when the vision model fails.
+        """
+        def completion(payload, **kwargs):
+            if payload['model'] != TEXT_MODEL:
+                raise requests.exceptions.ConnectionError('vision model down')
+            return self.ai_response
+        
+        mock_completion.side_effect = completion
+        
+        result = analyze_multimodal_content(
+            text="Une belle journée au parc.",
+            image_path=self.image_file.name,
+            use_cache=False
+        )
+        
+        self.assertEqual(result['analysis_scope'], 'text')
+        self.assertEqual(result['summary'], 'Tu as partagé une photo.')
+        self.assertIn('text_pre_analysis', result['timings'])
+    
+    @patch('module2_analysis.services.requests.post')
+    def test_audio_is_streamed_to_transcription_service(self, mock_post):
+        """
+        Test that the audio upload body is a chunk generator, not the whole file.
+        """
+        with open(self.audio_file.name, 'wb') as f:
+            f.write(b'x' * (600 * 1024))
+        mock_post.return_value.json.return_value = {'upload_url': 'https://cdn.example/audio'}
+        
+        upload_url = upload_audio_for_transcription(self.audio_file.name)
+        
+        body = mock_post.call_args.kwargs['data']
+        self.assertNotIsInstance(body, (bytes, str))
+        chunks = list(body)
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(sum(len(chunk) for chunk in chunks), 600 * 1024)
+        self.assertEqual(upload_url, 'https://cdn.example/audio')
+    
+    @patch('module2_analysis.services.transcribe_audio_with_whisper', return_value="Je me sens bien.")
+    def test_unchanged_audio_is_transcribed_once(self, mock_transcribe):
+        """
+        Test that the transcript store is consulted before calling Speech-to-Text.
+        """
+        first, _ = _prepare_audio(self.audio_file.name)
+        second, parts = _prepare_audio(self.audio_file.name)
+        
+        self.assertEqual(mock_transcribe.call_count, 1)
+        self.assertEqual(first, second)
+        self.assertIn("Je me sens bien.", parts[0])
+    
+    @patch('module2_analysis.services.transcribe_audio_with_whisper', return_value=None)
+    def test_known_transcription_is_a_fallback_only(self, mock_transcribe):
+        """
+        Test that a transcript saved on the entry is used when Speech-to-Text fails, never stored.
+        """
+        transcription, _ = _prepare_audio(self.audio_file.name, known_transcription="Texte déjà transcrit.")
+        
+        mock_transcribe.assert_called_once()
+        self.assertEqual(transcription, "Texte déjà transcrit.")
+        self.assertIsNone(get_cached_transcript(hash_file(self.audio_file.name), TRANSCRIPTION_CONFIG))
+        
+        # Speech-to-Text is retried, and its output preferred
+        mock_transcribe.return_value = "Je me sens bien."
+        transcription, _ = _prepare_audio(self.audio_file.name, known_transcription="Texte déjà transcrit.")
+        self.assertEqual(transcription, "Je me sens bien.")
+    
+    def test_model_transcription_is_dropped(self):
+        """
+        Test that a transcription made up by the model never reaches the results.
+        """
+        answer = json.dumps({
+            'sentiment': 'positif', 'emotion_score': 0.5, 'keywords': [], 'summary': '', 'topics': [],
+            'audio_transcription': "Transcription inventée.",
+        })
+        
+        self.assertNotIn('audio_transcription', _parse_analysis_response(answer))
+        self.assertEqual(_parse_analysis_response(answer, "Vrai texte.")['audio_transcription'], "Vrai texte.")
+
+
+class StreamingAnalysisTestCase(TestCase):
+    """
+    Test case for the streamed analysis and its incremental JSON parser.
+    """
+    def setUp(self):
+        """
+        Set up test data.
+        """
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='streamuser',
+            email='stream@example.com',
+            password='testpassword'
+        )
+        self.answer = '```json\n' + json.dumps({
+            'sentiment': 'positif',
+            'emotion_score': 0.8,
+            'keywords': ['réunion', 'équipe {projet}'],
+            'summary': 'Tu as eu une "belle" réunion.',
+            'topics': ['travail'],
+        }, ensure_ascii=False) + '\n```'
+    
+    def test_parser_emits_fields_as_they_close(self):
+        """
+        Test that each field is emitted by the chunk that closes it.
+        """
+        parser = IncrementalJSONParser()
+        
+        self.assertEqual(parser.feed('```json\n{"sentiment": "posi'), [])
+        self.assertEqual(parser.feed('tif", "emotion_score": 0.8'), [('sentiment', 'positif')])
+        self.assertEqual(parser.feed(', "keywords": ["a", "b]"]'), [('emotion_score', 0.8), ('keywords', ['a', 'b]'])])
+        self.assertEqual(parser.feed('}\n```'), [])
+        self.assertTrue(parser.done)
+    
+    @override_settings(THROTTLING={'enabled': False})
+    @patch('mindscribe.openrouter.OpenRouterClient.stream_chat_completion')
+    def test_stream_endpoint_pushes_fields_then_result(self, mock_stream):
+        """
+        Test that the SSE endpoint sends field events before the saved result.
+        """
+        mock_stream.return_value = iter([self.answer[i:i + 7] for i in range(0, len(self.answer), 7)])
+        
+        response = self.client.post(
+            reverse('module2_analysis:api_analyse_stream'),
+            {'text': "Une réunion productive.", 'user_id': str(self.user.id)},
+            format='json'
+        )
+        body = b''.join(response.streaming_content).decode('utf-8')
+        
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = [block.split('\n', 1) for block in body.strip().split('\n\n')]
+        names = [event[0] for event in events]
+        self.assertEqual(names[:5], ['event: field'] * 5)
+        self.assertEqual(names[-1], 'event: result')
+        
+        result = json.loads(events[-1][1][len('data: '):])
+        self.assertEqual(result['sentiment'], 'positif')
+        self.assertIn('first_field', result['timings'])
+        self.assertTrue(JournalAnalysis.objects.filter(id=result['analysis_id'], user=self.user).exists())
+
+
+class LLMJSONTestCase(TestCase):
+    """
+    Test case for the extraction, repair and validation of model answers.
+    """
+    def test_extracts_object_from_prose_and_fences(self):
+        """
+        Test that text around a fenced object is ignored.
+        """
+        answer = 'Voici l\'analyse :\n```json\n{"sentiment": "positif", "note": "l\'été {chaud}"}\n```\nBonne journée !'
+
+        self.assertEqual(parse_llm_json(answer), {'sentiment': 'positif', 'note': "l'été {chaud}"})
+
+    def test_repairs_common_syntax_errors(self):
+        """
+        Test trailing commas, single quotes, Python literals, comments and inner quotes.
+        """
+        answer = "{'a': 'l\\'ami', 'b': [1, 2,], 'c': True, 'd': None, // commentaire\n 'e': \"il a dit \"oui\"\",}"
+
+        self.assertEqual(
+            parse_llm_json(answer),
+            {'a': "l'ami", 'b': [1, 2], 'c': True, 'd': None, 'e': 'il a dit "oui"'}
+        )
+        self.assertEqual(repair_json('{"a": "ligne 1\nligne 2"}'), '{"a":"ligne 1\\nligne 2"}')
+
+    def test_closes_truncated_answer(self):
+        """
+        Test that an answer cut off by max_tokens is closed.
+        """
+        self.assertEqual(parse_llm_json('{"keywords": ["a", "b'), {'keywords': ['a', 'b']})
+        self.assertEqual(parse_llm_json('{"a": 1, "b":'), {'a': 1, 'b': None})
+        self.assertEqual(parse_llm_json('{"a": 1, "b"'), {'a': 1})
+
+    def test_schema_validation(self):
+        """
+        Test coercion, cleaning and required fields of the analysis schema.
+        """
+        answer = json.dumps({
+            'sentiment': 'positif\u0007',
+            'emotion_score': '1.4',
+            'keywords': 'travail',
+            'summary': 'Belle journée 😀',
+            'topics': ['travail', 3],
+            'extra': 'ignored',
+        })
+
+        results = parse_llm_json(answer, ANALYSIS_SCHEMA)
+
+        self.assertEqual(results['sentiment'], 'positif')
+        self.assertEqual(results['emotion_score'], 1.0)
+        self.assertEqual(results['keywords'], ['travail'])
+        self.assertEqual(results['summary'], 'Belle journée ')
+        self.assertEqual(results['topics'], ['travail', '3'])
+        self.assertIsNone(results['mood_analysis'])
+        self.assertNotIn('extra', results)
+
+        with self.assertRaisesRegex(LLMJSONError, 'topics'):
+            parse_llm_json('{"sentiment": "positif", "emotion_score": 0.5, "keywords": [], "summary": ""}', ANALYSIS_SCHEMA)
+        with self.assertRaises(LLMJSONError):
+            parse_llm_json('Je ne peux pas analyser ce contenu.')
+
+    def test_clean_text_matches_previous_filter(self):
+        """
+        Test that clean_text removes the same characters as the former per-character filter.
+        """
+        text = "Émotion forte\n\t😀 ​ fin\ud800"
+        expected = ''.join(c for c in text if ord(c) < 65536 and c.isprintable())
+
+        self.assertEqual(clean_text(text), expected)
+
+
+@override_settings(ANALYSIS_JOBS={'embedded': False, 'retry_delay': 0}, THROTTLING={'enabled': False})
+class AnalysisJobTestCase(TestCase):
+    """
+    Test case for the asynchronous analysis job queue.
+    """
+    def setUp(self):
+        """
+        Set up test data.
+        """
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='jobuser',
+            email='job@example.com',
+            password='testpassword'
+        )
+        self.result = {
+            'sentiment': 'positif',
+            'emotion_score': 0.8,
+            'keywords': ['réunion'],
+            'summary': 'Tu as eu une bonne réunion.',
+            'topics': ['travail'],
+        }
+    
+    def test_create_returns_202_and_status_url(self):
+        """
+        Test that queuing an analysis answers immediately with a status URL.
+        """
+        response = self.client.post(
+            reverse('module2_analysis:api_analyse_jobs'),
+            {'text': "Une journée calme.", 'user_id': str(self.user.id)},
+            format='json'
+        )
+        
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], AnalysisJob.STATUS_QUEUED)
+        self.assertEqual(response['Location'], response.data['status_url'])
+        
+        status_response = self.client.get(response.data['status_url'])
+        self.assertEqual(status_response.data['status'], AnalysisJob.STATUS_QUEUED)
+    
+    def test_status_view_starts_the_embedded_workers(self):
+        """
+        Test that polling a queued job starts the workers of a process that never queued one.
+        """
+        job = enqueue_analysis(text="Une journée calme.", user=self.user)
+        url = reverse('module2_analysis:api_analyse_job_status', args=[job.id])
+        
+        with patch('module2_analysis.jobs.get_worker_pool') as mock_pool:
+            self.client.get(url)
+            self.assertFalse(mock_pool.called)
+            with override_settings(ANALYSIS_JOBS={'embedded': True}):
+                self.client.get(url)
+                self.assertIsNotNone(start_embedded_workers())
+        self.assertEqual(mock_pool.return_value.wake.call_count, 2)
+    
+    def test_workers_start_in_server_processes_only(self):
+        """
+        Test that the embedded workers are started by web servers, not by management commands.
+        """
+        self.assertTrue(serves_requests(['/usr/local/bin/gunicorn', 'mindscribe.wsgi:application'], {}))
+        self.assertTrue(serves_requests(['manage.py', 'runserver'], {'RUN_MAIN': 'true'}))
+        self.assertFalse(serves_requests(['manage.py', 'runserver'], {}))
+        self.assertFalse(serves_requests(['manage.py', 'run_analysis_worker'], {}))
+        self.assertFalse(serves_requests(['manage.py', 'test'], {}))
+    
+    @patch('module2_analysis.jobs.analyze_multimodal_content')
+    def test_job_succeeds_and_saves_analysis(self, mock_analyze):
+        """
+        Test that a processed job exposes its result and saved analysis ID.
+        """
+        mock_analyze.return_value = dict(self.result)
+        job = enqueue_analysis(text="Une journée calme.", user=self.user)
+        
+        self.assertTrue(run_next_job('test-worker'))
+        
+        job.refresh_from_db()
+        self.assertEqual(job.status, AnalysisJob.STATUS_SUCCEEDED)
+        self.assertEqual(job.result['sentiment'], 'positif')
+        self.assertTrue(JournalAnalysis.objects.filter(id=job.analysis_id, user=self.user).exists())
+        
+        response = self.client.get(reverse('module2_analysis:api_analyse_job_status', args=[job.id]))
+        self.assertEqual(response.data['result']['analysis_id'], job.analysis_id)
+    
+    @patch('module2_analysis.jobs.analyze_multimodal_content', side_effect=RuntimeError('OpenRouter down'))
+    def test_job_is_retried_then_failed(self, mock_analyze):
+        """
+        Test that a failing job is retried up to max_attempts before being marked failed.
+        """
+        job = enqueue_analysis(text="Une journée calme.", user=self.user)
+        
+        while run_next_job('test-worker'):
+            pass
+        
+        job.refresh_from_db()
+        self.assertEqual(job.status, AnalysisJob.STATUS_FAILED)
+        self.assertEqual(job.attempts, 3)
+        self.assertEqual(mock_analyze.call_count, 3)
+        self.assertIn('OpenRouter down', job.error)
+    
+    def test_per_user_concurrency_limit(self):
+        """
+        Test that a user's second job is not claimed while the first one runs.
+        """
+        first = enqueue_analysis(text="Premier", user=self.user)
+        enqueue_analysis(text="Second", user=self.user)
+        
+        self.assertEqual(claim_next_job('w1').id, first.id)
+        self.assertIsNone(claim_next_job('w2'))
+    
+    def test_claim_race_does_not_exceed_the_limit(self):
+        """
+        Test that a job claimed while another worker claims one of the same user is given back.
+        """
+        first = enqueue_analysis(text="Premier", user=self.user)
+        second = enqueue_analysis(text="Second", user=self.user)
+        running_count = jobs._running_count
+        calls = []
+        
+        def racing_count(user_id):
+            calls.append(user_id)
+            count = running_count(user_id)
+            if len(calls) == 1:
+                # w1 passed the limit check; w2 claims the second job before w1's update
+                AnalysisJob.objects.filter(id=second.id).update(status=AnalysisJob.STATUS_RUNNING, worker_id='w2')
+            return count
+        
+        with patch('module2_analysis.jobs._running_count', side_effect=racing_count):
+            self.assertIsNone(claim_next_job('w1'))
+        
+        first.refresh_from_db()
+        self.assertEqual((first.status, first.attempts, first.worker_id), (AnalysisJob.STATUS_QUEUED, 0, ''))
+        self.assertEqual(AnalysisJob.objects.filter(status=AnalysisJob.STATUS_RUNNING).count(), 1)
+    
+    def test_stale_running_job_is_requeued(self):
+        """
+        Test that a job whose worker stopped sending heartbeats is queued again.
+        """
+        job = enqueue_analysis(text="Une journée calme.", user=self.user)
+        claim_next_job('dead-worker')
+        AnalysisJob.objects.filter(id=job.id).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+        
+        self.assertEqual(recover_stale_jobs(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, AnalysisJob.STATUS_QUEUED)
+
+
+@override_settings(ANALYSIS_BATCH={'concurrency': 3, 'rate_limit': 100})
+class BatchAnalysisTestCase(TestCase):
+    """
+    Test case for the NDJSON batch analysis endpoint.
+    """
+    def setUp(self):
+        """
+        Set up test data.
+        """
+        cache.clear()
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.throttle_db = os.path.join(temp_dir.name, 'throttle.sqlite3')
+        throttling = override_settings(THROTTLING={'db_path': self.throttle_db})
+        throttling.enable()
+        self.addCleanup(throttling.disable)
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='batchuser',
+            email='batch@example.com',
+            password='testpassword'
+        )
+        self.url = reverse('module2_analysis:api_analyse_batch')
+    
+    def _post(self, entries, **extra):
+        response = self.client.post(self.url, dict(entries=entries, user_id=str(self.user.id), **extra), format='json')
+        body = b''.join(response.streaming_content).decode('utf-8')
+        return response, [json.loads(line) for line in body.splitlines()]
+    
+    @staticmethod
+    def _fake_analysis(text=None, audio_path=None, image_path=None):
+        if text == 'boom':
+            raise Exception("Error in AI analysis: OpenRouter down")
+        return {
+            'sentiment': 'positif',
+            'emotion_score': 0.7,
+            'keywords': [text],
+            'summary': text,
+            'topics': ['travail'],
+        }
+    
+    @patch('module2_analysis.batch.analyze_multimodal_content')
+    def test_streams_one_line_per_entry_with_partial_failures(self, mock_analyze):
+        """
+        Test that successes, failures and invalid entries are reported line by line.
+        """
+        mock_analyze.side_effect = self._fake_analysis
+        
+        response, lines = self._post([
+            {'id': 'a', 'text': 'premier'},
+            {'id': 'b', 'text': 'boom'},
+            {'id': 'c'},
+            {'id': 'd', 'text': 'dernier'},
+        ])
+        
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        reports = {line['id']: line for line in lines[:-1]}
+        self.assertEqual(reports['a']['status'], 'ok')
+        self.assertEqual(reports['b']['status'], 'error')
+        self.assertIn('OpenRouter down', reports['b']['error'])
+        self.assertEqual(reports['c']['status'], 'invalid')
+        self.assertEqual(reports['d']['result']['keywords'], ['dernier'])
+        self.assertEqual(lines[-1]['summary']['ok'], 2)
+        self.assertEqual(lines[-1]['summary']['total'], 4)
+        self.assertEqual(JournalAnalysis.objects.filter(user=self.user).count(), 2)
+        self.assertTrue(JournalAnalysis.objects.filter(id=reports['a']['result']['analysis_id']).exists())
+    
+    @patch('module2_analysis.batch.analyze_multimodal_content')
+    def test_concurrency_is_bounded(self, mock_analyze):
+        """
+        Test that no more entries than the configured concurrency run at once.
+        """
+        running = []
+        peak = []
+        
+        def slow_analysis(**kwargs):
+            running.append(1)
+            peak.append(len(running))
+            time.sleep(0.05)
+            running.pop()
+            return self._fake_analysis(**kwargs)
+        
+        mock_analyze.side_effect = slow_analysis
+        _, lines = self._post([{'text': f'entrée {i}'} for i in range(8)], save=False)
+        
+        self.assertEqual(lines[-1]['summary']['ok'], 8)
+        self.assertLessEqual(max(peak), 3)
+        self.assertGreater(max(peak), 1)
+        self.assertEqual(JournalAnalysis.objects.count(), 0)
+    
+    @override_settings(ANALYSIS_BATCH={'rate_limit': 3})
+    @patch('module2_analysis.batch.analyze_multimodal_content')
+    def test_per_user_rate_limit(self, mock_analyze):
+        """
+        Test that entries beyond the user's quota are reported as rate limited.
+        """
+        mock_analyze.side_effect = self._fake_analysis
+        
+        _, first = self._post([{'text': 'un'}, {'text': 'deux'}], save=False)
+        _, second = self._post([{'text': 'trois'}, {'text': 'quatre'}], save=False)
+        
+        self.assertEqual(first[-1]['summary']['ok'], 2)
+        self.assertEqual(second[-1]['summary']['ok'], 1)
+        self.assertEqual(second[-1]['summary']['rate_limited'], 1)
+        limited = [line for line in second[:-1] if line['status'] == 'rate_limited']
+        self.assertGreater(limited[0]['retry_after'], 0)
+        self.assertEqual(mock_analyze.call_count, 3)
+    
+    @override_settings(ANALYSIS_BATCH={'rate_limit': 3})
+    def test_quota_is_shared_by_the_workers(self):
+        """
+        Test that entries counted by another process are deducted from the quota.
+        """
+        window_start = int(time.time() // 3600) * 3600
+        other_worker = ThrottleStore(self.throttle_db)
+        other_worker.reserve(f"analysis-batch-quota:{self.user.id}:{window_start}", 2, 3, window_start + 3600)
+        
+        granted, _ = reserve_quota(str(self.user.id), 2)
+        
+        self.assertEqual(granted, 1)
+    
+    @override_settings(ANALYSIS_BATCH={'concurrency': 1, 'deadline': 0.1, 'rate_limit': 3})
+    @patch('module2_analysis.batch.analyze_multimodal_content')
+    def test_entries_not_started_by_the_deadline_are_given_up(self, mock_analyze):
+        """
+        Test that the batch stops starting entries at its deadline and gives their quota back.
+        """
+        def slow_analysis(**kwargs):
+            time.sleep(0.2)
+            return self._fake_analysis(**kwargs)
+        
+        mock_analyze.side_effect = slow_analysis
+        _, lines = self._post([{'text': 'un'}, {'text': 'deux'}, {'text': 'trois'}], save=False)
+        
+        self.assertEqual(lines[-1]['summary']['ok'], 1)
+        self.assertEqual(lines[-1]['summary']['timeout'], 2)
+        self.assertEqual(mock_analyze.call_count, 1)
+        self.assertEqual(reserve_quota(str(self.user.id), 3)[0], 2)
+    
+    @override_settings(ANALYSIS_BATCH={'concurrency': 1, 'rate_limit': 3})
+    @patch('module2_analysis.batch.analyze_multimodal_content')
+    def test_disconnect_cancels_the_entries_not_started(self, mock_analyze):
+        """
+        Test that closing the stream returns at once and gives back the quota of pending entries.
+        """
+        def slow_analysis(**kwargs):
+            time.sleep(0.2)
+            return self._fake_analysis(**kwargs)
+        
+        mock_analyze.side_effect = slow_analysis
+        reports = analyze_batch([{'text': 'un'}, {'text': 'deux'}, {'text': 'trois'}], user=self.user, save=False)
+        self.assertEqual(next(reports)['status'], 'ok')
+        
+        started = time.perf_counter()
+        reports.close()
+        
+        self.assertLess(time.perf_counter() - started, 0.15)
+        self.assertEqual(reserve_quota(str(self.user.id), 3)[0], 1)
+        time.sleep(0.3)
+        self.assertEqual(mock_analyze.call_count, 2)
+    
+    @override_settings(ANALYSIS_BATCH={'max_items': 2})
+    def test_rejects_oversized_batch(self):
+        """
+        Test that a batch above max_items is refused.
+        """
+        response = self.client.post(self.url, {'entries': [{'text': 'x'}] * 3}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ModelRegistryTestCase(TestCase):
+    """
+    Test case for the lazy local model registry.
+    """
+    def setUp(self):
+        """
+        Set up a registry with fake models of known sizes.
+        """
+        self.registry = ModelRegistry(memory_budget_mb=1000, retry_failed_after=60, measure_rss=False)
+        self.load_calls = []
+        for name, size in (('small', 200), ('medium', 500), ('large', 600)):
+            self.registry.register(name, self._loader(name), estimated_mb=size)
+    
+    def _loader(self, name):
+        def load():
+            self.load_calls.append(name)
+            return object()
+        return load
+    
+    def test_loads_on_first_use_only(self):
+        """
+        Test that a model is loaded once and then served from memory.
+        """
+        self.assertEqual(self.load_calls, [])
+        
+        first = self.registry.get('small')
+        
+        self.assertIs(self.registry.get('small'), first)
+        self.assertEqual(self.load_calls, ['small'])
+        stats = self.registry.stats()['models']['small']
+        self.assertEqual((stats['loads'], stats['hits'], stats['memory_mb']), (1, 1, 200))
+    
+    def test_evicts_least_recently_used_past_budget(self):
+        """
+        Test that loading past the budget unloads the least recently used model.
+        """
+        self.registry.get('small')
+        self.registry.get('medium')
+        self.registry.get('small')  # medium is now the least recently used
+        self.registry.get('large')
+        
+        stats = self.registry.stats()
+        self.assertFalse(stats['models']['medium']['loaded'])
+        self.assertEqual(stats['models']['medium']['evictions'], 1)
+        self.assertTrue(stats['models']['small']['loaded'])
+        self.assertEqual(stats['resident_mb'], 800)
+        
+        self.registry.get('medium')
+        self.assertEqual(self.load_calls, ['small', 'medium', 'large', 'medium'])
+    
+    def test_failed_load_is_not_retried_immediately(self):
+        """
+        Test that a failing loader is reported as unavailable without retrying on each call.
+        """
+        calls = []
+        
+        def broken():
+            calls.append(1)
+            raise ImportError("No module named 'torch'")
+        
+        self.registry.register('broken', broken)
+        
+        with self.assertRaises(ModelUnavailable):
+            self.registry.get('broken')
+        with self.assertRaises(ModelUnavailable):
+            self.registry.get('broken')
+        self.assertEqual(len(calls), 1)
+        self.assertIn('torch', self.registry.stats()['models']['broken']['error'])
+
+
+class InferenceServerTestCase(TestCase):
+    """
+    Test case for the local inference daemon and its micro-batching client.
+    """
+    def setUp(self):
+        """
+        Start a daemon serving fake operations on a temporary socket.
+        """
+        self.batches = []
+        
+        def upper(texts):
+            self.batches.append(len(texts))
+            time.sleep(0.01)
+            return [text.upper() for text in texts]
+        
+        def failing(texts):
+            raise RuntimeError("model crashed")
+        
+        self.directory = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.directory, 'inference.sock')
+        service = InferenceService({'upper': upper, 'failing': failing}, max_batch=8, max_wait_ms=20)
+        self.server = InferenceServer(self.socket_path, service)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.client = InferenceClient(self.socket_path, max_batch=8, max_wait_ms=20, timeout=5)
+    
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        os.rmdir(self.directory)
+    
+    def test_concurrent_calls_share_batches(self):
+        """
+        Test that concurrent single-item calls reach the model in batches.
+        """
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            outputs = list(executor.map(lambda t: self.client.call('upper', t), [f'texte {i}' for i in range(16)]))
+        
+        self.assertEqual(outputs, [f'TEXTE {i}' for i in range(16)])
+        self.assertLess(len(self.batches), 16)
+        self.assertEqual(sum(self.batches), 16)
+        self.assertEqual(self.client.stats()['upper']['items'], 16)
+    
+    def test_errors_are_reported_to_the_caller(self):
+        """
+        Test that model failures and unknown operations raise InferenceUnavailable.
+        """
+        with self.assertRaisesRegex(InferenceUnavailable, 'model crashed'):
+            self.client.call('failing', 'x')
+        with self.assertRaisesRegex(InferenceUnavailable, 'Unknown operation'):
+            self.client.call('missing', 'x')
+        
+        # The connection stays usable after an error
+        self.assertEqual(self.client.call('upper', 'ok'), 'OK')
+    
+    def test_unreachable_server(self):
+        """
+        Test that a missing socket raises InferenceUnavailable.
+        """
+        client = InferenceClient(os.path.join(self.directory, 'missing.sock'), timeout=1)
+        
+        with self.assertRaises(InferenceUnavailable):
+            client.call('upper', 'x')
+
+
+class TextMicroBatchingTestCase(TestCase):
+    """
+    Test case for the batched text pipeline functions and their coalescing dispatcher.
+    """
+    def setUp(self):
+        """
+        Set up a fake sentiment model recording its batch sizes.
+        """
+        self.batches = []
+        
+        def fake_sentiment(texts, batch_size=None, truncation=False):
+            self.batches.append(len(texts))
+            time.sleep(0.01)
+            return [{'label': 'LABEL_2' if 'bien' in t else 'LABEL_0', 'score': 0.9} for t in texts]
+        
+        patcher = patch('module2_analysis.nlp.text_pipeline._get_model', return_value=fake_sentiment)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        text_pipeline._batchers.clear()
+    
+    def test_batch_variant_keeps_order_and_skips_empty_texts(self):
+        """
+        Test that empty texts get the neutral default without reaching the model.
+        """
+        results = text_pipeline.analyze_sentiment_batch(['tout va bien', '', 'journée difficile'])
+        
+        self.assertEqual([r['sentiment'] for r in results], ['positif', 'neutre', 'negatif'])
+        self.assertEqual(self.batches, [2])
+    
+    @override_settings(ANALYSIS_TEXT_BATCHING={'max_batch': 8, 'max_wait_ms': 30})
+    def test_concurrent_calls_are_coalesced(self):
+        """
+        Test that concurrent single-text calls run as shared forward passes.
+        """
+        texts = [f'entrée {i} bien' if i % 2 else f'entrée {i}' for i in range(16)]
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            results = list(executor.map(text_pipeline.analyze_sentiment, texts))
+        
+        self.assertEqual([r['sentiment'] for r in results], ['positif' if i % 2 else 'negatif' for i in range(16)])
+        self.assertEqual(sum(self.batches), 16)
+        self.assertLess(len(self.batches), 16)
+        self.assertEqual(text_pipeline.batching_stats()['sentiment']['items'], 16)
+    
+    @override_settings(ANALYSIS_TEXT_BATCHING={'enabled': False})
+    def test_batching_can_be_disabled(self):
+        """
+        Test that single calls run directly when batching is disabled.
+        """
+        text_pipeline.analyze_sentiment('tout va bien')
+        
+        self.assertEqual(self.batches, [1])
+        self.assertEqual(text_pipeline.batching_stats(), {})
+
+
+class FastCPUModeTestCase(TestCase):
+    """
+    Test case for the fast CPU mode settings.
+    """
+    def test_threads_are_shared_between_workers(self):
+        """
+        Test that each web worker gets its share of the cores.
+        """
+        self.assertEqual(default_thread_count(cpu_count=8, workers=3), 2)
+        self.assertEqual(default_thread_count(cpu_count=2, workers=3), 1)
+    
+    @override_settings(ANALYSIS_FAST_CPU={'enabled': True}, MEDIA_ROOT='/tmp/mindscribe-media')
+    def test_cache_directory_is_private(self):
+        """
+        Test that quantized weights are cached outside MEDIA_ROOT unless configured.
+        """
+        config = get_fast_cpu_config()
+        
+        self.assertTrue(config['enabled'])
+        self.assertEqual(config['cache_dir'], os.path.join(settings.BASE_DIR, '.cache', 'model_cache'))
+        self.assertFalse(config['cache_dir'].startswith('/tmp/mindscribe-media'))
+
+
+class TopicExtractionTestCase(TestCase):
+    """
+    Test case for the spaCy topic extraction.
+    """
+    @staticmethod
+    def _doc(*chunks):
+        return SimpleNamespace(noun_chunks=[SimpleNamespace(text=chunk) for chunk in chunks])
+    
+    def test_topics_are_ranked_by_frequency(self):
+        """
+        Test that topics are ordered by frequency, then by first appearance.
+        """
+        doc = self._doc('Le travail', 'ma sœur', 'le travail', 'une très longue réunion', 'le sport', 'ma sœur', 'le travail')
+        
+        self.assertEqual(text_pipeline.rank_noun_chunks(doc, top_n=3), ['le travail', 'ma sœur', 'le sport'])
+    
+    @override_settings(ANALYSIS_TOPICS={'n_process': 4, 'batch_size': 2})
+    def test_batch_goes_through_nlp_pipe(self):
+        """
+        Test that texts are parsed with one nlp.pipe call and processes are used for large batches.
+        """
+        calls = []
+        
+        class FakeNLP:
+            def pipe(inner_self, texts, batch_size, n_process):
+                calls.append((len(texts), batch_size, n_process))
+                return [self._doc(text.split()[0]) for text in texts]
+        
+        with patch('module2_analysis.nlp.text_pipeline._get_model', return_value=FakeNLP()):
+            small = text_pipeline.extract_topics_batch(['sport matin', '', 'travail soir'])
+            text_pipeline.extract_topics_batch([f'entrée {i}' for i in range(4)])
+        
+        self.assertEqual(small, [['sport'], [], ['travail']])
+        self.assertEqual(calls, [(2, 2, 1), (4, 2, 4)])
+
+
+class SummarizationTestCase(TestCase):
+    """
+    Test case for the chunked map-reduce summarization.
+    """
+    @staticmethod
+    def _count_words(text):
+        return len(text.split())
+    
+    def _summarizer(self, calls):
+        def summarize_batch(texts):
+            calls.append(list(texts))
+            return [' '.join(text.split()[:2]) for text in texts]
+        return summarize_batch
+    
+    def test_chunks_follow_sentence_boundaries(self):
+        """
+        Test that chunks hold whole sentences within the budget and long sentences are split.
+        """
+        text = "Un deux trois. Quatre cinq six! Sept huit?\nNeuf dix onze douze treize quatorze quinze seize."
+        
+        chunks = chunk_text(text, max_tokens=7, count_tokens=self._count_words)
+        
+        self.assertEqual(chunks[:2], ["Un deux trois. Quatre cinq six!", "Sept huit?"])
+        self.assertTrue(all(self._count_words(chunk) <= 7 for chunk in chunks))
+        self.assertEqual(' '.join(chunks).split(), text.split())
+    
+    def test_appending_only_summarizes_new_chunks(self):
+        """
+        Test that chunk summaries are cached, so an appended entry only summarizes its new chunks.
+        """
+        sentences = [f"Phrase numéro {i} du journal." for i in range(12)]
+        calls = []
+        summarize_batch = self._summarizer(calls)
+        
+        map_reduce_summarize(' '.join(sentences[:8]), summarize_batch, 'test', chunk_tokens=12, count_tokens=self._count_words)
+        first_chunks = len(calls[0])
+        calls.clear()
+        map_reduce_summarize(' '.join(sentences), summarize_batch, 'test', chunk_tokens=12, count_tokens=self._count_words)
+        
+        self.assertEqual(first_chunks, 4)
+        # Only the two new chunks are summarized, then the new reduce input
+        self.assertEqual(calls[0], [' '.join(sentences[8:10]), ' '.join(sentences[10:12])])
+        self.assertEqual(len(calls), 2)
+    
+    @override_settings(ANALYSIS_SUMMARIZATION={'max_prompt_tokens': 50, 'chunk_tokens': 40})
+    def test_long_transcript_is_condensed_for_the_prompt(self):
+        """
+        Test that a transcript too long for the prompt is condensed, and short ones are kept whole.
+        """
+        transcript = ' '.join(f"Aujourd'hui j'ai parlé de la réunion numéro {i}." for i in range(20))
+        
+        with patch('module2_analysis.summarization.llm_summarize_batch', side_effect=lambda texts, config: ['Résumé.' for _ in texts]) as summarize:
+            self.assertEqual(condense_for_prompt("Journée calme."), ("Journée calme.", False))
+            condensed, was_condensed = condense_for_prompt(transcript)
+        
+        self.assertTrue(was_condensed)
+        self.assertIn('Résumé.', condensed)
+        self.assertLess(len(condensed), len(transcript))
+        self.assertEqual(summarize.call_count, 1)
+    
+    @override_settings(ANALYSIS_SUMMARIZATION={'local_batch_size': 8})
+    def test_local_generation_batch_is_capped(self):
+        """
+        Test that the local model never summarizes more than local_batch_size chunks at once.
+        """
+        calls = []
+        
+        def fake_pipeline(texts, batch_size, **kwargs):
+            calls.append(batch_size)
+            return [{'summary_text': 'Résumé.'} for _ in texts]
+        
+        fake_pipeline.tokenizer = SimpleNamespace(src_lang=None)
+        with patch('module2_analysis.nlp.text_pipeline._get_model', return_value=fake_pipeline):
+            summaries = text_pipeline.summarize_batch([f"Morceau {i}." for i in range(30)])
+            text_pipeline.summarize_batch(["Un seul morceau."])
+        
+        self.assertEqual(len(summaries), 30)
+        self.assertEqual(calls, [8, 1])
+
+
+class ImagePipelineTestCase(TestCase):
+    """
+    Test case for the batched image captioning and scene classification.
+    """
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.paths = []
+        for i, color in enumerate(('red', 'green', 'blue')):
+            path = os.path.join(self.temp_dir.name, f'image_{i}.jpg')
+            Image.new('RGB', (640, 480), color=color).save(path)
+            self.paths.append(path)
+    
+    def tearDown(self):
+        self.temp_dir.cleanup()
+    
+    def _fake_models(self, calls):
+        class Pixels:
+            def __init__(self, count):
+                self.count = count
+            
+            def to(self, device):
+                return self
+        
+        class Processor:
+            size = {'height': 224, 'width': 224}
+            image_mean = [0.5, 0.5, 0.5]
+            image_std = [0.5, 0.5, 0.5]
+            
+            def __init__(self, name):
+                self.name = name
+            
+            def __call__(self, images, return_tensors):
+                calls.append((self.name, [image.size for image in images]))
+                return SimpleNamespace(pixel_values=Pixels(len(images)))
+        
+        class Model:
+            config = SimpleNamespace(id2label={0: 'plage', 1: 'bureau'})
+            
+            def parameters(self):
+                return iter([SimpleNamespace(device='cpu')])
+            
+            def generate(self, pixel_values, max_length):
+                calls.append(('generate', pixel_values.count))
+                return list(range(pixel_values.count))
+            
+            def __call__(self, pixel_values):
+                calls.append(('classify', pixel_values.count))
+                logits = SimpleNamespace(argmax=lambda dim: SimpleNamespace(tolist=lambda: [i % 2 for i in range(pixel_values.count)]))
+                return SimpleNamespace(logits=logits)
+        
+        tokenizer = SimpleNamespace(batch_decode=lambda ids, skip_special_tokens: [f'photo {i}' for i in ids])
+        return {
+            image_pipeline.CAPTIONING_MODEL: (Model(), Processor('caption_processor'), tokenizer),
+            image_pipeline.SCENE_MODEL: (Processor('scene_processor'), Model()),
+        }
+    
+    def test_images_are_decoded_once_and_batched(self):
+        """
+        Test that both models share one preprocessing pass per batch and missing files are skipped.
+        """
+        calls = []
+        models = self._fake_models(calls)
+        paths = self.paths[:2] + [os.path.join(self.temp_dir.name, 'missing.jpg')] + self.paths[2:]
+        
+        with patch('module2_analysis.nlp.image_pipeline._get_model', side_effect=models.get):
+            results = image_pipeline.analyze_images(paths, batch_size=2)
+        
+        self.assertEqual(results, [
+            {'caption': 'photo 0', 'scene': 'plage'},
+            {'caption': 'photo 1', 'scene': 'bureau'},
+            {'caption': '', 'scene': ''},
+            {'caption': 'photo 0', 'scene': 'plage'},
+        ])
+        self.assertEqual(calls, [
+            ('caption_processor', [(224, 224), (224, 224)]), ('generate', 2), ('classify', 2),
+            ('caption_processor', [(224, 224)]), ('generate', 1), ('classify', 1),
+        ])
+    
+    def test_single_image_helpers(self):
+        """
+        Test that caption_image and classify_image_scene only run their own model.
+        """
+        calls = []
+        models = self._fake_models(calls)
+        
+        with patch('module2_analysis.nlp.image_pipeline._get_model', side_effect=models.get):
+            self.assertEqual(image_pipeline.classify_image_scene(self.paths[0]), 'plage')
+            self.assertEqual(image_pipeline.caption_image(self.paths[0]), 'photo 0')
+        
+        self.assertEqual([call[0] for call in calls], ['scene_processor', 'classify', 'caption_processor', 'generate'])
+
+
+@override_settings(ANALYSIS_JOBS={'embedded': False}, THROTTLING={'enabled': False})
+class TieredAnalysisTestCase(TestCase):
+    """
+    Test case for the fast/full tiered analysis.
+    """
+    def setUp(self):
+        """
+        Set up test data.
+        """
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='tieruser',
+            email='tier@example.com',
+            password='testpassword'
+        )
+        self.text = "Je suis très heureux et fier, mon projet au travail est une réussite."
+    
+    @override_settings(ANALYSIS_TIERS={'fast_backend': 'lexicon'})
+    def test_lexicon_fast_tier(self):
+        """
+        Test that the lexicon backend fills sentiment, keywords and topics.
+        """
+        results = analyze_fast(self.text)
+        
+        self.assertEqual(results['analysis_tier'], JournalAnalysis.TIER_FAST)
+        self.assertEqual(results['sentiment'], 'positif')
+        self.assertIn('joie', results['emotions_detected'])
+        self.assertTrue(results['keywords'])
+        self.assertIn('travail etudes', results['topics'])
+    
+    @override_settings(ANALYSIS_TIERS={'fast_backend': 'local'})
+    def test_local_fast_tier_falls_back_to_lexicon(self):
+        """
+        Test that the local backend is used, and the lexicon when the inference server is down.
+        """
+        outputs = {
+            'sentiment': {'sentiment': 'positif', 'emotion_score': 0.91},
+            'keywords': ['projet', 'réussite'],
+            'topics': ['mon projet'],
+        }
+        with patch('module2_analysis.tiers.infer', side_effect=lambda op, text, **params: outputs[op]):
+            results = analyze_fast(self.text)
+        with patch('module2_analysis.tiers.infer', side_effect=InferenceUnavailable('down')):
+            fallback = analyze_fast(self.text)
+        
+        self.assertEqual((results['fast_backend'], results['emotion_score'], results['topics']), ('local', 0.91, ['mon projet']))
+        self.assertEqual((fallback['fast_backend'], fallback['sentiment']), ('lexicon', 'positif'))
+    
+    @override_settings(ANALYSIS_TIERS={'fast_backend': 'lexicon'})
+    @patch('module2_analysis.jobs.analyze_multimodal_content')
+    def test_fast_entry_is_enriched_by_the_full_tier(self, mock_analyze):
+        """
+        Test that the fast tier is saved at once and the job enriches the same entry.
+        """
+        mock_analyze.return_value = {
+            'sentiment': 'positif',
+            'emotion_score': 0.9,
+            'keywords': ['projet'],
+            'topics': ['travail'],
+            'summary': 'Tu es fier de ton projet.',
+            'detailed_summary': 'Une journée de réussite professionnelle.',
+            'action_items': ['Célébrer la réussite'],
+            'mood_analysis': 'Humeur enthousiaste.',
+        }
+        
+        response = self.client.post(
+            reverse('module2_analysis:api_analyse_tiered'),
+            {'text': self.text, 'user_id': str(self.user.id)},
+            format='json'
+        )
+        
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['sentiment'], 'positif')
+        analysis = JournalAnalysis.objects.get(id=response.data['analysis_id'])
+        self.assertEqual(analysis.analysis_tier, JournalAnalysis.TIER_FAST)
+        self.assertEqual(analysis.detailed_summary, '')
+        mock_analyze.assert_not_called()
+        
+        self.assertTrue(run_next_job('test-worker'))
+        
+        analysis.refresh_from_db()
+        self.assertEqual(analysis.analysis_tier, JournalAnalysis.TIER_FULL)
+        self.assertEqual(analysis.action_items, ['Célébrer la réussite'])
+        self.assertEqual(JournalAnalysis.objects.filter(user=self.user).count(), 1)
+        status_response = self.client.get(response.data['status_url'])
+        self.assertEqual(status_response.data['analysis_id'], str(analysis.id))
+
+
+class ModelRouterTestCase(TestCase):
+    """
+    Test case for the latency-aware model router.
+    """
+    def setUp(self):
+        self.router = ModelRouter({'hedge_delay': 0.05, 'hedge_factor': 0.05, 'deadline': 2, 'initial_latency': 1.0})
+    
+    @staticmethod
+    def _model_call(delays, failing=()):
+        def call(model, timeout):
+            time.sleep(delays.get(model, 0))
+            if model in failing:
+                raise requests.exceptions.ConnectionError(f"{model} down")
+            return f"réponse de {model}"
+        return call
+    
+    def test_slow_model_is_hedged_and_demoted(self):
+        """
+        Test that a slow first model is hedged, the fast one wins and is preferred afterwards.
+        """
+        result, model = self.router.call(self._model_call({'lent': 0.5, 'rapide': 0.01}), ['lent', 'rapide'])
+        
+        self.assertEqual((result, model), ("réponse de rapide", 'rapide'))
+        self.assertEqual(self.router.rank(['lent', 'rapide']), ['rapide', 'lent'])
+        stats = self.router.stats()
+        self.assertEqual((stats['rapide']['hedges'], stats['rapide']['wins'], stats['lent']['abandoned']), (1, 1, 1))
+    
+    def test_call_within_normal_latency_is_not_hedged(self):
+        """
+        Test that a model answering as fast as usual is not hedged, even past hedge_delay.
+        """
+        router = ModelRouter({'hedge_delay': 0.05, 'hedge_factor': 3, 'deadline': 2})
+        call = self._model_call({'habituel': 0.2, 'secours': 0.5})
+        router.call(call, ['secours'])
+        router.call(call, ['habituel'])
+        
+        _, model = router.call(call, ['habituel', 'secours'])
+        
+        self.assertEqual(model, 'habituel')
+        self.assertEqual(router.stats()['secours']['hedges'], 0)
+        self.assertAlmostEqual(router.hedge_delay_for('habituel'), 0.6, delta=0.1)
+    
+    def test_failure_fails_over_and_marks_model_unhealthy(self):
+        """
+        Test that a failing model is replaced at once and ranked last while unhealthy.
+        """
+        call = self._model_call({}, failing={'panne'})
+        
+        self.assertEqual(self.router.call(call, ['panne', 'secours'], hedge_delay=0)[1], 'secours')
+        self.assertEqual(self.router.rank(['panne', 'secours']), ['secours', 'panne'])
+        for _ in range(2):
+            with self.assertRaises(RoutingError) as context:
+                self.router.call(call, ['panne'])
+        
+        self.assertIsInstance(context.exception.errors[0], requests.exceptions.ConnectionError)
+        self.assertFalse(self.router.stats()['panne']['healthy'])
+    
+    def test_total_deadline(self):
+        """
+        Test that the call gives up at the total deadline even though models are still running.
+        """
+        started = time.monotonic()
+        
+        with self.assertRaises(RoutingError):
+            self.router.call(self._model_call({'a': 1, 'b': 1}), ['a', 'b'], deadline=0.2)
+        
+        self.assertLess(time.monotonic() - started, 0.5)
+
+
+class ThrottlingTestCase(TestCase):
+    """
+    Test case for request coalescing and rate limiting.
+    """
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.throttling = {'db_path': os.path.join(self.temp_dir.name, 'throttle.sqlite3'), 'poll_interval': 0.01}
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='throttleuser',
+            email='throttle@example.com',
+            password='testpassword'
+        )
+    
+    def tearDown(self):
+        self.temp_dir.cleanup()
+    
+    def test_token_bucket(self):
+        """
+        Test that a bucket allows its burst, then gives the wait before the next token.
+        """
+        store = ThrottleStore(self.throttling['db_path'])
+        buckets = [('user:test:1', 0.5, 2)]
+        
+        self.assertEqual([store.take(buckets), store.take(buckets)], [0.0, 0.0])
+        self.assertAlmostEqual(store.take(buckets), 2.0, delta=0.1)
+    
+    def test_identical_concurrent_calls_share_one_call(self):
+        """
+        Test that identical requests in flight run the expensive call once.
+        """
+        calls = []
+        
+        def expensive():
+            calls.append(1)
+            time.sleep(0.2)
+            return {'reponse': 'Bonjour !'}
+        
+        with override_settings(THROTTLING=self.throttling):
+            with ThreadPoolExecutor(max_workers=3) as executor:
+                results = list(executor.map(lambda _: throttled_call('assistant', '1', 'bonjour', expensive), range(3)))
+        
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{'reponse': 'Bonjour !'}] * 3)
+    
+    @patch('module2_analysis.views.analyze_multimodal_content')
+    def test_analysis_endpoint_returns_429_with_retry_after(self, mock_analyze):
+        """
+        Test that a repeated request is served from the first one and a new one is rate limited.
+        """
+        mock_analyze.return_value = {
+            'sentiment': 'neutre',
+            'emotion_score': 0.5,
+            'keywords': [],
+            'summary': 'Une journée calme.',
+            'topics': [],
+        }
+        url = reverse('module2_analysis:api_analyse')
+        
+        with override_settings(THROTTLING=dict(self.throttling, user_burst=1, user_rate=0.1)):
+            first = self.client.post(url, {'text': "Une journée calme.", 'user_id': str(self.user.id)}, format='json')
+            repeated = self.client.post(url, {'text': "Une journée calme.", 'user_id': str(self.user.id)}, format='json')
+            other = self.client.post(url, {'text': "Une autre journée.", 'user_id': str(self.user.id)}, format='json')
+        
+        self.assertEqual((first.status_code, repeated.status_code), (status.HTTP_200_OK, status.HTTP_200_OK))
+        self.assertEqual(repeated.data['analysis_id'], first.data['analysis_id'])
+        self.assertEqual(mock_analyze.call_count, 1)
+        self.assertEqual(other.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(other['Retry-After'], '10')
+    
+    @patch('module2_analysis.views.analyze_multimodal_content')
+    def test_uploads_are_keyed_on_content_and_written_per_request(self, mock_analyze):
+        """
+        Test that identical uploads coalesce on their content, each request using its own file.
+        """
+        seen = []
+        
+        def analysis(text=None, audio_path=None, image_path=None):
+            with open(image_path, 'rb') as f:
+                seen.append((image_path, f.read()))
+            return {'sentiment': 'neutre', 'emotion_score': 0.5, 'keywords': [], 'summary': 'Photo.', 'topics': []}
+        
+        mock_analyze.side_effect = analysis
+        url = reverse('module2_analysis:api_analyse')
+        
+        photos = {}
+        for color in ('green', 'blue'):
+            buffer = io.BytesIO()
+            Image.new('RGB', (8, 8), color=color).save(buffer, format='JPEG')
+            photos[color] = buffer.getvalue()
+        
+        def post(content):
+            return self.client.post(url, {
+                'text': "Au parc.",
+                'image_data': base64.b64encode(content).decode('ascii'),
+                'image_filename': 'photo.jpg',
+            }, format='json')
+        
+        with override_settings(THROTTLING=self.throttling, MEDIA_ROOT=self.temp_dir.name):
+            responses = [post(photos['green']), post(photos['green']), post(photos['blue'])]
+        
+        self.assertEqual([response.status_code for response in responses], [status.HTTP_200_OK] * 3)
+        self.assertEqual([content for _, content in seen], [photos['green'], photos['blue']])
+        self.assertNotEqual(seen[0][0], seen[1][0])
+        self.assertEqual(os.listdir(os.path.join(self.temp_dir.name, 'temp_analysis')), [])
+    
+    def test_identical_streams_share_one_call(self):
+        """
+        Test that an identical stream in flight receives the leader's result and no items.
+        """
+        calls = []
+        
+        def expensive():
+            calls.append(1)
+            yield 'champ'
+            time.sleep(0.2)
+            return {'sentiment': 'positif'}
+        
+        def consume(_):
+            stream = throttled_stream('analyse-stream', '1', 'journée', expensive)
+            items = []
+            while True:
+                try:
+                    items.append(next(stream))
+                except StopIteration as stop:
+                    return items, stop.value
+        
+        with override_settings(THROTTLING=self.throttling):
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                outcomes = list(executor.map(consume, range(2)))
+        
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(items for items, _ in outcomes), [[], ['champ']])
+        self.assertEqual([result for _, result in outcomes], [{'sentiment': 'positif'}] * 2)
+    
+    @override_settings(ANALYSIS_JOBS={'embedded': False})
+    def test_job_endpoint_is_rate_limited_with_the_analysis_endpoints(self):
+        """
+        Test that double submissions share one job and the analysis endpoints share one user bucket.
+        """
+        url = reverse('module2_analysis:api_analyse_jobs')
+        data = {'text': "Une journée calme.", 'user_id': str(self.user.id)}
+        
+        with override_settings(THROTTLING=dict(self.throttling, user_burst=1, user_rate=0.1)):
+            first = self.client.post(url, data, format='json')
+            repeated = self.client.post(url, data, format='json')
+            streamed = self.client.post(
+                reverse('module2_analysis:api_analyse_stream'),
+                {'text': "Une autre journée.", 'user_id': str(self.user.id)},
+                format='json'
+            )
+        
+        self.assertEqual((first.status_code, repeated.status_code), (status.HTTP_202_ACCEPTED, status.HTTP_202_ACCEPTED))
+        self.assertEqual(repeated.data['job_id'], first.data['job_id'])
+        self.assertEqual(AnalysisJob.objects.count(), 1)
+        self.assertEqual(streamed.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', streamed)
+
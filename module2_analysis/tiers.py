@@ -0,0 +1,166 @@
+"""
+Tiered analysis: an instant "fast" tier followed by the "full" LLM analysis in the background.
+
+The fast tier fills sentiment, emotion_score, keywords and topics in tens of milliseconds,
+from the local pipelines (nlp/, through the inference daemon when one is configured) or,
+when the local models are not installed, from the dashboard lexicon analyzer. The entry
+is saved right away with analysis_tier='fast' and a job is queued on the analysis job
+queue (jobs.py); the worker runs the full OpenRouter analysis and enriches the same
+JournalAnalysis, which then becomes 'full'. If the full tier ultimately fails, the fast
+results stay in place.
+"""
+import importlib.util
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from .jobs import check_job_quota, enqueue_analysis
+from .models import JournalAnalysis
+from .nlp.client import InferenceUnavailable, infer
+from .nlp.server import get_inference_config
+from .services import save_journal_analysis
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIER_CONFIG = {
+    'fast_backend': 'auto',     # 'local' (nlp pipelines), 'lexicon' (AnalyseurRapide) or 'auto'
+    'keywords': 5,              # Keywords kept by the fast tier
+    'topics': 3,                # Topics kept by the fast tier
+}
+
+_lexicon_analyzer = None
+_lexicon_lock = threading.Lock()
+
+
+def get_tier_config():
+    """
+    Return the tiered analysis configuration merged with the ANALYSIS_TIERS setting.
+    """
+    config = dict(DEFAULT_TIER_CONFIG)
+    config.update(getattr(settings, 'ANALYSIS_TIERS', {}))
+    return config
+
+
+def _fast_backend(config):
+    if config['fast_backend'] != 'auto':
+        return config['fast_backend']
+    if get_inference_config()['socket'] or importlib.util.find_spec('transformers'):
+        return 'local'
+    return 'lexicon'
+
+
+def _local_fast_analysis(text, config):
+    """
+    Run the local sentiment, keyword and topic models concurrently.
+    """
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        sentiment_future = executor.submit(infer, 'sentiment', text)
+        keywords_future = executor.submit(infer, 'keywords', text, top_n=config['keywords'])
+        topics_future = executor.submit(infer, 'topics', text, top_n=config['topics'])
+        sentiment = sentiment_future.result()
+        return {
+            'sentiment': sentiment['sentiment'],
+            'emotion_score': sentiment['emotion_score'],
+            'keywords': keywords_future.result(),
+            'topics': topics_future.result(),
+        }
+
+
+def _get_lexicon_analyzer():
+    global _lexicon_analyzer
+    if _lexicon_analyzer is None:
+        with _lexicon_lock:
+            if _lexicon_analyzer is None:
+                from dashboard.services.analyse_ia import AnalyseurRapide
+                _lexicon_analyzer = AnalyseurRapide()
+    return _lexicon_analyzer
+
+
+def _lexicon_fast_analysis(text, config):
+    """
+    Run the dashboard lexicon analyzer and map its output to the analysis fields.
+    """
+    resultat = _get_lexicon_analyzer().analyser_texte(text)
+    analyse = resultat.get('analyse_complete', {})
+    if not resultat.get('success'):
+        raise ValueError(analyse.get('erreur', "Lexicon analysis failed"))
+
+    sentiment = analyse['sentiment_principal']
+    themes = sorted(analyse['themes_psychologiques'].items(), key=lambda item: -item[1]['score'])
+    return {
+        'sentiment': sentiment['ton'],
+        'emotion_score': sentiment['confiance'],
+        'emotions_detected': list(analyse['emotions_detectees']),
+        'keywords': [mot['mot'] for mot in analyse['mots_cles_significatifs']][:config['keywords']],
+        'topics': [theme.replace('_', ' ') for theme, _ in themes][:config['topics']],
+    }
+
+
+def analyze_fast(text, config=None):
+    """
+    Compute the fast tier of an analysis.
+
+    Args:
+        text (str): The text to analyze (media are left to the full tier)
+        config (dict, optional): Tier settings, defaults to get_tier_config()
+
+    Returns:
+        dict: sentiment, emotion_score, keywords and topics, with analysis_tier='fast'
+    """
+    config = config or get_tier_config()
+    started = time.perf_counter()
+    results = {'sentiment': 'neutre', 'emotion_score': 0.5, 'keywords': [], 'topics': []}
+
+    if text and text.strip():
+        backend = _fast_backend(config)
+        try:
+            if backend == 'local':
+                try:
+                    results.update(_local_fast_analysis(text, config))
+                except InferenceUnavailable as e:
+                    logger.warning(f"Inference server unavailable, using the lexicon for the fast tier: {e}")
+                    backend = 'lexicon'
+            if backend == 'lexicon':
+                results.update(_lexicon_fast_analysis(text, config))
+        except Exception as e:
+            logger.error(f"Fast tier analysis failed: {e}")
+        results['fast_backend'] = backend
+
+    results['analysis_tier'] = JournalAnalysis.TIER_FAST
+    results['timings'] = {'fast_tier': round(time.perf_counter() - started, 3)}
+    return results
+
+
+def start_tiered_analysis(text=None, audio_file=None, image_file=None, user=None):
+    """
+    Save the fast tier of an analysis and queue its full tier.
+
+    Args:
+        text (str, optional): The text to analyze
+        audio_file (File, optional): The uploaded audio file
+        image_file (File, optional): The uploaded image file
+        user (User, optional): The user the analysis is saved for; anonymous fast results
+            are only returned, and the full results are read from the job
+
+    Returns:
+        tuple: (the fast results, with analysis_id when saved, the queued AnalysisJob)
+
+    Raises:
+        JobQueueFull: If the user already has too many pending jobs
+    """
+    # Refuse before saving anything, so a refused request leaves no half-done entry
+    check_job_quota(user)
+
+    results = analyze_fast(text)
+    analysis_id = None
+    if user is not None:
+        journal_analysis = save_journal_analysis(user, text, results, audio_file=audio_file, image_file=image_file)
+        analysis_id = str(journal_analysis.id)
+        results['analysis_id'] = analysis_id
+
+    job = enqueue_analysis(text=text, audio_file=audio_file, image_file=image_file, user=user, analysis_id=analysis_id)
+    return results, job
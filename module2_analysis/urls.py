@@ -14,6 +14,12 @@ router.register(r'analyses', views.JournalAnalysisViewSet)
 urlpatterns = [
     # API endpoints
     path('api/analyse/v2/', views.analyse_api_view, name='api_analyse'),
+    path('api/analyse/v2/stream/', views.analyse_stream_view, name='api_analyse_stream'),
+    path('api/analyse/v2/jobs/', views.analyse_job_create_view, name='api_analyse_jobs'),
+    path('api/analyse/v2/jobs/<uuid:job_id>/', views.analyse_job_status_view, name='api_analyse_job_status'),
+    path('api/analyse/v2/tiered/', views.analyse_tiered_view, name='api_analyse_tiered'),
+    path('api/analyse/v2/batch/', views.analyse_batch_view, name='api_analyse_batch'),
+    path('api/analyse/v2/stats/', views.analysis_stats_view, name='api_analyse_stats'),
     
     # Detail view for analysis
     path('analysis/<uuid:analysis_id>/', views.analysis_detail_view, name='analysis_detail'),
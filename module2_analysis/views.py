@@ -2,61 +2,52 @@
 Views for the module2_analysis app.
 """
 import os
+import json
 import base64
+import hashlib
 import logging
+import shutil
+import uuid
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.files.base import ContentFile
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from rest_framework import status, viewsets
 from rest_framework.decorators import api_view, permission_classes, parser_classes
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 
-from .models import JournalAnalysis
-from .serializers import AnalysisRequestSerializer, AnalysisResponseSerializer, JournalAnalysisSerializer
-from .services import analyze_multimodal_content
+from .models import JournalAnalysis, AnalysisJob
+from .serializers import AnalysisRequestSerializer, AnalysisResponseSerializer, BatchAnalysisRequestSerializer, JournalAnalysisSerializer
+from .services import analyze_multimodal_content, stream_multimodal_analysis, save_journal_analysis
+from .cache import cache_stats, normalize_text
+from .jobs import enqueue_analysis, job_to_dict, job_queue_stats, get_job_config, start_embedded_workers, JobQueueFull
+from .batch import analyze_batch, get_batch_config
+from .tiers import start_tiered_analysis
+from .nlp.registry import get_registry
+from .nlp.client import get_inference_client
+from .nlp.text_pipeline import batching_stats as text_batching_stats
+from mindscribe.openrouter import get_client
+from mindscribe.model_router import get_router
+from mindscribe.response_cache import response_cache_stats
+from mindscribe.throttling import CoalescedCallFailed, RateLimited, request_key, throttled_call, throttled_stream
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
 User = get_user_model()
 
-@api_view(['POST'])
-@permission_classes([AllowAny])
-@parser_classes([MultiPartParser, FormParser, JSONParser])
-def analyse_api_view(request):
+def _parse_analysis_request(request):
     """
-    API endpoint for multimodal analysis.
-    
-    Accepts text, audio, and/or image content and returns analysis results.
-    
-    POST:
-        - text: optional string
-        - audio_file: optional file (mp3, wav)
-        - image_file: optional file (jpg, png)
-        - user_id: optional string (user ID for saving results)
+    Validate an analysis request and decode base64 media into files.
     
     Returns:
-        JSON with analysis results
+        tuple: (content dict with text, user_id, audio_file and image_file, None)
+               or (None, error Response)
     """
-    # Log incoming data for debugging
-    print("="*80)
-    print("ANALYSE API VIEW CALLED")
-    print(f"Content-Type: {request.content_type}")
-    print(f"Request method: {request.method}")
-    print(f"Request POST keys: {list(request.POST.keys())}")
-    print(f"Request FILES keys: {list(request.FILES.keys())}")
-    
-    # Try to access request.data carefully
-    try:
-        print(f"Request data keys: {list(request.data.keys())}")
-        print(f"Request data dict: {dict(request.data)}")
-    except Exception as e:
-        print(f"Error accessing request.data: {e}")
-    
-    print("="*80)
-    
     # Combine POST and FILES data for multipart requests
     data = {}
     if request.content_type and 'multipart/form-data' in request.content_type:
@@ -74,7 +65,7 @@ def analyse_api_view(request):
     if not serializer.is_valid():
         print(f"VALIDATION FAILED: {serializer.errors}")
         print(f"Data passed to serializer: {data}")
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        return None, Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     # Extract data from request
     text = serializer.validated_data.get('text', '')
@@ -98,7 +89,7 @@ def analyse_api_view(request):
             print(f"Converted base64 audio to file: {audio_filename}, size: {len(audio_bytes)} bytes")
         except Exception as e:
             print(f"Error decoding audio base64: {e}")
-            return Response({"error": "Invalid audio data"}, status=status.HTTP_400_BAD_REQUEST)
+            return None, Response({"error": "Invalid audio data"}, status=status.HTTP_400_BAD_REQUEST)
     
     if image_data and not image_file:
         try:
@@ -107,34 +98,67 @@ def analyse_api_view(request):
             print(f"Converted base64 image to file: {image_filename}, size: {len(image_bytes)} bytes")
         except Exception as e:
             print(f"Error decoding image base64: {e}")
-            return Response({"error": "Invalid image data"}, status=status.HTTP_400_BAD_REQUEST)
+            return None, Response({"error": "Invalid image data"}, status=status.HTTP_400_BAD_REQUEST)
     
-    # Initialize paths to None
-    audio_path = None
-    image_path = None
+    return {
+        'text': text,
+        'user_id': user_id,
+        'audio_file': audio_file,
+        'image_file': image_file,
+    }, None
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+@parser_classes([MultiPartParser, FormParser, JSONParser])
+def analyse_api_view(request):
+    """
+    API endpoint for multimodal analysis.
     
-    # Save files if provided
-    if audio_file:
-        # Create media directory if it doesn't exist
-        os.makedirs(os.path.join(settings.MEDIA_ROOT, 'temp_analysis'), exist_ok=True)
-        
-        # Save audio file
-        audio_path = os.path.join(settings.MEDIA_ROOT, 'temp_analysis', audio_file.name)
-        with open(audio_path, 'wb') as f:
-            for chunk in audio_file.chunks():
-                f.write(chunk)
+    Accepts text, audio, and/or image content and returns analysis results.
     
-    if image_file:
-        # Create media directory if it doesn't exist
-        os.makedirs(os.path.join(settings.MEDIA_ROOT, 'temp_analysis'), exist_ok=True)
-        
-        # Save image file
-        image_path = os.path.join(settings.MEDIA_ROOT, 'temp_analysis', image_file.name)
-        with open(image_path, 'wb') as f:
-            for chunk in image_file.chunks():
-                f.write(chunk)
+    POST:
+        - text: optional string
+        - audio_file: optional file (mp3, wav)
+        - image_file: optional file (jpg, png)
+        - user_id: optional string (user ID for saving results)
     
+    Returns:
+        JSON with analysis results
+    """
+    # Log incoming data for debugging
+    print("="*80)
+    print("ANALYSE API VIEW CALLED")
+    print(f"Content-Type: {request.content_type}")
+    print(f"Request method: {request.method}")
+    print(f"Request POST keys: {list(request.POST.keys())}")
+    print(f"Request FILES keys: {list(request.FILES.keys())}")
+    
+    # Try to access request.data carefully
     try:
+        print(f"Request data keys: {list(request.data.keys())}")
+        print(f"Request data dict: {dict(request.data)}")
+    except Exception as e:
+        print(f"Error accessing request.data: {e}")
+    
+    print("="*80)
+    
+    content, error_response = _parse_analysis_request(request)
+    if error_response is not None:
+        return error_response
+    
+    text = content['text']
+    user_id = content['user_id']
+    audio_file = content['audio_file']
+    image_file = content['image_file']
+    
+    # Hash the uploads before anything is written to disk: identical requests coalesce on it
+    content_key = _content_key(content)
+    
+    # Save files if provided, in a directory of this request
+    audio_path, image_path = _save_temp_uploads(audio_file, image_file)
+    
+    def run_analysis():
         # Perform analysis
         analysis_results = analyze_multimodal_content(
             text=text,
@@ -148,83 +172,59 @@ def analyse_api_view(request):
         # Debug logging for response validation
         print(f"Validating response with serializer: {analysis_results.keys()}")
         
-        if response_serializer.is_valid():
-            print("Response serializer validation successful")
-            # If user_id is provided, save the analysis to the database
-            if user_id:
-                try:
-                    # Try to get the user
-                    print(f"Looking up user with ID: {user_id}")
-                    user = User.objects.get(id=user_id)
-                    print(f"Found user: {user.username}")
-                    
-                    # Handle None values for JSONFields
-                    emotions_detected = analysis_results.get('emotions_detected') or []
-                    keywords = analysis_results.get('keywords') or []
-                    topics = analysis_results.get('topics') or []
-                    positive_aspects = analysis_results.get('positive_aspects') or []
-                    negative_aspects = analysis_results.get('negative_aspects') or []
-                    action_items = analysis_results.get('action_items') or []
-                    
-                    print("Creating journal analysis entry")
-                    # Create a journal analysis entry with enhanced fields
-                    journal_analysis = JournalAnalysis.objects.create(
-                        user=user,
-                        text=text if text else '',
-                        sentiment=analysis_results.get('sentiment', 'neutre'),
-                        emotion_score=analysis_results.get('emotion_score', 0.5),
-                        emotions_detected=emotions_detected,
-                        keywords=keywords,
-                        topics=topics,
-                        summary=analysis_results.get('summary', ''),
-                        detailed_summary=analysis_results.get('detailed_summary', ''),
-                        positive_aspects=positive_aspects,
-                        negative_aspects=negative_aspects,
-                        action_items=action_items,
-                        mood_analysis=analysis_results.get('mood_analysis', ''),
-                        audio_transcription=analysis_results.get('audio_transcription') or '',
-                        image_caption=analysis_results.get('image_caption') or '',
-                        image_scene=analysis_results.get('image_scene') or '',
-                        image_analysis=analysis_results.get('image_analysis') or ''
-                    )
-                    
-                    print("Journal analysis entry created successfully")
-                    
-                    # Save audio and image if provided
-                    if audio_file:
-                        print(f"Saving audio file: {audio_file.name}")
-                        journal_analysis.audio_file = audio_file
-                    
-                    if image_file:
-                        print(f"Saving image file: {image_file.name}")
-                        journal_analysis.image_file = image_file
-                    
-                    journal_analysis.save()
-                    print("D")
-                    
-                    # Include the analysis ID in the response
-                    analysis_results['analysis_id'] = str(journal_analysis.id)
-                    print(f"Analysis ID added to response: {journal_analysis.id}")
+        if not response_serializer.is_valid():
+            print(f"Response serializer validation failed: {response_serializer.errors}")
+            return {'status': status.HTTP_500_INTERNAL_SERVER_ERROR, 'data': response_serializer.errors}
+        
+        print("Response serializer validation successful")
+        # If user_id is provided, save the analysis to the database
+        if user_id:
+            try:
+                # Try to get the user
+                print(f"Looking up user with ID: {user_id}")
+                user = User.objects.get(id=user_id)
+                print(f"Found user: {user.username}")
+                
+                print("Creating journal analysis entry")
+                journal_analysis = save_journal_analysis(
+                    user,
+                    text,
+                    analysis_results,
+                    audio_file=audio_file,
+                    image_file=image_file
+                )
+                print("Journal analysis entry created successfully")
                 
-                except User.DoesNotExist:
-                    logger.warning(f"User with ID {user_id} not found")
-                    print(f"ERROR: User with ID {user_id} not found")
-                except Exception as e:
-                    logger.error(f"Error saving analysis to database: {e}")
-                    print(f"ERROR saving analysis to database: {e}")
-                    print(f"Error type: {type(e)}")
-                    # Return error to client for debugging
-                    return Response(
-                        {"error": f"Database error: {str(e)}"},
-                        status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                    )
+                # Include the analysis ID in the response
+                analysis_results['analysis_id'] = str(journal_analysis.id)
+                print(f"Analysis ID added to response: {journal_analysis.id}")
             
-            print("Returning successful response")
-            return Response(analysis_results, status=status.HTTP_200_OK)
-        else:
-            print(f"Response serializer validation failed: {response_serializer.errors}")
-            return Response(response_serializer.errors, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            except User.DoesNotExist:
+                logger.warning(f"User with ID {user_id} not found")
+                print(f"ERROR: User with ID {user_id} not found")
+            except Exception as e:
+                logger.error(f"Error saving analysis to database: {e}")
+                print(f"ERROR saving analysis to database: {e}")
+                print(f"Error type: {type(e)}")
+                # Return error to client for debugging
+                return {'status': status.HTTP_500_INTERNAL_SERVER_ERROR, 'data': {"error": f"Database error: {str(e)}"}}
+        
+        print("Returning successful response")
+        return {'status': status.HTTP_200_OK, 'data': analysis_results}
     
+    try:
+        # Identical requests in flight (double-clicks, client retries) share one analysis and one saved entry
+        outcome = throttled_call(
+            'analyse',
+            _client_key(request, user_id),
+            content_key,
+            run_analysis,
+            rate_scope='analyse'
+        )
+        return Response(outcome['data'], status=outcome['status'])
+    
+    except RateLimited as e:
+        return _rate_limited_response(e)
     except Exception as e:
         logger.error(f"Error during analysis: {e}")
         error_message = str(e)
@@ -236,11 +236,379 @@ def analyse_api_view(request):
         )
     finally:
         # Clean up temporary files
-        if audio_path and os.path.exists(audio_path):
-            os.remove(audio_path)
-        
-        if image_path and os.path.exists(image_path):
-            os.remove(image_path)
+        _remove_temp_uploads(audio_path, image_path)
+
+
+def _save_temp_uploads(audio_file, image_file):
+    """
+    Write the uploads of a request to a temporary directory of its own.
+    
+    Identical requests carry the same file names: a shared path would let one request
+    overwrite a file that another is still reading.
+    
+    Returns:
+        tuple: (audio path or None, image path or None)
+    """
+    directory = os.path.join(settings.MEDIA_ROOT, 'temp_analysis', uuid.uuid4().hex)
+    paths = []
+    for upload in (audio_file, image_file):
+        if not upload:
+            paths.append(None)
+            continue
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, os.path.basename(upload.name))
+        with open(path, 'wb') as f:
+            for chunk in upload.chunks():
+                f.write(chunk)
+        paths.append(path)
+    return tuple(paths)
+
+
+def _remove_temp_uploads(audio_path, image_path):
+    """
+    Delete the temporary uploads of a request and their directory (optimized image included).
+    """
+    for path in (audio_path, image_path):
+        if path:
+            shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+
+
+def _resolve_user(request, user_id):
+    """
+    Return the user the analysis is saved for: the logged-in user, else the given user_id.
+    """
+    if request.user.is_authenticated:
+        return request.user
+    if not user_id:
+        return None
+    user = User.objects.filter(id=user_id).first()
+    if user is None:
+        logger.warning(f"User with ID {user_id} not found")
+    return user
+
+
+def _client_key(request, user_id):
+    """
+    Return who a request is rate limited as: the user, else the client IP.
+    """
+    if request.user.is_authenticated:
+        return str(request.user.id)
+    if user_id:
+        return str(user_id)
+    forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    return f"ip:{forwarded_for.split(',')[0].strip() if forwarded_for else request.META.get('REMOTE_ADDR', '')}"
+
+
+def _content_key(content):
+    """
+    Return the hash identifying identical analysis requests, uploaded files included.
+    """
+    digests = []
+    for name in ('audio_file', 'image_file'):
+        upload = content[name]
+        hasher = hashlib.sha256()
+        if upload:
+            for chunk in upload.chunks():
+                hasher.update(chunk)
+        digests.append(hasher.hexdigest() if upload else '')
+    return request_key(normalize_text(content['text']), *digests)
+
+
+def _rate_limited_response(error):
+    return Response(
+        {"error": str(error)},
+        status=status.HTTP_429_TOO_MANY_REQUESTS,
+        headers={'Retry-After': error.retry_after_header}
+    )
+
+
+def _sse_event(event, data):
+    """
+    Format a server-sent event.
+    """
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+@parser_classes([MultiPartParser, FormParser, JSONParser])
+def analyse_stream_view(request):
+    """
+    API endpoint streaming a multimodal analysis as server-sent events.
+    
+    Accepts the same fields as analyse_api_view. Each field of the analysis is pushed
+    as a `field` event ({"name": ..., "value": ...}) as soon as the model has written
+    it, followed by a `result` event with the complete results (and the saved
+    analysis ID), or an `error` event. An identical request already in flight only
+    receives the `result` event of its analysis; 429 when the user is rate limited.
+    """
+    content, error_response = _parse_analysis_request(request)
+    if error_response is not None:
+        return error_response
+    
+    user = _resolve_user(request, content['user_id'])
+    text = content['text']
+    audio_file = content['audio_file']
+    image_file = content['image_file']
+    
+    def analysis_events():
+        for event in stream_multimodal_analysis(text=text, audio_path=audio_path, image_path=image_path):
+            if event[0] == 'field':
+                yield _sse_event('field', {'name': event[1], 'value': event[2]})
+                continue
+            
+            results = event[1]
+            if user is not None:
+                journal_analysis = save_journal_analysis(
+                    user,
+                    text,
+                    results,
+                    audio_file=audio_file,
+                    image_file=image_file
+                )
+                results['analysis_id'] = str(journal_analysis.id)
+            return results
+    
+    try:
+        # Identical requests in flight share one analysis (and one saved entry) and receive its result
+        analysis = throttled_stream(
+            'analyse-stream',
+            _client_key(request, content['user_id']),
+            _content_key(content),
+            analysis_events,
+            rate_scope='analyse'
+        )
+    except RateLimited as e:
+        return _rate_limited_response(e)
+    
+    # Keep the uploads on disk for the duration of the stream
+    audio_path, image_path = _save_temp_uploads(audio_file, image_file)
+    
+    def event_stream():
+        try:
+            results = yield from analysis
+            yield _sse_event('result', results)
+        except Exception as e:
+            logger.error(f"Error during streamed analysis: {e}")
+            yield _sse_event('error', {'error': str(e)})
+        finally:
+            # Clean up temporary files
+            _remove_temp_uploads(audio_path, image_path)
+    
+    response = StreamingHttpResponse(event_stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Tell reverse proxies (nginx) not to buffer the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+@parser_classes([MultiPartParser, FormParser, JSONParser])
+def analyse_job_create_view(request):
+    """
+    API endpoint queuing a multimodal analysis.
+    
+    Accepts the same fields as analyse_api_view but returns immediately; the analysis
+    runs in a background worker and its outcome is read from the status endpoint.
+    
+    Returns:
+        202 with the job ID and status URL, 429 if the user has too many pending jobs or
+        is rate limited
+    """
+    content, error_response = _parse_analysis_request(request)
+    if error_response is not None:
+        return error_response
+    
+    user = _resolve_user(request, content['user_id'])
+    
+    try:
+        # The job calls the LLM: rate limited when queued, double submissions share one job
+        job_id = throttled_call(
+            'analyse-job',
+            _client_key(request, content['user_id']),
+            _content_key(content),
+            lambda: str(enqueue_analysis(
+                text=content['text'],
+                audio_file=content['audio_file'],
+                image_file=content['image_file'],
+                user=user
+            ).id),
+            rate_scope='analyse'
+        )
+        job = AnalysisJob.objects.get(id=job_id)
+    except RateLimited as e:
+        return _rate_limited_response(e)
+    except CoalescedCallFailed as e:
+        return Response({"error": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    except JobQueueFull as e:
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_429_TOO_MANY_REQUESTS,
+            headers={'Retry-After': str(get_job_config()['poll_interval'] * 5)}
+        )
+    
+    status_url = reverse('module2_analysis:api_analyse_job_status', args=[job.id])
+    return Response(
+        {
+            'job_id': str(job.id),
+            'status': job.status,
+            'status_url': status_url,
+            'poll_interval': get_job_config()['poll_interval'],
+        },
+        status=status.HTTP_202_ACCEPTED,
+        headers={'Location': status_url}
+    )
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def analyse_job_status_view(request, job_id):
+    """
+    API endpoint returning the status of an analysis job.
+    
+    The job ID is a random UUID only known to the client that queued it. Authenticated
+    users can only read their own jobs.
+    
+    Returns:
+        JSON with the job status, and the analysis results once it succeeded
+    """
+    job = get_object_or_404(AnalysisJob, id=job_id)
+    if job.user_id and request.user.is_authenticated and job.user_id != request.user.id:
+        return Response({"error": "Not found"}, status=status.HTTP_404_NOT_FOUND)
+    
+    headers = {}
+    if not job.is_finished:
+        config = get_job_config()
+        headers['Retry-After'] = str(config['poll_interval'])
+        # Make sure a worker pool polls for the job, even in a process that never queued one
+        start_embedded_workers(config)
+    return Response(job_to_dict(job), headers=headers)
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+@parser_classes([MultiPartParser, FormParser, JSONParser])
+def analyse_tiered_view(request):
+    """
+    API endpoint answering with the fast tier of an analysis and queuing the full tier.
+    
+    Accepts the same fields as analyse_api_view. Sentiment, emotion score, keywords and
+    topics are computed locally and saved at once (analysis_tier='fast'); the LLM analysis
+    runs in a background job that enriches the same entry.
+    
+    Returns:
+        202 with the fast results, the job ID and status URL, 429 if the user has too many
+        pending jobs or is rate limited
+    """
+    content, error_response = _parse_analysis_request(request)
+    if error_response is not None:
+        return error_response
+    
+    user = _resolve_user(request, content['user_id'])
+    
+    def start():
+        results, job = start_tiered_analysis(
+            text=content['text'],
+            audio_file=content['audio_file'],
+            image_file=content['image_file'],
+            user=user
+        )
+        return dict(results, job_id=str(job.id))
+    
+    try:
+        # The full tier calls the LLM: rate limited when queued, double submissions share one job
+        results = throttled_call(
+            'analyse-tiered',
+            _client_key(request, content['user_id']),
+            _content_key(content),
+            start,
+            rate_scope='analyse'
+        )
+    except RateLimited as e:
+        return _rate_limited_response(e)
+    except CoalescedCallFailed as e:
+        return Response({"error": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    except JobQueueFull as e:
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_429_TOO_MANY_REQUESTS,
+            headers={'Retry-After': str(get_job_config()['poll_interval'] * 5)}
+        )
+    
+    status_url = reverse('module2_analysis:api_analyse_job_status', args=[results['job_id']])
+    results.update({
+        'status_url': status_url,
+        'poll_interval': get_job_config()['poll_interval'],
+    })
+    return Response(results, status=status.HTTP_202_ACCEPTED, headers={'Location': status_url})
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+@parser_classes([JSONParser])
+def analyse_batch_view(request):
+    """
+    API endpoint analyzing many entries in one request.
+    
+    POST (JSON):
+        - entries: list of {id (optional, echoed back), text, audio_data, audio_filename,
+          image_data, image_filename}
+        - user_id: optional string (user ID for saving results)
+        - save: optional boolean, save a JournalAnalysis per entry (default true)
+    
+    Returns:
+        NDJSON stream with one line per entry as soon as it is analyzed
+        ({"index", "id", "status": ok|error|invalid|rate_limited|timeout, "result" or "error"}),
+        then a {"summary": {...}} line
+    """
+    serializer = BatchAnalysisRequestSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    entries = serializer.validated_data['entries']
+    max_items = get_batch_config()['max_items']
+    if len(entries) > max_items:
+        return Response(
+            {"error": f"A batch accepts at most {max_items} entries"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    user = _resolve_user(request, serializer.validated_data.get('user_id'))
+    user_key = str(user.id) if user is not None else request.META.get('REMOTE_ADDR', 'anonymous')
+    
+    def ndjson_stream():
+        for report in analyze_batch(entries, user=user, user_key=user_key, save=serializer.validated_data['save']):
+            yield json.dumps(report, ensure_ascii=False) + '\n'
+    
+    response = StreamingHttpResponse(ndjson_stream(), content_type='application/x-ndjson')
+    response['Cache-Control'] = 'no-cache'
+    # Tell reverse proxies (nginx) not to buffer the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def analysis_stats_view(request):
+    """
+    API endpoint exposing runtime statistics of the analysis pipeline (staff only).
+    
+    Returns:
+        JSON with result cache, job queue, OpenRouter client, model router, local model and
+        response cache counters
+    """
+    client = get_inference_client()
+    return Response({
+        'result_cache': cache_stats(),
+        'jobs': job_queue_stats(),
+        'openrouter': get_client().stats(),
+        'model_router': get_router().stats(),
+        'local_models': get_registry().stats(),
+        'text_batching': text_batching_stats(),
+        'inference_client': client.stats() if client else None,
+        'response_cache': response_cache_stats(),
+    })
 
 
 @api_view(['GET'])
@@ -249,7 +617,7 @@ def analysis_detail_view(request, analysis_id):
     """
     View for displaying a single analysis in detail.
     """
-    from django.shortcuts import render, get_object_or_404
+    from django.shortcuts import render
     
     analysis = get_object_or_404(JournalAnalysis, id=analysis_id, user=request.user)
     return render(request, 'journal/analysis_detail.html', {'analysis': analysis})
@@ -9,15 +9,20 @@ from datetime import datetime, timedelta
 from django.utils import timezone
 from django.db.models import Avg, Count, Q
 from django.conf import settings
+from module2_analysis.llm_json import LLMJSONError, parse_llm_json
 from module2_analysis.models import JournalAnalysis
+from mindscribe.openrouter import get_client
 
 logger = logging.getLogger(__name__)
 
-# OpenRouter API Configuration (from settings)
-OPENROUTER_API_KEY = getattr(settings, 'OPENROUTER_API_KEY', '')
-OPENROUTER_API_URL = f"{getattr(settings, 'OPENROUTER_BASE_URL', 'https://openrouter.ai/api/v1')}/chat/completions"
+# OpenRouter model (the shared client in mindscribe.openrouter reads the key and base URL)
 OPENROUTER_MODEL = getattr(settings, 'OPENROUTER_MODEL', 'google/gemini-pro')
 
+# Expected shape of the model answer
+RECOMMENDATIONS_SCHEMA = {
+    'recommendations': {'type': 'list', 'items': 'object', 'required': True},
+}
+
 
 def get_user_analysis_summary(user, days=7):
     """
@@ -198,13 +203,6 @@ IMPORTANT:
 
     try:
         # Call OpenRouter API
-        headers = {
-            "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-            "Content-Type": "application/json",
-            "HTTP-Referer": "https://mindscribe.app",
-            "X-Title": "MindScribe Recommendations"
-        }
-        
         payload = {
             "model": OPENROUTER_MODEL,
             "messages": [
@@ -224,10 +222,12 @@ IMPORTANT:
         logger.info(f"🤖 Calling OpenRouter API with model: {OPENROUTER_MODEL}")
         logger.info(f"📊 User summary - Entries: {summary['total_entries']}, Emotions: {summary['common_emotions']}")
         
-        response = requests.post(OPENROUTER_API_URL, headers=headers, json=payload, timeout=30)
-        response.raise_for_status()
-        
-        result = response.json()
+        result = get_client().chat_completion(
+            payload,
+            deadline=30,
+            title="MindScribe Recommendations",
+            referer="https://mindscribe.app"
+        )
         
         # Vérifier si la réponse contient les données attendues
         if 'choices' not in result or len(result['choices']) == 0:
@@ -246,25 +246,18 @@ IMPORTANT:
         
         logger.info(f"✅ AI Response received: {ai_response[:200]}...")
         
-        # Parse JSON response
-        # Remove markdown code blocks if present
-        if '```json' in ai_response:
-            ai_response = ai_response.split('```json')[1].split('```')[0].strip()
-        elif '```' in ai_response:
-            ai_response = ai_response.split('```')[1].split('```')[0].strip()
-            
+        # Parse JSON response (fences, trailing commas and truncation are repaired in one pass)
         # Pas de recommandations par défaut - utilisation uniquement de l'IA
         
         try:
-            recommendations_data = json.loads(ai_response)
-            recommendations = recommendations_data.get('recommendations', [])
+            recommendations = parse_llm_json(ai_response, RECOMMENDATIONS_SCHEMA)['recommendations']
             
             # Vérifier si les recommandations sont valides
-            if not recommendations or not isinstance(recommendations, list):
+            if not recommendations:
                 logger.warning("⚠️ No valid recommendations in API response")
                 return []
-        except json.JSONDecodeError:
-            logger.warning("⚠️ Failed to parse JSON response")
+        except LLMJSONError as e:
+            logger.warning(f"⚠️ Failed to parse JSON response: {e}")
             return []
         
         logger.info(f"🎯 Successfully generated {len(recommendations)} AI-powered recommendations!")
@@ -6,12 +6,18 @@ from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.utils import timezone
 from datetime import timedelta
+from mindscribe.response_cache import invalidate_on
 from module2_analysis.models import JournalAnalysis
-from .models import Recommandation
+from .models import Objectif, Recommandation
 from .services import create_recommendations_for_user, get_user_analysis_summary
 
 logger = logging.getLogger(__name__)
 
+# Invalidate the cached recommendations dashboard of the user on every relevant write
+invalidate_on('recommendations', Recommandation, 'utilisateur')
+invalidate_on('recommendations', Objectif, 'utilisateur')
+invalidate_on('recommendations', JournalAnalysis, 'user')
+
 
 @receiver(post_save, sender=JournalAnalysis)
 def trigger_recommendations_on_journal_entry(sender, instance, created, **kwargs):
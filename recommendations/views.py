@@ -10,6 +10,7 @@ from django.contrib import messages
 from django.db.models import Q, Count
 from datetime import datetime, timedelta
 from django.utils import timezone
+from mindscribe.response_cache import cache_per_user
 
 from .models import Recommandation, Objectif
 from .services import (
@@ -22,7 +23,13 @@ from .services import (
 logger = logging.getLogger(__name__)
 
 
+def _today(request, *args, **kwargs):
+    # Active goals, deadlines and the 7-day summary depend on the current date
+    return timezone.localdate().isoformat()
+
+
 @login_required
+@cache_per_user('recommendations', key_func=_today)
 def dashboard(request):
     """
     Main dashboard view for recommendations and goals.